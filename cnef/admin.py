@@ -1,20 +1,41 @@
+from datetime import date
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.http import JsonResponse
+from django.utils.functional import cached_property
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import NoReverseMatch, path, reverse
 from django.contrib import messages
 from django.utils import timezone
 from .models import (
     Etablissement, User, FichierImport, Credit_Amortissables, 
     Decouverts, Affacturage, Cautions, Effets_commerces, Spot,
-    TokenInscription, ActionUtilisateur
+    TokenInscription, ActionUtilisateur, AnomalieTEG
 )
+from .evenements import publier_fichiers
+from .suggestions import index_suggestions, ETABLISSEMENT
+from .tendances_teg import invalider_donnees_prets
 
 
 # ==========================================
 # ADMIN PERSONNALISÉS
 # ==========================================
 
+def lien_admin(obj, libelle):
+    """Lien vers la fiche admin de `obj`, ou le libellé seul si son modèle n'est pas enregistré"""
+    try:
+        url = reverse(f'admin:{obj._meta.app_label}_{obj._meta.model_name}_change', args=[obj.pk])
+    except NoReverseMatch:
+        return libelle
+    return format_html('<a href="{}">{}</a>', url, libelle)
+
+
 class EtablissementAdmin(admin.ModelAdmin):
     """Admin pour le modèle Etablissement"""
     
@@ -112,6 +133,7 @@ class UserAdmin(BaseUserAdmin):
         return "Aucun"
     etablissement_link.short_description = "Établissement"
 
+@admin.register(FichierImport)
 class FichierImportAdmin(admin.ModelAdmin):
     """Admin pour le modèle FichierImport"""
     
@@ -173,24 +195,23 @@ class FichierImportAdmin(admin.ModelAdmin):
         }),
     )
     
+    list_select_related = ['etablissement_cnef', 'uploader_par', 'valide_par']
+
     def etablissement_cnef_link(self, obj):
         if obj.etablissement_cnef:
-            url = reverse('admin:cnef_etablissement_change', args=[obj.etablissement_cnef.id])
-            return format_html('<a href="{}">{}</a>', url, obj.etablissement_cnef.Nom_etablissement)
+            return lien_admin(obj.etablissement_cnef, obj.etablissement_cnef.Nom_etablissement)
         return "Aucun"
     etablissement_cnef_link.short_description = "Établissement"
     
     def uploader_par_link(self, obj):
         if obj.uploader_par:
-            url = reverse('admin:cnef_user_change', args=[obj.uploader_par.id])
-            return format_html('<a href="{}">{}</a>', url, obj.uploader_par.get_full_name())
+            return lien_admin(obj.uploader_par, obj.uploader_par.get_full_name())
         return "Aucun"
     uploader_par_link.short_description = "Uploadé par"
     
     def valide_par_link(self, obj):
         if obj.valide_par:
-            url = reverse('admin:cnef_user_change', args=[obj.valide_par.id])
-            return format_html('<a href="{}">{}</a>', url, obj.valide_par.get_full_name())
+            return lien_admin(obj.valide_par, obj.valide_par.get_full_name())
         return "Non validé"
     valide_par_link.short_description = "Validé par"
     
@@ -199,21 +220,228 @@ class FichierImportAdmin(admin.ModelAdmin):
     total_lignes_importees.short_description = "Total lignes"
     
     # Actions personnalisées
-    actions = ['marquer_comme_valide', 'marquer_comme_rejete']
-    
+    actions = ['marquer_comme_valide', 'marquer_comme_rejete', 'valider_en_lot']
+
     def marquer_comme_valide(self, request, queryset):
+        fichier_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(statut='REUSSI', valide_par=request.user, date_validation=timezone.now())
+        publier_fichiers(fichier_ids)
         self.message_user(request, f"{updated} fichier(s) marqué(s) comme validé(s).")
     marquer_comme_valide.short_description = "Marquer comme validé"
     
     def marquer_comme_rejete(self, request, queryset):
+        fichier_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(statut='REJETE')
+        publier_fichiers(fichier_ids)
         self.message_user(request, f"{updated} fichier(s) marqué(s) comme rejeté(s).")
     marquer_comme_rejete.short_description = "Marquer comme rejeté"
-    
+
+    def valider_en_lot(self, request, queryset):
+        from .validation_groupee import lancer_validation_arriere_plan
+
+        fichier_ids = list(queryset.filter(statut='EN_COURS').values_list('id', flat=True))
+        ignores = queryset.count() - len(fichier_ids)
+        if not fichier_ids:
+            self.message_user(request, "Aucun fichier en attente de validation dans la sélection.", messages.WARNING)
+            return
+        tache_id = lancer_validation_arriere_plan(fichier_ids, request.user)
+        suivi = reverse('api_progression_validation_en_lot', args=[tache_id])
+        self.message_user(
+            request,
+            format_html(
+                "Import de {} fichier(s) lancé en parallèle ({} ignoré(s), déjà traités). "
+                'Progression : <a href="{}">{}</a>',
+                len(fichier_ids), ignores, suivi, tache_id
+            )
+        )
+    valider_en_lot.short_description = "Importer et valider (validation groupée)"
+
+
+
+# ==========================================
+# MODE PERFORMANCE DES TABLES DE PRÊTS
+# ==========================================
+# Les tables de prêts comptent des millions de lignes : la liste ne doit
+# exécuter qu'un nombre fixe de requêtes, sans COUNT(*) ni SELECT DISTINCT
+# sur toute la table, et les suppressions se font par lots.
+
+def estimer_lignes(modele):
+    """Nombre de lignes estimé par le moteur (statistiques de la table), None si indisponible"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [modele._meta.db_table]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [modele._meta.db_table])
+        else:
+            return None
+        ligne = cursor.fetchone()
+    return int(ligne[0]) if ligne and ligne[0] is not None and ligne[0] >= 0 else None
+
+
+class PaginateurEstime(Paginator):
+    """
+    Sans filtre ni recherche, le nombre de lignes est l'estimation du moteur
+    au lieu d'un COUNT(*) sur toute la table (au-delà d'ADMIN_COMPTAGE_ESTIME_SEUIL)
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimation = estimer_lignes(self.object_list.model)
+            if estimation is not None and estimation >= settings.ADMIN_COMPTAGE_ESTIME_SEUIL:
+                return estimation
+        return super().count
+
+
+class FiltreEtablissement(admin.SimpleListFilter):
+    """
+    Filtre par établissement avec autocomplétion (index de suggestions en
+    mémoire, cnef/suggestions.py) au lieu de la liste de tous les établissements
+    """
+    title = "établissement"
+    parameter_name = 'etablissement'
+    template = 'admin/filtre_etablissement.html'
+
+    def __init__(self, request, params, model, model_admin):
+        info = model._meta.app_label, model._meta.model_name
+        self.url_suggestions = reverse('admin:%s_%s_suggestions_etablissements' % info)
+        super().__init__(request, params, model, model_admin)
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        # Seul l'établissement sélectionné est proposé ; les autres viennent de l'autocomplétion
+        valeur = self.value()
+        if not (valeur and valeur.isdigit()):
+            return []
+        etablissements = index_suggestions.lister(ETABLISSEMENT, filtre=lambda e: e['id'] == int(valeur))
+        return [(valeur, f"{e['nom']} ({e['code']})") for e in etablissements] or [(valeur, f"#{valeur}")]
+
+    def queryset(self, request, queryset):
+        valeur = self.value()
+        if valeur and valeur.isdigit():
+            return queryset.filter(etablissement_id=int(valeur))
+        return queryset
+
+
+class FiltreAnnee(admin.SimpleListFilter):
+    """
+    Année de mise en place, à la place de date_hierarchy (SELECT DISTINCT des
+    années sur toute la table). Filtre par intervalle : une seule partition lue (MySQL).
+    """
+    title = "année de mise en place"
+    parameter_name = 'annee'
+
+    def __init__(self, request, params, model, model_admin):
+        self.champ_date = model_admin.champ_date
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        cle = f'admin:annees:{model_admin.model._meta.db_table}'
+        bornes = cache.get(cle)
+        if bornes is None:
+            # MIN / MAX : lecture des deux extrémités de l'index de la date
+            bornes = model_admin.model.objects.aggregate(premiere=Min(self.champ_date), derniere=Max(self.champ_date))
+            cache.set(cle, bornes, settings.ADMIN_FILTRES_CACHE_DUREE)
+        if not (bornes['premiere'] and bornes['derniere']):
+            return []
+        return [(str(a), str(a)) for a in range(bornes['derniere'].year, bornes['premiere'].year - 1, -1)]
+
+    def queryset(self, request, queryset):
+        valeur = self.value()
+        if valeur and valeur.isdigit():
+            annee = int(valeur)
+            return queryset.filter(**{
+                f'{self.champ_date}__gte': date(annee, 1, 1),
+                f'{self.champ_date}__lt': date(annee + 1, 1, 1),
+            })
+        return queryset
+
+
+class ValeursCacheesFiltre(admin.AllValuesFieldListFilter):
+    """AllValuesFieldListFilter dont les valeurs (SELECT DISTINCT sur toute la table) sont mises en cache"""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        cle = f'admin:valeurs:{model._meta.db_table}:{field_path}'
+        valeurs = cache.get(cle)
+        if valeurs is None:
+            valeurs = list(self.lookup_choices)
+            cache.set(cle, valeurs, settings.ADMIN_FILTRES_CACHE_DUREE)
+        self.lookup_choices = valeurs
+
+
+class PretsAdmin(admin.ModelAdmin):
+    """
+    Base des admins des tables de prêts :
+    - établissement et fichier d'import joints (list_select_related), sans
+      les colonnes volumineuses du fichier
+    - nombre de lignes estimé, pas de second COUNT(*) du total
+    - filtres établissement (autocomplétion), année et valeurs en cache
+    - recherche par préfixe sur des colonnes indexées
+    - suppression par lots d'ADMIN_SUPPRESSION_TAILLE_LOT lignes (sans la page
+      de confirmation de Django qui charge toutes les lignes)
+    """
+    champ_date = None
+    list_select_related = ['etablissement', 'fichier_import']
+    show_full_result_count = False
+    paginator = PaginateurEstime
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer(
+            'fichier_import__erreurs', 'fichier_import__details', 'fichier_import__feuilles'
+        )
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                'suggestions-etablissements/',
+                self.admin_site.admin_view(self.suggestions_etablissements),
+                name='%s_%s_suggestions_etablissements' % info,
+            ),
+        ] + super().get_urls()
+
+    def suggestions_etablissements(self, request):
+        """Autocomplétion du filtre établissement : GET ?q=<nom ou code>"""
+        resultats = index_suggestions.suggerer(ETABLISSEMENT, request.GET.get('q', ''), 10)
+        return JsonResponse({
+            'success': True,
+            'resultats': [{'id': e['id'], 'nom': e['nom'], 'code': e['code']} for e in resultats],
+        })
+
+    def supprimer_par_lots(self, request, queryset, libelle):
+        """Supprime les lignes sélectionnées par lots bornés par la clé primaire"""
+        taille_lot = settings.ADMIN_SUPPRESSION_TAILLE_LOT
+        base = queryset.order_by('pk')
+        dernier_pk = 0
+        supprimes = 0
+        while True:
+            pks = list(base.filter(pk__gt=dernier_pk).values_list('pk', flat=True)[:taille_lot])
+            if not pks:
+                break
+            with transaction.atomic():
+                nb, _ = self.model.objects.filter(pk__in=pks).delete()
+            supprimes += nb
+            dernier_pk = pks[-1]
+            if len(pks) < taille_lot:
+                break
+        if supprimes:
+            invalider_donnees_prets()
+        self.message_user(request, f"{supprimes} {libelle} supprimé(s) avec succès", messages.SUCCESS)
+
     
 @admin.register(Credit_Amortissables)
-class CreditAmortissablesAdmin(admin.ModelAdmin):
+class CreditAmortissablesAdmin(PretsAdmin):
     list_display = [
         'ETABLISSEMENT_I01',
         'CODE_ETAB_I02',
@@ -245,18 +473,19 @@ class CreditAmortissablesAdmin(admin.ModelAdmin):
         'fichier_import'
     ]
     list_filter = [
-        'etablissement',
+        FiltreEtablissement,
+        FiltreAnnee,
         'DATE_MEP_I03',
-        'NATURE_PRET_I05',
-        'SITUATION_CREANCE_I25',
-        'MATURITE',
+        ('NATURE_PRET_I05', ValeursCacheesFiltre),
+        ('SITUATION_CREANCE_I25', ValeursCacheesFiltre),
+        ('MATURITE', ValeursCacheesFiltre),
     ]
+    # Recherche par préfixe (LIKE 'texte%') sur des colonnes indexées
     search_fields = [
-        'BENEFICIAIRE_I06',
-        'CODE_ETAB_I02',
-        'PROFESSION_I12'
+        '^BENEFICIAIRE_I06',
+        '^CODE_ETAB_I02',
     ]
-    date_hierarchy = 'DATE_MEP_I03'
+    champ_date = 'DATE_MEP_I03'
     
     actions = ['supprimer_credits']
     
@@ -317,17 +546,11 @@ class CreditAmortissablesAdmin(admin.ModelAdmin):
     readonly_fields = ['MATURITE']
     
     def supprimer_credits(self, request, queryset):
-        count = queryset.count()
-        queryset.delete()
-        self.message_user(
-            request,
-            f"{count} crédit(s) amortissable(s) supprimé(s) avec succès",
-            messages.SUCCESS
-        )
+        self.supprimer_par_lots(request, queryset, "crédit(s) amortissable(s)")
     supprimer_credits.short_description = " Supprimer les crédits sélectionnés"
 
 @admin.register(Decouverts)
-class DecouvertsAdmin(admin.ModelAdmin):
+class DecouvertsAdmin(PretsAdmin):
     list_display = [
         'etablissement',
         'SIGLE_I01',
@@ -348,24 +571,18 @@ class DecouvertsAdmin(admin.ModelAdmin):
         'SITUATION_CREANCE_I16',
         'TEG_I17',
     ]
-    list_filter = ['etablissement', 'DATE_MISE_PLACE_I03', 'SITUATION_CREANCE_I16']
-    search_fields = ['BENEFICAIRE_I06', 'CODE_BANQUE_I02']
-    date_hierarchy = 'DATE_MISE_PLACE_I03'
+    list_filter = [FiltreEtablissement, FiltreAnnee, 'DATE_MISE_PLACE_I03', ('SITUATION_CREANCE_I16', ValeursCacheesFiltre)]
+    search_fields = ['^BENEFICAIRE_I04', '^CODE_BANQUE_I02']
+    champ_date = 'DATE_MISE_PLACE_I03'
     
     actions = ['supprimer_decouverts']
     
     def supprimer_decouverts(self, request, queryset):
-        count = queryset.count()
-        queryset.delete()
-        self.message_user(
-            request,
-            f"{count} découvert(s) supprimé(s) avec succès",
-            messages.SUCCESS
-        )
+        self.supprimer_par_lots(request, queryset, "découvert(s)")
     supprimer_decouverts.short_description = "🗑️ Supprimer les découverts sélectionnés"
 
 @admin.register(Affacturage)
-class AffacturageAdmin(admin.ModelAdmin):
+class AffacturageAdmin(PretsAdmin):
     list_display = [
         'etablissement',
         'SIGLE_I01',
@@ -383,24 +600,18 @@ class AffacturageAdmin(admin.ModelAdmin):
         'MONTANT_FRAIS_ANNEXES_I13',
         'TEG_I14',
     ]
-    list_filter = ['etablissement', 'DATE_MISE_PLACE_I03']
-    search_fields = ['BENEFICAIRE_I06', 'CODE_BANQUE_I02']
-    date_hierarchy = 'DATE_MISE_PLACE_I03'
+    list_filter = [FiltreEtablissement, FiltreAnnee, 'DATE_MISE_PLACE_I03']
+    search_fields = ['^BENEFICAIRE_I06', '^CODE_BANQUE_I02']
+    champ_date = 'DATE_MISE_PLACE_I03'
     
     actions = ['supprimer_affacturages']
     
     def supprimer_affacturages(self, request, queryset):
-        count = queryset.count()
-        queryset.delete()
-        self.message_user(
-            request,
-            f"{count} affacturage(s) supprimé(s) avec succès",
-            messages.SUCCESS
-        )
+        self.supprimer_par_lots(request, queryset, "affacturage(s)")
     supprimer_affacturages.short_description = "🗑️ Supprimer les affacturages sélectionnés"
 
 @admin.register(Cautions)
-class CautionsAdmin(admin.ModelAdmin):
+class CautionsAdmin(PretsAdmin):
     list_display = [
         'etablissement',
         'SIGLE_I01',
@@ -418,23 +629,17 @@ class CautionsAdmin(admin.ModelAdmin):
         'MONTANT_FRAIS_ANNEXES_I13',
         'TEG_I14',
     ]
-    list_filter = ['etablissement', 'DATE_MISE_PLACE_I03']
-    search_fields = ['BENEFICAIRE_I06', 'CODE_BANQUE_I02']
-    date_hierarchy = 'DATE_MISE_PLACE_I03'
+    list_filter = [FiltreEtablissement, FiltreAnnee, 'DATE_MISE_PLACE_I03']
+    search_fields = ['^BENEFICAIRE_I06', '^CODE_BANQUE_I02']
+    champ_date = 'DATE_MISE_PLACE_I03'
     
     actions = ['supprimer_cautions']
     
     def supprimer_cautions(self, request, queryset):
-        count = queryset.count()
-        queryset.delete()
-        self.message_user(
-            request,
-            f"{count} caution(s) supprimé(s) avec succès",
-            messages.SUCCESS
-        )
+        self.supprimer_par_lots(request, queryset, "caution(s)")
     supprimer_cautions.short_description = "🗑️ Supprimer les cautions sélectionnés"
 
-class SpotAdmin(admin.ModelAdmin):
+class SpotAdmin(PretsAdmin):
     list_display = [
         'ETABLISSEMENT_I01',
         'CODE_ETAB_I02',
@@ -465,17 +670,17 @@ class SpotAdmin(admin.ModelAdmin):
         'fichier_import'
     ]
     list_filter = [
-        'etablissement',
+        FiltreEtablissement,
+        FiltreAnnee,
         'DATE_MEP_I03',
-        'NATURE_PRET_I05',
-        'SITUATION_CREANCE_I25'
+        ('NATURE_PRET_I05', ValeursCacheesFiltre),
+        ('SITUATION_CREANCE_I25', ValeursCacheesFiltre),
     ]
     search_fields = [
-        'BENEFICIAIRE_I06',
-        'CODE_ETAB_I02',
-        'PROFESSION_I12'
+        '^BENEFICIAIRE_I06',
+        '^CODE_ETAB_I02',
     ]
-    date_hierarchy = 'DATE_MEP_I03'
+    champ_date = 'DATE_MEP_I03'
     
     actions = ['spots']
     
@@ -532,18 +737,12 @@ class SpotAdmin(admin.ModelAdmin):
     )
     
     def spots(self, request, queryset):
-        count = queryset.count()
-        queryset.delete()
-        self.message_user(
-            request,
-            f"{count} Spot supprimé avec succès",
-            messages.SUCCESS
-        )
+        self.supprimer_par_lots(request, queryset, "spot(s)")
     spots.short_description = "🗑️ Supprimer les spots"
 
 
 @admin.register(Effets_commerces)
-class EffetsCommercesAdmin(admin.ModelAdmin):
+class EffetsCommercesAdmin(PretsAdmin):
     list_display = [
         'etablissement',
         'SIGLE_I01',
@@ -562,18 +761,65 @@ class EffetsCommercesAdmin(admin.ModelAdmin):
         'AUTRES_FRA_I14',
         'TEG_I15',
     ]
-    list_filter = ['etablissement', 'DATE_MISE_PLACE_I03']
-    search_fields = ['BENEFICAIRE_I06', 'CODE_BANQUE_I02']
-    date_hierarchy = 'DATE_MISE_PLACE_I03'
+    list_filter = [FiltreEtablissement, FiltreAnnee, 'DATE_MISE_PLACE_I03']
+    search_fields = ['^BENEFICAIRE_I06', '^CODE_BANQUE_I02']
+    champ_date = 'DATE_MISE_PLACE_I03'
     
     actions = ['supprimer_effets']
     
     def supprimer_effets(self, request, queryset):
-        count = queryset.count()
-        queryset.delete()
-        self.message_user(
-            request,
-            f"{count} effet(s) de commerce supprimé(s) avec succès",
-            messages.SUCCESS
-        )
-    supprimer_effets.short_description = "🗑️ Supprimer les effets sélectionnés"
\ No newline at end of file
+        self.supprimer_par_lots(request, queryset, "effet(s) de commerce")
+    supprimer_effets.short_description = "🗑️ Supprimer les effets sélectionnés"
+
+
+# ==========================================
+# TEG ATYPIQUES
+# ==========================================
+
+class FiltreSoumission(admin.SimpleListFilter):
+    """Filtre par soumission (?fichier=<id>, lien depuis une soumission) sans lister toutes les soumissions"""
+    title = "soumission"
+    parameter_name = 'fichier'
+
+    def lookups(self, request, model_admin):
+        valeur = self.value()
+        if not (valeur and valeur.isdigit()):
+            return []
+        fichier = FichierImport.objects.filter(pk=int(valeur)).values_list('nom_fichier', flat=True).first()
+        return [(valeur, fichier or f"#{valeur}")]
+
+    def queryset(self, request, queryset):
+        valeur = self.value()
+        if valeur and valeur.isdigit():
+            return queryset.filter(fichier_import_id=int(valeur))
+        return queryset
+
+
+@admin.register(AnomalieTEG)
+class AnomalieTEGAdmin(PretsAdmin):
+    """Résultats de la détection (cnef/anomalies_teg.py), en lecture seule"""
+    list_display = [
+        'etablissement',
+        'fichier_import',
+        'produit',
+        'pret_id',
+        'date_mise_place',
+        'nature_pret',
+        'maturite',
+        'categorie_beneficiaire',
+        'teg_declare',
+        'teg_median',
+        'premier_quartile',
+        'troisieme_quartile',
+        'score_robuste',
+        'methode',
+        'taille_groupe',
+    ]
+    list_filter = [FiltreEtablissement, FiltreSoumission, FiltreAnnee, 'produit', 'methode']
+    champ_date = 'date_mise_place'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
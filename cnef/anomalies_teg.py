@@ -0,0 +1,356 @@
+"""
+Détection des TEG atypiques
+
+Au-delà du contrôle conforme / non conforme, repère les prêts dont le TEG
+déclaré s'écarte fortement de celui des prêts comparables : même produit
+(et nature du prêt), même maturité, même catégorie de bénéficiaire.
+
+- les colonnes utiles des tables de prêts sont chargées par lots bornés par
+  la clé primaire (ANOMALIES_TAILLE_LOT) dans des tableaux NumPy
+- les statistiques robustes de chaque groupe (médiane, MAD, quartiles) sont
+  calculées par tris et indexation NumPy, sans boucle Python par prêt ni
+  par groupe
+- un prêt est atypique si son score robuste (x - médiane) / (1,4826 × MAD)
+  dépasse ANOMALIES_SEUIL_MAD ou s'il sort de [Q1 - k × IQR, Q3 + k × IQR]
+  (k = ANOMALIES_COEFFICIENT_IQR), avec un écart à la médiane d'au moins
+  ANOMALIES_ECART_MIN point de TEG ; les groupes de moins de
+  ANOMALIES_TAILLE_GROUPE_MIN prêts ne sont pas évalués
+- les résultats remplacent ceux de la détection précédente sur le même
+  produit et la même période (table AnomalieTEG, consultable par soumission
+  et par établissement)
+- une seule détection à la fois (verrou dans le cache) : deux lancements
+  simultanés dupliqueraient les résultats
+
+Le TEG déclaré est ramené en pourcentage selon la règle des modèles
+(valeur > 1 : déjà en %, sinon fraction).
+"""
+
+import logging
+import time
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import (
+    Affacturage, AnomalieTEG, Cautions, Credit_Amortissables, Decouverts,
+    Effets_commerces, Spot,
+)
+from .routage_bdd import base_reporting
+from .taches_arriere_plan import SuiviTaches
+
+logger = logging.getLogger(__name__)
+
+CLE_VERROU = 'anomalies:teg:verrou'
+
+suivi = SuiviTaches('anomalies:teg:', 'anomalies-teg')
+publier_progression = suivi.publier
+lire_progression = suivi.lire
+
+# Écart absolu médian -> écart-type pour une loi normale
+FACTEUR_MAD = 1.4826
+# Intervalle interquartile -> écart-type pour une loi normale
+FACTEUR_IQR = 1.349
+
+# produit : (modèle, date, TEG déclaré, nature, maturité, catégorie du bénéficiaire)
+PRODUITS = {
+    'credit': (Credit_Amortissables, 'DATE_MEP_I03', 'TEG_I26', 'NATURE_PRET_I05', 'MATURITE', 'CATEGORIE_BENEF_I07'),
+    'spot': (Spot, 'DATE_MEP_I03', 'TEG_I26', 'NATURE_PRET_I05', None, 'CATEGORIE_BENEF_I07'),
+    'decouvert': (Decouverts, 'DATE_MISE_PLACE_I03', 'TEG_I17', None, None, 'CATEGORIE_BENEF_I05'),
+    'affacturage': (Affacturage, 'DATE_MISE_PLACE_I03', 'TEG_I14', None, None, 'CATEGORIE_BENEF_I07'),
+    'caution': (Cautions, 'DATE_MISE_PLACE_I03', 'TEG_I14', None, None, 'CATEGORIE_BENEF_I07'),
+    'effet': (Effets_commerces, 'DATE_MISE_PLACE_I03', 'TEG_I15', None, None, 'CATEGORIE_BENEF_I07'),
+}
+
+
+# ==========================================
+# CHARGEMENT PAR LOTS
+# ==========================================
+
+def normaliser_categorie(valeur):
+    """'06', '6 ' -> '6' ; '3_2', '3 2' -> '3-2' (codes saisis de plusieurs façons)"""
+    valeur = valeur.strip().upper().replace('_', '-').replace(' ', '-')
+    return '-'.join((partie.lstrip('0') or '0') if partie.isdigit() else partie for partie in valeur.split('-'))
+
+
+class Groupes:
+    """Numérotation des groupes (nature, maturité, catégorie) rencontrés d'un lot à l'autre"""
+
+    def __init__(self):
+        self.ids = {}
+        self.libelles = []
+
+    def identifiants(self, natures, maturites, categories):
+        """Identifiant de groupe de chaque ligne (une recherche par valeur distincte du lot)"""
+        cles = np.char.add(np.char.add(np.char.add(natures, '\x1f'), np.char.add(maturites, '\x1f')), categories)
+        distinctes, inverse = np.unique(cles, return_inverse=True)
+        ids_lot = np.empty(len(distinctes), dtype=np.int64)
+        for i, cle in enumerate(distinctes):
+            nature, maturite, categorie = str(cle).split('\x1f')
+            libelle = (nature.strip().upper(), maturite.strip().upper(), normaliser_categorie(categorie))
+            ids_lot[i] = self.ids.setdefault(libelle, len(self.ids))
+            if ids_lot[i] == len(self.libelles):
+                self.libelles.append(libelle)
+        return ids_lot[inverse]
+
+
+def colonne_texte(valeurs, nombre):
+    if valeurs is None:
+        return np.full(nombre, '')
+    return np.array(valeurs, dtype=str)
+
+
+def charger_colonnes(produit, debut=None, fin=None, taille_lot=None):
+    """
+    Charge les prêts d'un produit dans des tableaux NumPy, par lots bornés par
+    la clé primaire. Retourne (colonnes, groupes) ; les prêts sans TEG sont écartés.
+    """
+    modele, champ_date, champ_teg, champ_nature, champ_maturite, champ_categorie = PRODUITS[produit]
+    taille_lot = taille_lot or settings.ANOMALIES_TAILLE_LOT
+
+    queryset = modele.objects.exclude(**{f'{champ_teg}__isnull': True}).exclude(**{champ_teg: 0})
+    if debut:
+        queryset = queryset.filter(**{f'{champ_date}__gte': debut})
+    if fin:
+        queryset = queryset.filter(**{f'{champ_date}__lt': fin})
+    queryset = queryset.order_by('pk')
+
+    champs = ['pk', 'etablissement_id', 'fichier_import_id', champ_date, champ_teg, champ_categorie]
+    champs += [c for c in (champ_nature, champ_maturite) if c]
+
+    groupes = Groupes()
+    morceaux = []
+    dernier_pk = 0
+    while True:
+        lignes = list(queryset.filter(pk__gt=dernier_pk).values_list(*champs)[:taille_lot])
+        if not lignes:
+            break
+        dernier_pk = lignes[-1][0]
+        valeurs = dict(zip(champs, zip(*lignes)))
+        nombre = len(lignes)
+        morceaux.append({
+            'pk': np.array(valeurs['pk'], dtype=np.int64),
+            'etablissement': np.array(valeurs['etablissement_id'], dtype=np.int64),
+            # Prêts sans soumission : -1
+            'fichier': np.nan_to_num(np.array(valeurs['fichier_import_id'], dtype=float), nan=-1).astype(np.int64),
+            'date': np.array(valeurs[champ_date], dtype='datetime64[D]'),
+            'teg': np.array(valeurs[champ_teg], dtype=float),
+            'groupe': groupes.identifiants(
+                colonne_texte(valeurs.get(champ_nature), nombre),
+                colonne_texte(valeurs.get(champ_maturite), nombre),
+                colonne_texte(valeurs[champ_categorie], nombre),
+            ),
+        })
+        if nombre < taille_lot:
+            break
+
+    if not morceaux:
+        return None, groupes
+    colonnes = {nom: np.concatenate([m[nom] for m in morceaux]) for nom in morceaux[0]}
+    # Même règle que les modèles : au-delà de 1 le TEG est déjà en %
+    colonnes['teg'] = np.where(colonnes['teg'] > 1, colonnes['teg'], colonnes['teg'] * 100)
+    return colonnes, groupes
+
+
+# ==========================================
+# STATISTIQUES ROBUSTES PAR GROUPE
+# ==========================================
+
+def quantiles_tries(tries, debuts, effectifs, q):
+    """Quantile q de chaque groupe (interpolation linéaire, comme np.quantile) ; NaN si vide"""
+    presents = effectifs > 0
+    position = debuts + q * np.maximum(effectifs - 1, 0)
+    bas = np.floor(position).astype(np.int64)
+    haut = np.ceil(position).astype(np.int64)
+    bas = np.where(presents, bas, 0)
+    haut = np.where(presents, haut, 0)
+    resultat = tries[bas] + (tries[haut] - tries[bas]) * (position - bas)
+    return np.where(presents, resultat, np.nan)
+
+
+def statistiques_groupees(groupes, valeurs, nb_groupes):
+    """Effectif, médiane, MAD, Q1 et Q3 de chaque groupe (deux tris au total)"""
+    effectifs = np.bincount(groupes, minlength=nb_groupes)
+    debuts = np.concatenate(([0], np.cumsum(effectifs)[:-1]))
+
+    # Valeurs triées par groupe puis par valeur : chaque groupe est une tranche contiguë
+    tries = valeurs[np.lexsort((valeurs, groupes))]
+    mediane = quantiles_tries(tries, debuts, effectifs, 0.5)
+    q1 = quantiles_tries(tries, debuts, effectifs, 0.25)
+    q3 = quantiles_tries(tries, debuts, effectifs, 0.75)
+
+    ecarts = np.abs(valeurs - mediane[groupes])
+    mad = quantiles_tries(ecarts[np.lexsort((ecarts, groupes))], debuts, effectifs, 0.5)
+
+    return {'effectif': effectifs, 'mediane': mediane, 'mad': mad, 'q1': q1, 'q3': q3}
+
+
+def reperer_atypiques(groupes, valeurs, stats):
+    """Masque des valeurs atypiques, score robuste et méthode(s) déclenchée(s)"""
+    mediane = stats['mediane'][groupes]
+    iqr = (stats['q3'] - stats['q1'])[groupes]
+    # Dispersion robuste ; groupe sans dispersion (MAD et IQR nuls) : écart minimal
+    echelle = np.where(
+        stats['mad'][groupes] > 0, FACTEUR_MAD * stats['mad'][groupes],
+        np.where(iqr > 0, iqr / FACTEUR_IQR, settings.ANOMALIES_ECART_MIN)
+    )
+    score = (valeurs - mediane) / echelle
+
+    coefficient = settings.ANOMALIES_COEFFICIENT_IQR
+    hors_mad = np.abs(score) > settings.ANOMALIES_SEUIL_MAD
+    hors_iqr = (valeurs < stats['q1'][groupes] - coefficient * iqr) | (valeurs > stats['q3'][groupes] + coefficient * iqr)
+    atypique = (
+        (stats['effectif'][groupes] >= settings.ANOMALIES_TAILLE_GROUPE_MIN)
+        & (np.abs(valeurs - mediane) >= settings.ANOMALIES_ECART_MIN)
+        & (hors_mad | hors_iqr)
+    )
+    methode = np.where(hors_mad & hors_iqr, 'MAD_IQR', np.where(hors_mad, 'MAD', 'IQR'))
+    return atypique, score, methode
+
+
+# ==========================================
+# DÉTECTION
+# ==========================================
+
+class DetectionEnCours(Exception):
+    """Une autre détection des TEG atypiques est en cours"""
+
+    def __init__(self):
+        super().__init__("Une détection des TEG atypiques est déjà en cours")
+
+
+def verrouiller_detection():
+    """Prend le verrou des détections ; DetectionEnCours s'il est déjà pris"""
+    if not cache.add(CLE_VERROU, True, settings.ANOMALIES_DUREE_VERROU):
+        raise DetectionEnCours()
+
+
+def liberer_detection():
+    cache.delete(CLE_VERROU)
+
+
+def periode(annee=None, trimestre=None):
+    """Bornes (début inclus, fin exclue) d'une année ou d'un trimestre 'T1'..'T4' ; (None, None) sans année"""
+    if not annee:
+        return None, None
+    annee = int(annee)
+    if not trimestre:
+        return date(annee, 1, 1), date(annee + 1, 1, 1)
+    mois = {'T1': 1, 'T2': 4, 'T3': 7, 'T4': 10}[trimestre]
+    return date(annee, mois, 1), date(annee + 1, 1, 1) if mois == 10 else date(annee, mois + 3, 1)
+
+
+def detecter_produit(produit, debut=None, fin=None):
+    """Détection sur un produit ; remplace les résultats précédents de la période"""
+    depart = time.monotonic()
+    with base_reporting():
+        colonnes, groupes = charger_colonnes(produit, debut, fin)
+
+    bilan = {'produit': produit, 'prets_analyses': 0, 'groupes': len(groupes.libelles),
+             'groupes_evalues': 0, 'anomalies': 0}
+    anomalies = []
+    if colonnes is not None:
+        stats = statistiques_groupees(colonnes['groupe'], colonnes['teg'], len(groupes.libelles))
+        atypique, score, methode = reperer_atypiques(colonnes['groupe'], colonnes['teg'], stats)
+        bilan['prets_analyses'] = len(colonnes['teg'])
+        bilan['groupes_evalues'] = int((stats['effectif'] >= settings.ANOMALIES_TAILLE_GROUPE_MIN).sum())
+
+        # Seuls les prêts atypiques sont convertis en objets
+        for i in np.flatnonzero(atypique):
+            g = colonnes['groupe'][i]
+            nature, maturite, categorie = groupes.libelles[g]
+            anomalies.append(AnomalieTEG(
+                etablissement_id=int(colonnes['etablissement'][i]),
+                fichier_import_id=int(colonnes['fichier'][i]) if colonnes['fichier'][i] >= 0 else None,
+                produit=produit,
+                pret_id=int(colonnes['pk'][i]),
+                date_mise_place=colonnes['date'][i].item(),
+                nature_pret=nature[:75],
+                maturite=maturite[:10],
+                categorie_beneficiaire=categorie[:30],
+                taille_groupe=int(stats['effectif'][g]),
+                teg_declare=round(float(colonnes['teg'][i]), 4),
+                teg_median=round(float(stats['mediane'][g]), 4),
+                mad=round(float(stats['mad'][g]), 4),
+                premier_quartile=round(float(stats['q1'][g]), 4),
+                troisieme_quartile=round(float(stats['q3'][g]), 4),
+                score_robuste=round(float(score[i]), 3),
+                score_absolu=round(abs(float(score[i])), 3),
+                methode=str(methode[i]),
+            ))
+
+    precedentes = AnomalieTEG.objects.filter(produit=produit)
+    if debut:
+        precedentes = precedentes.filter(date_mise_place__gte=debut)
+    if fin:
+        precedentes = precedentes.filter(date_mise_place__lt=fin)
+    with transaction.atomic():
+        precedentes.delete()
+        AnomalieTEG.objects.bulk_create(anomalies, batch_size=1000)
+
+    bilan['anomalies'] = len(anomalies)
+    bilan['duree_ms'] = round((time.monotonic() - depart) * 1000)
+    logger.info(f"TEG atypiques : {bilan}")
+    return bilan
+
+
+def detecter_anomalies(debut=None, fin=None, produits=None, progression=None, verrou=True):
+    """
+    Détection sur les produits demandés (tous par défaut), prêts mis en place
+    entre `debut` (inclus) et `fin` (exclu). `progression(bilan, traites, total)`
+    est appelée après chaque produit. DetectionEnCours si une autre détection
+    tient le verrou (`verrou=False` : déjà pris par l'appelant).
+    """
+    produits = produits or list(PRODUITS)
+    bilans = []
+    if verrou:
+        verrouiller_detection()
+    try:
+        for produit in produits:
+            bilans.append(detecter_produit(produit, debut, fin))
+            if progression:
+                progression(bilans[-1], len(bilans), len(produits))
+    finally:
+        if verrou:
+            liberer_detection()
+    return {
+        'produits': bilans,
+        'prets_analyses': sum(b['prets_analyses'] for b in bilans),
+        'anomalies': sum(b['anomalies'] for b in bilans),
+    }
+
+
+# ==========================================
+# SUIVI DE PROGRESSION
+# ==========================================
+
+def lancer_detection_arriere_plan(debut=None, fin=None, produits=None):
+    """
+    Lance la détection dans un thread et retourne l'identifiant de suivi.
+    DetectionEnCours si une détection est déjà en cours : le verrou est pris
+    ici, avant le lancement, et libéré par le thread.
+    """
+    verrouiller_detection()
+
+    def executer(tache_id):
+        def progression(bilan, traites, total):
+            etat = lire_progression(tache_id) or {}
+            publier_progression(
+                tache_id, traites=traites, pourcentage=round(traites * 100 / total, 1),
+                produits=etat.get('produits', []) + [bilan],
+            )
+
+        # Un échec est journalisé et publié (statut ECHEC) par suivi.lancer
+        try:
+            resultat = detecter_anomalies(debut, fin, produits, progression=progression, verrou=False)
+        finally:
+            liberer_detection()
+        publier_progression(tache_id, statut='TERMINE', pourcentage=100, **resultat)
+
+    try:
+        return suivi.lancer(executer, total=len(produits or PRODUITS), traites=0, pourcentage=0, produits=[])
+    except Exception:
+        liberer_detection()
+        raise
@@ -4,3 +4,33 @@ from django.apps import AppConfig
 class CnefConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cnef'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.models.signals import post_delete, post_init, post_save
+        from .evenements import fichier_enregistre, fichier_supprime, memoriser_statut
+        from .journal import vider_fin_requete
+        from .models import ActionUtilisateur, Etablissement, FichierImport, User
+        from .recherche_journal import indexer_action_creee
+        from .suggestions import invalider_sur_modification
+        from .tendances_teg import prets_modifies
+
+        # Vidage du journal des actions en fin de requête (si activé)
+        request_finished.connect(vider_fin_requete, dispatch_uid='cnef_journal_fin_requete')
+
+        # Index de recherche du journal (bases sans FULLTEXT)
+        post_save.connect(indexer_action_creee, sender=ActionUtilisateur, dispatch_uid='cnef_journal_indexation')
+
+        # Index des suggestions (autocomplétion) utilisateurs / établissements
+        for modele in (User, Etablissement):
+            post_save.connect(invalider_sur_modification, sender=modele, dispatch_uid=f'cnef_suggestions_save_{modele.__name__}')
+            post_delete.connect(invalider_sur_modification, sender=modele, dispatch_uid=f'cnef_suggestions_delete_{modele.__name__}')
+
+        # Diffusion des changements de statut des soumissions (tableaux de bord)
+        post_init.connect(memoriser_statut, sender=FichierImport, dispatch_uid='cnef_evenements_init')
+        post_save.connect(fichier_enregistre, sender=FichierImport, dispatch_uid='cnef_evenements_save')
+        post_delete.connect(fichier_supprime, sender=FichierImport, dispatch_uid='cnef_evenements_delete')
+
+        # Génération des données de prêts (cache des tendances du communiqué)
+        post_save.connect(prets_modifies, sender=FichierImport, dispatch_uid='cnef_prets_save')
+        post_delete.connect(prets_modifies, sender=FichierImport, dispatch_uid='cnef_prets_delete')
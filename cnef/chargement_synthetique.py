@@ -0,0 +1,297 @@
+"""
+Chargement massif de données synthétiques pour les tests de charge
+(visualiser_base_donnees, calculer_donnees_communique, listes de l'admin)
+
+N établissements × M trimestres × K prêts par produit, générés par
+donnees_synthetiques.GenerateurLignes (mêmes distributions que les classeurs
+synthétiques) puis enrichis des champs calculés (TEG_*, MATURITE) selon les
+règles des extracteurs.
+
+Les lignes sont insérées par lots avec un INSERT multi-valeurs
+(cursor.executemany) : ni instanciation de modèles ni save(), ce qui permet
+de charger plusieurs millions de lignes en quelques minutes.
+
+Les établissements synthétiques sont nommés 'SYNTHETIQUE 0001'... avec le code
+'SYN0001'... : supprimer_donnees_synthetiques() retire tout ce qui est rattaché
+aux établissements de cette forme exacte, et à eux seuls.
+"""
+
+import logging
+import random
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .donnees_synthetiques import TRIMESTRES, GenerateurLignes, taux_actuariel
+from .models import (
+    Affacturage, Cautions, Credit_Amortissables, Decouverts, Effets_commerces,
+    Etablissement, FichierImport, Spot,
+)
+from .tendances_teg import invalider_donnees_prets
+from .utils import (
+    calculer_teg_affacturage, calculer_teg_caution, calculer_teg_decouvert,
+    calculer_teg_effet, calculer_teg_spot,
+)
+
+logger = logging.getLogger(__name__)
+
+PREFIXE_CODE = 'SYN'
+PREFIXE_NOM = 'SYNTHETIQUE '
+
+# (type, catégorie EMF, poids, majoration des taux)
+TYPES_ETABLISSEMENTS = [
+    ('BANQUE', None, 40, 0.0),
+    ('EMF', 'PREMIERE_CATEGORIE', 30, 0.05),
+    ('EMF', 'DEUXIEME_CATEGORIE', 20, 0.07),
+    ('EMF', 'TROISIEME_CATEGORIE', 10, 0.09),
+]
+
+
+# ==========================================
+# CHAMPS CALCULÉS (mêmes règles que les extracteurs)
+# ==========================================
+
+def maturite(duree):
+    if duree <= 24:
+        return "1-CT"
+    if duree > 60:
+        return "3-LT"
+    return "2-MT"
+
+
+def calcul_credit(v):
+    montant_net = v[12] - v[17] - v[19] - v[20]
+    multiplicateur = 4 if v[15] == '2' else 12
+    teg_mensuel = taux_actuariel(v[13], v[22], montant_net, v[16] / multiplicateur) * 100
+    return [teg_mensuel, teg_mensuel * multiplicateur, maturite(v[13])]
+
+
+def calcul_spot(v):
+    # Le taux nominal spot est déclaré en pourcentage : normalisé comme dans extraire_spot
+    v[16] = v[16] / 100 if v[16] > 1 else v[16]
+    return [calculer_teg_spot.__wrapped__(v[12], v[13], v[22], v[17], v[19], v[20])]
+
+
+def calcul_decouvert(v):
+    return [calculer_teg_decouvert.__wrapped__(v[7], v[9], v[10], v[11], v[12])]
+
+
+def calcul_affacturage(v):
+    return [calculer_teg_affacturage.__wrapped__(v[9], v[4], v[10], v[11], v[12])]
+
+
+def calcul_caution(v):
+    return [calculer_teg_caution.__wrapped__(v[9], v[4], v[10], v[11], v[12])]
+
+
+def calcul_effet(v):
+    return [calculer_teg_effet.__wrapped__(v[10], v[4], v[9], v[12], v[13])]
+
+
+# méthode du générateur : (modèle, nombre de colonnes du fichier, calcul des champs dérivés)
+PRODUITS = {
+    'credit': (Credit_Amortissables, 26, calcul_credit),
+    'decouvert': (Decouverts, 17, calcul_decouvert),
+    'affacturage': (Affacturage, 14, calcul_affacturage),
+    'caution': (Cautions, 14, calcul_caution),
+    'effet': (Effets_commerces, 15, calcul_effet),
+    'spot': (Spot, 26, calcul_spot),
+}
+
+
+# ==========================================
+# INSERTION PAR LOTS
+# ==========================================
+
+class InsertionParLots:
+    """
+    Accumule des lignes (valeurs des colonnes du fichier) pour un modèle
+    et les insère par lots de `taille_lot` avec cursor.executemany
+    """
+
+    def __init__(self, methode, taille_lot):
+        self.modele, nb_colonnes, self.calcul = PRODUITS[methode]
+        champs = [f for f in self.modele._meta.concrete_fields if not f.primary_key]
+        # Ordre des champs du modèle : etablissement, fichier_import, colonnes du fichier,
+        # champs calculés, puis created_at / updated_at
+        self.champs_fichier = champs[2:2 + nb_colonnes]
+        self.conversions = [self.conversion(f) for f in self.champs_fichier]
+
+        qn = connection.ops.quote_name
+        colonnes = ', '.join(qn(f.column) for f in champs)
+        marqueurs = ', '.join(['%s'] * len(champs))
+        self.sql = f'INSERT INTO {qn(self.modele._meta.db_table)} ({colonnes}) VALUES ({marqueurs})'
+
+        horodatage = timezone.now()
+        self.horodatage = [champs[-1].get_db_prep_value(horodatage, connection)] * 2
+        self.taille_lot = taille_lot
+        self.lignes = []
+        self.total = 0
+
+    @staticmethod
+    def conversion(champ):
+        """Conversion d'une valeur de cellule, comme les fonctions *_safe des extracteurs"""
+        type_champ = champ.get_internal_type()
+        # Cellule vide : NULL si le champ l'accepte, sinon 0 (comme convertir_*_safe)
+        vide = None if champ.null else 0
+        if type_champ == 'CharField':
+            return lambda v: '' if v is None else str(v)[:champ.max_length]
+        if type_champ == 'IntegerField':
+            return lambda v: vide if v is None else int(round(v))
+        if type_champ == 'FloatField':
+            return lambda v: vide if v is None else float(v)
+        if type_champ == 'DateField':
+            return lambda v: connection.ops.adapt_datefield_value(v.date())
+        return lambda v: v
+
+    def ajouter(self, etablissement_id, fichier_id, valeurs):
+        derives = self.calcul(valeurs)
+        ligne = [etablissement_id, fichier_id]
+        ligne.extend(conv(v) for conv, v in zip(self.conversions, valeurs))
+        ligne.extend(derives)
+        ligne.extend(self.horodatage)
+        self.lignes.append(ligne)
+        if len(self.lignes) >= self.taille_lot:
+            self.vider()
+
+    def vider(self):
+        if not self.lignes:
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(self.sql, self.lignes)
+        self.total += len(self.lignes)
+        self.lignes = []
+
+
+# ==========================================
+# CHARGEMENT
+# ==========================================
+
+def trimestres_precedents(annee, trimestre, nombre):
+    """Les `nombre` trimestres se terminant par (annee, trimestre), du plus ancien au plus récent"""
+    index = int(annee) * 4 + list(TRIMESTRES).index(trimestre)
+    return [(i // 4, list(TRIMESTRES)[i % 4]) for i in range(index - nombre + 1, index + 1)]
+
+
+def creer_etablissements(nombre, graine):
+    rng = random.Random(f'{graine}-etablissements')
+    etablissements = []
+    for i in range(1, nombre + 1):
+        type_etab, categorie, _, majoration = rng.choices(
+            TYPES_ETABLISSEMENTS, weights=[t[2] for t in TYPES_ETABLISSEMENTS]
+        )[0]
+        etablissement = Etablissement.objects.create(
+            Nom_etablissement=f'{PREFIXE_NOM}{i:04d}',
+            code_etablissement=f'{PREFIXE_CODE}{i:04d}',
+            type_etablissement=type_etab,
+            categorie_emf=categorie,
+        )
+        etablissements.append((etablissement, majoration))
+    return etablissements
+
+
+def charger_donnees_synthetiques(nb_etablissements, nb_trimestres, prets_par_produit,
+                                 annee=2024, trimestre='T4', graine=42, taille_lot=5000,
+                                 produits=None, progression=None):
+    """
+    Génère et insère les données. Chaque couple (établissement, trimestre) reçoit
+    une soumission FichierImport validée et `prets_par_produit` lignes par produit.
+    `progression(lignes_inserees, lignes_prevues)` est appelée après chaque soumission.
+    Retourne le nombre de lignes insérées par modèle.
+    """
+    produits = produits or list(PRODUITS)
+    trimestres = trimestres_precedents(annee, trimestre, nb_trimestres)
+    prevues = nb_etablissements * nb_trimestres * prets_par_produit * len(produits)
+
+    etablissements = creer_etablissements(nb_etablissements, graine)
+    insertions = {methode: InsertionParLots(methode, taille_lot) for methode in produits}
+    compteurs = {
+        'credit': 'nb_credits_importes', 'decouvert': 'nb_decouverts_importes',
+        'affacturage': 'nb_affacturages_importes', 'caution': 'nb_cautions_importes',
+        'effet': 'nb_effets_importes', 'spot': 'nb_spots_importes',
+    }
+
+    inserees = 0
+    for etablissement, majoration in etablissements:
+        for annee_t, code_t in trimestres:
+            fichier = FichierImport.objects.create(
+                etablissement_cnef=etablissement,
+                nom_fichier=f'synthetique_{etablissement.code_etablissement}_{annee_t}_{code_t}.xlsx',
+                statut='REUSSI',
+                date_validation=timezone.now(),
+                **{compteurs[methode]: prets_par_produit for methode in produits},
+            )
+            # Une graine par soumission : le résultat ne dépend pas de l'ordre de chargement
+            generateur = GenerateurLignes(
+                graine=f'{graine}-{etablissement.code_etablissement}-{annee_t}{code_t}',
+                sigle=etablissement.Nom_etablissement,
+                code=etablissement.code_etablissement,
+                annee=annee_t, trimestre=code_t,
+                majoration_taux=majoration,
+            )
+            for methode in produits:
+                produire = getattr(generateur, methode)
+                insertion = insertions[methode]
+                for _ in range(prets_par_produit):
+                    insertion.ajouter(etablissement.id, fichier.id, produire())
+            inserees += prets_par_produit * len(produits)
+            if progression:
+                progression(inserees, prevues)
+
+    for insertion in insertions.values():
+        insertion.vider()
+
+    # INSERT direct : pas de signal, les caches des tendances sont à invalider
+    invalider_donnees_prets()
+
+    resultat = {insertion.modele.__name__: insertion.total for insertion in insertions.values()}
+    logger.info(f"Données synthétiques chargées : {resultat}")
+    return resultat
+
+
+# ==========================================
+# NETTOYAGE
+# ==========================================
+
+def etablissements_synthetiques():
+    """Établissements créés par creer_etablissements (nom ET code générés)"""
+    # Un vrai établissement dont le code commence par 'SYN' n'est pas concerné
+    return Etablissement.objects.filter(
+        Nom_etablissement__regex=rf'^{PREFIXE_NOM}[0-9]{{4}}$',
+        code_etablissement__regex=rf'^{PREFIXE_CODE}[0-9]{{4}}$',
+    )
+
+
+def supprimer_donnees_synthetiques(taille_lot=20000, progression=None):
+    """
+    Supprime les prêts (par lots bornés par la clé primaire), les soumissions
+    puis les établissements synthétiques. Retourne le nombre de lignes par modèle.
+    """
+    ids_etablissements = list(etablissements_synthetiques().values_list('id', flat=True))
+    resultat = {}
+    if not ids_etablissements:
+        return resultat
+
+    for modele, _, _ in PRODUITS.values():
+        queryset = modele.objects.filter(etablissement_id__in=ids_etablissements).order_by('pk')
+        total = 0
+        dernier_pk = 0
+        while True:
+            pks = list(queryset.filter(pk__gt=dernier_pk).values_list('pk', flat=True)[:taille_lot])
+            if not pks:
+                break
+            with transaction.atomic():
+                nb, _ = modele.objects.filter(pk__in=pks).delete()
+            total += nb
+            dernier_pk = pks[-1]
+            if progression:
+                progression(modele.__name__, total)
+        resultat[modele.__name__] = total
+
+    resultat['FichierImport'], _ = FichierImport.objects.filter(
+        etablissement_cnef_id__in=ids_etablissements
+    ).delete()
+    resultat['Etablissement'] = len(ids_etablissements)
+    etablissements_synthetiques().delete()
+    invalider_donnees_prets()
+    return resultat
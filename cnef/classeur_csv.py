@@ -0,0 +1,260 @@
+"""
+Lecture des soumissions au format CSV
+
+Alternative au classeur Excel pour les établissements qui exportent
+nativement en CSV :
+- un fichier .csv : un seul produit, identifié par le nom du fichier
+  (ex. "credits_amortissables.csv")
+- une archive .zip de fichiers .csv : un fichier par produit, identifié par
+  son nom comme une feuille Excel (ex. "Découverts.csv", "Spot.csv")
+
+ClasseurCSV et FeuilleCSV exposent le sous-ensemble de l'API openpyxl utilisé
+par les extracteurs (sheetnames, classeur[nom], iter_rows(), cell.value,
+max_row...) : les mêmes fonctions d'extraction et de calcul des TEG
+s'appliquent sans modification. Les lignes sont lues en flux avec le module
+csv, sans charger le fichier en mémoire.
+
+charger_classeur() choisit le lecteur d'après l'extension du fichier.
+"""
+
+import csv
+import io
+import os
+import zipfile
+
+EXTENSIONS_EXCEL = ('.xlsx', '.xls')
+EXTENSIONS_CSV = ('.csv', '.zip')
+EXTENSIONS_SOUMISSION = EXTENSIONS_EXCEL + EXTENSIONS_CSV
+
+# Taille de l'échantillon lu pour détecter l'encodage et le séparateur
+TAILLE_ECHANTILLON = 64 * 1024
+
+
+def est_soumission_csv(nom):
+    return str(nom).lower().endswith(EXTENSIONS_CSV)
+
+
+def charger_classeur(source, read_only=False):
+    """
+    Ouvre une soumission (chemin ou fichier) : ClasseurCSV pour .csv / .zip,
+    classeur openpyxl (valeurs calculées) sinon
+    """
+    nom = getattr(source, 'name', source)
+    if est_soumission_csv(nom):
+        return ClasseurCSV(source)
+
+    import openpyxl
+    return openpyxl.load_workbook(source, read_only=read_only, data_only=True)
+
+
+class CelluleCSV:
+    """Cellule minimale : seul l'attribut value est utilisé par les extracteurs"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def detecter_format(echantillon):
+    """Retourne (encodage, séparateur) d'après le début du fichier"""
+    try:
+        texte = echantillon.decode('utf-8-sig')
+        encodage = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        if e.start >= len(echantillon) - 3:
+            # Caractère multi-octets coupé par la fin de l'échantillon
+            texte = echantillon[:e.start].decode('utf-8-sig')
+            encodage = 'utf-8-sig'
+        else:
+            # Export Excel Windows
+            texte = echantillon.decode('cp1252', errors='replace')
+            encodage = 'cp1252'
+
+    premiere_ligne = texte.split('\n', 1)[0]
+    try:
+        separateur = csv.Sniffer().sniff(texte[:8192], delimiters=';,\t|').delimiter
+    except csv.Error:
+        separateur = ';' if premiere_ligne.count(';') > premiere_ligne.count(',') else ','
+    return encodage, separateur
+
+
+class FeuilleCSV:
+    """
+    Un fichier CSV vu comme une feuille openpyxl. `ouvrir` retourne un flux
+    binaire positionné au début du fichier ; il est rouvert à chaque parcours.
+    """
+
+    def __init__(self, title, ouvrir):
+        self.title = title
+        self._ouvrir = ouvrir
+        self._format = None
+        self._dimensions = None
+        self._lignes = None
+
+    def _flux_binaire(self):
+        flux = self._ouvrir()
+        if self._format is None:
+            self._format = detecter_format(flux.read(TAILLE_ECHANTILLON))
+            flux.seek(0)
+        return flux
+
+    def _lignes_brutes(self):
+        flux = self._flux_binaire()
+        encodage, separateur = self._format
+        texte = io.TextIOWrapper(io.BufferedReader(flux), encoding=encodage, errors='replace', newline='')
+        try:
+            for ligne in csv.reader(texte, delimiter=separateur):
+                # Cellule vide = None, comme une cellule Excel vide
+                yield [valeur if valeur != '' else None for valeur in ligne]
+        finally:
+            texte.detach()
+            flux.close()
+
+    def iter_rows(self, min_row=1, max_row=None, values_only=False):
+        for numero, ligne in enumerate(self._lignes_brutes(), start=1):
+            if max_row is not None and numero > max_row:
+                break
+            if numero < min_row:
+                continue
+            yield tuple(ligne) if values_only else tuple(CelluleCSV(v) for v in ligne)
+
+    @property
+    def rows(self):
+        return self.iter_rows()
+
+    def _calculer_dimensions(self):
+        if self._dimensions is None:
+            nb_lignes = nb_colonnes = 0
+            for ligne in self._lignes_brutes():
+                nb_lignes += 1
+                nb_colonnes = max(nb_colonnes, len(ligne))
+            self._dimensions = (nb_lignes, nb_colonnes)
+        return self._dimensions
+
+    @property
+    def max_row(self):
+        return self._calculer_dimensions()[0]
+
+    @property
+    def max_column(self):
+        return self._calculer_dimensions()[1]
+
+    def __getitem__(self, numero):
+        """Accès direct à une ligne (1-indexé) : la feuille est alors chargée en mémoire"""
+        if self._lignes is None:
+            self._lignes = list(self._lignes_brutes())
+        if numero < 1 or numero > len(self._lignes):
+            return ()
+        return tuple(CelluleCSV(v) for v in self._lignes[numero - 1])
+
+
+class ClasseurCSV:
+    """Un fichier .csv (une feuille) ou une archive .zip de fichiers .csv (une feuille par fichier)"""
+
+    def __init__(self, source):
+        self._source = source
+        self._archive = None
+        self._fichier = None
+        nom = os.path.basename(str(getattr(source, 'name', source)))
+
+        if isinstance(source, (str, os.PathLike)):
+            self._fichier = open(source, 'rb')
+        else:
+            self._fichier = getattr(source, 'file', source)
+            self._fichier.seek(0)
+
+        if nom.lower().endswith('.zip'):
+            self._archive = zipfile.ZipFile(self._fichier)
+            membres = [
+                info for info in self._archive.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith('.csv')
+                and not os.path.basename(info.filename).startswith(('.', '__MACOSX'))
+                and '__MACOSX/' not in info.filename
+            ]
+            self.worksheets = [
+                FeuilleCSV(os.path.splitext(os.path.basename(info.filename))[0], self._ouvrir_membre(info))
+                for info in membres
+            ]
+        else:
+            self.worksheets = [FeuilleCSV(os.path.splitext(nom)[0], self._ouvrir_fichier)]
+
+    def _ouvrir_membre(self, info):
+        # Flux décompressé seekable (la détection du format relit le début)
+        def ouvrir():
+            return _FluxRembobinable(lambda: self._archive.open(info))
+        return ouvrir
+
+    def _ouvrir_fichier(self):
+        self._fichier.seek(0)
+        return _FluxNonFermant(self._fichier)
+
+    @property
+    def sheetnames(self):
+        return [feuille.title for feuille in self.worksheets]
+
+    def __getitem__(self, nom):
+        for feuille in self.worksheets:
+            if feuille.title == nom:
+                return feuille
+        raise KeyError(f"Worksheet {nom} does not exist.")
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+        if isinstance(self._source, (str, os.PathLike)):
+            self._fichier.close()
+
+
+class _FluxNonFermant(io.RawIOBase):
+    """Enveloppe d'un fichier de l'appelant : close() ne le ferme pas"""
+
+    def __init__(self, fichier):
+        self._fichier = fichier
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, position, whence=io.SEEK_SET):
+        return self._fichier.seek(position, whence)
+
+    def tell(self):
+        return self._fichier.tell()
+
+    def readinto(self, tampon):
+        donnees = self._fichier.read(len(tampon))
+        tampon[:len(donnees)] = donnees
+        return len(donnees)
+
+
+class _FluxRembobinable(io.RawIOBase):
+    """Membre d'archive zip : seek(0) rouvre le flux décompressé"""
+
+    def __init__(self, ouvrir):
+        self._ouvrir = ouvrir
+        self._flux = ouvrir()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, position, whence=io.SEEK_SET):
+        if position != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("seek limité au début du fichier")
+        self._flux.close()
+        self._flux = self._ouvrir()
+        return 0
+
+    def readinto(self, tampon):
+        donnees = self._flux.read(len(tampon))
+        tampon[:len(donnees)] = donnees
+        return len(donnees)
+
+    def close(self):
+        self._flux.close()
+        super().close()
@@ -0,0 +1,360 @@
+"""
+Génération de données de soumission synthétiques (benchmarks, tests de charge)
+
+Les lignes produites respectent l'ordre des colonnes attendu par les fonctions
+extraire_* de utils.py (26 colonnes pour les crédits et le spot, 17 pour les
+découverts, 14 pour l'affacturage et les cautions, 15 pour les effets).
+Les distributions reprennent la forme des fichiers réels : montants
+log-normaux, catalogue de durées, majorité de particuliers (catégorie 6),
+TEG déclaré calculé selon les mêmes règles que la plateforme (calculer_teg_*),
+sauf pour une petite part de lignes volontairement non conformes.
+
+Le générateur est déterministe : une même graine donne le même classeur.
+generer_csv() écrit les mêmes lignes au format CSV (archive .zip, un fichier
+par feuille).
+"""
+
+import csv
+import io
+import math
+import random
+import zipfile
+from datetime import datetime, timedelta
+
+import openpyxl
+
+
+# ==========================================
+# RÉFÉRENTIELS
+# ==========================================
+
+ETABLISSEMENTS_TYPES = [
+    ('BOA CONGO', 30012),
+    ('BGFIBANK CONGO', 30008),
+    ('BCH', 30015),
+    ('BCI', 30013),
+    ('BPC', 30019),
+    ('BSCA', 30020),
+]
+
+# (code catégorie bénéficiaire, poids) : codes reconnus par calculer_donnees_communique
+CATEGORIES_BENEFICIAIRES = [('6', 55), ('32', 20), ('31', 10), ('1', 5), ('2', 5), ('7', 5)]
+NATURES_PRET = [(2, 60), (9, 20), (5, 15), (1, 5)]
+FREQUENCES_REMBOURSEMENT = [('1', 85), ('2', 15)]
+DUREES_CREDIT = [(6, 10), (12, 30), (18, 10), (24, 15), (36, 15), (48, 8), (60, 7), (84, 3), (120, 2)]
+LIEUX = ['Brazzaville', 'Pointe-Noire', 'Kouilou', 'Niari', 'Bouenza', 'Plateaux']
+SECTEURS = [
+    'Commerce de gros', 'Bâtiment et Travaux publics', 'Transports routiers',
+    'Agriculture', 'Services aux entreprises', 'Industries extractives', None,
+]
+PROFESSIONS = [
+    'EMPLOYE DE LA FONCTION PUBLIQUE', 'MILITAIRE', 'EMPLOYES DE BUREAU',
+    'COMMERCANT', 'ENSEIGNANT', 'CADRE DU PRIVE', 'INCONNU',
+]
+NOMS = [
+    'MALONGA', 'OBAMBI', 'NGOMA', 'MOUKALA', 'MABIALA', 'BANZOUZI', 'ITOUA',
+    'OKEMBA', 'MBEMBA', 'NKOUNKOU', 'SAMBA', 'LOEMBA', 'TCHICAYA', 'OPANGAULT',
+]
+ENTREPRISES = [
+    'ZOE TRANSPORT & LOGISTIQUE', 'SERRU-TOP', 'E2C', 'PRESTATIONS CONGOLAISES DE SERVICES',
+    'LES GRANDS MOULINS DU PHARE', 'CONGO BTP', 'SOCIETE AGRICOLE DU NIARI',
+]
+COMPTES_ORIGINE = [321620, 321201, 311500, 321100]
+
+TRIMESTRES = {'T1': 1, 'T2': 4, 'T3': 7, 'T4': 10}
+
+
+# ==========================================
+# EN-TÊTES (identiques aux fichiers réels)
+# ==========================================
+
+ENTETES_CREDITS = [
+    'ETABLISSEMENT_I01', 'CODE_ETAB_I02', 'DATE_MEP_I03', 'CHA_ORI_I04', 'NATURE_PRET_I05',
+    'BENEFICIAIRE_I06', 'CATEGORIE_BENEF_I07', 'LIEU_RESIDENCE_I08', 'SECT_ACT_I09',
+    'MONTANT_CHAF_I10', 'EFFECTIF_I11', 'PROFESSION_I12', 'MONTANT_PRET_I13', 'DUREE_I14',
+    'DUREE_DIFFERRE_I15', 'FREQ_REMB_I16', 'TAUX_NOMINAL_I17', 'FRAIS_DOSSIER_I18',
+    'MODALITEPAIEMENT_ASS_I19', 'MONTANTASSURANCE_I20', 'FRAIS_ANNEXE_I21',
+    'MODEREMBOURSEMENT_I22', 'MONTANT_ECHEANCE_I23', 'MODE_DEBLOCAGE_I24',
+    'SITUATION_CREANCE_I25', 'TEG_I26',
+]
+ENTETES_DECOUVERTS = [f'i{i}' for i in range(1, 18)]
+ENTETES_AFFACTURAGES = [f'I{i:02d}' for i in range(1, 15)]
+ENTETES_CAUTIONS = [f'I{i:02d}' for i in range(1, 15)]
+ENTETES_EFFETS = [f'I{i:02d}' for i in range(1, 16)]
+
+
+def choix_pondere(rng, valeurs_poids):
+    valeurs, poids = zip(*valeurs_poids)
+    return rng.choices(valeurs, weights=poids)[0]
+
+
+def arrondir(montant, pas=1000):
+    return int(round(montant / pas) * pas) or pas
+
+
+def taux_actuariel(nombre_periodes, echeance, montant_net, depart=0.01):
+    """
+    Taux périodique d'un prêt à échéances constantes (même résultat que npf.rate,
+    par la méthode de Newton, mais ~50 fois plus rapide sur un scalaire)
+    """
+    taux = depart or 0.01
+    for _ in range(50):
+        actualisation = (1 + taux) ** -nombre_periodes
+        ecart = echeance * (1 - actualisation) / taux - montant_net
+        derivee = echeance * (nombre_periodes * actualisation / (1 + taux) - (1 - actualisation) / taux) / taux
+        pas = ecart / derivee
+        taux -= pas
+        if abs(pas) < 1e-12:
+            break
+    return taux
+
+
+# ==========================================
+# GÉNÉRATEUR DE LIGNES
+# ==========================================
+
+class GenerateurLignes:
+    """
+    Produit des lignes de soumission pour un établissement et un trimestre.
+    Chaque méthode retourne la liste des valeurs d'une ligne, dans l'ordre
+    des colonnes de la feuille correspondante.
+    """
+
+    def __init__(self, graine=42, sigle='BOA CONGO', code=30012, annee=2024, trimestre='T4',
+                 taux_non_conforme=0.05, majoration_taux=0.0):
+        self.rng = random.Random(graine)
+        self.sigle = sigle
+        self.code = code
+        self.debut = datetime(int(annee), TRIMESTRES[trimestre], 1)
+        self.taux_non_conforme = taux_non_conforme
+        # Les EMF prêtent plus cher que les banques
+        self.majoration_taux = majoration_taux
+
+    # ------------------------------------------
+    # Tirages élémentaires
+    # ------------------------------------------
+
+    def date_trimestre(self):
+        return self.debut + timedelta(days=self.rng.randrange(90))
+
+    def montant(self, mediane, dispersion=1.0, minimum=10000, maximum=5_000_000_000):
+        """Montant log-normal arrondi au millier"""
+        valeur = self.rng.lognormvariate(math.log(mediane), dispersion)
+        return arrondir(min(max(valeur, minimum), maximum))
+
+    def beneficiaire(self, categorie):
+        if categorie == '6':
+            return f"{self.rng.choice(NOMS)} {self.rng.choice(NOMS)}"
+        return self.rng.choice(ENTREPRISES)
+
+    def teg_declare(self, teg):
+        """Quelques déclarations s'écartent volontairement du TEG recalculé"""
+        if self.rng.random() < self.taux_non_conforme:
+            teg *= self.rng.uniform(0.6, 0.9)
+        return round(teg, 6)
+
+    def entete_operation(self, duree_jours):
+        """Colonnes 0 à 8 communes à l'affacturage, aux cautions et aux effets"""
+        date_mep = self.date_trimestre()
+        categorie = choix_pondere(self.rng, CATEGORIES_BENEFICIAIRES[1:])
+        return [
+            self.sigle, self.code, date_mep, date_mep + timedelta(days=duree_jours), duree_jours,
+            self.beneficiaire(categorie), categorie, self.rng.choice(LIEUX), self.rng.choice(SECTEURS),
+        ]
+
+    # ------------------------------------------
+    # Lignes par produit
+    # ------------------------------------------
+
+    def credit(self, spot=False):
+        rng = self.rng
+        categorie = choix_pondere(rng, CATEGORIES_BENEFICIAIRES)
+        if spot:
+            duree = rng.choice([1, 3, 6, 9, 12])
+            montant = self.montant(5_000_000, 1.5)
+        else:
+            duree = choix_pondere(rng, DUREES_CREDIT)
+            montant = self.montant(1_500_000 if categorie == '6' else 25_000_000, 1.1)
+        freq = choix_pondere(rng, FREQUENCES_REMBOURSEMENT)
+        periodes_an = 12 if freq == '1' else 4
+        taux = round(rng.uniform(0.07, 0.16) + self.majoration_taux, 4)
+
+        frais_dossier = arrondir(montant * rng.uniform(0.005, 0.02), 100)
+        assurance = arrondir(montant * rng.uniform(0.002, 0.012), 100) if rng.random() < 0.6 else 0
+        frais_annexe = arrondir(montant * rng.uniform(0.0, 0.01), 100)
+
+        frais = frais_dossier + assurance + frais_annexe
+
+        if spot:
+            # Remboursement in fine : capital + intérêts simples
+            echeance = round(montant * (1 + taux * duree / 12), 2)
+            teg = taux + frais / montant
+        else:
+            # Échéance constante (les extracteurs lisent la durée comme un nombre de périodes)
+            taux_periode = taux / periodes_an
+            echeance = round(montant * taux_periode / (1 - (1 + taux_periode) ** -duree), 2)
+            teg = taux_actuariel(duree, echeance, montant - frais, taux_periode) * periodes_an
+
+        return [
+            self.sigle, self.code, self.date_trimestre(), rng.choice(COMPTES_ORIGINE),
+            choix_pondere(rng, NATURES_PRET), self.beneficiaire(categorie), categorie,
+            rng.choice(LIEUX), rng.choice(SECTEURS),
+            0 if categorie == '6' else self.montant(200_000_000, 1.2), None,
+            rng.choice(PROFESSIONS) if categorie == '6' else 'INCONNU',
+            montant, duree, 0, freq,
+            # Les fichiers spot déclarent le taux nominal en pourcentage
+            round(taux * 100, 2) if spot else taux,
+            frais_dossier, 1, assurance, frais_annexe, 1, echeance, 1, 1,
+            self.teg_declare(teg),
+        ]
+
+    def spot(self):
+        return self.credit(spot=True)
+
+    def decouvert(self):
+        rng = self.rng
+        categorie = choix_pondere(rng, CATEGORIES_BENEFICIAIRES)
+        montant = self.montant(500_000 if categorie == '6' else 15_000_000, 1.3)
+        taux = round(rng.uniform(0.09, 0.18) + self.majoration_taux, 4)
+        frais_dossier = arrondir(montant * rng.uniform(0.005, 0.02), 100)
+        assurance = arrondir(montant * 0.005, 100) if rng.random() < 0.3 else 0
+        frais_annexes = arrondir(montant * rng.uniform(0.0, 0.012), 100)
+        agios = round(montant * taux * rng.randint(10, 90) / 360, 2)
+        teg = taux + (frais_dossier + assurance + frais_annexes) / montant
+
+        return [
+            self.sigle, self.code, self.date_trimestre(), self.beneficiaire(categorie), categorie,
+            rng.choice(LIEUX), rng.choice(SECTEURS), montant, None, taux,
+            frais_dossier, assurance, frais_annexes, agios, rng.randint(0, 3), 1,
+            self.teg_declare(teg),
+        ]
+
+    def affacturage(self):
+        rng = self.rng
+        duree = rng.randint(30, 180)
+        montant = self.montant(2_000_000, 1.0)
+        commission = round(montant * rng.uniform(0.01, 0.02), 2)
+        financement = round(montant * rng.uniform(0.08, 0.14) * duree / 360, 2)
+        frais_annexes = round(montant * 0.005, 2)
+        teg = (commission + financement + frais_annexes) / montant * 360 / duree
+
+        return self.entete_operation(duree) + [
+            montant, commission, financement, frais_annexes, self.teg_declare(teg),
+        ]
+
+    def caution(self):
+        rng = self.rng
+        duree = rng.randint(90, 730)
+        montant = self.montant(40_000_000, 1.2, minimum=1_000_000)
+        taux = round(rng.uniform(0.005, 0.04), 4)
+        frais_commission = arrondir(rng.uniform(25_000, 150_000), 5000)
+        frais_annexes = 0 if rng.random() < 0.7 else arrondir(montant * 0.001, 100)
+        teg = taux * montant / (montant - frais_commission - frais_annexes)
+
+        return self.entete_operation(duree) + [
+            montant, taux, frais_commission, frais_annexes, self.teg_declare(teg),
+        ]
+
+    def effet(self):
+        rng = self.rng
+        duree = rng.randint(30, 365)
+        taux = round(rng.uniform(0.06, 0.12) + self.majoration_taux, 4)
+        montant = self.montant(20_000_000, 1.0)
+        frais_dossier = 0 if rng.random() < 0.5 else arrondir(montant * 0.002, 100)
+        commission = round(montant * rng.uniform(0.005, 0.03), 0)
+        autres = 0
+        teg = taux * montant / (montant - commission - autres)
+
+        return self.entete_operation(duree) + [
+            taux, montant, frais_dossier, commission, autres, self.teg_declare(teg),
+        ]
+
+
+# Feuilles du classeur : (nom de feuille, en-têtes, méthode du générateur)
+FEUILLES = [
+    ('Credits amortissables', ENTETES_CREDITS, 'credit'),
+    ('Découverts', ENTETES_DECOUVERTS, 'decouvert'),
+    ('Affacturage', ENTETES_AFFACTURAGES, 'affacturage'),
+    ('Cautions', ENTETES_CAUTIONS, 'caution'),
+    ('Effets de commerce', ENTETES_EFFETS, 'effet'),
+    ('Spot', ENTETES_CREDITS, 'spot'),
+]
+
+# Part de chaque produit dans une soumission (proportions du fichier d'exemple)
+REPARTITION_PRODUITS = {
+    'credit': 0.31, 'decouvert': 0.26, 'affacturage': 0.12,
+    'caution': 0.03, 'effet': 0.01, 'spot': 0.27,
+}
+
+
+# ==========================================
+# CLASSEUR
+# ==========================================
+
+def repartir_lignes(total):
+    """Nombre de lignes par feuille pour un total donné"""
+    return {
+        methode: max(1, round(total * REPARTITION_PRODUITS[methode]))
+        for _, _, methode in FEUILLES
+    }
+
+
+def generer_classeur(destination, lignes=1000, graine=42, **options):
+    """
+    Écrit un classeur de soumission synthétique.
+
+    - destination : chemin ou flux binaire
+    - lignes : total de lignes (réparti selon REPARTITION_PRODUITS)
+      ou dictionnaire {méthode: nombre de lignes}
+    - options : sigle, code, annee, trimestre, taux_non_conforme, majoration_taux
+      (voir GenerateurLignes)
+
+    Retourne le nombre de lignes écrites par feuille.
+    """
+    generateur = GenerateurLignes(graine=graine, **options)
+    repartition = lignes if isinstance(lignes, dict) else repartir_lignes(lignes)
+
+    # Mode écriture seule : mémoire constante quel que soit le volume
+    workbook = openpyxl.Workbook(write_only=True)
+    ecrites = {}
+    for nom_feuille, entetes, methode in FEUILLES:
+        nombre = repartition.get(methode, 0)
+        if not nombre:
+            continue
+        worksheet = workbook.create_sheet(nom_feuille)
+        worksheet.append(entetes)
+        produire = getattr(generateur, methode)
+        for _ in range(nombre):
+            worksheet.append(produire())
+        ecrites[nom_feuille] = nombre
+
+    workbook.save(destination)
+    return ecrites
+
+
+def generer_csv(destination, lignes=1000, graine=42, separateur=';', **options):
+    """
+    Écrit la même soumission que generer_classeur() (même graine, mêmes lignes)
+    au format CSV : une archive .zip contenant un fichier "<nom de feuille>.csv"
+    (UTF-8) par feuille. Retourne le nombre de lignes écrites par feuille.
+    """
+    generateur = GenerateurLignes(graine=graine, **options)
+    repartition = lignes if isinstance(lignes, dict) else repartir_lignes(lignes)
+
+    ecrites = {}
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom_feuille, entetes, methode in FEUILLES:
+            nombre = repartition.get(methode, 0)
+            if not nombre:
+                continue
+            with archive.open(f'{nom_feuille}.csv', 'w') as membre:
+                texte = io.TextIOWrapper(membre, encoding='utf-8', newline='')
+                writer = csv.writer(texte, delimiter=separateur)
+                writer.writerow(entetes)
+                produire = getattr(generateur, methode)
+                for _ in range(nombre):
+                    writer.writerow(produire())
+                texte.flush()
+                texte.detach()
+            ecrites[nom_feuille] = nombre
+    return ecrites
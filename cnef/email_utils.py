@@ -7,21 +7,37 @@ import random
 import string
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 import logging
 
+from .envoi_emails import mettre_en_file
+
 logger = logging.getLogger(__name__)
 
 def obtenir_url_logo():
     """Retourne l'URL complète du logo Congo"""
     return f"{settings.SITE_URL}/static/image/Congo.png"
 
+def mettre_en_file_protege(**champs):
+    """
+    mettre_en_file sans propager l'erreur : un échec de mise en file est
+    journalisé et n'annule pas la transaction appelante (validation, rejet).
+    Retourne True si l'email est en file.
+    """
+    try:
+        # Point de sauvegarde : seul l'email est annulé en cas d'échec
+        with transaction.atomic():
+            mettre_en_file(**champs)
+        return True
+    except Exception as e:
+        logger.error(f"Erreur de mise en file de l'email {champs.get('type_email')} pour {champs.get('destinataire_email')}: {str(e)}")
+        return False
+
 def envoyer_email_invitation(token, envoyeur):
-    """Envoie un email d'invitation avec le lien d'inscription"""
+    """Met en file d'envoi l'email d'invitation avec le lien d'inscription"""
     try:
-        from .models import HistoriqueEmail
-        
         email_destinataire = token.email_destinataire
         lien_inscription = token.generer_lien_inscription()
         
@@ -60,55 +76,27 @@ CNEF - Comité National Économique et Financier
 République du Congo
         """.strip()
         
-        email = EmailMultiAlternatives(
-            subject=sujet,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[email_destinataire],
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send(fail_silently=False)
-        
-        HistoriqueEmail.objects.create(
+        mettre_en_file(
             type_email='INVITATION',
             destinataire_email=email_destinataire,
             objet=sujet,
             contenu_html=html_content,
             contenu_texte=text_content,
-            statut='ENVOYE',
             utilisateur_envoyeur=envoyeur,
             etablissement=token.etablissement,
             token_lie=token
         )
         
-        logger.info(f"Email d'invitation envoyé à {email_destinataire} par {envoyeur.email}")
+        logger.info(f"Email d'invitation mis en file pour {email_destinataire} par {envoyeur.email}")
         return True
         
     except Exception as e:
-        logger.error(f"Erreur lors de l'envoi de l'email d'invitation à {email_destinataire}: {str(e)}")
-        
-        try:
-            from .models import HistoriqueEmail
-            HistoriqueEmail.objects.create(
-                type_email='INVITATION',
-                destinataire_email=email_destinataire,
-                objet=sujet if 'sujet' in locals() else "Invitation CNEF",
-                contenu_html=html_content if 'html_content' in locals() else "",
-                contenu_texte=text_content if 'text_content' in locals() else "",
-                statut='ECHEC',
-                erreur_message=str(e),
-                utilisateur_envoyeur=envoyeur,
-                etablissement=token.etablissement if token.etablissement else None,
-                token_lie=token
-            )
-        except:
-            pass
-        
+        logger.error(f"Erreur lors de la préparation de l'email d'invitation à {email_destinataire}: {str(e)}")
         return False
 
 def envoyer_email_validation(fichier):
-    """Envoie un email de validation au AEF et UEF de l'établissement"""
-    from .models import HistoriqueEmail, User
+    """Met en file d'envoi l'email de validation pour l'AEF et l'UEF de l'établissement"""
+    from .models import User
     
     resultat = {'aef': False, 'uef': False}
     
@@ -150,92 +138,113 @@ CNEF - Comité National Économique et Financier
     """.strip()
     
     if aef and aef.email:
-        try:
-            email_aef = EmailMultiAlternatives(
-                subject=sujet,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[aef.email],
-            )
-            email_aef.attach_alternative(html_content, "text/html")
-            email_aef.send(fail_silently=False)
-            
-            HistoriqueEmail.objects.create(
-                type_email='VALIDATION',
-                destinataire_email=aef.email,
-                destinataire_nom=aef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ENVOYE',
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
-            
-            resultat['aef'] = True
-            logger.info(f"Email de validation envoyé à AEF {aef.email}")
-            
-        except Exception as e:
-            logger.error(f"Erreur envoi email validation à AEF {aef.email}: {str(e)}")
-            HistoriqueEmail.objects.create(
-                type_email='VALIDATION',
-                destinataire_email=aef.email,
-                destinataire_nom=aef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ECHEC',
-                erreur_message=str(e),
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
+        resultat['aef'] = mettre_en_file_protege(
+            type_email='VALIDATION',
+            destinataire_email=aef.email,
+            destinataire_nom=aef.get_full_name(),
+            objet=sujet,
+            contenu_html=html_content,
+            contenu_texte=text_content,
+            etablissement=fichier.etablissement_cnef,
+            fichier_lie=fichier
+        )
+        if resultat['aef']:
+            logger.info(f"Email de validation mis en file pour AEF {aef.email}")
     
     if uef and uef.email and uef.role == 'UEF':
-        try:
-            email_uef = EmailMultiAlternatives(
-                subject=sujet,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[uef.email],
-            )
-            email_uef.attach_alternative(html_content, "text/html")
-            email_uef.send(fail_silently=False)
-            
-            HistoriqueEmail.objects.create(
-                type_email='VALIDATION',
-                destinataire_email=uef.email,
-                destinataire_nom=uef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ENVOYE',
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
-            
-            resultat['uef'] = True
-            logger.info(f"Email de validation envoyé à UEF {uef.email}")
-            
-        except Exception as e:
-            logger.error(f"Erreur envoi email validation à UEF {uef.email}: {str(e)}")
-            HistoriqueEmail.objects.create(
-                type_email='VALIDATION',
-                destinataire_email=uef.email,
-                destinataire_nom=uef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ECHEC',
-                erreur_message=str(e),
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
+        resultat['uef'] = mettre_en_file_protege(
+            type_email='VALIDATION',
+            destinataire_email=uef.email,
+            destinataire_nom=uef.get_full_name(),
+            objet=sujet,
+            contenu_html=html_content,
+            contenu_texte=text_content,
+            etablissement=fichier.etablissement_cnef,
+            fichier_lie=fichier
+        )
+        if resultat['uef']:
+            logger.info(f"Email de validation mis en file pour UEF {uef.email}")
     
     return resultat
 
+def envoyer_email_validation_groupee(fichiers):
+    """
+    Met en file un seul email de validation par destinataire pour des fichiers
+    d'un même établissement validés ensemble (validation groupée) :
+    l'AEF de l'établissement et chaque UEF ayant déposé un des fichiers.
+    Retourne le nombre d'emails mis en file.
+    """
+    from .models import User
+
+    if not fichiers:
+        return 0
+    if len(fichiers) == 1:
+        resultat = envoyer_email_validation(fichiers[0])
+        return int(resultat['aef']) + int(resultat['uef'])
+
+    etablissement = fichiers[0].etablissement_cnef
+    aef = User.objects.filter(etablissement=etablissement, role='AEF', is_active=True).first()
+
+    destinataires = {}
+    if aef and aef.email:
+        destinataires[aef.email.lower()] = aef
+    for fichier in fichiers:
+        uef = fichier.uploader_par
+        if uef and uef.email and uef.role == 'UEF':
+            destinataires.setdefault(uef.email.lower(), uef)
+
+    noms = [fichier.fichier.name.split('/')[-1] for fichier in fichiers]
+    total_lignes = sum(fichier.total_lignes_importees for fichier in fichiers)
+    context = {
+        'fichier_nom': ', '.join(noms),
+        'etablissement': etablissement.Nom_etablissement,
+        'date_validation': timezone.now().strftime('%d/%m/%Y à %H:%M'),
+        'nombre_lignes': total_lignes,
+        'logo_url': obtenir_url_logo(),
+    }
+
+    sujet = f"✅ {len(fichiers)} fichiers validés - {etablissement.Nom_etablissement}"
+    html_content = generer_html_validation(context)
+    liste_fichiers = "\n".join(
+        f"📁 {nom} : {fichier.total_lignes_importees} lignes" for nom, fichier in zip(noms, fichiers)
+    )
+    text_content = f"""
+Bonjour,
+
+Bonne nouvelle ! {len(fichiers)} fichiers ont été validés avec succès.
+
+{liste_fichiers}
+
+🏦 Établissement : {context['etablissement']}
+📅 Date de validation : {context['date_validation']}
+📊 Lignes traitées : {total_lignes}
+
+Vos données ont été prises en compte.
+
+Cordialement,
+CNEF - Comité National Économique et Financier
+    """.strip()
+
+    nb_en_file = 0
+    for destinataire in destinataires.values():
+        if mettre_en_file_protege(
+            type_email='VALIDATION',
+            destinataire_email=destinataire.email,
+            destinataire_nom=destinataire.get_full_name(),
+            objet=sujet,
+            contenu_html=html_content,
+            contenu_texte=text_content,
+            etablissement=etablissement,
+            fichier_lie=fichiers[0]
+        ):
+            nb_en_file += 1
+            logger.info(f"Email de validation groupée mis en file pour {destinataire.email} ({len(fichiers)} fichiers)")
+
+    return nb_en_file
+
 def envoyer_email_rejet(fichier, motif_rejet):
-    """Envoie un email de rejet au AEF et UEF de l'établissement"""
-    from .models import HistoriqueEmail, User
+    """Met en file d'envoi l'email de rejet pour l'AEF et l'UEF de l'établissement"""
+    from .models import User
     
     resultat = {'aef': False, 'uef': False}
     
@@ -279,110 +288,50 @@ CNEF - Comité National Économique et Financier
     """.strip()
     
     if aef and aef.email:
-        try:
-            email_aef = EmailMultiAlternatives(
-                subject=sujet,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[aef.email],
-            )
-            email_aef.attach_alternative(html_content, "text/html")
-            email_aef.send(fail_silently=False)
-            
-            HistoriqueEmail.objects.create(
-                type_email='REJET',
-                destinataire_email=aef.email,
-                destinataire_nom=aef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ENVOYE',
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
-            
-            resultat['aef'] = True
-            logger.info(f"Email de rejet envoyé à AEF {aef.email}")
-            
-        except Exception as e:
-            logger.error(f"Erreur envoi email rejet à AEF: {str(e)}")
-            HistoriqueEmail.objects.create(
-                type_email='REJET',
-                destinataire_email=aef.email,
-                destinataire_nom=aef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ECHEC',
-                erreur_message=str(e),
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
+        resultat['aef'] = mettre_en_file_protege(
+            type_email='REJET',
+            destinataire_email=aef.email,
+            destinataire_nom=aef.get_full_name(),
+            objet=sujet,
+            contenu_html=html_content,
+            contenu_texte=text_content,
+            etablissement=fichier.etablissement_cnef,
+            fichier_lie=fichier
+        )
+        if resultat['aef']:
+            logger.info(f"Email de rejet mis en file pour AEF {aef.email}")
     
     if uef and uef.email and uef.role == 'UEF':
-        try:
-            email_uef = EmailMultiAlternatives(
-                subject=sujet,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[uef.email],
-            )
-            email_uef.attach_alternative(html_content, "text/html")
-            email_uef.send(fail_silently=False)
-            
-            HistoriqueEmail.objects.create(
-                type_email='REJET',
-                destinataire_email=uef.email,
-                destinataire_nom=uef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ENVOYE',
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
-            
-            resultat['uef'] = True
-            logger.info(f"Email de rejet envoyé à UEF {uef.email}")
-            
-        except Exception as e:
-            logger.error(f"Erreur envoi email rejet à UEF: {str(e)}")
-            HistoriqueEmail.objects.create(
-                type_email='REJET',
-                destinataire_email=uef.email,
-                destinataire_nom=uef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ECHEC',
-                erreur_message=str(e),
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
+        resultat['uef'] = mettre_en_file_protege(
+            type_email='REJET',
+            destinataire_email=uef.email,
+            destinataire_nom=uef.get_full_name(),
+            objet=sujet,
+            contenu_html=html_content,
+            contenu_texte=text_content,
+            etablissement=fichier.etablissement_cnef,
+            fichier_lie=fichier
+        )
+        if resultat['uef']:
+            logger.info(f"Email de rejet mis en file pour UEF {uef.email}")
     
     return resultat
 
 def envoyer_email_notification_acnef(fichier):
     """
-    Envoie un email à tous les ACNEF/UCNEF actifs quand un nouveau fichier est soumis
+    Met en file d'envoi un email pour chaque ACNEF/UCNEF actif quand un nouveau fichier est soumis
     
     Args:
         fichier (FichierImport): Instance du fichier soumis
         
     Returns:
-        int: Nombre d'emails envoyés avec succès
+        int: Nombre d'emails mis en file
         
     Gère automatiquement :
     - Les utilisateurs avec rôle ACNEF ou UCNEF actifs
-    - L'historique d'envoi (succès ou échec)
-    - Les erreurs d'envoi par destinataire
+    - L'historique d'envoi (EN_ATTENTE, puis ENVOYE ou ECHEC, voir envoi_emails.py)
     """
-    from .models import HistoriqueEmail, User
-    from django.core.mail import EmailMultiAlternatives
-    from django.conf import settings
-    import logging
-    
-    logger = logging.getLogger(__name__)
+    from .models import User
     
     # ==========================================
     # VALIDATIONS PRÉALABLES
@@ -463,147 +412,57 @@ République du Congo
     """.strip()
     
     # ==========================================
-    # ENVOI DES EMAILS À CHAQUE ACNEF/UCNEF
+    # MISE EN FILE D'UN EMAIL PAR ACNEF/UCNEF
     # ==========================================
+    # Le corps est identique pour tous les destinataires : un seul ContenuEmail
     
     count_success = 0
-    count_echec = 0
     
     for acnef in acnefs:
-        try:
-            # Vérifier que l'utilisateur a une adresse email valide
-            if not acnef.email:
-                logger.warning(f"L'utilisateur {acnef.get_full_name()} n'a pas d'adresse email - notification ignorée")
-                continue
-            
-            # Créer l'email avec version HTML et texte
-            email_notif = EmailMultiAlternatives(
-                subject=sujet,
-                body=text_content,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[acnef.email],
-            )
-            
-            # Attacher la version HTML
-            email_notif.attach_alternative(html_content, "text/html")
-            
-            # Envoyer l'email
-            email_notif.send(fail_silently=False)
-            
-            # ==========================================
-            # ENREGISTREMENT DANS L'HISTORIQUE (SUCCÈS)
-            # ==========================================
-            HistoriqueEmail.objects.create(
-                type_email='NOTIFICATION_ACNEF',
-                destinataire_email=acnef.email,
-                destinataire_nom=acnef.get_full_name(),
-                objet=sujet,
-                contenu_html=html_content,
-                contenu_texte=text_content,
-                statut='ENVOYE',
-                utilisateur_envoyeur=fichier.uploader_par,  # Peut être None, c'est OK
-                etablissement=fichier.etablissement_cnef,
-                fichier_lie=fichier
-            )
-            
+        # Vérifier que l'utilisateur a une adresse email valide
+        if not acnef.email:
+            logger.warning(f"L'utilisateur {acnef.get_full_name()} n'a pas d'adresse email - notification ignorée")
+            continue
+        
+        if mettre_en_file_protege(
+            type_email='NOTIFICATION_ACNEF',
+            destinataire_email=acnef.email,
+            destinataire_nom=acnef.get_full_name(),
+            objet=sujet,
+            contenu_html=html_content,
+            contenu_texte=text_content,
+            utilisateur_envoyeur=fichier.uploader_par,  # Peut être None, c'est OK
+            etablissement=fichier.etablissement_cnef,
+            fichier_lie=fichier
+        ):
             count_success += 1
-            logger.info(f"✅ Notification envoyée avec succès à {acnef.email} ({acnef.get_full_name()})")
-            
-        except Exception as e:
-            # ==========================================
-            # GESTION DES ERREURS D'ENVOI
-            # ==========================================
-            count_echec += 1
-            logger.error(f"❌ Erreur lors de l'envoi de la notification à {acnef.email}: {str(e)}")
-            
-            # Enregistrer l'échec dans l'historique
-            try:
-                HistoriqueEmail.objects.create(
-                    type_email='NOTIFICATION_ACNEF',
-                    destinataire_email=acnef.email,
-                    destinataire_nom=acnef.get_full_name(),
-                    objet=sujet,
-                    contenu_html=html_content,
-                    contenu_texte=text_content,
-                    statut='ECHEC',
-                    erreur_message=str(e)[:500],  # Limiter la taille du message d'erreur
-                    utilisateur_envoyeur=fichier.uploader_par,
-                    etablissement=fichier.etablissement_cnef,
-                    fichier_lie=fichier
-                )
-            except Exception as hist_error:
-                logger.error(f"⚠️ Impossible d'enregistrer l'échec dans l'historique: {str(hist_error)}")
     
-    # ==========================================
-    # RAPPORT FINAL
-    # ==========================================
-    logger.info(f"""
-    📊 Rapport d'envoi pour le fichier #{fichier.id}:
-    - ✅ Succès : {count_success}/{acnefs.count()}
-    - ❌ Échecs : {count_echec}/{acnefs.count()}
-    - 🏦 Établissement : {fichier.etablissement_cnef.Nom_etablissement}
-    """)
+    logger.info(f"{count_success} notification(s) mise(s) en file pour le fichier #{fichier.id} ({fichier.etablissement_cnef.Nom_etablissement})")
     
     return count_success
 
 def renvoyer_email(historique_email):
-    """Renvoie un email depuis l'historique"""
+    """Remet en file d'envoi un email de l'historique (même contenu)"""
     try:
-        email = EmailMultiAlternatives(
-            subject=historique_email.objet,
-            body=historique_email.contenu_texte or "",
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[historique_email.destinataire_email],
-        )
-        
-        if historique_email.contenu_html:
-            email.attach_alternative(historique_email.contenu_html, "text/html")
-        
-        email.send(fail_silently=False)
-        
-        from .models import HistoriqueEmail
-        HistoriqueEmail.objects.create(
+        mettre_en_file(
             type_email=historique_email.type_email,
             destinataire_email=historique_email.destinataire_email,
             destinataire_nom=historique_email.destinataire_nom,
             objet=f"[RENVOI] {historique_email.objet}",
-            contenu_html=historique_email.contenu_html,
-            contenu_texte=historique_email.contenu_texte,
-            statut='ENVOYE',
+            contenu=historique_email.contenu,
             utilisateur_envoyeur=historique_email.utilisateur_envoyeur,
             etablissement=historique_email.etablissement,
             token_lie=historique_email.token_lie,
             fichier_lie=historique_email.fichier_lie
         )
         
-        logger.info(f"Email renvoyé à {historique_email.destinataire_email}")
+        logger.info(f"Renvoi d'email mis en file pour {historique_email.destinataire_email}")
         return True
         
     except Exception as e:
         logger.error(f"Erreur lors du renvoi d'email: {str(e)}")
-        
-        from .models import HistoriqueEmail
-        HistoriqueEmail.objects.create(
-            type_email=historique_email.type_email,
-            destinataire_email=historique_email.destinataire_email,
-            destinataire_nom=historique_email.destinataire_nom,
-            objet=f"[RENVOI] {historique_email.objet}",
-            contenu_html=historique_email.contenu_html,
-            contenu_texte=historique_email.contenu_texte,
-            statut='ECHEC',
-            erreur_message=str(e),
-            utilisateur_envoyeur=historique_email.utilisateur_envoyeur,
-            etablissement=historique_email.etablissement,
-            token_lie=historique_email.token_lie,
-            fichier_lie=historique_email.fichier_lie
-        )
-        
         return False
 
-# ==========================================
-# TEMPLATES HTML DES EMAILS
-# ==========================================
-
 def generer_html_invitation(context):
     """Génère le HTML pour l'email d'invitation"""
     
@@ -0,0 +1,258 @@
+"""
+File d'envoi des emails (outbox transactionnelle)
+
+Les fonctions de email_utils n'appellent plus SMTP sur le chemin de la
+requête : chaque email est enregistré dans HistoriqueEmail avec le statut
+EN_ATTENTE, dans la transaction de l'action métier (validation, rejet,
+invitation...). Un email n'est donc envoyé que si cette transaction est validée.
+
+Les emails dus sont ensuite envoyés par lots, sur une seule connexion SMTP :
+- par un thread d'arrière-plan, réveillé après le commit (transaction.on_commit)
+- par la commande envoyer_emails (cron, ou --continu pour un worker dédié)
+
+En cas d'échec, nouvelle tentative après EMAIL_FILE_DELAI_BASE × 2^(n-1)
+secondes (plafonné à EMAIL_FILE_DELAI_MAX) ; au-delà de
+EMAIL_FILE_TENTATIVES_MAX tentatives, l'email passe au statut ECHEC.
+
+Modes (EMAIL_FILE_MODE) :
+- 'synchrone' : envoi après le commit, dans le thread de la requête (tests)
+- 'thread'    : envoi par un thread d'arrière-plan du worker
+- 'commande'  : envoi uniquement par la commande envoyer_emails
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def mode_file():
+    return getattr(settings, 'EMAIL_FILE_MODE', 'synchrone')
+
+
+def delai_nouvelle_tentative(tentatives):
+    """Backoff exponentiel : EMAIL_FILE_DELAI_BASE × 2^(tentatives - 1), plafonné"""
+    base = getattr(settings, 'EMAIL_FILE_DELAI_BASE', 60)
+    maximum = getattr(settings, 'EMAIL_FILE_DELAI_MAX', 3600)
+    return timedelta(seconds=min(base * 2 ** max(tentatives - 1, 0), maximum))
+
+
+# ==========================================
+# MISE EN FILE
+# ==========================================
+
+def mettre_en_file(**champs):
+    """
+    Enregistre un email à envoyer (champs de HistoriqueEmail, dont
+    contenu_html / contenu_texte ou contenu) et programme l'envoi après le
+    commit de la transaction en cours. Retourne la ligne créée.
+    """
+    from .models import HistoriqueEmail
+
+    email = HistoriqueEmail.objects.create(
+        statut='EN_ATTENTE',
+        prochaine_tentative=timezone.now(),
+        **champs
+    )
+    transaction.on_commit(declencher_envoi)
+    return email
+
+
+def declencher_envoi():
+    """Appelé après le commit : envoie ou réveille le répartiteur selon le mode"""
+    mode = mode_file()
+    if mode == 'synchrone':
+        envoyer_emails_en_attente()
+    elif mode == 'thread':
+        repartiteur.reveiller()
+
+
+# ==========================================
+# ENVOI PAR LOTS
+# ==========================================
+
+def construire_message(email):
+    message = EmailMultiAlternatives(
+        subject=email.objet,
+        body=email.contenu_texte or "",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.destinataire_email],
+    )
+    if email.contenu_html:
+        message.attach_alternative(email.contenu_html, "text/html")
+    return message
+
+
+def reserver_lot(taille_lot):
+    """
+    Réserve jusqu'à `taille_lot` emails dus : leur prochaine tentative est
+    repoussée de EMAIL_FILE_BAIL secondes, ce qui les soustrait aux autres
+    répartiteurs et les remet en file si le processus s'arrête pendant l'envoi
+    """
+    from .models import HistoriqueEmail
+
+    maintenant = timezone.now()
+    bail = maintenant + timedelta(seconds=getattr(settings, 'EMAIL_FILE_BAIL', 300))
+
+    with transaction.atomic():
+        dus = HistoriqueEmail.objects.filter(
+            statut='EN_ATTENTE', prochaine_tentative__lte=maintenant
+        ).order_by('prochaine_tentative', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            dus = dus.select_for_update(skip_locked=True)
+        ids = list(dus.values_list('id', flat=True)[:taille_lot])
+        # La condition sur prochaine_tentative rend la réservation sûre même sans SKIP LOCKED
+        HistoriqueEmail.objects.filter(
+            id__in=ids, statut='EN_ATTENTE', prochaine_tentative__lte=maintenant
+        ).update(prochaine_tentative=bail)
+
+    return list(
+        HistoriqueEmail.objects.filter(id__in=ids, prochaine_tentative=bail)
+        .select_related('contenu')
+        .order_by('id')
+    )
+
+
+def noter_envoi(email):
+    from .models import HistoriqueEmail
+
+    HistoriqueEmail.objects.filter(pk=email.pk).update(
+        statut='ENVOYE',
+        date_envoi=timezone.now(),
+        tentatives=F('tentatives') + 1,
+        prochaine_tentative=None,
+        erreur_message=None,
+    )
+
+
+def noter_echec(email, erreur):
+    """Reprogramme l'email avec backoff, ou le passe en ECHEC après la dernière tentative"""
+    from .models import HistoriqueEmail
+
+    tentatives = email.tentatives + 1
+    champs = {'tentatives': tentatives, 'erreur_message': str(erreur)[:500]}
+    if tentatives >= getattr(settings, 'EMAIL_FILE_TENTATIVES_MAX', 6):
+        champs.update(statut='ECHEC', prochaine_tentative=None)
+        logger.error(f"Email #{email.pk} à {email.destinataire_email} abandonné après {tentatives} tentative(s): {erreur}")
+    else:
+        champs['prochaine_tentative'] = timezone.now() + delai_nouvelle_tentative(tentatives)
+        logger.warning(f"Email #{email.pk} à {email.destinataire_email} : tentative {tentatives} échouée ({erreur})")
+    HistoriqueEmail.objects.filter(pk=email.pk).update(**champs)
+    return champs.get('statut') == 'ECHEC'
+
+
+def envoyer_lot(emails):
+    """
+    Envoie un lot d'emails sur une seule connexion SMTP.
+    Retourne (envoyés, reprogrammés, abandonnés).
+    """
+    envoyes = reprogrammes = abandonnes = 0
+    connexion = get_connection(fail_silently=False)
+    try:
+        connexion.open()
+    except Exception as e:
+        # Serveur injoignable : tout le lot est reprogrammé
+        for email in emails:
+            if noter_echec(email, e):
+                abandonnes += 1
+            else:
+                reprogrammes += 1
+        return envoyes, reprogrammes, abandonnes
+
+    try:
+        for email in emails:
+            try:
+                connexion.send_messages([construire_message(email)])
+            except Exception as e:
+                if noter_echec(email, e):
+                    abandonnes += 1
+                else:
+                    reprogrammes += 1
+            else:
+                noter_envoi(email)
+                envoyes += 1
+    finally:
+        try:
+            connexion.close()
+        except Exception:
+            pass
+
+    return envoyes, reprogrammes, abandonnes
+
+
+_verrou_envoi = threading.Lock()
+
+
+def envoyer_emails_en_attente(taille_lot=None, maximum=None):
+    """
+    Envoie les emails dus, lot par lot, jusqu'à épuisement de la file
+    (ou `maximum` emails traités). Retourne les compteurs.
+    """
+    taille_lot = taille_lot or getattr(settings, 'EMAIL_FILE_TAILLE_LOT', 50)
+    resultat = {'envoyes': 0, 'reprogrammes': 0, 'echecs': 0}
+
+    # Un seul envoi à la fois par processus (thread d'arrière-plan et commande)
+    with _verrou_envoi:
+        while maximum is None or sum(resultat.values()) < maximum:
+            lot = reserver_lot(taille_lot if maximum is None else min(taille_lot, maximum - sum(resultat.values())))
+            if not lot:
+                break
+            envoyes, reprogrammes, abandonnes = envoyer_lot(lot)
+            resultat['envoyes'] += envoyes
+            resultat['reprogrammes'] += reprogrammes
+            resultat['echecs'] += abandonnes
+
+    if any(resultat.values()):
+        logger.info(f"File d'emails : {resultat}")
+    return resultat
+
+
+# ==========================================
+# THREAD D'ARRIÈRE-PLAN
+# ==========================================
+
+class RepartiteurEmails:
+    """
+    Thread qui vide la file après chaque commit, et toutes les
+    EMAIL_FILE_INTERVALLE secondes pour les nouvelles tentatives
+    """
+
+    def __init__(self):
+        self._reveil = threading.Event()
+        self._verrou = threading.Lock()
+        self._thread = None
+
+    def reveiller(self):
+        self._demarrer_thread()
+        self._reveil.set()
+
+    def _demarrer_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._verrou:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._boucle, name='envoi-emails', daemon=True)
+            self._thread.start()
+
+    def _boucle(self):
+        while True:
+            self._reveil.wait(timeout=getattr(settings, 'EMAIL_FILE_INTERVALLE', 30))
+            self._reveil.clear()
+            try:
+                close_old_connections()
+                envoyer_emails_en_attente()
+            except Exception as e:
+                logger.error(f"File d'emails : erreur du thread d'envoi: {e}")
+            finally:
+                close_old_connections()
+
+
+repartiteur = RepartiteurEmails()
@@ -0,0 +1,403 @@
+"""
+Diffusion en direct des changements de statut des soumissions
+
+Les tableaux de bord chef et AEF reçoivent les dépôts, validations, rejets,
+erreurs et suppressions de soumissions avec les compteurs à jour, au lieu
+d'interroger get_stats_ajax / aef_api_dashboard.
+
+- publication : signaux de FichierImport (création, changement de statut,
+  suppression, branchés dans apps.py), après le commit de la transaction ;
+  les mises à jour par queryset.update() appellent publier_fichiers()
+- compteurs : une agrégation (globale et par établissement) calculée une
+  fois à la publication, et non à chaque interrogation de chaque client
+- transport (EVENEMENTS_MODE) :
+    'redis' : pub/sub Redis, partagé entre les workers et les serveurs (par
+              défaut ; 'local' si le cache n'est pas django-redis)
+    'local' : diffuseur en mémoire, limité au processus (un seul worker)
+- historique : les EVENEMENTS_HISTORIQUE derniers événements sont numérotés
+  et conservés ; un client qui se reconnecte (Last-Event-ID) ou en attente
+  longue (?depuis=) reçoit ceux qu'il a manqués
+
+Points d'accès (views_evenements.py) : flux text/event-stream servi par
+l'application ASGI (collecte_platform/asgi.py), et attente longue JSON pour
+les déploiements WSGI.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CANAL_REDIS = 'evenements:soumissions'
+CLE_SEQUENCE_REDIS = 'evenements:soumissions:sequence'
+CLE_HISTORIQUE_REDIS = 'evenements:soumissions:historique'
+
+# Compteurs de lignes du fichier (total_lignes_importees)
+CHAMPS_LIGNES = [
+    'nb_credits_importes', 'nb_decouverts_importes', 'nb_affacturages_importes',
+    'nb_cautions_importes', 'nb_effets_importes', 'nb_spots_importes',
+]
+
+# Action publiée selon le nouveau statut du fichier
+ACTIONS_STATUT = {
+    'REUSSI': 'validation',
+    'REJETE': 'rejet',
+    'ERREUR': 'erreur',
+    'EN_COURS': 'statut',
+}
+
+
+def mode_evenements():
+    mode = getattr(settings, 'EVENEMENTS_MODE', 'redis')
+    # Pub/sub Redis impossible sans cache django-redis (cache local des tests, développement)
+    if mode == 'redis' and not settings.CACHES['default']['BACKEND'].startswith('django_redis'):
+        return 'local'
+    return mode
+
+
+def taille_historique():
+    return getattr(settings, 'EVENEMENTS_HISTORIQUE', 200)
+
+
+def rattrapage(historique, dernier_id, dernier_publie):
+    """
+    Événements postérieurs à `dernier_id`. Si une partie a été perdue
+    (historique dépassé, numérotation repartie de zéro), un événement
+    'resynchronisation' invite le client à recharger son tableau de bord.
+    """
+    if dernier_id is None:
+        return []
+    manques = [e for e in historique if e['id'] > dernier_id]
+    perdu = dernier_id > dernier_publie or (
+        dernier_id < dernier_publie and (not manques or manques[0]['id'] > dernier_id + 1)
+    )
+    if perdu:
+        return [{'id': dernier_publie, 'type': 'resynchronisation'}]
+    return manques
+
+
+# ==========================================
+# DIFFUSEUR EN MÉMOIRE
+# ==========================================
+
+class DiffuseurLocal:
+    """
+    Historique en mémoire. Les attentes longues (threads WSGI) sont réveillées
+    par une Condition, les flux SSE (boucle asyncio) par leur file.
+    """
+
+    def __init__(self):
+        self._historique = deque(maxlen=taille_historique())
+        self._condition = threading.Condition()
+        self._dernier_id = 0
+        self._abonnes = set()
+
+    def publier(self, evenement):
+        with self._condition:
+            self._dernier_id += 1
+            evenement = dict(evenement, id=self._dernier_id)
+            self._historique.append(evenement)
+            self._condition.notify_all()
+            abonnes = list(self._abonnes)
+        for boucle, file in abonnes:
+            try:
+                boucle.call_soon_threadsafe(file.put_nowait, evenement)
+            except RuntimeError:
+                # Boucle fermée : le flux se désabonne en se terminant
+                pass
+        return evenement
+
+    def dernier_id(self):
+        with self._condition:
+            return self._dernier_id
+
+    def depuis(self, dernier_id):
+        with self._condition:
+            return rattrapage(self._historique, dernier_id, self._dernier_id)
+
+    def attendre(self, dernier_id, delai):
+        """Bloque jusqu'à un événement postérieur à `dernier_id` ou l'expiration du délai"""
+        fin = time.monotonic() + delai
+        with self._condition:
+            while True:
+                nouveaux = rattrapage(self._historique, dernier_id, self._dernier_id)
+                reste = fin - time.monotonic()
+                if nouveaux or reste <= 0:
+                    return nouveaux
+                self._condition.wait(reste)
+
+    async def ecouter(self, dernier_id, battement):
+        """Générateur asynchrone : événements (None toutes les `battement` secondes sans événement)"""
+        file = asyncio.Queue()
+        abonne = (asyncio.get_running_loop(), file)
+        with self._condition:
+            self._abonnes.add(abonne)
+            manques = rattrapage(self._historique, dernier_id, self._dernier_id)
+            dernier = self._dernier_id
+        try:
+            for evenement in manques:
+                yield evenement
+            while True:
+                try:
+                    evenement = await asyncio.wait_for(file.get(), timeout=battement)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if evenement['id'] > dernier:
+                    dernier = evenement['id']
+                    yield evenement
+        finally:
+            with self._condition:
+                self._abonnes.discard(abonne)
+
+
+# ==========================================
+# DIFFUSEUR REDIS
+# ==========================================
+
+class DiffuseurRedis:
+    """
+    Numérotation (INCR) et historique (liste bornée) dans Redis, notification
+    par PUBLISH : tous les workers et serveurs voient les mêmes événements.
+    """
+
+    def _client(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def _lire_historique(self, client):
+        return [json.loads(e) for e in client.lrange(CLE_HISTORIQUE_REDIS, 0, -1)]
+
+    def publier(self, evenement):
+        client = self._client()
+        evenement = dict(evenement, id=client.incr(CLE_SEQUENCE_REDIS))
+        donnees = json.dumps(evenement, default=str)
+        pipe = client.pipeline()
+        pipe.rpush(CLE_HISTORIQUE_REDIS, donnees)
+        pipe.ltrim(CLE_HISTORIQUE_REDIS, -taille_historique(), -1)
+        pipe.publish(CANAL_REDIS, donnees)
+        pipe.execute()
+        return evenement
+
+    def dernier_id(self):
+        return int(self._client().get(CLE_SEQUENCE_REDIS) or 0)
+
+    def depuis(self, dernier_id):
+        client = self._client()
+        return rattrapage(self._lire_historique(client), dernier_id, int(client.get(CLE_SEQUENCE_REDIS) or 0))
+
+    def attendre(self, dernier_id, delai):
+        fin = time.monotonic() + delai
+        client = self._client()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            # Abonnement avant la lecture de l'historique : rien n'est perdu entre les deux
+            pubsub.subscribe(CANAL_REDIS)
+            while True:
+                nouveaux = self.depuis(dernier_id)
+                reste = fin - time.monotonic()
+                if nouveaux or reste <= 0:
+                    return nouveaux
+                pubsub.get_message(timeout=reste)
+        finally:
+            pubsub.close()
+
+    async def ecouter(self, dernier_id, battement):
+        import redis.asyncio as redis_async
+
+        client = redis_async.from_url(getattr(settings, 'EVENEMENTS_REDIS_URL', settings.REDIS_URL))
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(CANAL_REDIS)
+            historique = [json.loads(e) for e in await client.lrange(CLE_HISTORIQUE_REDIS, 0, -1)]
+            dernier = int(await client.get(CLE_SEQUENCE_REDIS) or 0)
+            for evenement in rattrapage(historique, dernier_id, dernier):
+                yield evenement
+            while True:
+                message = await pubsub.get_message(timeout=battement)
+                if message is None:
+                    yield None
+                    continue
+                evenement = json.loads(message['data'])
+                if evenement['id'] > dernier:
+                    dernier = evenement['id']
+                    yield evenement
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_diffuseurs = {}
+_verrou_diffuseurs = threading.Lock()
+
+
+def diffuseur():
+    mode = mode_evenements()
+    with _verrou_diffuseurs:
+        if mode not in _diffuseurs:
+            _diffuseurs[mode] = DiffuseurRedis() if mode == 'redis' else DiffuseurLocal()
+        return _diffuseurs[mode]
+
+
+# ==========================================
+# COMPTEURS
+# ==========================================
+
+# Compteurs mémorisés pour les événements d'un même commit (suppression
+# de plusieurs fichiers, validation par l'admin) : invalidés à chaque écriture
+_memo = threading.local()
+
+
+def _invalider_compteurs():
+    _memo.generation = getattr(_memo, 'generation', 0) + 1
+
+
+def compteurs(etablissement_id=None):
+    """Soumissions par statut, une seule requête (toutes, ou d'un établissement)"""
+    from .models import FichierImport
+    from .views_commun import compter_soumissions
+
+    cle = (getattr(_memo, 'generation', 0), etablissement_id)
+    valeurs = getattr(_memo, 'valeurs', {})
+    if cle in valeurs and time.monotonic() - valeurs[cle][0] < 1:
+        return valeurs[cle][1]
+
+    queryset = FichierImport.objects.all()
+    if etablissement_id is not None:
+        queryset = queryset.filter(etablissement_cnef_id=etablissement_id)
+    resultat = compter_soumissions(queryset)
+    _memo.valeurs = {c: v for c, v in valeurs.items() if c[0] == cle[0]}
+    _memo.valeurs[cle] = (time.monotonic(), resultat)
+    return resultat
+
+
+# ==========================================
+# PUBLICATION
+# ==========================================
+
+def instantane_fichier(fichier):
+    """Données du fichier diffusées, sans requête (champs différés ignorés)"""
+    from .views_commun import get_statut_class
+
+    champs = fichier.__dict__
+    statut = champs.get('statut')
+    instantane = {
+        'id': fichier.pk,
+        'nom_fichier': champs.get('nom_fichier'),
+        'statut': statut,
+        'statut_display': dict(fichier.STATUS_CHOICES).get(statut, statut),
+        'statut_class': get_statut_class(statut),
+        'etablissement_id': champs.get('etablissement_cnef_id'),
+        'date_import': champs['date_import'].isoformat() if champs.get('date_import') else None,
+    }
+    if all(c in champs for c in CHAMPS_LIGNES):
+        instantane['total_lignes'] = fichier.total_lignes_importees
+    return instantane
+
+
+def _diffuser(action, instantane):
+    try:
+        etablissement_id = instantane['etablissement_id']
+        diffuseur().publier({
+            'type': 'soumission',
+            'action': action,
+            'fichier': instantane,
+            'etablissement_id': etablissement_id,
+            'compteurs': compteurs(),
+            'compteurs_etablissement': compteurs(etablissement_id) if etablissement_id else None,
+            'date': timezone.now().isoformat(),
+        })
+    except Exception as e:
+        # La diffusion ne doit jamais faire échouer l'écriture : au pire, les
+        # tableaux de bord se resynchronisent à la prochaine reconnexion
+        logger.warning(f"Événements : diffusion impossible ({action} fichier {instantane['id']}) : {e}")
+
+
+def publier_fichier(fichier, action):
+    """Diffuse l'état actuel de `fichier` après le commit de la transaction en cours"""
+    _invalider_compteurs()
+    instantane = instantane_fichier(fichier)
+    transaction.on_commit(lambda: _diffuser(action, instantane))
+
+
+def publier_fichiers(fichier_ids):
+    """Pour les mises à jour par queryset.update() : relit les fichiers après le commit"""
+    from .models import FichierImport
+
+    _invalider_compteurs()
+    fichier_ids = list(fichier_ids)
+
+    def diffuser():
+        fichiers = FichierImport.objects.filter(pk__in=fichier_ids).only(
+            'nom_fichier', 'statut', 'etablissement_cnef_id', 'date_import', *CHAMPS_LIGNES
+        )
+        for fichier in fichiers:
+            _diffuser(ACTIONS_STATUT.get(fichier.statut, 'statut'), instantane_fichier(fichier))
+
+    transaction.on_commit(diffuser)
+
+
+# ==========================================
+# RÉCEPTEURS DES SIGNAUX (apps.py)
+# ==========================================
+
+def memoriser_statut(sender, instance, **kwargs):
+    """post_init : statut au chargement, pour ne publier que les changements"""
+    instance._statut_diffuse = instance.__dict__.get('statut')
+
+
+def fichier_enregistre(sender, instance, created, update_fields=None, **kwargs):
+    """post_save de FichierImport"""
+    if update_fields is not None and 'statut' not in update_fields:
+        return
+    statut = instance.__dict__.get('statut')
+    if created:
+        publier_fichier(instance, 'depot')
+    elif statut != getattr(instance, '_statut_diffuse', None):
+        publier_fichier(instance, ACTIONS_STATUT.get(statut, 'statut'))
+    instance._statut_diffuse = statut
+
+
+def fichier_supprime(sender, instance, **kwargs):
+    """post_delete de FichierImport"""
+    publier_fichier(instance, 'suppression')
+
+
+# ==========================================
+# ABONNÉS
+# ==========================================
+
+def portee_utilisateur(user):
+    """
+    None pour le CNEF (tous les établissements), l'identifiant de
+    l'établissement pour un AEF / UEF, False si l'utilisateur n'a droit à rien
+    """
+    from .views_commun import is_cnef_user, is_etablissement_user
+
+    if is_cnef_user(user) or user.is_staff or user.is_superuser:
+        return None
+    if is_etablissement_user(user) and user.etablissement_id:
+        return user.etablissement_id
+    return False
+
+
+def pour_abonne(evenement, portee):
+    """Événement tel que reçu par un abonné de cette portée (None s'il ne le concerne pas)"""
+    if evenement.get('type') != 'soumission':
+        return evenement
+    if portee is None:
+        donnees = dict(evenement)
+    elif evenement['etablissement_id'] == portee:
+        donnees = dict(evenement, compteurs=evenement['compteurs_etablissement'])
+    else:
+        return None
+    donnees.pop('compteurs_etablissement', None)
+    return donnees
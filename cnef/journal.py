@@ -0,0 +1,245 @@
+"""
+Module d'écriture différée du journal des actions (ActionUtilisateur)
+
+Au lieu d'un INSERT par action sur le chemin de la requête, les actions sont
+mises en tampon puis écrites par lots (bulk_create) :
+- dès que le lot atteint JOURNAL_TAILLE_LOT actions
+- au plus tard JOURNAL_DELAI_MAX secondes après la première action en attente
+- en fin de requête si JOURNAL_VIDAGE_FIN_REQUETE est activé
+- à l'arrêt du processus (atexit)
+
+Modes (JOURNAL_MODE) :
+- 'synchrone' : écriture immédiate, comme avant (tests)
+- 'tampon'    : file en mémoire, propre à chaque processus (par défaut)
+- 'redis'     : file partagée dans une liste Redis, vidée par n'importe quel worker
+"""
+
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+CLE_LISTE_REDIS = 'journal:actions_en_attente'
+
+# Champs sérialisés pour le mode Redis
+CHAMPS_ACTION = [
+    'utilisateur_id', 'type_action', 'description', 'etablissement_id',
+    'adresse_ip', 'user_agent', 'donnees_supplementaires',
+]
+
+
+def mode_journal():
+    return getattr(settings, 'JOURNAL_MODE', 'tampon')
+
+
+# ==========================================
+# TAMPON D'ÉCRITURE
+# ==========================================
+
+class TamponJournal:
+    """File d'actions en attente, vidée par un thread d'arrière-plan"""
+
+    def __init__(self):
+        self._file = deque()
+        self._verrou = threading.Lock()
+        self._verrou_vidage = threading.Lock()
+        self._reveil = threading.Event()
+        self._thread = None
+        self._premiere_attente = None
+
+    # ------------------------------------------
+    # Ajout
+    # ------------------------------------------
+
+    def ajouter(self, action):
+        """Ajoute une action (instance non enregistrée) à la file"""
+        self._demarrer_thread()
+
+        if mode_journal() == 'redis':
+            nb_en_attente = self._pousser_redis(action)
+        else:
+            with self._verrou:
+                self._file.append(action)
+                nb_en_attente = len(self._file)
+
+        if self._premiere_attente is None:
+            self._premiere_attente = time.monotonic()
+
+        # Seuil de taille atteint : on réveille le thread sans bloquer la requête
+        if nb_en_attente >= getattr(settings, 'JOURNAL_TAILLE_LOT', 100):
+            self._reveil.set()
+
+    def _pousser_redis(self, action):
+        """Pousse l'action dans la liste Redis. Retourne le nombre d'actions en attente."""
+        from django_redis import get_redis_connection
+
+        donnees = {champ: getattr(action, champ) for champ in CHAMPS_ACTION}
+        donnees['date_action'] = action.date_action.isoformat()
+        try:
+            # RPUSH retourne la longueur de la liste après l'ajout
+            return get_redis_connection('default').rpush(CLE_LISTE_REDIS, json.dumps(donnees, default=str))
+        except Exception as e:
+            # Redis indisponible : on garde l'action dans la file locale
+            logger.warning(f"Journal : Redis indisponible, action conservée en mémoire ({e})")
+            with self._verrou:
+                self._file.append(action)
+                return len(self._file)
+
+    def _nb_en_attente(self):
+        """Actions en attente : file locale, plus la liste Redis en mode 'redis'"""
+        nb = len(self._file)
+        if mode_journal() == 'redis':
+            from django_redis import get_redis_connection
+            try:
+                nb += get_redis_connection('default').llen(CLE_LISTE_REDIS)
+            except Exception as e:
+                logger.warning(f"Journal : lecture Redis impossible ({e})")
+        return nb
+
+    # ------------------------------------------
+    # Vidage
+    # ------------------------------------------
+
+    def vider(self):
+        """Écrit toutes les actions en attente par lots. Retourne le nombre écrit."""
+        from .models import ActionUtilisateur
+        from .recherche_journal import indexer_actions
+
+        taille_lot = getattr(settings, 'JOURNAL_TAILLE_LOT', 100)
+        total = 0
+
+        with self._verrou_vidage:
+            self._premiere_attente = None
+            while True:
+                lot = self._extraire_lot(taille_lot)
+                if not lot:
+                    break
+                try:
+                    ActionUtilisateur.objects.bulk_create(lot, batch_size=taille_lot)
+                    total += len(lot)
+                except Exception as e:
+                    logger.error(f"Journal : échec de l'écriture de {len(lot)} action(s): {e}")
+                    # Remettre le lot en tête de file pour la prochaine tentative
+                    with self._verrou:
+                        self._file.extendleft(reversed(lot))
+                    break
+
+                # bulk_create n'émet pas post_save : indexation explicite pour la recherche
+                try:
+                    indexer_actions(lot)
+                except Exception as e:
+                    logger.warning(f"Journal : indexation de {len(lot)} action(s) impossible: {e}")
+
+        return total
+
+    def _extraire_lot(self, taille_lot):
+        with self._verrou:
+            lot = [self._file.popleft() for _ in range(min(taille_lot, len(self._file)))]
+
+        if len(lot) < taille_lot and mode_journal() == 'redis':
+            lot.extend(self._extraire_lot_redis(taille_lot - len(lot)))
+        return lot
+
+    def _extraire_lot_redis(self, taille):
+        from django.utils.dateparse import parse_datetime
+        from django_redis import get_redis_connection
+        from .models import ActionUtilisateur
+
+        try:
+            redis = get_redis_connection('default')
+            pipe = redis.pipeline(transaction=True)
+            pipe.lrange(CLE_LISTE_REDIS, 0, taille - 1)
+            pipe.ltrim(CLE_LISTE_REDIS, taille, -1)
+            elements, _ = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Journal : lecture Redis impossible ({e})")
+            return []
+
+        lot = []
+        for element in elements:
+            donnees = json.loads(element)
+            donnees['date_action'] = parse_datetime(donnees['date_action'])
+            lot.append(ActionUtilisateur(**donnees))
+        return lot
+
+    # ------------------------------------------
+    # Thread d'arrière-plan
+    # ------------------------------------------
+
+    def _demarrer_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._verrou:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._boucle, name='journal-actions', daemon=True)
+            self._thread.start()
+
+    def _boucle(self):
+        while True:
+            delai_max = getattr(settings, 'JOURNAL_DELAI_MAX', 2)
+            self._reveil.wait(timeout=delai_max)
+            self._reveil.clear()
+
+            premiere = self._premiere_attente
+            delai_atteint = premiere is not None and time.monotonic() - premiere >= delai_max
+            if not delai_atteint and self._nb_en_attente() < getattr(settings, 'JOURNAL_TAILLE_LOT', 100):
+                continue
+
+            try:
+                close_old_connections()
+                self.vider()
+            except Exception as e:
+                logger.error(f"Journal : erreur du thread d'écriture: {e}")
+            finally:
+                close_old_connections()
+
+
+tampon_journal = TamponJournal()
+
+
+# ==========================================
+# API DU MODULE
+# ==========================================
+
+def enregistrer(action):
+    """
+    Enregistre une action (instance ActionUtilisateur non sauvegardée)
+    selon le mode configuré
+    """
+    if mode_journal() == 'synchrone':
+        action.save()
+    else:
+        tampon_journal.ajouter(action)
+    return action
+
+
+def vider_journal():
+    """Force l'écriture immédiate de toutes les actions en attente"""
+    return tampon_journal.vider()
+
+
+def vider_fin_requete(sender, **kwargs):
+    """Récepteur du signal request_finished"""
+    if getattr(settings, 'JOURNAL_VIDAGE_FIN_REQUETE', False) and mode_journal() != 'synchrone':
+        vider_journal()
+
+
+@atexit.register
+def _vider_a_l_arret():
+    # Garantit qu'aucune action en attente n'est perdue à l'arrêt du worker
+    if mode_journal() == 'synchrone':
+        return
+    try:
+        nb = vider_journal()
+        if nb:
+            logger.info(f"Journal : {nb} action(s) écrite(s) à l'arrêt du processus")
+    except Exception as e:
+        logger.error(f"Journal : actions perdues à l'arrêt du processus: {e}")
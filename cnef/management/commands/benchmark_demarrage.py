@@ -0,0 +1,107 @@
+"""
+Mesure du temps d'import au démarrage (python -X importtime)
+
+Lance un interpréteur neuf qui exécute django.setup() puis importe la
+configuration d'URL (cnef.urls, donc toutes les vues), et relève le temps
+cumulé de chaque module. Sert à vérifier qu'aucune bibliothèque lourde
+(pandas, openpyxl, numpy, numpy_financial) n'est chargée au démarrage d'un
+worker : elles doivent rester importées à la demande.
+
+Usage :
+    python manage.py benchmark_demarrage
+    python manage.py benchmark_demarrage --repetitions 5 --top 30 --sortie demarrage.json
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from .benchmark_import import version_code
+
+SCRIPT = "import django; django.setup(); import cnef.urls"
+
+# Bibliothèques qui ne doivent pas apparaître dans les imports de démarrage
+MODULES_LOURDS = ['pandas', 'openpyxl', 'numpy', 'numpy_financial', 'rest_framework.serializers']
+
+
+def mesurer_imports():
+    """
+    Exécute SCRIPT avec -X importtime dans un sous-processus et retourne
+    {module: (propre_us, cumule_us)} dans l'ordre de la sortie
+    """
+    # DJANGO_SETTINGS_MODULE est hérité de l'environnement (fixé par manage.py)
+    processus = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+        cwd=settings.BASE_DIR, env=dict(os.environ), capture_output=True, text=True,
+    )
+    if processus.returncode != 0:
+        raise CommandError(f"Échec du démarrage :\n{processus.stderr[-2000:]}")
+
+    modules = {}
+    for ligne in processus.stderr.splitlines():
+        if not ligne.startswith('import time:') or 'self [us]' in ligne:
+            continue
+        propre, cumule, nom = ligne[len('import time:'):].split('|')
+        modules[nom.strip()] = (int(propre), int(cumule))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps d'import au démarrage (django.setup() + cnef.urls)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repetitions', type=int, default=3,
+                            help="Nombre de démarrages mesurés (la médiane est retenue)")
+        parser.add_argument('--top', type=int, default=20, help="Nombre de modules les plus coûteux affichés")
+        parser.add_argument('--sortie', help="Fichier JSON où écrire les résultats")
+
+    def handle(self, *args, **options):
+        mesures = [mesurer_imports() for _ in range(max(1, options['repetitions']))]
+        noms = list(mesures[-1])
+
+        def median(nom, index):
+            return statistics.median(m[nom][index] for m in mesures if nom in m)
+
+        total_us = median('cnef.urls', 1) if 'cnef.urls' in mesures[-1] else 0
+        top = sorted(noms, key=lambda nom: median(nom, 0), reverse=True)[:options['top']]
+        lourds = [nom for nom in MODULES_LOURDS if nom in mesures[-1]]
+
+        self.stdout.write(f"cnef.urls (cumulé) : {total_us / 1000:.1f} ms, {len(noms)} modules importés")
+        self.stdout.write(f"{'Module':<50} {'Propre (ms)':>12} {'Cumulé (ms)':>12}")
+        for nom in top:
+            self.stdout.write(f"{nom:<50} {median(nom, 0) / 1000:>12.1f} {median(nom, 1) / 1000:>12.1f}")
+
+        if lourds:
+            self.stdout.write(self.style.WARNING(
+                f"Bibliothèques lourdes chargées au démarrage : {', '.join(lourds)}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Aucune bibliothèque lourde chargée au démarrage"))
+
+        if options['sortie']:
+            rapport = {
+                'commit': version_code(),
+                'date': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'repetitions': len(mesures),
+                'cnef_urls_ms': round(total_us / 1000, 1),
+                'nb_modules': len(noms),
+                'modules_lourds': lourds,
+                'top': [
+                    {'module': nom, 'propre_ms': round(median(nom, 0) / 1000, 1),
+                     'cumule_ms': round(median(nom, 1) / 1000, 1)}
+                    for nom in top
+                ],
+            }
+            with open(options['sortie'], 'w', encoding='utf-8') as f:
+                json.dump(rapport, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['sortie']}"))
@@ -0,0 +1,210 @@
+"""
+Benchmark de bout en bout de la chaîne de soumission sur des classeurs synthétiques :
+prévisualisation, import, recalcul des TEG, communiqué, export Excel et
+rapport TEG AEF. Chaque fonction est mesurée en durée, en nombre de requêtes
+SQL et en pic mémoire (tracemalloc, lors d'une seconde exécution pour ne pas
+fausser la durée).
+
+Usage :
+    python manage.py benchmark_import --lignes 1000,10000 --sortie resultats.json
+    python manage.py benchmark_import --lignes 10000 --formats xlsx,zip
+
+--formats compare le classeur Excel et la même soumission en CSV zippé
+(mêmes lignes, même graine).
+
+La commande travaille sur une base de test temporaire (créée puis détruite),
+avec un cache mémoire local et un MEDIA_ROOT temporaire : aucun service
+externe n'est nécessaire, SQLite suffit.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from cnef.donnees_synthetiques import generer_classeur, generer_csv
+from cnef.models import (
+    Affacturage, Cautions, Credit_Amortissables, Decouverts, Effets_commerces,
+    Etablissement, FichierImport, Spot, User,
+)
+from cnef.teg_cache import vider_cache_teg
+
+MODELES_PRETS = [Credit_Amortissables, Decouverts, Affacturage, Cautions, Effets_commerces, Spot]
+
+GENERATEURS = {'xlsx': generer_classeur, 'zip': generer_csv}
+
+
+def version_code():
+    """Commit courant, pour comparer les résultats d'une version à l'autre"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def purger_prets():
+    for modele in MODELES_PRETS:
+        modele.objects.all().delete()
+
+
+def mesurer(fonction, preparation=None):
+    """
+    Exécute `fonction` deux fois : une mesure de durée et de requêtes SQL,
+    puis une mesure du pic mémoire (tracemalloc ralentit fortement l'exécution)
+    """
+    if preparation:
+        preparation()
+    vider_cache_teg()
+    with CaptureQueriesContext(connection) as requetes:
+        debut = time.perf_counter()
+        fonction()
+        duree = time.perf_counter() - debut
+
+    if preparation:
+        preparation()
+    vider_cache_teg()
+    tracemalloc.start()
+    try:
+        fonction()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'duree_ms': round(duree * 1000, 1),
+        'requetes_sql': len(requetes),
+        'pic_memoire_mo': round(pic / 1024 / 1024, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = "Mesure durée, requêtes SQL et mémoire de la chaîne de soumission sur des classeurs synthétiques"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', default='1000,5000',
+                            help="Tailles de classeur (total de lignes), séparées par des virgules")
+        parser.add_argument('--formats', default='xlsx',
+                            help="Formats de soumission mesurés : xlsx, zip (CSV zippé), séparés par des virgules")
+        parser.add_argument('--graine', type=int, default=42, help="Graine aléatoire")
+        parser.add_argument('--annee', type=int, default=2024)
+        parser.add_argument('--trimestre', default='T4', choices=['T1', 'T2', 'T3', 'T4'])
+        parser.add_argument('--sortie', help="Fichier JSON où écrire les résultats")
+
+    def handle(self, *args, **options):
+        try:
+            tailles = [int(t) for t in options['lignes'].split(',') if t.strip()]
+        except ValueError:
+            raise CommandError("--lignes attend des entiers séparés par des virgules")
+        formats = [f.strip() for f in options['formats'].split(',') if f.strip()]
+        if not formats or any(f not in GENERATEURS for f in formats):
+            raise CommandError(f"--formats attend des valeurs parmi : {', '.join(GENERATEURS)}")
+
+        dossier_media = tempfile.mkdtemp(prefix='benchmark_import_')
+        configuration = {
+            'MEDIA_ROOT': dossier_media,
+            'JOURNAL_MODE': 'synchrone',
+            'TEG_CACHE_REDIS': False,
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        }
+
+        setup_test_environment()
+        ancien_nom = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        resultats = []
+        try:
+            with override_settings(**configuration):
+                etablissement = Etablissement.objects.create(
+                    Nom_etablissement='BOA CONGO', code_etablissement='30012', type_etablissement='BANQUE'
+                )
+                user = User.objects.create_user(
+                    email='benchmark@cnef.cg', nom='Bench', prenom='Mark',
+                    password='benchmark-import', role='AEF', etablissement=etablissement
+                )
+                for taille in tailles:
+                    for format_fichier in formats:
+                        resultats.extend(self.mesurer_taille(
+                            taille, format_fichier, etablissement, user, dossier_media, options
+                        ))
+        finally:
+            connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{'Fonction':<32} {'Format':>6} {'Lignes':>7} {'Durée (ms)':>11} {'SQL':>6} {'Mémoire (Mo)':>13}"
+        )
+        for r in resultats:
+            self.stdout.write(
+                f"{r['fonction']:<32} {r['format']:>6} {r['lignes']:>7} {r['duree_ms']:>11} "
+                f"{r['requetes_sql']:>6} {r['pic_memoire_mo']:>13}"
+            )
+
+        if options['sortie']:
+            rapport = {
+                'commit': version_code(),
+                'date': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base': connection.vendor,
+                'graine': options['graine'],
+                'resultats': resultats,
+            }
+            with open(options['sortie'], 'w', encoding='utf-8') as f:
+                json.dump(rapport, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['sortie']}"))
+
+    def mesurer_taille(self, taille, format_fichier, etablissement, user, dossier_media, options):
+        from cnef.utils import extraire_et_calculer_teg, previsualiser_fichier_excel, traiter_fichier_excel
+        from cnef.views import calculer_donnees_communique, exporter_excel, telecharger_rapport_teg_aef
+
+        nom = f'imports/benchmark/synthetique_{taille}.{format_fichier}'
+        chemin = os.path.join(dossier_media, nom)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+
+        debut = time.perf_counter()
+        GENERATEURS[format_fichier](
+            chemin, taille, graine=options['graine'],
+            annee=options['annee'], trimestre=options['trimestre'],
+        )
+        self.stdout.write(
+            f"Soumission {format_fichier} de {taille} lignes générée en {time.perf_counter() - debut:.1f} s "
+            f"({os.path.getsize(chemin) / 1024:.0f} Ko)"
+        )
+
+        purger_prets()
+        fichier = FichierImport.objects.create(
+            etablissement_cnef=etablissement, uploader_par=user,
+            fichier=nom, nom_fichier=os.path.basename(nom),
+        )
+
+        requete = RequestFactory().get(f'/aef/soumission/{fichier.id}/telecharger-rapport-teg/')
+        requete.user = user
+
+        mesures = [
+            ('previsualiser_fichier_excel', lambda: previsualiser_fichier_excel(fichier), None),
+            ('traiter_fichier_excel', lambda: traiter_fichier_excel(fichier), purger_prets),
+            ('extraire_et_calculer_teg', lambda: extraire_et_calculer_teg(fichier.fichier.path, etablissement), None),
+            ('calculer_donnees_communique',
+             lambda: calculer_donnees_communique(options['trimestre'], options['annee'], 'Banques'), None),
+            ('exporter_excel', lambda: exporter_excel(Credit_Amortissables.objects.all(), 'credits'), None),
+            ('telecharger_rapport_teg_aef', lambda: telecharger_rapport_teg_aef(requete, fichier.id), None),
+        ]
+
+        resultats = []
+        for nom_fonction, fonction, preparation in mesures:
+            mesure = mesurer(fonction, preparation)
+            resultats.append({'fonction': nom_fonction, 'format': format_fichier, 'lignes': taille, **mesure})
+            self.stdout.write(f"  {nom_fonction:<30} {mesure['duree_ms']:>10} ms")
+        return resultats
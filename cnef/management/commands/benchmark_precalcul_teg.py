@@ -0,0 +1,90 @@
+"""
+Compare la taille et la latence du cache de pré-calcul TEG :
+instances Django picklées (ancien format) contre colonnes NumPy compactes
+
+Usage :
+    python manage.py benchmark_precalcul_teg imports/2025/12/10/Base_essaie_-_Copie.xlsx
+"""
+
+import json
+import pickle
+import time
+
+import openpyxl
+from django.core.management.base import BaseCommand
+
+from cnef.models import Etablissement, FichierImport
+from cnef.utils import (
+    compacter_precalcul_teg,
+    decompacter_precalcul_teg,
+    extraire_instances_precalcul,
+)
+
+
+def mesurer(fonction, repetitions):
+    """Retourne la durée moyenne (ms) d'un appel et son dernier résultat"""
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        resultat = fonction()
+    return (time.perf_counter() - debut) / repetitions * 1000, resultat
+
+
+class Command(BaseCommand):
+    help = "Mesure la taille et la latence du cache de pré-calcul TEG (pickle vs colonnes NumPy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Chemin d'un classeur de soumission (.xlsx)")
+        parser.add_argument('--repetitions', type=int, default=20)
+        parser.add_argument('--sortie', help="Fichier JSON où écrire les résultats")
+
+    def handle(self, *args, **options):
+        # Objets non enregistrés : aucune base de données n'est nécessaire
+        etablissement = Etablissement(
+            id=1, Nom_etablissement="Établissement de test",
+            code_etablissement="BENCH", type_etablissement='BANQUE'
+        )
+        fichier_import = FichierImport(id=1, etablissement_cnef=etablissement, nom_fichier=options['fichier'])
+
+        workbook = openpyxl.load_workbook(options['fichier'], data_only=True)
+        instances = extraire_instances_precalcul(workbook, etablissement, fichier_import)
+        nb_lignes = sum(len(v) for v in instances.values())
+        repetitions = options['repetitions']
+
+        # Ancien format : listes d'instances picklées (comme le fait le cache Redis)
+        t_pickle_ecriture, donnees_pickle = mesurer(
+            lambda: pickle.dumps(instances, pickle.HIGHEST_PROTOCOL), repetitions)
+        t_pickle_lecture, _ = mesurer(lambda: pickle.loads(donnees_pickle), repetitions)
+
+        # Nouveau format : colonnes NumPy
+        t_npz_ecriture, donnees_npz = mesurer(lambda: compacter_precalcul_teg(instances), repetitions)
+        t_npz_lecture, _ = mesurer(lambda: decompacter_precalcul_teg(donnees_npz), repetitions)
+
+        resultats = {
+            'fichier': options['fichier'],
+            'lignes': nb_lignes,
+            'pickle': {
+                'octets': len(donnees_pickle),
+                'ecriture_ms': round(t_pickle_ecriture, 3),
+                'lecture_ms': round(t_pickle_lecture, 3),
+            },
+            'colonnes_numpy': {
+                'octets': len(donnees_npz),
+                'ecriture_ms': round(t_npz_ecriture, 3),
+                'lecture_ms': round(t_npz_lecture, 3),
+            },
+        }
+        resultats['reduction_taille'] = round(len(donnees_pickle) / len(donnees_npz), 1)
+
+        self.stdout.write(f"Lignes extraites : {nb_lignes}")
+        for nom in ('pickle', 'colonnes_numpy'):
+            r = resultats[nom]
+            self.stdout.write(
+                f"{nom:<15} {r['octets']:>10} octets | écriture {r['ecriture_ms']:>8} ms | "
+                f"lecture {r['lecture_ms']:>8} ms"
+            )
+        self.stdout.write(f"Réduction de taille : x{resultats['reduction_taille']}")
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as f:
+                json.dump(resultats, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['sortie']}"))
@@ -0,0 +1,109 @@
+"""
+Mesure la latence et le nombre d'écritures en base de django_session
+sur les appels AJAX des tableaux de bord, avant et après la configuration
+cached_db + prolongation limitée de la session
+
+Usage :
+    python manage.py benchmark_sessions --requetes 200
+
+La commande travaille sur une base de test temporaire (créée puis détruite).
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from cnef.models import User
+
+
+CONFIGURATIONS = [
+    {
+        'nom': "db + sauvegarde à chaque requête (avant)",
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_SAVE_EVERY_REQUEST': True,
+    },
+    {
+        'nom': "cached_db + prolongation limitée (après)",
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'SESSION_SAVE_EVERY_REQUEST': False,
+    },
+]
+
+
+def cache_disponible():
+    """Vérifie que le cache des sessions répond (Redis démarré)"""
+    from django.core.cache import caches
+    try:
+        caches[settings.SESSION_CACHE_ALIAS].set('benchmark_sessions_ping', 1, 5)
+        return True
+    except Exception:
+        return False
+
+
+class Command(BaseCommand):
+    help = "Compare les écritures django_session et la latence des appels AJAX selon la configuration des sessions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=200, help="Nombre d'appels AJAX simulés")
+        parser.add_argument('--sortie', help="Fichier JSON où écrire les résultats")
+
+    def handle(self, *args, **options):
+        caches_override = {}
+        if not cache_disponible():
+            self.stdout.write(self.style.WARNING("Cache Redis indisponible : utilisation d'un cache mémoire local"))
+            caches_override = {'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}}
+
+        setup_test_environment()
+        ancien_nom = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        resultats = []
+        try:
+            with override_settings(**caches_override):
+                user = User.objects.create_user(
+                    email='benchmark@cnef.cg', nom='Bench', prenom='Mark',
+                    password='benchmark-sessions', role='UCNEF'
+                )
+                for config in CONFIGURATIONS:
+                    resultats.append(self.mesurer(config, user, options['requetes']))
+        finally:
+            connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+            teardown_test_environment()
+
+        for r in resultats:
+            self.stdout.write(
+                f"{r['configuration']:<45} écritures django_session: {r['ecritures_session']:>5} | "
+                f"requêtes SQL session: {r['requetes_session']:>5} | latence moyenne: {r['latence_ms']} ms"
+            )
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as f:
+                json.dump(resultats, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['sortie']}"))
+
+    def mesurer(self, config, user, nb_requetes):
+        reglages = {k: v for k, v in config.items() if k != 'nom'}
+        with override_settings(**reglages):
+            client = Client()
+            client.force_login(user)
+            url = reverse('get_stats')
+
+            with CaptureQueriesContext(connection) as requetes:
+                debut = time.perf_counter()
+                for _ in range(nb_requetes):
+                    client.get(url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                duree = time.perf_counter() - debut
+
+        sql_session = [q['sql'] for q in requetes.captured_queries if 'django_session' in q['sql']]
+        ecritures = [sql for sql in sql_session if not sql.lstrip().upper().startswith('SELECT')]
+        return {
+            'configuration': config['nom'],
+            'requetes_http': nb_requetes,
+            'ecritures_session': len(ecritures),
+            'requetes_session': len(sql_session),
+            'latence_ms': round(duree / nb_requetes * 1000, 3),
+        }
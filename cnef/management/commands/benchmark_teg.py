@@ -0,0 +1,105 @@
+"""
+Benchmark de la mémoïsation des calculs de TEG
+
+Usage :
+    python manage.py benchmark_teg --lignes 20000 --proportion-unique 0.15
+"""
+
+import json
+import random
+import time
+
+import numpy_financial as npf
+from django.core.management.base import BaseCommand
+
+from cnef.teg_cache import statistiques_cache_teg, vider_cache_teg
+from cnef.utils import calculer_teg_credit, calculer_teg_decouvert
+
+
+# Catalogue de produits standards d'un EMF (montant FCFA, durée en mois, taux mensuel)
+MONTANTS_STANDARDS = [100000, 250000, 500000, 1000000, 2000000, 5000000]
+DUREES_STANDARDS = [6, 12, 18, 24, 36]
+TAUX_STANDARDS = [0.0125, 0.015, 0.02]
+FREQUENCES = ['1', 'mensuel', '2']
+
+
+def generer_credits(nb_lignes, proportion_unique, graine):
+    """
+    Génère des paramètres de crédits ayant la forme des fichiers réels :
+    la majorité provient du catalogue, le reste est négocié au cas par cas
+    """
+    rng = random.Random(graine)
+    credits = []
+    for _ in range(nb_lignes):
+        if rng.random() < proportion_unique:
+            montant = rng.randint(50, 10000) * 1000
+            duree = rng.randint(3, 84)
+            taux = rng.uniform(0.008, 0.025)
+        else:
+            montant = rng.choice(MONTANTS_STANDARDS)
+            duree = rng.choice(DUREES_STANDARDS)
+            taux = rng.choice(TAUX_STANDARDS)
+
+        echeance = round(float(-npf.pmt(taux, duree, montant)), 0)
+        frais_dossier = round(montant * 0.01, 0)
+        credits.append((
+            float(montant), duree, echeance,
+            frais_dossier, 0.0, 0.0,
+            rng.choice(FREQUENCES),
+        ))
+    return credits
+
+
+class Command(BaseCommand):
+    help = "Mesure le gain de la mémoïsation des calculs de TEG sur des données de forme réaliste"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=20000, help="Nombre de crédits générés")
+        parser.add_argument('--proportion-unique', type=float, default=0.15,
+                            help="Part des crédits hors catalogue (0 à 1)")
+        parser.add_argument('--graine', type=int, default=42, help="Graine aléatoire")
+        parser.add_argument('--sortie', help="Fichier JSON où écrire les résultats")
+
+    def handle(self, *args, **options):
+        credits = generer_credits(options['lignes'], options['proportion_unique'], options['graine'])
+        decouverts = [(c[0], 0.15, c[3], 0.0, 0.0) for c in credits]
+
+        # 1. Sans cache : appel direct des fonctions d'origine
+        debut = time.perf_counter()
+        for params in credits:
+            calculer_teg_credit.__wrapped__(*params)
+        for params in decouverts:
+            calculer_teg_decouvert.__wrapped__(*params)
+        duree_sans_cache = time.perf_counter() - debut
+
+        # 2. Avec cache (démarrage à froid)
+        vider_cache_teg()
+        debut = time.perf_counter()
+        for params in credits:
+            calculer_teg_credit(*params)
+        for params in decouverts:
+            calculer_teg_decouvert(*params)
+        duree_avec_cache = time.perf_counter() - debut
+        stats = statistiques_cache_teg()
+
+        resultats = {
+            'lignes': options['lignes'],
+            'proportion_unique': options['proportion_unique'],
+            'sans_cache_s': round(duree_sans_cache, 4),
+            'avec_cache_s': round(duree_avec_cache, 4),
+            'acceleration': round(duree_sans_cache / duree_avec_cache, 2) if duree_avec_cache else None,
+            'cache': stats,
+        }
+
+        self.stdout.write(f"Crédits générés     : {options['lignes']}")
+        self.stdout.write(f"Sans cache          : {resultats['sans_cache_s']} s")
+        self.stdout.write(f"Avec cache (froid)  : {resultats['avec_cache_s']} s")
+        self.stdout.write(f"Accélération        : x{resultats['acceleration']}")
+        self.stdout.write(f"Taux de succès      : {stats['taux_succes']} % "
+                          f"({stats['succes_memoire']} mémoire, {stats['succes_redis']} Redis, "
+                          f"{stats['echecs']} calculs)")
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as f:
+                json.dump(resultats, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['sortie']}"))
@@ -0,0 +1,72 @@
+"""
+Charge en base des prêts synthétiques pour tester les vues d'analyse à
+l'échelle de la production : N établissements × M trimestres × K prêts par produit
+
+Usage :
+    python manage.py charger_donnees_synthetiques --etablissements 50 --trimestres 8 --prets 2000
+    python manage.py charger_donnees_synthetiques --etablissements 10 --trimestres 4 --prets 500 --produits credit,spot
+
+Les données se suppriment avec : python manage.py supprimer_donnees_synthetiques
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cnef.chargement_synthetique import (
+    PRODUITS, charger_donnees_synthetiques, etablissements_synthetiques,
+)
+
+
+class Command(BaseCommand):
+    help = "Génère et insère par lots des établissements, soumissions et prêts synthétiques (déterministe)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--etablissements', type=int, default=10, help="Nombre d'établissements (N)")
+        parser.add_argument('--trimestres', type=int, default=4, help="Nombre de trimestres (M)")
+        parser.add_argument('--prets', type=int, default=1000,
+                            help="Prêts par produit, établissement et trimestre (K)")
+        parser.add_argument('--annee', type=int, default=2024, help="Année du dernier trimestre")
+        parser.add_argument('--trimestre', default='T4', choices=['T1', 'T2', 'T3', 'T4'],
+                            help="Dernier trimestre chargé")
+        parser.add_argument('--produits', default=','.join(PRODUITS),
+                            help=f"Produits, séparés par des virgules ({', '.join(PRODUITS)})")
+        parser.add_argument('--graine', type=int, default=42, help="Graine aléatoire")
+        parser.add_argument('--taille-lot', type=int, default=5000, help="Lignes par INSERT")
+
+    def handle(self, *args, **options):
+        produits = [p.strip() for p in options['produits'].split(',') if p.strip()]
+        inconnus = set(produits) - set(PRODUITS)
+        if inconnus:
+            raise CommandError(f"Produit(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+
+        # Relancer le chargement dupliquerait les prêts : on part d'une base propre
+        if etablissements_synthetiques().exists():
+            raise CommandError(
+                "Des données synthétiques sont déjà chargées : "
+                "lancez d'abord python manage.py supprimer_donnees_synthetiques"
+            )
+
+        total = options['etablissements'] * options['trimestres'] * options['prets'] * len(produits)
+        self.stdout.write(f"{total} prêt(s) à générer")
+        debut = time.perf_counter()
+        dernier_affichage = [debut]
+
+        def progression(inserees, prevues):
+            maintenant = time.perf_counter()
+            if maintenant - dernier_affichage[0] >= 5 or inserees == prevues:
+                dernier_affichage[0] = maintenant
+                debit = inserees / (maintenant - debut)
+                self.stdout.write(f"  {inserees}/{prevues} ({inserees * 100 // prevues} %) - {debit:,.0f} lignes/s")
+
+        resultat = charger_donnees_synthetiques(
+            options['etablissements'], options['trimestres'], options['prets'],
+            annee=options['annee'], trimestre=options['trimestre'], graine=options['graine'],
+            taille_lot=options['taille_lot'], produits=produits, progression=progression,
+        )
+
+        for modele, nombre in resultat.items():
+            self.stdout.write(f"  {modele:<22} {nombre:>10}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(resultat.values())} prêt(s) chargé(s) en {time.perf_counter() - debut:.1f} s"
+        ))
@@ -0,0 +1,42 @@
+"""
+Détecte les TEG atypiques (cnef/anomalies_teg.py) et enregistre les résultats
+dans AnomalieTEG, en remplaçant ceux de la détection précédente sur la période
+
+Usage :
+    python manage.py detecter_anomalies_teg
+    python manage.py detecter_anomalies_teg --annee 2024 --trimestre T2
+    python manage.py detecter_anomalies_teg --annee 2024 --produits credit decouvert
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cnef.anomalies_teg import PRODUITS, DetectionEnCours, detecter_anomalies, periode
+
+
+class Command(BaseCommand):
+    help = "Détecte les prêts dont le TEG déclaré s'écarte fortement des prêts comparables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--annee', type=int, help="Prêts mis en place pendant cette année (défaut : tous)")
+        parser.add_argument('--trimestre', choices=['T1', 'T2', 'T3', 'T4'], help="Restreindre à un trimestre de l'année")
+        parser.add_argument('--produits', nargs='+', choices=list(PRODUITS), help="Produits à analyser (défaut : tous)")
+
+    def handle(self, *args, **options):
+        if options['trimestre'] and not options['annee']:
+            raise CommandError("--trimestre nécessite --annee")
+        debut, fin = periode(options['annee'], options['trimestre'])
+
+        def progression(bilan, traites, total):
+            self.stdout.write(
+                f"[{traites}/{total}] {bilan['produit']:<12} {bilan['prets_analyses']:>10} prêt(s), "
+                f"{bilan['groupes_evalues']}/{bilan['groupes']} groupe(s) évalué(s), "
+                f"{bilan['anomalies']} TEG atypique(s) ({bilan['duree_ms']} ms)"
+            )
+
+        try:
+            resultat = detecter_anomalies(debut, fin, options['produits'], progression=progression)
+        except DetectionEnCours as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultat['anomalies']} TEG atypique(s) sur {resultat['prets_analyses']} prêt(s) analysé(s)"
+        ))
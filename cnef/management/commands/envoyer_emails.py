@@ -0,0 +1,54 @@
+"""
+Vide la file d'envoi des emails (HistoriqueEmail au statut EN_ATTENTE)
+
+Les emails dus sont envoyés par lots de EMAIL_FILE_TAILLE_LOT sur une seule
+connexion SMTP ; les échecs sont reprogrammés avec backoff exponentiel
+(voir cnef/envoi_emails.py).
+
+Usage (à planifier, par exemple chaque minute via cron, avec EMAIL_FILE_MODE='commande') :
+    python manage.py envoyer_emails
+    python manage.py envoyer_emails --continu --intervalle 10
+    python manage.py envoyer_emails --simulation
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from cnef.envoi_emails import envoyer_emails_en_attente
+from cnef.models import HistoriqueEmail
+
+
+class Command(BaseCommand):
+    help = "Envoie par lots les emails en attente de la file d'envoi"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=settings.EMAIL_FILE_TAILLE_LOT,
+                            help="Nombre d'emails envoyés par connexion SMTP")
+        parser.add_argument('--maximum', type=int, default=None, help="Nombre maximal d'emails traités")
+        parser.add_argument('--continu', action='store_true',
+                            help="Ne pas s'arrêter : vider la file toutes les --intervalle secondes")
+        parser.add_argument('--intervalle', type=float, default=settings.EMAIL_FILE_INTERVALLE)
+        parser.add_argument('--simulation', action='store_true', help="Compter les emails sans envoyer")
+
+    def handle(self, *args, **options):
+        en_attente = HistoriqueEmail.objects.filter(statut='EN_ATTENTE')
+        dus = en_attente.filter(prochaine_tentative__lte=timezone.now()).count()
+        self.stdout.write(f"{en_attente.count()} email(s) en attente, dont {dus} à envoyer maintenant")
+        if options['simulation']:
+            return
+
+        while True:
+            resultat = envoyer_emails_en_attente(taille_lot=options['taille_lot'], maximum=options['maximum'])
+            if any(resultat.values()) or not options['continu']:
+                self.stdout.write(
+                    f"{resultat['envoyes']} envoyé(s), {resultat['reprogrammes']} reprogrammé(s), "
+                    f"{resultat['echecs']} en échec définitif"
+                )
+            if not options['continu']:
+                break
+            close_old_connections()
+            time.sleep(options['intervalle'])
@@ -0,0 +1,44 @@
+"""
+Génère un classeur de soumission synthétique (6 feuilles, colonnes des fichiers réels)
+
+Usage :
+    python manage.py generer_classeur_synthetique soumission.xlsx --lignes 20000
+    python manage.py generer_classeur_synthetique soumission.xlsx --sigle BCI --code 30013 --trimestre T2
+    python manage.py generer_classeur_synthetique soumission.zip --lignes 20000   (un CSV par feuille)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from cnef.donnees_synthetiques import generer_classeur, generer_csv
+
+
+class Command(BaseCommand):
+    help = "Génère un classeur de soumission synthétique déterministe"
+
+    def add_arguments(self, parser):
+        parser.add_argument('chemin', help="Fichier .xlsx, ou .zip pour une soumission CSV")
+        parser.add_argument('--lignes', type=int, default=1000, help="Total de lignes, toutes feuilles confondues")
+        parser.add_argument('--graine', type=int, default=42, help="Graine aléatoire")
+        parser.add_argument('--sigle', default='BOA CONGO')
+        parser.add_argument('--code', type=int, default=30012)
+        parser.add_argument('--annee', type=int, default=2024)
+        parser.add_argument('--trimestre', default='T4', choices=['T1', 'T2', 'T3', 'T4'])
+        parser.add_argument('--taux-non-conforme', type=float, default=0.05,
+                            help="Part des lignes dont le TEG déclaré est faux (0 à 1)")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        generer = generer_csv if options['chemin'].lower().endswith('.zip') else generer_classeur
+        ecrites = generer(
+            options['chemin'], options['lignes'], graine=options['graine'],
+            sigle=options['sigle'], code=options['code'],
+            annee=options['annee'], trimestre=options['trimestre'],
+            taux_non_conforme=options['taux_non_conforme'],
+        )
+        for feuille, nombre in ecrites.items():
+            self.stdout.write(f"  {feuille:<25} {nombre:>8} ligne(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['chemin']} écrit en {time.perf_counter() - debut:.1f} s"
+        ))
@@ -0,0 +1,122 @@
+"""
+Gère les partitions annuelles des tables de prêts (MySQL)
+
+Sans option, affiche les partitions de chaque table et leur nombre de
+lignes estimé. Sous une autre base que MySQL, la commande n'a aucun effet.
+
+Usage :
+    python manage.py gerer_partitions
+    python manage.py gerer_partitions --ajouter              # année prochaine (cron annuel, en décembre)
+    python manage.py gerer_partitions --ajouter 2030
+    python manage.py gerer_partitions --supprimer-avant 2018 --archiver
+    python manage.py gerer_partitions --supprimer-avant 2018 --simulation
+    python manage.py gerer_partitions --expliquer --annee 2025 --trimestre T2
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cnef.partitionnement import (
+    TABLES_PARTITIONNEES,
+    PartitionnementIndisponible,
+    ajouter_annee,
+    lister_partitions,
+    nom_partition,
+    partitionnement_disponible,
+    partitions_parcourues,
+    PARTITION_INVALIDE,
+    supprimer_annees_avant,
+)
+
+TRIMESTRES = {'T1': (1, 4), 'T2': (4, 7), 'T3': (7, 10), 'T4': (10, 13)}
+
+
+class Command(BaseCommand):
+    help = "Ajoute, supprime ou archive les partitions annuelles des tables de prêts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ajouter', nargs='?', type=int, const=date.today().year + 1,
+                            help="Créer la partition de l'année indiquée (défaut : année prochaine)")
+        parser.add_argument('--supprimer-avant', type=int,
+                            help="Supprimer les partitions des années antérieures à cette année")
+        parser.add_argument('--archiver', action='store_true',
+                            help="Avec --supprimer-avant : déplacer chaque partition dans une table <table>_archive_<année>")
+        parser.add_argument('--expliquer', action='store_true',
+                            help="Vérifier avec EXPLAIN que les requêtes par trimestre et par année n'ouvrent qu'une partition")
+        parser.add_argument('--annee', type=int, default=date.today().year, help="Année des requêtes de --expliquer")
+        parser.add_argument('--trimestre', choices=sorted(TRIMESTRES), default='T1', help="Trimestre des requêtes de --expliquer")
+        parser.add_argument('--simulation', action='store_true', help="Afficher les opérations sans les exécuter")
+
+    def handle(self, *args, **options):
+        if not partitionnement_disponible():
+            self.stdout.write(f"Partitionnement non pris en charge par {connection.vendor} : rien à faire")
+            return
+
+        try:
+            if options['ajouter']:
+                self.ajouter(options['ajouter'], options['simulation'])
+            if options['supprimer_avant']:
+                self.supprimer(options['supprimer_avant'], options['archiver'], options['simulation'])
+            if options['expliquer']:
+                self.expliquer(options['annee'], options['trimestre'])
+        except (PartitionnementIndisponible, ValueError) as e:
+            raise CommandError(str(e))
+
+        if not (options['ajouter'] or options['supprimer_avant'] or options['expliquer']):
+            self.afficher_etat()
+
+    def afficher_etat(self):
+        for modele, champ in TABLES_PARTITIONNEES:
+            partitions = lister_partitions(modele)
+            if not partitions:
+                self.stdout.write(self.style.WARNING(f"{modele._meta.db_table} : non partitionnée"))
+                continue
+            self.stdout.write(f"{modele._meta.db_table} (YEAR({champ})) :")
+            for partition in partitions:
+                borne = 'MAXVALUE' if partition['borne'] is None else f"< {partition['borne']}"
+                self.stdout.write(f"    {partition['nom']:<12} {borne:<10} ~{partition['lignes']} ligne(s)")
+
+    def ajouter(self, annee, simulation):
+        for modele, _ in TABLES_PARTITIONNEES:
+            creees = ajouter_annee(modele, annee, simulation=simulation)
+            if creees:
+                verbe = "à créer" if simulation else "créée(s)"
+                self.stdout.write(self.style.SUCCESS(f"{modele._meta.db_table} : {', '.join(creees)} {verbe}"))
+            else:
+                self.stdout.write(f"{modele._meta.db_table} : {nom_partition(annee)} existe déjà")
+
+    def supprimer(self, annee, archiver, simulation):
+        for modele, _ in TABLES_PARTITIONNEES:
+            supprimees = supprimer_annees_avant(modele, annee, archiver=archiver, simulation=simulation)
+            if not supprimees:
+                self.stdout.write(f"{modele._meta.db_table} : aucune partition antérieure à {annee}")
+            for partition in supprimees:
+                verbe = "à supprimer" if simulation else "supprimée"
+                destination = f", archivée dans {partition['archive']}" if partition['archive'] else ''
+                self.stdout.write(
+                    f"{modele._meta.db_table} : {partition['nom']} {verbe} (~{partition['lignes']} ligne(s){destination})"
+                )
+
+    def expliquer(self, annee, trimestre):
+        mois_debut, mois_fin = TRIMESTRES[trimestre]
+        debut = date(annee, mois_debut, 1)
+        fin = date(annee + 1, 1, 1) if mois_fin == 13 else date(annee, mois_fin, 1)
+        attendues = {nom_partition(annee), PARTITION_INVALIDE}
+
+        for modele, champ in TABLES_PARTITIONNEES:
+            requetes = {
+                f"{trimestre} {annee} (communiqué)": modele.objects.filter(
+                    **{f'{champ}__gte': debut, f'{champ}__lt': fin}
+                ),
+                f"année {annee} (base de données)": modele.objects.filter(**{f'{champ}__year': annee}),
+            }
+            for libelle, queryset in requetes.items():
+                parcourues = partitions_parcourues(queryset.values('id'))
+                ok = parcourues <= attendues
+                style = self.style.SUCCESS if ok else self.style.ERROR
+                self.stdout.write(style(
+                    f"{modele._meta.db_table} - {libelle} : {', '.join(sorted(parcourues)) or 'aucune'}"
+                    f"{'' if ok else ' (élagage incomplet)'}"
+                ))
@@ -0,0 +1,48 @@
+"""
+Reconstruit la table d'index JetonJournal utilisée par la recherche du journal
+sur les bases sans index FULLTEXT (SQLite)
+
+Usage :
+    python manage.py indexer_journal
+    python manage.py indexer_journal --taille-lot 5000
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cnef.models import ActionUtilisateur, JetonJournal
+from cnef.recherche_journal import indexer_actions, utiliser_fulltext
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de jetons de la recherche dans le journal des actions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if utiliser_fulltext():
+            self.stdout.write("Index FULLTEXT MySQL actif : aucune table de jetons à construire")
+            return
+
+        taille_lot = options['taille_lot']
+        JetonJournal.objects.all().delete()
+
+        dernier_pk = 0
+        nb_actions = 0
+        nb_jetons = 0
+        while True:
+            lot = list(
+                ActionUtilisateur.objects.filter(pk__gt=dernier_pk)
+                .order_by('pk')
+                .only('pk', 'description')[:taille_lot]
+            )
+            if not lot:
+                break
+            with transaction.atomic():
+                nb_jetons += indexer_actions(lot)
+            nb_actions += len(lot)
+            dernier_pk = lot[-1].pk
+            self.stdout.write(f"  {nb_actions} action(s) indexée(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"{nb_actions} action(s), {nb_jetons} jeton(s)"))
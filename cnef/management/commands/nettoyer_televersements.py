@@ -0,0 +1,36 @@
+"""
+Supprime les téléversements fragmentés abandonnés et leurs fragments sur disque
+
+Un téléversement est abandonné quand aucun fragment n'a été reçu depuis
+TELEVERSEMENT_DUREE_VIE heures. Les dossiers de fragments sans
+téléversement en cours sont aussi retirés.
+
+Usage (à planifier, par exemple chaque nuit via cron) :
+    python manage.py nettoyer_televersements
+    python manage.py nettoyer_televersements --duree-vie 6
+    python manage.py nettoyer_televersements --simulation
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cnef.televersements import dossier_racine, purger_televersements_abandonnes
+
+
+class Command(BaseCommand):
+    help = "Supprime les téléversements fragmentés inachevés depuis TELEVERSEMENT_DUREE_VIE heures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duree-vie', type=int, default=settings.TELEVERSEMENT_DUREE_VIE,
+                            help="Âge (en heures) du dernier fragment reçu au-delà duquel le téléversement est supprimé")
+        parser.add_argument('--simulation', action='store_true', help="Compter sans supprimer")
+
+    def handle(self, *args, **options):
+        televersements, dossiers = purger_televersements_abandonnes(
+            duree_vie_heures=options['duree_vie'], simulation=options['simulation']
+        )
+        verbe = "à supprimer" if options['simulation'] else "supprimé(s)"
+        self.stdout.write(
+            f"{televersements} téléversement(s) abandonné(s) {verbe}, "
+            f"{dossiers} dossier(s) de fragments {verbe} dans {dossier_racine()}"
+        )
@@ -0,0 +1,43 @@
+"""
+Renseigne taille, empreinte SHA-256 et inventaire des feuilles des fichiers
+importés avant que ces métadonnées ne soient calculées à l'upload
+
+Usage :
+    python manage.py renseigner_metadonnees_fichiers
+    python manage.py renseigner_metadonnees_fichiers --tous
+"""
+
+from django.core.management.base import BaseCommand
+
+from cnef.models import FichierImport
+from cnef.utils import calculer_metadonnees_fichier
+
+
+class Command(BaseCommand):
+    help = "Calcule les métadonnées (taille, empreinte, feuilles) des fichiers importés qui n'en ont pas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tous', action='store_true', help="Recalculer aussi les fichiers déjà renseignés")
+
+    def handle(self, *args, **options):
+        fichiers = FichierImport.objects.order_by('id').only('id', 'fichier', 'nom_fichier')
+        if not options['tous']:
+            fichiers = fichiers.filter(empreinte_sha256='')
+
+        nb_ok = 0
+        nb_erreurs = 0
+        for fichier_import in fichiers.iterator(chunk_size=200):
+            try:
+                with fichier_import.fichier.open('rb'):
+                    metadonnees = calculer_metadonnees_fichier(fichier_import.fichier)
+            except (FileNotFoundError, ValueError) as e:
+                nb_erreurs += 1
+                self.stdout.write(self.style.WARNING(f"  #{fichier_import.id} {fichier_import.nom_fichier} : {e}"))
+                continue
+
+            for champ, valeur in metadonnees.items():
+                setattr(fichier_import, champ, valeur)
+            fichier_import.save(update_fields=list(metadonnees))
+            nb_ok += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{nb_ok} fichier(s) renseigné(s), {nb_erreurs} introuvable(s)"))
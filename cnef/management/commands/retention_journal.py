@@ -0,0 +1,72 @@
+"""
+Applique la politique de rétention du journal des actions :
+supprime (après archivage optionnel) les actions plus anciennes que
+JOURNAL_RETENTION_JOURS, par lots bornés par la clé primaire
+
+Usage (à planifier, par exemple chaque nuit via cron) :
+    python manage.py retention_journal
+    python manage.py retention_journal --jours 180 --sans-archive
+    python manage.py retention_journal --simulation
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cnef.models import ActionUtilisateur
+from cnef.retention_journal import dossier_archives, instantane_suppression, supprimer_par_lots
+
+
+class Command(BaseCommand):
+    help = "Supprime par lots (et archive en JSONL gzip) les actions du journal plus anciennes que la rétention"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=settings.JOURNAL_RETENTION_JOURS,
+                            help="Ancienneté maximale conservée, en jours")
+        parser.add_argument('--taille-lot', type=int, default=settings.JOURNAL_RETENTION_TAILLE_LOT)
+        parser.add_argument('--pause', type=float, default=settings.JOURNAL_RETENTION_PAUSE,
+                            help="Pause entre deux lots, en secondes")
+        parser.add_argument('--sans-archive', action='store_true', help="Supprimer sans archiver")
+        parser.add_argument('--dossier', default=None, help="Dossier des archives")
+        parser.add_argument('--simulation', action='store_true', help="Compter sans supprimer")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['jours'])
+        queryset = ActionUtilisateur.objects.filter(date_action__lt=limite)
+        instantane = instantane_suppression(queryset)
+        total = instantane['nombre']
+
+        self.stdout.write(f"{total} action(s) antérieure(s) au {limite:%d/%m/%Y %H:%M}")
+        if total == 0 or options['simulation']:
+            return
+
+        archiver = settings.JOURNAL_RETENTION_ARCHIVER and not options['sans_archive']
+        dossier = options['dossier'] or dossier_archives()
+
+        def progression(supprimes, archives):
+            self.stdout.write(f"  {supprimes}/{total} supprimée(s) ({supprimes * 100 // total} %)")
+
+        resultat = supprimer_par_lots(
+            queryset, instantane['pk_max'],
+            taille_lot=options['taille_lot'], pause=options['pause'],
+            archiver=archiver, dossier=dossier, progression=progression,
+        )
+
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=None,
+            type_action='SUPPRESSION',
+            description=f"Rétention du journal : {resultat['supprimes']} entrées supprimées",
+            donnees_supplementaires={
+                'jours': options['jours'],
+                'nombre_supprime': resultat['supprimes'],
+                'nombre_archive': resultat['archives'],
+                'dossier_archive': dossier if archiver else None,
+            }
+        )
+
+        message = f"{resultat['supprimes']} action(s) supprimée(s)"
+        if archiver:
+            message += f", {resultat['archives']} archivée(s) dans {dossier}"
+        self.stdout.write(self.style.SUCCESS(message))
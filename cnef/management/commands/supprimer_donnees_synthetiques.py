@@ -0,0 +1,39 @@
+"""
+Supprime les données chargées par charger_donnees_synthetiques :
+prêts (par lots), soumissions puis établissements synthétiques
+(nommés 'SYNTHETIQUE 0001'... avec le code 'SYN0001'...)
+
+Usage :
+    python manage.py supprimer_donnees_synthetiques
+    python manage.py supprimer_donnees_synthetiques --simulation
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from cnef.chargement_synthetique import etablissements_synthetiques, supprimer_donnees_synthetiques
+
+
+class Command(BaseCommand):
+    help = "Supprime les établissements synthétiques et toutes les données qui leur sont rattachées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=20000, help="Lignes supprimées par lot")
+        parser.add_argument('--simulation', action='store_true', help="Compter sans supprimer")
+
+    def handle(self, *args, **options):
+        nombre = etablissements_synthetiques().count()
+        self.stdout.write(f"{nombre} établissement(s) synthétique(s)")
+        if nombre == 0 or options['simulation']:
+            return
+
+        debut = time.perf_counter()
+
+        def progression(modele, supprimes):
+            self.stdout.write(f"  {modele} : {supprimes} supprimé(s)")
+
+        resultat = supprimer_donnees_synthetiques(taille_lot=options['taille_lot'], progression=progression)
+        for modele, total in resultat.items():
+            self.stdout.write(f"  {modele:<22} {total:>10}")
+        self.stdout.write(self.style.SUCCESS(f"Données synthétiques supprimées en {time.perf_counter() - debut:.1f} s"))
@@ -0,0 +1,89 @@
+"""
+Valide en parallèle les soumissions en attente (statut EN_COURS)
+
+Chaque fichier est importé dans sa propre transaction par un pool borné de
+workers (VALIDATION_GROUPEE_WORKERS, chacun avec sa connexion à la base) ;
+un email de validation unique est envoyé par établissement.
+
+Usage :
+    python manage.py valider_soumissions_en_lot 12 15 18
+    python manage.py valider_soumissions_en_lot --tous-en-cours --workers 8
+    python manage.py valider_soumissions_en_lot --tous-en-cours --etablissement BGFI
+    python manage.py valider_soumissions_en_lot --tous-en-cours --simulation
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from cnef.models import FichierImport, User
+from cnef.validation_groupee import nombre_workers, valider_en_lot
+
+
+class Command(BaseCommand):
+    help = "Importe et valide en parallèle des soumissions en attente"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier_ids', nargs='*', type=int, help="Identifiants des FichierImport à valider")
+        parser.add_argument('--tous-en-cours', action='store_true',
+                            help="Valider toutes les soumissions en attente")
+        parser.add_argument('--etablissement', help="Restreindre à un établissement (code ou nom)")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Nombre d'imports en parallèle (défaut : VALIDATION_GROUPEE_WORKERS)")
+        parser.add_argument('--utilisateur', help="Email du valideur enregistré sur les fichiers et dans le journal")
+        parser.add_argument('--sans-notification', action='store_true', help="Ne pas envoyer les emails de validation")
+        parser.add_argument('--simulation', action='store_true', help="Lister les fichiers sans les importer")
+
+    def handle(self, *args, **options):
+        if not options['fichier_ids'] and not options['tous_en_cours']:
+            raise CommandError("Indiquez des identifiants de fichiers ou --tous-en-cours")
+
+        fichiers = FichierImport.objects.filter(statut='EN_COURS').select_related('etablissement_cnef')
+        if options['fichier_ids']:
+            fichiers = fichiers.filter(id__in=options['fichier_ids'])
+        if options['etablissement']:
+            fichiers = fichiers.filter(
+                Q(etablissement_cnef__code_etablissement=options['etablissement'])
+                | Q(etablissement_cnef__Nom_etablissement__icontains=options['etablissement'])
+            )
+        fichiers = list(fichiers.order_by('date_import'))
+
+        utilisateur = None
+        if options['utilisateur']:
+            utilisateur = User.objects.filter(email__iexact=options['utilisateur']).first()
+            if utilisateur is None:
+                raise CommandError(f"Utilisateur {options['utilisateur']} introuvable")
+
+        if not fichiers:
+            self.stdout.write("Aucune soumission en attente à valider")
+            return
+
+        workers = nombre_workers(options['workers'], len(fichiers))
+        if options['simulation']:
+            for fichier in fichiers:
+                self.stdout.write(f"  {fichier.id:>6}  {fichier.etablissement_cnef}  {fichier.nom_fichier}")
+            self.stdout.write(f"{len(fichiers)} soumission(s) à valider avec {workers} worker(s)")
+            return
+
+        def progression(rapport, traites, total):
+            style = self.style.SUCCESS if rapport['statut'] == 'VALIDE' else self.style.WARNING
+            self.stdout.write(style(
+                f"[{traites}/{total}] {rapport['statut']:<7} {rapport['nom_fichier'] or rapport['fichier_id']} "
+                f"- {rapport['message']} ({rapport['duree_ms']} ms)"
+            ))
+
+        bilan = valider_en_lot(
+            [fichier.id for fichier in fichiers], utilisateur, workers=workers,
+            progression=progression, notifier=not options['sans_notification'],
+        )
+
+        for rapport in bilan['rapports']:
+            if rapport['statut'] == 'ERREUR' and rapport['erreurs']:
+                self.stdout.write(f"Erreurs de {rapport['nom_fichier']} :")
+                for erreur in rapport['erreurs']:
+                    self.stdout.write(f"    {erreur}")
+
+        self.stdout.write(
+            f"{bilan['valides']} validé(s), {bilan['erreurs']} en erreur, {bilan['ignores']} ignoré(s) "
+            f"sur {bilan['total']} en {bilan['duree_ms'] / 1000:.1f} s ({bilan['workers']} worker(s)), "
+            f"{bilan['emails']} email(s) de validation mis en file"
+        )
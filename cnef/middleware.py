@@ -1,5 +1,17 @@
+import json
 import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from django.conf import settings
 from django.contrib.sessions.exceptions import SessionInterrupted
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+logger_instrumentation = logging.getLogger('cnef.instrumentation')
 
 class SessionInterruptionMiddleware:
     def __init__(self, get_response):
@@ -17,4 +29,191 @@ class SessionInterruptionMiddleware:
             return render(request, 'inscription/inscription_token.html', {
                 'token_valide': False,
                 'error': 'Votre session a expiré. Veuillez réessayer.'
-            }, status=400)
\ No newline at end of file
+            }, status=400)
+
+
+class SessionRafraichissementMiddleware:
+    """
+    Prolonge l'expiration de la session au plus une fois par intervalle
+    (SESSION_REFRESH_INTERVAL) au lieu de la réécrire à chaque requête,
+    notamment pour les appels AJAX fréquents des tableaux de bord
+    """
+    CLE_SESSION = '_derniere_prolongation'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        # Inutile si Django sauvegarde déjà la session à chaque requête
+        if getattr(settings, 'SESSION_SAVE_EVERY_REQUEST', False):
+            return response
+
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return response
+
+        maintenant = int(time.time())
+        derniere = request.session.get(self.CLE_SESSION, 0)
+        if maintenant - derniere >= getattr(settings, 'SESSION_REFRESH_INTERVAL', 300):
+            # Modifier la session la marque comme à sauvegarder : SessionMiddleware
+            # repousse alors l'expiration (base, cache et cookie)
+            request.session[self.CLE_SESSION] = maintenant
+
+        return response
+
+
+class LectureCollanteMiddleware:
+    """
+    Lecture de ses propres écritures avec la base de reporting : pendant
+    DB_REPORTING_DELAI_COLLANT secondes après une validation (marquer_ecriture),
+    les lectures de la session restent sur la base principale
+    (voir cnef/routage_bdd.py). Sans effet si l'alias `reporting` n'existe pas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .routage_bdd import lecture_principale_si_recente
+
+        with lecture_principale_si_recente(request):
+            return self.get_response(request)
+
+
+# ==========================================
+# INSTRUMENTATION DES REQUÊTES
+# ==========================================
+
+# Dernières mesures du processus, consultables par l'ACNEF (api_instrumentation)
+tampon_instrumentation = deque(maxlen=getattr(settings, 'INSTRUMENTATION_TAILLE_TAMPON', 500))
+verrou_instrumentation = threading.Lock()
+
+_RE_LISTE_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_RE_ESPACES = re.compile(r'\s+')
+
+
+def empreinte_sql(sql):
+    """Forme normalisée d'une requête : les requêtes répétées (N+1) ont la même empreinte"""
+    return _RE_ESPACES.sub(' ', _RE_LISTE_IN.sub('IN (...)', sql)).strip()
+
+
+class CollecteurSQL:
+    """execute_wrapper : compte et chronomètre les requêtes SQL de la requête HTTP"""
+
+    def __init__(self):
+        self.requetes = []
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.requetes.append((sql, (time.perf_counter() - debut) * 1000))
+
+
+class InstrumentationMiddleware:
+    """
+    Mesure par vue : durée, nombre et temps des requêtes SQL, requêtes répétées.
+
+    - INSTRUMENTATION_TAUX : proportion de requêtes échantillonnées (0 = désactivé),
+      enregistrées dans le tampon et journalisées en INFO
+    - INSTRUMENTATION_SEUIL_LENT_MS : au-delà, la requête est journalisée en
+      WARNING avec son SQL, qu'elle soit échantillonnée ou non
+    - INSTRUMENTATION_SEUIL_DOUBLONS : nombre d'exécutions d'une même empreinte
+      SQL à partir duquel elle est signalée comme N+1
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        taux = getattr(settings, 'INSTRUMENTATION_TAUX', 0.0)
+        echantillonnee = taux > 0 and (taux >= 1 or random.random() < taux)
+        seuil = getattr(settings, 'INSTRUMENTATION_SEUIL_LENT_MS', 0)
+
+        if not echantillonnee and not seuil:
+            return self.get_response(request)
+
+        # SQL collecté pour toute requête : on ne sait qu'à la fin si elle est lente
+        collecteur = CollecteurSQL()
+        with ExitStack() as pile:
+            for alias in connections:
+                pile.enter_context(connections[alias].execute_wrapper(collecteur))
+            debut = time.perf_counter()
+            response = self.get_response(request)
+            duree_ms = (time.perf_counter() - debut) * 1000
+
+        if echantillonnee or duree_ms >= seuil:
+            self.enregistrer(request, response, duree_ms, collecteur.requetes, echantillonnee)
+        return response
+
+    @staticmethod
+    def nom_vue(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        return match.view_name or match._func_path
+
+    def enregistrer(self, request, response, duree_ms, requetes, echantillonnee=True):
+        seuil_doublons = getattr(settings, 'INSTRUMENTATION_SEUIL_DOUBLONS', 3)
+        empreintes = Counter(empreinte_sql(sql) for sql, _ in requetes)
+        doublons = [
+            {'sql': empreinte, 'executions': nb}
+            for empreinte, nb in empreintes.most_common()
+            if nb >= seuil_doublons
+        ]
+
+        mesure = {
+            'date': time.time(),
+            'vue': self.nom_vue(request),
+            'methode': request.method,
+            'chemin': request.path,
+            'statut': response.status_code,
+            'duree_ms': round(duree_ms, 1),
+            'nb_sql': len(requetes),
+            'temps_sql_ms': round(sum(t for _, t in requetes), 1),
+            'doublons': doublons,
+        }
+        if echantillonnee:
+            with verrou_instrumentation:
+                tampon_instrumentation.append(mesure)
+
+        seuil = getattr(settings, 'INSTRUMENTATION_SEUIL_LENT_MS', 0)
+        if seuil and duree_ms >= seuil:
+            # Requête lente : on joint le SQL exécuté, du plus coûteux au moins coûteux
+            detail = dict(mesure, evenement='requete_lente', sql=[
+                {'sql': sql, 'ms': round(t, 2)}
+                for sql, t in sorted(requetes, key=lambda r: -r[1])
+            ])
+            logger_instrumentation.warning(json.dumps(detail, ensure_ascii=False))
+        elif echantillonnee:
+            logger_instrumentation.info(json.dumps(dict(mesure, evenement='requete'), ensure_ascii=False))
+
+
+def synthese_instrumentation():
+    """Agrège le tampon par vue : nombre d'appels, durées et SQL moyens, p95, N+1"""
+    with verrou_instrumentation:
+        mesures = list(tampon_instrumentation)
+
+    par_vue = {}
+    for mesure in mesures:
+        par_vue.setdefault(mesure['vue'] or mesure['chemin'], []).append(mesure)
+
+    synthese = []
+    for vue, liste in par_vue.items():
+        durees = sorted(m['duree_ms'] for m in liste)
+        synthese.append({
+            'vue': vue,
+            'appels': len(liste),
+            'duree_moyenne_ms': round(sum(durees) / len(durees), 1),
+            'duree_p95_ms': durees[min(len(durees) - 1, int(len(durees) * 0.95))],
+            'duree_max_ms': durees[-1],
+            'nb_sql_moyen': round(sum(m['nb_sql'] for m in liste) / len(liste), 1),
+            'temps_sql_moyen_ms': round(sum(m['temps_sql_ms'] for m in liste) / len(liste), 1),
+            'appels_avec_doublons': sum(1 for m in liste if m['doublons']),
+        })
+    synthese.sort(key=lambda v: -v['duree_moyenne_ms'])
+    return {'vues': synthese, 'dernieres': mesures[-50:][::-1]}
+
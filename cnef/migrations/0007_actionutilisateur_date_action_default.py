@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0006_alter_actionutilisateur_type_action_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="actionutilisateur",
+            name="date_action",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Index FULLTEXT de la recherche dans le journal : MySQL uniquement,
+# les autres bases utilisent la table JetonJournal
+def creer_index_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX cnef_action_description_ft "
+            "ON cnef_actionutilisateur (description)"
+        )
+
+
+def supprimer_index_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "DROP INDEX cnef_action_description_ft ON cnef_actionutilisateur"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0007_actionutilisateur_date_action_default"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JetonJournal",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("jeton", models.CharField(max_length=64)),
+                ("occurrences", models.PositiveSmallIntegerField(default=1)),
+                (
+                    "action",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="jetons",
+                        to="cnef.actionutilisateur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Jeton du journal",
+                "verbose_name_plural": "Jetons du journal",
+                "indexes": [
+                    models.Index(
+                        fields=["jeton", "action"], name="cnef_jetonj_jeton_40a2d1_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(creer_index_fulltext, supprimer_index_fulltext),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 16:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0008_jetonjournal"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fichierimport",
+            name="empreinte_sha256",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                max_length=64,
+                verbose_name="Empreinte SHA-256",
+            ),
+        ),
+        migrations.AddField(
+            model_name="fichierimport",
+            name="feuilles",
+            field=models.JSONField(
+                blank=True, null=True, verbose_name="Inventaire des feuilles"
+            ),
+        ),
+        migrations.AddField(
+            model_name="fichierimport",
+            name="taille_octets",
+            field=models.BigIntegerField(
+                blank=True, null=True, verbose_name="Taille (octets)"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fichierimport",
+            index=models.Index(
+                fields=["etablissement_cnef", "-date_import", "-id"],
+                name="cnef_fichie_etablis_95c6bc_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fichierimport",
+            index=models.Index(
+                fields=["uploader_par", "-date_import", "-id"],
+                name="cnef_fichie_uploade_ee6a35_idx",
+            ),
+        ),
+    ]
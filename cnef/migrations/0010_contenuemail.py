@@ -0,0 +1,132 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:05
+
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Les corps d'email sont déplacés vers ContenuEmail : une ligne par empreinte
+# (HTML, texte), partagée par toutes les lignes d'historique identiques
+def empreinte(contenu_html, contenu_texte):
+    return hashlib.sha256(
+        json.dumps([contenu_html or "", contenu_texte], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def dedupliquer_contenus(apps, schema_editor):
+    HistoriqueEmail = apps.get_model("cnef", "HistoriqueEmail")
+    ContenuEmail = apps.get_model("cnef", "ContenuEmail")
+
+    identifiants = {}
+    a_mettre_a_jour = []
+    lignes = HistoriqueEmail.objects.only("id", "contenu_html", "contenu_texte").order_by("id")
+    for email in lignes.iterator(chunk_size=500):
+        cle = empreinte(email.contenu_html, email.contenu_texte)
+        if cle not in identifiants:
+            identifiants[cle] = ContenuEmail.objects.create(
+                empreinte=cle,
+                contenu_html=email.contenu_html or "",
+                contenu_texte=email.contenu_texte,
+            ).id
+        email.contenu_id = identifiants[cle]
+        a_mettre_a_jour.append(email)
+        if len(a_mettre_a_jour) >= 500:
+            HistoriqueEmail.objects.bulk_update(a_mettre_a_jour, ["contenu"])
+            a_mettre_a_jour = []
+    if a_mettre_a_jour:
+        HistoriqueEmail.objects.bulk_update(a_mettre_a_jour, ["contenu"])
+
+
+def restaurer_contenus(apps, schema_editor):
+    HistoriqueEmail = apps.get_model("cnef", "HistoriqueEmail")
+    a_mettre_a_jour = []
+    lignes = HistoriqueEmail.objects.select_related("contenu").order_by("id")
+    for email in lignes.iterator(chunk_size=500):
+        email.contenu_html = email.contenu.contenu_html if email.contenu else ""
+        email.contenu_texte = email.contenu.contenu_texte if email.contenu else None
+        a_mettre_a_jour.append(email)
+        if len(a_mettre_a_jour) >= 500:
+            HistoriqueEmail.objects.bulk_update(a_mettre_a_jour, ["contenu_html", "contenu_texte"])
+            a_mettre_a_jour = []
+    if a_mettre_a_jour:
+        HistoriqueEmail.objects.bulk_update(a_mettre_a_jour, ["contenu_html", "contenu_texte"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0009_fichierimport_metadonnees"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContenuEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "empreinte",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="Empreinte SHA-256"
+                    ),
+                ),
+                (
+                    "contenu_html",
+                    models.TextField(verbose_name="Contenu HTML de l'email"),
+                ),
+                (
+                    "contenu_texte",
+                    models.TextField(
+                        blank=True, null=True, verbose_name="Contenu texte (fallback)"
+                    ),
+                ),
+                (
+                    "date_creation",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de création"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Contenu d'email",
+                "verbose_name_plural": "Contenus d'email",
+            },
+        ),
+        migrations.AddField(
+            model_name="historiqueemail",
+            name="contenu",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="emails",
+                to="cnef.contenuemail",
+                verbose_name="Contenu de l'email",
+            ),
+        ),
+        # Nullable le temps de la migration, pour que le retour arrière puisse
+        # recréer la colonne avant d'y recopier les contenus
+        migrations.AlterField(
+            model_name="historiqueemail",
+            name="contenu_html",
+            field=models.TextField(null=True, verbose_name="Contenu HTML de l'email"),
+        ),
+        migrations.RunPython(dedupliquer_contenus, restaurer_contenus),
+        migrations.RemoveField(
+            model_name="historiqueemail",
+            name="contenu_html",
+        ),
+        migrations.RemoveField(
+            model_name="historiqueemail",
+            name="contenu_texte",
+        ),
+    ]
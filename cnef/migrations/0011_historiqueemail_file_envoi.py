@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0010_contenuemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historiqueemail",
+            name="prochaine_tentative",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Prochaine tentative"
+            ),
+        ),
+        migrations.AddField(
+            model_name="historiqueemail",
+            name="tentatives",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Tentatives d'envoi"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="historiqueemail",
+            name="statut",
+            field=models.CharField(
+                choices=[
+                    ("EN_ATTENTE", "En attente d'envoi"),
+                    ("ENVOYE", "Envoyé avec succès"),
+                    ("ECHEC", "Échec d'envoi"),
+                ],
+                default="ENVOYE",
+                max_length=20,
+                verbose_name="Statut d'envoi",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="historiqueemail",
+            index=models.Index(
+                fields=["statut", "prochaine_tentative"],
+                name="cnef_histor_statut_bb6970_idx",
+            ),
+        ),
+    ]
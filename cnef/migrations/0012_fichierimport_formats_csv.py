@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:14
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0011_historiqueemail_file_envoi"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="fichierimport",
+            name="fichier",
+            field=models.FileField(
+                upload_to="imports/%Y/%m/%d/",
+                validators=[
+                    django.core.validators.FileExtensionValidator(
+                        allowed_extensions=["xlsx", "xls", "csv", "zip"]
+                    )
+                ],
+                verbose_name="Fichier Excel",
+            ),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:28
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0012_fichierimport_formats_csv"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeleversementFragmente",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "nom_fichier",
+                    models.CharField(max_length=255, verbose_name="Nom du fichier"),
+                ),
+                (
+                    "taille_totale",
+                    models.BigIntegerField(verbose_name="Taille (octets)"),
+                ),
+                (
+                    "taille_fragment",
+                    models.PositiveIntegerField(
+                        verbose_name="Taille d'un fragment (octets)"
+                    ),
+                ),
+                (
+                    "empreinte_sha256",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        max_length=64,
+                        verbose_name="Empreinte SHA-256 attendue",
+                    ),
+                ),
+                (
+                    "statut",
+                    models.CharField(
+                        choices=[("EN_COURS", "En cours"), ("TERMINE", "Terminé")],
+                        default="EN_COURS",
+                        max_length=20,
+                    ),
+                ),
+                ("date_creation", models.DateTimeField(auto_now_add=True)),
+                ("date_mise_a_jour", models.DateTimeField(auto_now=True)),
+                (
+                    "etablissement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="televersements",
+                        to="cnef.etablissement",
+                    ),
+                ),
+                (
+                    "fichier_import",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="televersements",
+                        to="cnef.fichierimport",
+                    ),
+                ),
+                (
+                    "utilisateur",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="televersements",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Téléversement fragmenté",
+                "verbose_name_plural": "Téléversements fragmentés",
+                "indexes": [
+                    models.Index(
+                        fields=["statut", "date_mise_a_jour"],
+                        name="cnef_televe_statut_7c0fe7_idx",
+                    )
+                ],
+            },
+        ),
+    ]
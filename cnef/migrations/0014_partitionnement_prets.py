@@ -0,0 +1,209 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:42
+
+from datetime import date
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Partitionnement RANGE par année des six tables de prêts (MySQL uniquement,
+# sans effet sur les autres bases). Toute clé unique d'une table partitionnée
+# doit contenir la colonne de partitionnement : la clé primaire devient
+# (id, date). Partitions créées :
+# - p_invalide : dates nulles ou invalides (YEAR() = 0), toujours parcourue
+#   par MySQL et donc gardée vide
+# - p_anterieur : années antérieures à la première partition annuelle
+# - pAAAA : une par année, de la plus ancienne année présente (au plus
+#   ANNEES_HISTORIQUE ans en arrière) à l'année prochaine
+# - p_futur : dates au-delà (saisies erronées), éclatée par gerer_partitions
+TABLES_PARTITIONNEES = [
+    ("cnef_credit_amortissables", "DATE_MEP_I03"),
+    ("cnef_decouverts", "DATE_MISE_PLACE_I03"),
+    ("cnef_affacturage", "DATE_MISE_PLACE_I03"),
+    ("cnef_cautions", "DATE_MISE_PLACE_I03"),
+    ("cnef_effets_commerces", "DATE_MISE_PLACE_I03"),
+    ("cnef_spot", "DATE_MEP_I03"),
+]
+ANNEES_HISTORIQUE = 10
+
+
+def partitionner_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    annee_courante = date.today().year
+    for table, colonne in TABLES_PARTITIONNEES:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN(YEAR(`{colonne}`)) FROM `{table}` WHERE YEAR(`{colonne}`) > 0")
+            premiere = cursor.fetchone()[0] or annee_courante
+        premiere = min(max(premiere, annee_courante - ANNEES_HISTORIQUE), annee_courante)
+
+        partitions = [
+            "PARTITION p_invalide VALUES LESS THAN (1)",
+            f"PARTITION p_anterieur VALUES LESS THAN ({premiere})",
+        ]
+        partitions += [
+            f"PARTITION p{annee} VALUES LESS THAN ({annee + 1})"
+            for annee in range(premiere, annee_courante + 2)
+        ]
+        partitions.append("PARTITION p_futur VALUES LESS THAN MAXVALUE")
+
+        schema_editor.execute(
+            f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `{colonne}`)"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE `{table}` PARTITION BY RANGE (YEAR(`{colonne}`)) ({', '.join(partitions)})"
+        )
+
+
+def retirer_partitionnement(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    for table, colonne in TABLES_PARTITIONNEES:
+        schema_editor.execute(f"ALTER TABLE `{table}` REMOVE PARTITIONING")
+        schema_editor.execute(f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`)")
+
+
+class Migration(migrations.Migration):
+
+    # Reconstruction des tables : DDL non transactionnel sous MySQL
+    atomic = False
+
+    dependencies = [
+        ("cnef", "0013_televersementfragmente"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="affacturage",
+            name="etablissement",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="affacturages",
+                to="cnef.etablissement",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="affacturage",
+            name="fichier_import",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="affacturages",
+                to="cnef.fichierimport",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="cautions",
+            name="etablissement",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="cautions",
+                to="cnef.etablissement",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="cautions",
+            name="fichier_import",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="cautions",
+                to="cnef.fichierimport",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="credit_amortissables",
+            name="etablissement",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="credits_amortissables",
+                to="cnef.etablissement",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="credit_amortissables",
+            name="fichier_import",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="credits_amortissables_files",
+                to="cnef.fichierimport",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="decouverts",
+            name="etablissement",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="decouverts",
+                to="cnef.etablissement",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="decouverts",
+            name="fichier_import",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="decouverts",
+                to="cnef.fichierimport",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="effets_commerces",
+            name="etablissement",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="effets_commerces",
+                to="cnef.etablissement",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="effets_commerces",
+            name="fichier_import",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="effets",
+                to="cnef.fichierimport",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="spot",
+            name="etablissement",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="spots",
+                to="cnef.etablissement",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="spot",
+            name="fichier_import",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="spot_files",
+                to="cnef.fichierimport",
+            ),
+        ),
+        migrations.RunPython(partitionner_tables, retirer_partitionnement),
+    ]
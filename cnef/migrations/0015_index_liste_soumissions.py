@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0014_partitionnement_prets"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="fichierimport",
+            index=models.Index(
+                fields=["-date_import", "-id"], name="cnef_fichie_date_im_c56898_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fichierimport",
+            index=models.Index(
+                fields=["statut", "-date_import", "-id"],
+                name="cnef_fichie_statut_5304f2_idx",
+            ),
+        ),
+    ]
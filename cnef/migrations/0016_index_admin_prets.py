@@ -0,0 +1,121 @@
+# Generated by Django 5.2.8 on 2026-10-19 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0015_index_liste_soumissions"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="affacturage",
+            index=models.Index(
+                fields=["DATE_MISE_PLACE_I03"], name="cnef_affact_DATE_MI_5d3c79_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="affacturage",
+            index=models.Index(
+                fields=["BENEFICAIRE_I06"], name="cnef_affact_BENEFIC_666766_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="affacturage",
+            index=models.Index(
+                fields=["CODE_BANQUE_I02"], name="cnef_affact_CODE_BA_008067_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cautions",
+            index=models.Index(
+                fields=["DATE_MISE_PLACE_I03"], name="cnef_cautio_DATE_MI_f4fb68_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cautions",
+            index=models.Index(
+                fields=["BENEFICAIRE_I06"], name="cnef_cautio_BENEFIC_df3ce7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cautions",
+            index=models.Index(
+                fields=["CODE_BANQUE_I02"], name="cnef_cautio_CODE_BA_46c9de_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="credit_amortissables",
+            index=models.Index(
+                fields=["DATE_MEP_I03"], name="cnef_credit_DATE_ME_73737e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="credit_amortissables",
+            index=models.Index(
+                fields=["BENEFICIAIRE_I06"], name="cnef_credit_BENEFIC_ab0213_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="credit_amortissables",
+            index=models.Index(
+                fields=["CODE_ETAB_I02"], name="cnef_credit_CODE_ET_8d8139_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="decouverts",
+            index=models.Index(
+                fields=["DATE_MISE_PLACE_I03"], name="cnef_decouv_DATE_MI_e47a0c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="decouverts",
+            index=models.Index(
+                fields=["BENEFICAIRE_I04"], name="cnef_decouv_BENEFIC_c9d5ea_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="decouverts",
+            index=models.Index(
+                fields=["CODE_BANQUE_I02"], name="cnef_decouv_CODE_BA_aca61b_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="effets_commerces",
+            index=models.Index(
+                fields=["DATE_MISE_PLACE_I03"], name="cnef_effets_DATE_MI_241881_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="effets_commerces",
+            index=models.Index(
+                fields=["BENEFICAIRE_I06"], name="cnef_effets_BENEFIC_4d722f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="effets_commerces",
+            index=models.Index(
+                fields=["CODE_BANQUE_I02"], name="cnef_effets_CODE_BA_b11f50_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="spot",
+            index=models.Index(
+                fields=["DATE_MEP_I03"], name="cnef_spot_DATE_ME_a43cec_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="spot",
+            index=models.Index(
+                fields=["BENEFICIAIRE_I06"], name="cnef_spot_BENEFIC_9afcb7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="spot",
+            index=models.Index(
+                fields=["CODE_ETAB_I02"], name="cnef_spot_CODE_ET_23ea54_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 5.2.8 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("cnef", "0016_index_admin_prets"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnomalieTEG",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "produit",
+                    models.CharField(
+                        choices=[
+                            ("credit", "Crédit amortissable"),
+                            ("spot", "Spot"),
+                            ("decouvert", "Découvert"),
+                            ("affacturage", "Affacturage"),
+                            ("caution", "Caution"),
+                            ("effet", "Effet de commerce"),
+                        ],
+                        max_length=20,
+                        verbose_name="Produit",
+                    ),
+                ),
+                ("pret_id", models.BigIntegerField(verbose_name="Identifiant du prêt")),
+                (
+                    "date_mise_place",
+                    models.DateField(verbose_name="Date de mise en place"),
+                ),
+                (
+                    "nature_pret",
+                    models.CharField(
+                        blank=True, max_length=75, verbose_name="Nature du prêt"
+                    ),
+                ),
+                (
+                    "maturite",
+                    models.CharField(
+                        blank=True, max_length=10, verbose_name="Maturité"
+                    ),
+                ),
+                (
+                    "categorie_beneficiaire",
+                    models.CharField(
+                        blank=True, max_length=30, verbose_name="Catégorie bénéficiaire"
+                    ),
+                ),
+                (
+                    "taille_groupe",
+                    models.IntegerField(verbose_name="Prêts comparables"),
+                ),
+                ("teg_declare", models.FloatField(verbose_name="TEG déclaré (%)")),
+                (
+                    "teg_median",
+                    models.FloatField(verbose_name="TEG médian du groupe (%)"),
+                ),
+                ("mad", models.FloatField(verbose_name="Écart absolu médian (MAD)")),
+                (
+                    "premier_quartile",
+                    models.FloatField(verbose_name="Premier quartile (%)"),
+                ),
+                (
+                    "troisieme_quartile",
+                    models.FloatField(verbose_name="Troisième quartile (%)"),
+                ),
+                ("score_robuste", models.FloatField(verbose_name="Score robuste")),
+                (
+                    "score_absolu",
+                    models.FloatField(verbose_name="Score robuste (valeur absolue)"),
+                ),
+                (
+                    "methode",
+                    models.CharField(
+                        choices=[
+                            ("MAD", "Écart à la médiane (MAD)"),
+                            ("IQR", "Hors de l'intervalle interquartile"),
+                            ("MAD_IQR", "MAD et intervalle interquartile"),
+                        ],
+                        max_length=10,
+                        verbose_name="Méthode",
+                    ),
+                ),
+                (
+                    "date_detection",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de détection"
+                    ),
+                ),
+                (
+                    "etablissement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="anomalies_teg",
+                        to="cnef.etablissement",
+                        verbose_name="Établissement",
+                    ),
+                ),
+                (
+                    "fichier_import",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="anomalies_teg",
+                        to="cnef.fichierimport",
+                        verbose_name="Soumission",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "TEG atypique",
+                "verbose_name_plural": "TEG atypiques",
+                "ordering": ["-score_absolu"],
+                "indexes": [
+                    models.Index(
+                        fields=["fichier_import", "-score_absolu"],
+                        name="cnef_anomal_fichier_926c3f_idx",
+                    ),
+                    models.Index(
+                        fields=["etablissement", "-score_absolu"],
+                        name="cnef_anomal_etablis_2944d1_idx",
+                    ),
+                    models.Index(
+                        fields=["produit", "date_mise_place"],
+                        name="cnef_anomal_produit_bfc768_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -4,9 +4,11 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.core.validators import FileExtensionValidator, EmailValidator
 from django.utils import timezone
 from django.urls import reverse
-import numpy_financial as npf
+import hashlib
+import json
 import secrets
 import string
+import uuid
 from datetime import timedelta
 
 # ==========================================
@@ -286,7 +288,7 @@ class FichierImport(models.Model):
     
     fichier = models.FileField(
         upload_to='imports/%Y/%m/%d/',
-        validators=[FileExtensionValidator(allowed_extensions=['xlsx', 'xls'])],
+        validators=[FileExtensionValidator(allowed_extensions=['xlsx', 'xls', 'csv', 'zip'])],
         verbose_name="Fichier Excel"
     )
     nom_fichier = models.CharField(max_length=255, verbose_name="Nom du fichier")
@@ -305,6 +307,11 @@ class FichierImport(models.Model):
     erreurs = models.TextField(blank=True, null=True, verbose_name="Erreurs rencontrées")
     details = models.TextField(blank=True, null=True, verbose_name="Détails de l'import")
     
+    # Métadonnées calculées à l'upload (évite tout accès disque dans les historiques)
+    taille_octets = models.BigIntegerField(null=True, blank=True, verbose_name="Taille (octets)")
+    empreinte_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True, verbose_name="Empreinte SHA-256")
+    feuilles = models.JSONField(null=True, blank=True, verbose_name="Inventaire des feuilles")
+    
     # Validation par CNEF
     valide_par = models.ForeignKey(
         User,
@@ -321,6 +328,14 @@ class FichierImport(models.Model):
         verbose_name = "Fichier importé"
         verbose_name_plural = "Fichiers importés"
         ordering = ['-date_import']
+        indexes = [
+            # Historiques paginés par curseur (date_import, id)
+            models.Index(fields=['etablissement_cnef', '-date_import', '-id']),
+            models.Index(fields=['uploader_par', '-date_import', '-id']),
+            # Liste paginée d'interface_chef, avec ou sans filtre de statut
+            models.Index(fields=['-date_import', '-id']),
+            models.Index(fields=['statut', '-date_import', '-id']),
+        ]
     
     def __str__(self):
         return f"{self.nom_fichier} - {self.date_import.strftime('%d/%m/%Y %H:%M')}"
@@ -346,15 +361,79 @@ class FichierImport(models.Model):
             'spots': self.spots.count(),
         }
 
+
+class TeleversementFragmente(models.Model):
+    """
+    Téléversement d'une soumission en plusieurs fragments (voir
+    cnef/televersements.py). Les fragments sont sur disque ; la ligne porte
+    l'état et devient un FichierImport à la finalisation.
+    """
+    STATUT_CHOICES = [
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='televersements'
+    )
+    etablissement = models.ForeignKey(
+        Etablissement,
+        on_delete=models.CASCADE,
+        related_name='televersements'
+    )
+    nom_fichier = models.CharField(max_length=255, verbose_name="Nom du fichier")
+    taille_totale = models.BigIntegerField(verbose_name="Taille (octets)")
+    taille_fragment = models.PositiveIntegerField(verbose_name="Taille d'un fragment (octets)")
+    empreinte_sha256 = models.CharField(max_length=64, blank=True, default='', verbose_name="Empreinte SHA-256 attendue")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_COURS')
+    fichier_import = models.ForeignKey(
+        FichierImport,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='televersements'
+    )
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_mise_a_jour = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Téléversement fragmenté"
+        verbose_name_plural = "Téléversements fragmentés"
+        indexes = [
+            # Recherche des téléversements abandonnés
+            models.Index(fields=['statut', 'date_mise_a_jour']),
+        ]
+
+    def __str__(self):
+        return f"{self.nom_fichier} ({self.get_statut_display()})"
+
+    @property
+    def nb_fragments(self):
+        return max(1, -(-self.taille_totale // self.taille_fragment))
+
+    def taille_attendue(self, numero):
+        """Taille du fragment `numero` (0-indexé) : le dernier peut être plus court"""
+        if numero < self.nb_fragments - 1:
+            return self.taille_fragment
+        return self.taille_totale - self.taille_fragment * (self.nb_fragments - 1)
+
 # ==========================================
 # MODÈLES DE DONNÉES
 # ==========================================
 
+# Les six tables de prêts sont partitionnées par année sous MySQL
+# (migration 0014, commande gerer_partitions) : InnoDB n'accepte pas de
+# contrainte de clé étrangère sur une table partitionnée, d'où
+# db_constraint=False. Les suppressions en cascade restent assurées par Django.
+
 class Credit_Amortissables(models.Model):
     """Modèle pour des crédits amortissables"""
    
-    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='credits_amortissables')
-    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='credits_amortissables_files')
+    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='credits_amortissables', db_constraint=False)
+    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='credits_amortissables_files', db_constraint=False)
 
     ETABLISSEMENT_I01 = models.CharField(max_length=30, verbose_name="Établissement")
     CODE_ETAB_I02 = models.CharField(max_length=8, verbose_name="Code établissement")
@@ -470,13 +549,19 @@ class Credit_Amortissables(models.Model):
     class Meta:
         verbose_name = "Crédit amortissable"
         verbose_name_plural = "Crédits amortissables"
-        ordering = ['-DATE_MEP_I03']   
+        ordering = ['-DATE_MEP_I03']
+        indexes = [
+            # Liste de l'admin (tri par date, recherche par préfixe - admin.PretsAdmin)
+            models.Index(fields=['DATE_MEP_I03']),
+            models.Index(fields=['BENEFICIAIRE_I06']),
+            models.Index(fields=['CODE_ETAB_I02']),
+        ]
 
 class Decouverts(models.Model):
     """Modèle pour les découverts"""
    
-    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='decouverts')
-    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='decouverts')
+    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='decouverts', db_constraint=False)
+    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='decouverts', db_constraint=False)
     
     SIGLE_I01 = models.CharField(max_length=30, verbose_name="Sigle")
     CODE_BANQUE_I02 = models.CharField(max_length=8, verbose_name="Code banque")
@@ -529,13 +614,19 @@ class Decouverts(models.Model):
         verbose_name = "Découvert"
         verbose_name_plural = "Découverts"
         ordering = ['-DATE_MISE_PLACE_I03']
+        indexes = [
+            # Liste de l'admin (tri par date, recherche par préfixe - admin.PretsAdmin)
+            models.Index(fields=['DATE_MISE_PLACE_I03']),
+            models.Index(fields=['BENEFICAIRE_I04']),
+            models.Index(fields=['CODE_BANQUE_I02']),
+        ]
     
 
 class Affacturage(models.Model):
     """Modèle pour l'affacturage"""
     
-    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='affacturages')
-    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='affacturages')
+    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='affacturages', db_constraint=False)
+    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='affacturages', db_constraint=False)
     
     SIGLE_I01 = models.CharField(max_length=30, verbose_name="Sigle")
     CODE_BANQUE_I02 = models.CharField(max_length=8, verbose_name="Code banque")
@@ -589,13 +680,19 @@ class Affacturage(models.Model):
         verbose_name = "Affacturage"
         verbose_name_plural = "Affacturages"
         ordering = ['-DATE_MISE_PLACE_I03']
+        indexes = [
+            # Liste de l'admin (tri par date, recherche par préfixe - admin.PretsAdmin)
+            models.Index(fields=['DATE_MISE_PLACE_I03']),
+            models.Index(fields=['BENEFICAIRE_I06']),
+            models.Index(fields=['CODE_BANQUE_I02']),
+        ]
     
 
 class Cautions(models.Model):
     """Modèle pour les cautions"""
     
-    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='cautions')
-    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='cautions')
+    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='cautions', db_constraint=False)
+    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='cautions', db_constraint=False)
     
     SIGLE_I01 = models.CharField(max_length=30, verbose_name="Sigle")
     CODE_BANQUE_I02 = models.CharField(max_length=8, verbose_name="Code banque")
@@ -664,13 +761,19 @@ class Cautions(models.Model):
         verbose_name = "Caution"
         verbose_name_plural = "Cautions"
         ordering = ['-DATE_MISE_PLACE_I03']
+        indexes = [
+            # Liste de l'admin (tri par date, recherche par préfixe - admin.PretsAdmin)
+            models.Index(fields=['DATE_MISE_PLACE_I03']),
+            models.Index(fields=['BENEFICAIRE_I06']),
+            models.Index(fields=['CODE_BANQUE_I02']),
+        ]
     
 
 class Effets_commerces(models.Model):
     """Modèle pour les effets de commerce"""
     
-    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='effets_commerces')
-    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='effets')
+    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='effets_commerces', db_constraint=False)
+    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='effets', db_constraint=False)
     
     SIGLE_I01 = models.CharField(max_length=30, verbose_name="Sigle")
     CODE_BANQUE_I02 = models.CharField(max_length=8, verbose_name="Code banque")
@@ -735,13 +838,19 @@ class Effets_commerces(models.Model):
         verbose_name = "Effet de commerce"
         verbose_name_plural = "Effets de commerce"
         ordering = ['-DATE_MISE_PLACE_I03']
+        indexes = [
+            # Liste de l'admin (tri par date, recherche par préfixe - admin.PretsAdmin)
+            models.Index(fields=['DATE_MISE_PLACE_I03']),
+            models.Index(fields=['BENEFICAIRE_I06']),
+            models.Index(fields=['CODE_BANQUE_I02']),
+        ]
     
 
 class Spot(models.Model):
     """Modèle pour des crédits spot"""
    
-    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='spots')
-    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='spot_files')
+    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='spots', db_constraint=False)
+    fichier_import = models.ForeignKey(FichierImport, on_delete=models.SET_NULL, null=True, blank=True, related_name='spot_files', db_constraint=False)
     
     ETABLISSEMENT_I01 = models.CharField(max_length=30, verbose_name="Établissement")
     CODE_ETAB_I02 = models.CharField(max_length=8, verbose_name="Code établissement")
@@ -809,6 +918,78 @@ class Spot(models.Model):
         verbose_name = "Spot"
         verbose_name_plural = "Spots"
         ordering = ['-DATE_MEP_I03']
+        indexes = [
+            # Liste de l'admin (tri par date, recherche par préfixe - admin.PretsAdmin)
+            models.Index(fields=['DATE_MEP_I03']),
+            models.Index(fields=['BENEFICIAIRE_I06']),
+            models.Index(fields=['CODE_ETAB_I02']),
+        ]
+
+# ==========================================
+# TEG ATYPIQUES (DÉTECTION D'ANOMALIES)
+# ==========================================
+
+class AnomalieTEG(models.Model):
+    """
+    Prêt dont le TEG déclaré s'écarte fortement de celui des prêts comparables
+    (même produit, maturité et catégorie de bénéficiaire) - cnef/anomalies_teg.py
+    """
+    PRODUIT_CHOICES = [
+        ('credit', 'Crédit amortissable'),
+        ('spot', 'Spot'),
+        ('decouvert', 'Découvert'),
+        ('affacturage', 'Affacturage'),
+        ('caution', 'Caution'),
+        ('effet', 'Effet de commerce'),
+    ]
+
+    METHODE_CHOICES = [
+        ('MAD', 'Écart à la médiane (MAD)'),
+        ('IQR', 'Hors de l\'intervalle interquartile'),
+        ('MAD_IQR', 'MAD et intervalle interquartile'),
+    ]
+
+    etablissement = models.ForeignKey(Etablissement, on_delete=models.CASCADE, related_name='anomalies_teg', verbose_name="Établissement")
+    fichier_import = models.ForeignKey(FichierImport, on_delete=models.CASCADE, null=True, blank=True, related_name='anomalies_teg', verbose_name="Soumission")
+
+    # Prêt concerné (tables partitionnées : pas de clé étrangère)
+    produit = models.CharField(max_length=20, choices=PRODUIT_CHOICES, verbose_name="Produit")
+    pret_id = models.BigIntegerField(verbose_name="Identifiant du prêt")
+    date_mise_place = models.DateField(verbose_name="Date de mise en place")
+
+    # Groupe de comparaison
+    nature_pret = models.CharField(max_length=75, blank=True, verbose_name="Nature du prêt")
+    maturite = models.CharField(max_length=10, blank=True, verbose_name="Maturité")
+    categorie_beneficiaire = models.CharField(max_length=30, blank=True, verbose_name="Catégorie bénéficiaire")
+    taille_groupe = models.IntegerField(verbose_name="Prêts comparables")
+
+    # TEG (en %) et statistiques robustes du groupe
+    teg_declare = models.FloatField(verbose_name="TEG déclaré (%)")
+    teg_median = models.FloatField(verbose_name="TEG médian du groupe (%)")
+    mad = models.FloatField(verbose_name="Écart absolu médian (MAD)")
+    premier_quartile = models.FloatField(verbose_name="Premier quartile (%)")
+    troisieme_quartile = models.FloatField(verbose_name="Troisième quartile (%)")
+    score_robuste = models.FloatField(verbose_name="Score robuste")
+    score_absolu = models.FloatField(verbose_name="Score robuste (valeur absolue)")
+    methode = models.CharField(max_length=10, choices=METHODE_CHOICES, verbose_name="Méthode")
+
+    date_detection = models.DateTimeField(auto_now_add=True, verbose_name="Date de détection")
+
+    class Meta:
+        verbose_name = "TEG atypique"
+        verbose_name_plural = "TEG atypiques"
+        ordering = ['-score_absolu']
+        indexes = [
+            # Consultation par soumission et par établissement (écarts les plus forts d'abord)
+            models.Index(fields=['fichier_import', '-score_absolu']),
+            models.Index(fields=['etablissement', '-score_absolu']),
+            # Remplacement des résultats d'une détection (produit, période)
+            models.Index(fields=['produit', 'date_mise_place']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_produit_display()} #{self.pret_id} : TEG {self.teg_declare:.2f}% (médiane {self.teg_median:.2f}%)"
+
 
 # ==========================================
 # MODÈLE POUR LES TOKENS D'INSCRIPTION
@@ -1033,8 +1214,8 @@ class ActionUtilisateur(models.Model):
     # Données supplémentaires (JSON)
     donnees_supplementaires = models.JSONField(null=True, blank=True)
     
-    # Horodatage
-    date_action = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Horodatage (fixé à la création de l'action, même si l'écriture est différée)
+    date_action = models.DateTimeField(default=timezone.now, db_index=True)
     
     class Meta:
         verbose_name = "Action utilisateur"
@@ -1053,7 +1234,10 @@ class ActionUtilisateur(models.Model):
     
     @classmethod
     def enregistrer_action(cls, utilisateur, type_action, description, etablissement=None, request=None, donnees_supplementaires=None):
-        """Méthode utilitaire pour enregistrer une action facilement"""
+        """
+        Méthode utilitaire pour enregistrer une action facilement
+        L'écriture peut être différée selon JOURNAL_MODE (voir cnef/journal.py)
+        """
         adresse_ip = None
         user_agent = None
         
@@ -1068,7 +1252,9 @@ class ActionUtilisateur(models.Model):
             # Récupérer le User-Agent
             user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
         
-        return cls.objects.create(
+        from .journal import enregistrer
+        
+        return enregistrer(cls(
             utilisateur=utilisateur,
             type_action=type_action,
             description=description,
@@ -1076,12 +1262,85 @@ class ActionUtilisateur(models.Model):
             adresse_ip=adresse_ip,
             user_agent=user_agent,
             donnees_supplementaires=donnees_supplementaires
-        )
+        ))
+
+
+class JetonJournal(models.Model):
+    """
+    Index de recherche du journal : un mot normalisé (minuscules, sans accents)
+    de la description d'une action. Utilisé quand la base ne dispose pas
+    d'index FULLTEXT (SQLite) - voir cnef/recherche_journal.py
+    """
+    action = models.ForeignKey(
+        ActionUtilisateur,
+        on_delete=models.CASCADE,
+        related_name='jetons'
+    )
+    jeton = models.CharField(max_length=64)
+    occurrences = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Jeton du journal"
+        verbose_name_plural = "Jetons du journal"
+        indexes = [
+            models.Index(fields=['jeton', 'action']),
+        ]
+
+    def __str__(self):
+        return f"{self.jeton} ({self.action_id})"
 
 # ==========================================
 # MODÈLE HISTORIQUE EMAIL
 # ==========================================
 
+class ContenuEmail(models.Model):
+    """
+    Corps d'un email (HTML + texte), stocké une seule fois et adressé par son
+    empreinte SHA-256 : une notification envoyée à N destinataires ne crée
+    qu'une ligne, référencée par les N lignes de HistoriqueEmail
+    """
+    empreinte = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Empreinte SHA-256"
+    )
+    contenu_html = models.TextField(
+        verbose_name="Contenu HTML de l'email"
+    )
+    contenu_texte = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Contenu texte (fallback)"
+    )
+    date_creation = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Date de création"
+    )
+
+    class Meta:
+        verbose_name = "Contenu d'email"
+        verbose_name_plural = "Contenus d'email"
+
+    def __str__(self):
+        return self.empreinte[:12]
+
+    @staticmethod
+    def calculer_empreinte(contenu_html, contenu_texte):
+        """Empreinte du couple (HTML, texte) ; None et "" restent distincts"""
+        return hashlib.sha256(
+            json.dumps([contenu_html or "", contenu_texte], ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+    @classmethod
+    def obtenir(cls, contenu_html, contenu_texte):
+        """Retourne le contenu existant de même empreinte, ou le crée"""
+        contenu, _ = cls.objects.get_or_create(
+            empreinte=cls.calculer_empreinte(contenu_html, contenu_texte),
+            defaults={'contenu_html': contenu_html or "", 'contenu_texte': contenu_texte}
+        )
+        return contenu
+
+
 class HistoriqueEmail(models.Model):
     """Modèle pour enregistrer l'historique de tous les emails envoyés"""
     
@@ -1093,6 +1352,7 @@ class HistoriqueEmail(models.Model):
     ]
     
     STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente d\'envoi'),
         ('ENVOYE', 'Envoyé avec succès'),
         ('ECHEC', 'Échec d\'envoi'),
     ]
@@ -1114,18 +1374,18 @@ class HistoriqueEmail(models.Model):
         verbose_name="Nom du destinataire"
     )
     
-    # Contenu de l'email
+    # Contenu de l'email (corps partagé, chargé seulement à la lecture)
     objet = models.CharField(
         max_length=255,
         verbose_name="Objet de l'email"
     )
-    contenu_html = models.TextField(
-        verbose_name="Contenu HTML de l'email"
-    )
-    contenu_texte = models.TextField(
-        blank=True,
+    contenu = models.ForeignKey(
+        ContenuEmail,
+        on_delete=models.PROTECT,
         null=True,
-        verbose_name="Contenu texte (fallback)"
+        blank=True,
+        related_name='emails',
+        verbose_name="Contenu de l'email"
     )
     
     # Statut d'envoi
@@ -1141,6 +1401,17 @@ class HistoriqueEmail(models.Model):
         verbose_name="Message d'erreur (si échec)"
     )
     
+    # File d'envoi (cnef/envoi_emails.py)
+    tentatives = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Tentatives d'envoi"
+    )
+    prochaine_tentative = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Prochaine tentative"
+    )
+    
     # Contexte
     utilisateur_envoyeur = models.ForeignKey(
         'User',
@@ -1192,11 +1463,42 @@ class HistoriqueEmail(models.Model):
             models.Index(fields=['type_email']),
             models.Index(fields=['statut']),
             models.Index(fields=['destinataire_email']),
+            models.Index(fields=['statut', 'prochaine_tentative']),
         ]
     
     def __str__(self):
         return f"{self.get_type_email_display()} → {self.destinataire_email} ({self.date_envoi.strftime('%d/%m/%Y %H:%M')})"
     
+    # contenu_html / contenu_texte restent utilisables comme avant
+    # (HistoriqueEmail.objects.create(contenu_html=..., contenu_texte=...)) :
+    # les valeurs sont rattachées à un ContenuEmail lors du save()
+
+    @property
+    def contenu_html(self):
+        if hasattr(self, '_contenu_a_enregistrer'):
+            return self._contenu_a_enregistrer[0]
+        return self.contenu.contenu_html if self.contenu_id else ""
+
+    @contenu_html.setter
+    def contenu_html(self, valeur):
+        self._contenu_a_enregistrer = (valeur, self.contenu_texte)
+
+    @property
+    def contenu_texte(self):
+        if hasattr(self, '_contenu_a_enregistrer'):
+            return self._contenu_a_enregistrer[1]
+        return self.contenu.contenu_texte if self.contenu_id else None
+
+    @contenu_texte.setter
+    def contenu_texte(self, valeur):
+        self._contenu_a_enregistrer = (self.contenu_html, valeur)
+
+    def save(self, *args, **kwargs):
+        if hasattr(self, '_contenu_a_enregistrer'):
+            self.contenu = ContenuEmail.obtenir(*self._contenu_a_enregistrer)
+            del self._contenu_a_enregistrer
+        super().save(*args, **kwargs)
+
     def peut_renvoyer(self):
         """Vérifie si l'email peut être renvoyé"""
         # On peut toujours renvoyer un email
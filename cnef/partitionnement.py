@@ -0,0 +1,208 @@
+"""
+Partitionnement par année des tables de prêts (MySQL)
+
+Les six tables de prêts sont partitionnées RANGE sur l'année de leur date
+de mise en place (migration 0014) : une requête filtrée sur un trimestre
+(calculer_donnees_communique) ou sur une année (filtre `annee` de
+visualiser_base_donnees) ne lit que la partition de l'année concernée.
+
+Partitions :
+- p_invalide : dates nulles ou invalides ; MySQL la parcourt toujours, elle doit rester vide
+- p_anterieur : années antérieures à la première partition annuelle
+- pAAAA : une partition par année
+- p_futur : au-delà de la dernière année (MAXVALUE)
+
+La commande gerer_partitions ajoute la partition de l'année suivante
+(à planifier avant le 1er janvier), supprime ou archive les années
+anciennes et vérifie l'élagage avec EXPLAIN. Sous une autre base que
+MySQL, toutes les opérations sont sans effet.
+"""
+
+import logging
+
+from django.db import connection
+
+from .models import Affacturage, Cautions, Credit_Amortissables, Decouverts, Effets_commerces, Spot
+
+logger = logging.getLogger(__name__)
+
+# (modèle, champ de partitionnement)
+TABLES_PARTITIONNEES = [
+    (Credit_Amortissables, 'DATE_MEP_I03'),
+    (Decouverts, 'DATE_MISE_PLACE_I03'),
+    (Affacturage, 'DATE_MISE_PLACE_I03'),
+    (Cautions, 'DATE_MISE_PLACE_I03'),
+    (Effets_commerces, 'DATE_MISE_PLACE_I03'),
+    (Spot, 'DATE_MEP_I03'),
+]
+
+PARTITION_INVALIDE = 'p_invalide'
+PARTITION_ANTERIEURE = 'p_anterieur'
+PARTITION_FUTURE = 'p_futur'
+
+
+class PartitionnementIndisponible(Exception):
+    """Base sans partitionnement, ou table non partitionnée (migration 0014 non appliquée)"""
+
+
+def partitionnement_disponible():
+    return connection.vendor == 'mysql'
+
+
+def nom_partition(annee):
+    return f'p{annee}'
+
+
+# ==========================================
+# ÉTAT DES PARTITIONS
+# ==========================================
+
+def lister_partitions(modele):
+    """
+    [{'nom', 'borne', 'lignes'}] dans l'ordre des partitions.
+    `borne` est l'année exclue (VALUES LESS THAN), None pour MAXVALUE ;
+    `lignes` est l'estimation d'InnoDB (information_schema).
+    """
+    if not partitionnement_disponible():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """,
+            [modele._meta.db_table]
+        )
+        return [
+            {
+                'nom': nom,
+                'borne': None if description == 'MAXVALUE' else int(description),
+                'lignes': lignes or 0,
+            }
+            for nom, description, lignes in cursor.fetchall()
+        ]
+
+
+def verifier_partitionnee(modele):
+    partitions = lister_partitions(modele)
+    if not partitions:
+        raise PartitionnementIndisponible(
+            f"{modele._meta.db_table} n'est pas partitionnée "
+            f"({'migration 0014 non appliquée' if partitionnement_disponible() else connection.vendor})"
+        )
+    return partitions
+
+
+# ==========================================
+# AJOUT D'ANNÉES
+# ==========================================
+
+def ajouter_annee(modele, annee, simulation=False):
+    """
+    Crée la partition de `annee` (et celles des années manquantes avant elle)
+    en éclatant p_futur. Retourne les noms des partitions créées.
+    """
+    partitions = verifier_partitionnee(modele)
+    noms = {p['nom'] for p in partitions}
+    derniere_borne = max(p['borne'] for p in partitions if p['borne'] is not None)
+    if PARTITION_FUTURE not in noms:
+        raise PartitionnementIndisponible(f"{modele._meta.db_table} : partition {PARTITION_FUTURE} absente")
+    if nom_partition(annee) in noms:
+        return []
+    if annee < derniere_borne:
+        raise ValueError(
+            f"{modele._meta.db_table} : l'année {annee} est couverte par une partition existante "
+            f"(dernière borne {derniere_borne})"
+        )
+
+    nouvelles = [
+        f"PARTITION {nom_partition(a)} VALUES LESS THAN ({a + 1})"
+        for a in range(derniere_borne, annee + 1)
+    ]
+    sql = (
+        f"ALTER TABLE `{modele._meta.db_table}` REORGANIZE PARTITION {PARTITION_FUTURE} INTO "
+        f"({', '.join(nouvelles)}, PARTITION {PARTITION_FUTURE} VALUES LESS THAN MAXVALUE)"
+    )
+    if not simulation:
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+        logger.info(f"Partitionnement : {sql}")
+    return [nom_partition(a) for a in range(derniere_borne, annee + 1)]
+
+
+# ==========================================
+# SUPPRESSION ET ARCHIVAGE
+# ==========================================
+
+def nom_table_archive(modele, partition):
+    return f"{modele._meta.db_table}_archive_{partition.lstrip('p').lstrip('_')}"
+
+
+def supprimer_annees_avant(modele, annee, archiver=False, simulation=False):
+    """
+    Supprime les partitions des années antérieures à `annee` (p_anterieur
+    comprise, p_invalide jamais). Avec `archiver`, chaque partition est
+    d'abord échangée (EXCHANGE PARTITION, sans copie de lignes) avec une
+    table <table>_archive_<année> non partitionnée.
+    Retourne [{'nom', 'lignes', 'archive'}].
+    """
+    table = modele._meta.db_table
+    a_supprimer = [
+        p for p in verifier_partitionnee(modele)
+        if p['nom'] != PARTITION_INVALIDE and p['borne'] is not None and p['borne'] <= annee
+    ]
+
+    resultat = []
+    for partition in a_supprimer:
+        archive = nom_table_archive(modele, partition['nom']) if archiver else None
+        instructions = []
+        if archive:
+            instructions += [
+                f"CREATE TABLE `{archive}` LIKE `{table}`",
+                f"ALTER TABLE `{archive}` REMOVE PARTITIONING",
+                f"ALTER TABLE `{table}` EXCHANGE PARTITION {partition['nom']} WITH TABLE `{archive}`",
+            ]
+        instructions.append(f"ALTER TABLE `{table}` DROP PARTITION {partition['nom']}")
+
+        if not simulation:
+            with connection.cursor() as cursor:
+                for sql in instructions:
+                    cursor.execute(sql)
+            logger.info(
+                f"Partitionnement : {table}.{partition['nom']} supprimée "
+                f"({partition['lignes']} lignes{f', archivées dans {archive}' if archive else ''})"
+            )
+        resultat.append({'nom': partition['nom'], 'lignes': partition['lignes'], 'archive': archive})
+    return resultat
+
+
+# ==========================================
+# VÉRIFICATION DE L'ÉLAGAGE
+# ==========================================
+
+def expliquer(queryset):
+    """
+    Plan d'exécution MySQL du queryset : [{colonne: valeur}] par table lue.
+    La colonne `partitions` liste les partitions parcourues.
+    """
+    if not partitionnement_disponible():
+        return []
+    sql, params = queryset.query.sql_with_params()
+    # MySQL 8 affiche toujours les partitions ; EXPLAIN PARTITIONS pour MySQL 5.7 et MariaDB
+    prefixe = 'EXPLAIN' if connection.mysql_version >= (8,) and not connection.mysql_is_mariadb else 'EXPLAIN PARTITIONS'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefixe} {sql}', params)
+        colonnes = [colonne[0] for colonne in cursor.description]
+        return [dict(zip(colonnes, ligne)) for ligne in cursor.fetchall()]
+
+
+def partitions_parcourues(queryset):
+    """Partitions de la table du queryset lues par MySQL pour l'exécuter"""
+    table = queryset.model._meta.db_table
+    parcourues = set()
+    for ligne in expliquer(queryset):
+        if ligne.get('table') == table and ligne.get('partitions'):
+            parcourues.update(ligne['partitions'].split(','))
+    return parcourues
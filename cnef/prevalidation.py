@@ -0,0 +1,271 @@
+"""
+Pré-validation structurelle des soumissions, au moment de l'upload
+
+Un classeur mal structuré (aucune feuille de produit, pas d'en-tête,
+colonnes manquantes) n'était découvert qu'à l'ouverture de la soumission
+par un valideur. Le contrôle est désormais fait à l'upload, sans charger le
+classeur : un .xlsx est une archive zip, dont on ne lit que
+- xl/workbook.xml et ses relations (noms des feuilles, fichiers XML associés)
+- le début de chaque feuille : balise <dimension> et premières lignes,
+  lues en flux (iterparse) puis abandonnées
+
+La durée ne dépend donc pas de la taille du fichier. Les feuilles sont
+classées par identifier_type_feuille() comme à l'import, et la largeur de
+l'en-tête est comparée au nombre de colonnes attendu par les extracteurs.
+
+Les soumissions CSV (.csv, .zip de .csv) sont contrôlées de la même façon
+sur leurs premières lignes ; les anciens classeurs .xls (binaires) ne sont
+pas pré-validés.
+"""
+
+import logging
+import posixpath
+import re
+import time
+import zipfile
+from xml.etree import ElementTree
+
+from django.conf import settings
+
+from .classeur_csv import est_soumission_csv, charger_classeur
+from .utils import CORRESPONDANCE_FEUILLES, identifier_type_feuille
+
+logger = logging.getLogger(__name__)
+
+# Nombre de colonnes lues par les fonctions extraire_* (lignes plus courtes rejetées)
+COLONNES_ATTENDUES = {
+    'credits': 26,
+    'spot': 26,
+    'decouverts': 17,
+    'affacturages': 14,
+    'cautions': 14,
+    'effets': 15,
+}
+
+LIBELLES_PRODUITS = {
+    'credits': 'Crédits amortissables',
+    'decouverts': 'Découverts',
+    'affacturages': 'Affacturage',
+    'cautions': 'Cautions',
+    'effets': 'Effets de commerce',
+    'spot': 'Spot',
+}
+
+# Même fenêtre que trouver_entete() : l'en-tête est la première ligne non vide
+LIGNES_ENTETE = 10
+
+TYPE_WORKSHEET = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+
+
+def _local(nom):
+    """Nom d'une balise ou d'un attribut sans son espace de noms"""
+    return nom.rsplit('}', 1)[-1]
+
+
+def _index_colonne(reference):
+    """'AB12' -> 28 (colonnes numérotées à partir de 1)"""
+    index = 0
+    for caractere in reference:
+        if not caractere.isalpha():
+            break
+        index = index * 26 + (ord(caractere.upper()) - 64)
+    return index
+
+
+def _lignes_dimension(reference):
+    """'A1:Z931' -> 931 ; None si la balise est absente ou illisible"""
+    if not reference:
+        return None
+    correspondance = re.search(r'(\d+)$', reference.split(':')[-1])
+    return int(correspondance.group(1)) if correspondance else None
+
+
+# ==========================================
+# LECTURE DU CLASSEUR (.xlsx)
+# ==========================================
+
+def lister_feuilles_xlsx(archive):
+    """[(nom de feuille, chemin du XML dans l'archive)] d'après xl/workbook.xml"""
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    try:
+        relations = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    except KeyError:
+        relations = None
+
+    cibles = {}
+    if relations is not None:
+        for relation in relations:
+            if relation.get('Type', '').endswith('/worksheet') or relation.get('Type') == TYPE_WORKSHEET:
+                cible = relation.get('Target', '')
+                chemin = cible.lstrip('/') if cible.startswith('/') else posixpath.normpath(posixpath.join('xl', cible))
+                cibles[relation.get('Id')] = chemin
+
+    feuilles = []
+    for element in workbook.iter():
+        if _local(element.tag) != 'sheet':
+            continue
+        identifiant = next((v for k, v in element.attrib.items() if _local(k) == 'id'), None)
+        if identifiant in cibles:
+            feuilles.append((element.get('name', ''), cibles[identifiant]))
+    return feuilles
+
+
+def lire_debut_feuille(archive, chemin, nb_lignes=LIGNES_ENTETE):
+    """
+    Lit en flux le début du XML d'une feuille.
+    Retourne (lignes déclarées par <dimension>, [largeur des nb_lignes premières lignes]) ;
+    la largeur d'une ligne est l'indice de sa dernière cellule non vide (0 si vide).
+    """
+    lignes_dimension = None
+    largeurs = []
+    numero_ligne = 0
+    largeur = 0
+    colonne = 0
+    cellule_non_vide = False
+
+    with archive.open(chemin) as flux:
+        for evenement, element in ElementTree.iterparse(flux, events=('start', 'end')):
+            balise = _local(element.tag)
+            if evenement == 'start':
+                if balise == 'dimension':
+                    lignes_dimension = _lignes_dimension(element.get('ref'))
+                elif balise == 'row':
+                    numero = int(element.get('r') or numero_ligne + 1)
+                    # Lignes vides omises du XML
+                    largeurs.extend([0] * max(0, min(numero, nb_lignes + 1) - numero_ligne - 1))
+                    numero_ligne = numero
+                    if numero_ligne > nb_lignes:
+                        break
+                    largeur = 0
+                    colonne = 0
+                elif balise == 'c':
+                    reference = element.get('r')
+                    colonne = _index_colonne(reference) if reference else colonne + 1
+                    cellule_non_vide = False
+                continue
+
+            if balise in ('v', 't') and (element.text or '').strip():
+                cellule_non_vide = True
+            elif balise == 'c':
+                if cellule_non_vide:
+                    largeur = colonne
+                element.clear()
+            elif balise == 'row':
+                largeurs.append(largeur)
+                element.clear()
+            elif balise == 'sheetData':
+                break
+
+    return lignes_dimension, largeurs[:nb_lignes]
+
+
+def inventorier_xlsx(fichier):
+    """[{nom, lignes, largeurs}] pour chaque feuille d'un .xlsx"""
+    fichier.seek(0)
+    with zipfile.ZipFile(fichier) as archive:
+        inventaire = []
+        for nom, chemin in lister_feuilles_xlsx(archive):
+            lignes, largeurs = lire_debut_feuille(archive, chemin)
+            inventaire.append({'nom': nom, 'lignes': lignes, 'largeurs': largeurs})
+        return inventaire
+
+
+def inventorier_csv(fichier):
+    """Même inventaire pour une soumission CSV (premières lignes de chaque fichier)"""
+    fichier.seek(0)
+    classeur = charger_classeur(fichier)
+    try:
+        inventaire = []
+        for feuille in classeur.worksheets:
+            largeurs = []
+            for ligne in feuille.iter_rows(max_row=LIGNES_ENTETE, values_only=True):
+                largeurs.append(max((i + 1 for i, v in enumerate(ligne) if v not in (None, '')), default=0))
+            inventaire.append({'nom': feuille.title, 'lignes': None, 'largeurs': largeurs})
+        return inventaire
+    finally:
+        classeur.close()
+
+
+# ==========================================
+# CONTRÔLES
+# ==========================================
+
+def prevalider_soumission(fichier):
+    """
+    Contrôle structurel d'une soumission (UploadedFile ou File ouvert).
+    Retourne {'valide', 'erreurs', 'avertissements', 'feuilles', 'duree_ms'} ;
+    une soumission non valide doit être refusée à l'upload.
+    """
+    debut = time.perf_counter()
+    resultat = {'valide': True, 'erreurs': [], 'avertissements': [], 'feuilles': [], 'duree_ms': 0}
+    nom = getattr(fichier, 'name', '') or ''
+
+    if not getattr(settings, 'PREVALIDATION_SOUMISSIONS', True) or nom.lower().endswith('.xls'):
+        return resultat
+
+    try:
+        if est_soumission_csv(nom):
+            inventaire = inventorier_csv(fichier)
+        else:
+            inventaire = inventorier_xlsx(fichier)
+    except Exception as e:
+        # Archive corrompue, XML invalide, membre manquant...
+        logger.info(f"Pré-validation de {nom} : archive illisible ({e})")
+        resultat['erreurs'].append(
+            "Le fichier n'est pas un classeur Excel (.xlsx) ou une archive de fichiers CSV lisible"
+        )
+        inventaire = []
+    finally:
+        fichier.seek(0)
+
+    types_trouves = set()
+    for feuille in inventaire:
+        type_feuille = identifier_type_feuille(feuille['nom'], CORRESPONDANCE_FEUILLES)
+        largeurs = feuille['largeurs']
+        ligne_entete = next((i for i, largeur in enumerate(largeurs, start=1) if largeur), None)
+        resume = {
+            'nom': feuille['nom'],
+            'type': type_feuille,
+            'lignes': feuille['lignes'],
+            'colonnes_entete': largeurs[ligne_entete - 1] if ligne_entete else 0,
+        }
+        resultat['feuilles'].append(resume)
+
+        if type_feuille is None:
+            resultat['avertissements'].append(f"Feuille « {feuille['nom']} » non reconnue : elle sera ignorée")
+            continue
+        types_trouves.add(type_feuille)
+
+        attendues = COLONNES_ATTENDUES[type_feuille]
+        if ligne_entete is None:
+            if feuille['lignes'] and feuille['lignes'] > LIGNES_ENTETE:
+                resultat['erreurs'].append(
+                    f"Feuille « {feuille['nom']} » : aucune ligne d'en-tête dans les {LIGNES_ENTETE} premières lignes"
+                )
+            else:
+                resultat['avertissements'].append(f"Feuille « {feuille['nom']} » vide")
+        elif resume['colonnes_entete'] < attendues:
+            resultat['erreurs'].append(
+                f"Feuille « {feuille['nom']} » ({LIBELLES_PRODUITS[type_feuille]}) : "
+                f"{resume['colonnes_entete']} colonne(s) dans l'en-tête (ligne {ligne_entete}), {attendues} attendues"
+            )
+
+    if inventaire and not types_trouves:
+        resultat['erreurs'].append(
+            "Aucune feuille de produit reconnue (Crédits amortissables, Découverts, Affacturage, "
+            "Cautions, Effets de commerce, Spot)"
+        )
+    elif inventaire:
+        manquants = [libelle for t, libelle in LIBELLES_PRODUITS.items() if t not in types_trouves]
+        if manquants:
+            resultat['avertissements'].append(f"Feuille(s) absente(s) : {', '.join(manquants)}")
+    elif not resultat['erreurs']:
+        resultat['erreurs'].append("Le fichier ne contient aucune feuille")
+
+    resultat['valide'] = not resultat['erreurs']
+    resultat['duree_ms'] = round((time.perf_counter() - debut) * 1000, 1)
+    return resultat
+
+
+def message_refus(resultat):
+    return 'Fichier refusé : ' + ' ; '.join(resultat['erreurs'])
@@ -0,0 +1,169 @@
+"""
+Recherche plein texte dans le journal des actions (paramètre `search`)
+
+- MySQL : index FULLTEXT sur ActionUtilisateur.description,
+  interrogé par MATCH ... AGAINST en mode booléen
+- autres bases (SQLite en test) : table d'index JetonJournal alimentée
+  à l'écriture des actions, interrogée par préfixe
+
+Dans les deux cas :
+- chaque mot recherché doit être présent (recherche par préfixe : "valid" trouve "validation")
+- les actions dont l'utilisateur correspond par nom ou prénom sont aussi retenues
+- une annotation `pertinence` permet le tri par pertinence
+Les autres filtres (type, utilisateur, établissement, dates) restent de simples
+filter() sur le queryset et se composent librement avec la recherche.
+"""
+
+import logging
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import Func
+from django.db.models.functions import Coalesce
+
+from .models import JetonJournal, User
+
+logger = logging.getLogger(__name__)
+
+# Longueur minimale d'un mot indexé (innodb_ft_min_token_size vaut 3 par défaut)
+LONGUEUR_MIN_JETON = 3
+LONGUEUR_MAX_JETON = 64
+
+
+# ==========================================
+# NORMALISATION
+# ==========================================
+
+def normaliser_texte(texte):
+    """Minuscules et suppression des accents"""
+    decompose = unicodedata.normalize('NFKD', str(texte or ''))
+    return ''.join(c for c in decompose if not unicodedata.combining(c)).lower()
+
+
+def extraire_jetons(texte):
+    """Découpe un texte en mots normalisés indexables"""
+    return [
+        mot[:LONGUEUR_MAX_JETON]
+        for mot in re.split(r'\W+', normaliser_texte(texte))
+        if len(mot) >= LONGUEUR_MIN_JETON
+    ]
+
+
+def utiliser_fulltext():
+    """Vrai si la recherche passe par l'index FULLTEXT MySQL"""
+    return (
+        getattr(settings, 'JOURNAL_RECHERCHE_FULLTEXT', True)
+        and connection.vendor == 'mysql'
+    )
+
+
+# ==========================================
+# INDEX DE JETONS (BASES SANS FULLTEXT)
+# ==========================================
+
+def indexer_actions(actions):
+    """Alimente JetonJournal pour des actions déjà enregistrées"""
+    if utiliser_fulltext():
+        return 0
+
+    jetons = []
+    for action in actions:
+        # bulk_create ne renvoie pas toujours les clés primaires
+        if action.pk is None:
+            continue
+        for jeton, nb in Counter(extraire_jetons(action.description)).items():
+            jetons.append(JetonJournal(action_id=action.pk, jeton=jeton, occurrences=min(nb, 32767)))
+
+    JetonJournal.objects.bulk_create(jetons, batch_size=1000)
+    return len(jetons)
+
+
+def indexer_action_creee(sender, instance, created, **kwargs):
+    """Récepteur post_save d'ActionUtilisateur"""
+    if created:
+        try:
+            indexer_actions([instance])
+        except Exception as e:
+            logger.warning(f"Recherche journal : indexation de l'action {instance.pk} impossible: {e}")
+
+
+# ==========================================
+# EXPRESSION MATCH ... AGAINST
+# ==========================================
+
+class CorrespondanceTexte(Func):
+    """MATCH (colonne) AGAINST (requête IN BOOLEAN MODE), score de pertinence MySQL"""
+    template = 'MATCH (%(colonne)s) AGAINST (%(requete)s IN BOOLEAN MODE)'
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        colonne, requete = self.get_source_expressions()
+        sql_colonne, params_colonne = compiler.compile(colonne)
+        sql_requete, params_requete = compiler.compile(requete)
+        return self.template % {'colonne': sql_colonne, 'requete': sql_requete}, (*params_colonne, *params_requete)
+
+
+# ==========================================
+# RECHERCHE
+# ==========================================
+
+def rechercher_journal(actions, texte):
+    """
+    Applique la recherche `texte` au queryset d'ActionUtilisateur et
+    l'annote avec `pertinence` (0 pour les actions retenues par le seul nom d'utilisateur)
+    """
+    texte = (texte or '').strip()
+    jetons = extraire_jetons(texte)
+
+    # Utilisateurs correspondants : table petite, le LIKE y reste bon marché
+    utilisateurs = User.objects.filter(
+        Q(nom__icontains=texte) | Q(prenom__icontains=texte)
+    ).values('pk')
+
+    # Aucun mot indexable (ex. "AB") : ancien comportement
+    if not jetons:
+        return actions.filter(
+            Q(description__icontains=texte) | Q(utilisateur__in=utilisateurs)
+        ).annotate(pertinence=Value(0.0, output_field=FloatField()))
+
+    if utiliser_fulltext():
+        requete = ' '.join(f'+{jeton}*' for jeton in jetons)
+        actions = actions.annotate(
+            pertinence=CorrespondanceTexte('description', Value(requete))
+        )
+        return actions.filter(Q(pertinence__gt=0) | Q(utilisateur__in=utilisateurs))
+
+    # Index de jetons : chaque mot doit préfixer au moins un jeton de l'action
+    correspondances = Q()
+    for jeton in jetons:
+        correspondances |= Q(jeton__startswith=jeton)
+
+    condition_description = Q()
+    for jeton in jetons:
+        condition_description &= Q(
+            pk__in=JetonJournal.objects.filter(jeton__startswith=jeton).values('action_id')
+        )
+
+    score = (
+        JetonJournal.objects
+        .filter(correspondances, action=OuterRef('pk'))
+        .order_by()
+        .values('action')
+        .annotate(total=Sum('occurrences'))
+        .values('total')
+    )
+    actions = actions.annotate(
+        pertinence=Coalesce(Subquery(score, output_field=FloatField()), Value(0.0))
+    )
+    return actions.filter(condition_description | Q(utilisateur__in=utilisateurs))
+
+
+def trier_journal(actions, texte, tri=''):
+    """Tri par pertinence quand une recherche est active (sauf tri=date demandé)"""
+    if texte and tri != 'date':
+        return actions.order_by('-pertinence', '-date_action')
+    return actions.order_by('-date_action')
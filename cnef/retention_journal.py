@@ -0,0 +1,244 @@
+"""
+Moteur de rétention du journal des actions (ActionUtilisateur)
+
+La suppression ne passe plus par un unique queryset.delete() qui verrouille
+la table sur des millions de lignes :
+- l'ensemble à supprimer est figé par un instantané (nombre + clé primaire maximale),
+  partagé par le comptage affiché dans l'interface et la suppression effective
+- les lignes sont supprimées par lots bornés par la clé primaire, avec une pause
+  entre les lots pour laisser passer les autres écritures
+- les lignes peuvent d'abord être archivées en JSONL compressé (gzip),
+  un fichier par mois : journal_AAAA_MM.jsonl.gz
+- un point de reprise (reprise_suppression.json, dans le dossier des archives)
+  enregistre le dernier lot archivé : si le processus s'arrête en cours de
+  route, la suppression suivante supprime ce lot sans le réarchiver et
+  reprend après la dernière clé primaire traitée
+- la progression est publiée dans le cache pour être suivie depuis l'interface
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from .models import ActionUtilisateur
+from .taches_arriere_plan import SuiviTaches
+
+logger = logging.getLogger(__name__)
+
+suivi = SuiviTaches('journal:retention:', 'retention-journal')
+publier_progression = suivi.publier
+lire_progression = suivi.lire
+
+# Champs écrits dans les archives
+CHAMPS_ARCHIVE = [
+    'id', 'date_action', 'type_action', 'description', 'utilisateur_id',
+    'utilisateur__email', 'etablissement_id', 'adresse_ip', 'user_agent',
+    'donnees_supplementaires',
+]
+
+
+# ==========================================
+# INSTANTANÉ DE L'ENSEMBLE À SUPPRIMER
+# ==========================================
+
+def instantane_suppression(queryset):
+    """
+    Fige l'ensemble à supprimer : nombre de lignes et bornes de clé primaire.
+    Les actions enregistrées après l'instantané (dont celle qui journalise la
+    suppression elle-même) ne sont pas concernées.
+    """
+    resultat = queryset.order_by().aggregate(
+        nombre=Count('pk'), pk_min=Min('pk'), pk_max=Max('pk')
+    )
+    return resultat
+
+
+# ==========================================
+# ARCHIVAGE
+# ==========================================
+
+def dossier_archives():
+    return getattr(
+        settings, 'JOURNAL_RETENTION_DOSSIER',
+        os.path.join(settings.BASE_DIR, 'archives', 'journal')
+    )
+
+
+def archiver_lignes(lignes, dossier):
+    """
+    Ajoute les lignes aux archives mensuelles (un membre gzip par lot).
+    Retourne le nombre de lignes archivées.
+    """
+    os.makedirs(dossier, exist_ok=True)
+
+    par_mois = {}
+    for ligne in lignes:
+        par_mois.setdefault(ligne['date_action'].strftime('%Y_%m'), []).append(ligne)
+
+    for mois, lignes_mois in par_mois.items():
+        chemin = os.path.join(dossier, f'journal_{mois}.jsonl.gz')
+        contenu = ''.join(
+            json.dumps(ligne, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+            for ligne in lignes_mois
+        )
+        # Le mode ajout produit un gzip multi-membres, lisible d'un seul tenant
+        with gzip.open(chemin, 'at', encoding='utf-8') as f:
+            f.write(contenu)
+            f.flush()
+            os.fsync(f.fileno())
+
+    return len(lignes)
+
+
+# ==========================================
+# POINT DE REPRISE
+# ==========================================
+
+def fichier_reprise(dossier):
+    return os.path.join(dossier, 'reprise_suppression.json')
+
+
+def lire_reprise(dossier):
+    """Point de reprise d'une suppression interrompue (None s'il n'y en a pas)"""
+    try:
+        with open(fichier_reprise(dossier), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def ecrire_reprise(dossier, reprise):
+    os.makedirs(dossier, exist_ok=True)
+    chemin = fichier_reprise(dossier)
+    # Écriture atomique : un arrêt pendant l'écriture laisse l'ancien point de reprise
+    with open(chemin + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(reprise, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(chemin + '.tmp', chemin)
+
+
+def effacer_reprise(dossier):
+    try:
+        os.remove(fichier_reprise(dossier))
+    except FileNotFoundError:
+        pass
+
+
+def cle_suppression(queryset, pk_max):
+    """Identifie une suppression (mêmes critères, même instantané)"""
+    return hashlib.md5(f"{queryset.query}|{pk_max}".encode()).hexdigest()
+
+
+# ==========================================
+# SUPPRESSION PAR LOTS
+# ==========================================
+
+def supprimer_par_lots(queryset, pk_max, taille_lot=None, pause=None,
+                       archiver=None, dossier=None, progression=None):
+    """
+    Supprime (et archive si demandé) les lignes du queryset dont la clé
+    primaire est <= pk_max, par lots bornés par la clé primaire.
+    `progression(supprimes, archives)` est appelée après chaque lot.
+    Termine d'abord le lot archivé d'une suppression interrompue, puis
+    reprend la même suppression après sa dernière clé primaire traitée.
+    """
+    taille_lot = taille_lot or getattr(settings, 'JOURNAL_RETENTION_TAILLE_LOT', 5000)
+    pause = getattr(settings, 'JOURNAL_RETENTION_PAUSE', 0.2) if pause is None else pause
+    archiver = getattr(settings, 'JOURNAL_RETENTION_ARCHIVER', True) if archiver is None else archiver
+    dossier = dossier or dossier_archives()
+
+    base = queryset.order_by('pk').filter(pk__lte=pk_max)
+    cle = cle_suppression(queryset, pk_max)
+    dernier_pk = 0
+    supprimes = 0
+    archives = 0
+
+    reprise = lire_reprise(dossier)
+    if reprise:
+        # Lot archivé mais pas encore supprimé lors de l'arrêt : le supprimer sans le réarchiver
+        if reprise['en_attente']:
+            with transaction.atomic():
+                supprimes, _ = ActionUtilisateur.objects.filter(pk__in=reprise['en_attente']).delete()
+        if reprise['cle'] == cle:
+            dernier_pk = reprise['dernier_pk']
+        logger.info(
+            f"Rétention du journal : reprise après la clé {reprise['dernier_pk']} "
+            f"({supprimes} action(s) déjà archivée(s) supprimée(s))"
+        )
+        effacer_reprise(dossier)
+
+    while True:
+        if archiver:
+            lignes = list(base.filter(pk__gt=dernier_pk).values(*CHAMPS_ARCHIVE)[:taille_lot])
+            pks = [ligne['id'] for ligne in lignes]
+        else:
+            pks = list(base.filter(pk__gt=dernier_pk).values_list('pk', flat=True)[:taille_lot])
+        if not pks:
+            break
+
+        # Archiver avant de supprimer : une archive incomplète est préférable
+        # à des lignes supprimées sans trace
+        if archiver:
+            archives += archiver_lignes(lignes, dossier)
+            ecrire_reprise(dossier, {'cle': cle, 'dernier_pk': pks[-1], 'en_attente': pks})
+
+        with transaction.atomic():
+            nb, _ = ActionUtilisateur.objects.filter(pk__in=pks).delete()
+        supprimes += nb
+        dernier_pk = pks[-1]
+        ecrire_reprise(dossier, {'cle': cle, 'dernier_pk': dernier_pk, 'en_attente': []})
+
+        if progression:
+            progression(supprimes, archives)
+
+        if len(pks) < taille_lot:
+            break
+        if pause:
+            time.sleep(pause)
+
+    effacer_reprise(dossier)
+    return {'supprimes': supprimes, 'archives': archives}
+
+
+# ==========================================
+# SUIVI DE PROGRESSION
+# ==========================================
+
+def executer_suppression(queryset, instantane, tache_id=None, **options):
+    """Exécute la suppression en publiant sa progression sous `tache_id`"""
+    tache_id = tache_id or uuid.uuid4().hex
+    total = instantane['nombre']
+
+    def progression(supprimes, archives):
+        publier_progression(
+            tache_id, supprimes=supprimes, archives=archives,
+            pourcentage=round(supprimes * 100 / total, 1) if total else 100,
+        )
+
+    publier_progression(tache_id, statut='EN_COURS', total=total, supprimes=0, archives=0, pourcentage=0)
+    try:
+        resultat = supprimer_par_lots(queryset, instantane['pk_max'], progression=progression, **options)
+        publier_progression(tache_id, statut='TERMINE', pourcentage=100, **resultat)
+        return resultat
+    except Exception as e:
+        logger.error(f"Rétention du journal : échec de la suppression {tache_id}: {e}")
+        publier_progression(tache_id, statut='ECHEC', message=str(e))
+        raise
+
+
+def lancer_suppression_arriere_plan(queryset, instantane, **options):
+    """Lance la suppression dans un thread et retourne l'identifiant de suivi"""
+    return suivi.lancer(
+        lambda tache_id: executer_suppression(queryset, instantane, tache_id=tache_id, **options),
+        total=instantane['nombre'], supprimes=0, archives=0, pourcentage=0,
+    )
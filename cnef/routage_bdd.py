@@ -0,0 +1,123 @@
+"""
+Routage des lectures lourdes vers la base de reporting (réplica en lecture)
+
+Les calculs du communiqué, la visualisation et les exports de la base des
+prêts, les exports du journal et la vérification des TEG lisent beaucoup et
+n'écrivent rien : quand l'alias `reporting` est configuré (DB_REPORTING_*),
+leurs lectures partent vers le réplica au lieu de concurrencer les imports
+et les connexions sur la base principale.
+
+- les fonctions concernées sont décorées par @lecture_reporting ; hors de
+  ces fonctions, rien ne change (lectures et écritures sur `default`)
+- les écritures vont toujours sur `default`, y compris depuis une fonction
+  décorée
+- lecture de ses propres écritures : après une validation (unitaire ou groupée),
+  marquer_ecriture(request) renvoie les lectures de la session vers
+  `default` pendant DB_REPORTING_DELAI_COLLANT secondes, le temps que le
+  réplica rattrape son retard (LectureCollanteMiddleware)
+
+Sans alias `reporting` (développement, tests), toutes les lectures restent
+sur `default`. Le routage ne dépend que des alias : deux bases SQLite
+suffisent pour l'essayer localement, avec DB_ENGINE et DB_REPORTING_ENGINE
+à django.db.backends.sqlite3 (le réplica lit par défaut le fichier de la base
+principale : il n'est jamais migré). Dans les tests, le réplica est un miroir
+de la base de test principale (RoutageReportingTests).
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+ALIAS_REPORTING = 'reporting'
+CLE_SESSION = '_lecture_principale_jusqu_a'
+
+# Base des lectures dans le contexte courant (None = routage par défaut)
+_base_lecture = ContextVar('cnef_base_lecture', default=None)
+# Lectures forcées sur la base principale (écriture récente de la session)
+_lecture_principale = ContextVar('cnef_lecture_principale', default=False)
+
+
+def reporting_configure():
+    return ALIAS_REPORTING in settings.DATABASES
+
+
+class RouteurReporting:
+    """Routeur Django (DATABASE_ROUTERS)"""
+
+    def db_for_read(self, model, **hints):
+        # Sessions, permissions... restent sur la base principale
+        if model._meta.app_label != 'cnef':
+            return None
+        return _base_lecture.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Même données des deux côtés : un objet lu sur le réplica peut être
+        # rattaché à un objet de la base principale
+        bases = {'default', ALIAS_REPORTING}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Le réplica reçoit le schéma par la réplication
+        if db == ALIAS_REPORTING:
+            return False
+        return None
+
+
+# ==========================================
+# LECTURES SUR LE RÉPLICA
+# ==========================================
+
+@contextmanager
+def base_reporting():
+    """Dans ce bloc, les lectures vont sur le réplica (sauf écriture récente de la session)"""
+    alias = ALIAS_REPORTING if reporting_configure() and not _lecture_principale.get() else None
+    jeton = _base_lecture.set(alias)
+    try:
+        yield alias or 'default'
+    finally:
+        _base_lecture.reset(jeton)
+
+
+def lecture_reporting(fonction):
+    """Décorateur : les lectures de la fonction (vue ou calcul) vont sur le réplica"""
+    @wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        with base_reporting():
+            return fonction(*args, **kwargs)
+    return enveloppe
+
+
+# ==========================================
+# LECTURE DE SES PROPRES ÉCRITURES
+# ==========================================
+
+def marquer_ecriture(request):
+    """
+    À appeler après une écriture dont l'utilisateur doit voir l'effet
+    (validation) : ses lectures restent sur la base principale
+    pendant DB_REPORTING_DELAI_COLLANT secondes
+    """
+    _lecture_principale.set(True)
+    if reporting_configure() and hasattr(request, 'session'):
+        request.session[CLE_SESSION] = time.time() + settings.DB_REPORTING_DELAI_COLLANT
+
+
+@contextmanager
+def lecture_principale_si_recente(request):
+    """Utilisé par LectureCollanteMiddleware pour la durée de la requête"""
+    recente = False
+    if reporting_configure() and hasattr(request, 'session'):
+        recente = request.session.get(CLE_SESSION, 0) > time.time()
+    jeton = _lecture_principale.set(recente)
+    try:
+        yield recente
+    finally:
+        _lecture_principale.reset(jeton)
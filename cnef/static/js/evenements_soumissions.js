@@ -0,0 +1,61 @@
+// ==================== ÉVÉNEMENTS DES SOUMISSIONS ====================
+// Changements de statut des soumissions et compteurs à jour, poussés par le
+// serveur (voir cnef/evenements.py) : flux SSE sous ASGI, attente longue sinon.
+//
+//   ecouterEvenementsSoumissions(surEvenement, surResynchronisation)
+//
+// surEvenement(evenement) : {action, fichier, compteurs}
+//   action : depot | validation | rejet | erreur | suppression | statut
+//   compteurs : {total, en_attente, reussis, rejetes, erreurs}
+// surResynchronisation() : des événements ont été perdus, recharger les données
+
+function ecouterEvenementsSoumissions(surEvenement, surResynchronisation) {
+    let dernierId = null;
+
+    function traiter(evenement) {
+        dernierId = evenement.id;
+        if (evenement.type === 'resynchronisation') {
+            if (surResynchronisation) surResynchronisation();
+        } else {
+            surEvenement(evenement);
+        }
+    }
+
+    async function attenteLongue() {
+        while (true) {
+            try {
+                const url = dernierId === null
+                    ? '/api/evenements/attente/'
+                    : `/api/evenements/attente/?depuis=${dernierId}`;
+                const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+                // Session expirée (redirection vers la connexion) ou accès refusé
+                if (response.redirected || response.status === 403) return;
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+                const data = await response.json();
+                data.evenements.forEach(traiter);
+                dernierId = data.dernier_id;
+            } catch (error) {
+                console.error('Événements des soumissions :', error);
+                await new Promise(resolve => setTimeout(resolve, 5000));
+            }
+        }
+    }
+
+    if (!window.EventSource) {
+        attenteLongue();
+        return;
+    }
+
+    const source = new EventSource('/api/evenements/flux/');
+    ['soumission', 'resynchronisation'].forEach(type => {
+        source.addEventListener(type, e => traiter(JSON.parse(e.data)));
+    });
+    source.onerror = () => {
+        // Le navigateur se reconnecte seul (Last-Event-ID) ; la source n'est
+        // fermée que sur un 204 (serveur WSGI) ou un refus : attente longue
+        if (source.readyState === EventSource.CLOSED) {
+            attenteLongue();
+        }
+    };
+}
@@ -31,13 +31,39 @@
                     document.getElementById('stat-rejetees').textContent = data.stats.rejetees;
                     document.getElementById('stat-utilisateurs').textContent = data.stats.utilisateurs_actifs;
                     
-                    afficherDernieresSoumissions(data.dernieres_soumissions);
+                    dernieresSoumissions = data.dernieres_soumissions;
+                    afficherDernieresSoumissions(dernieresSoumissions);
                 }
             } catch (error) {
                 console.error('Erreur:', error);
             }
         }
 
+        // Soumissions et compteurs de l'établissement poussés par le serveur
+        // (evenements_soumissions.js) : le tableau de bord n'est plus rechargé
+        let dernieresSoumissions = [];
+
+        function appliquerEvenementSoumission(evenement) {
+            const stats = evenement.compteurs;
+            document.getElementById('stat-total-soumissions').textContent = stats.total;
+            document.getElementById('stat-en-attente').textContent = stats.en_attente;
+            document.getElementById('stat-validees').textContent = stats.reussis;
+            document.getElementById('stat-rejetees').textContent = stats.rejetes;
+
+            const fichier = evenement.fichier;
+            const existant = dernieresSoumissions.find(s => s.id === fichier.id);
+            if (evenement.action === 'suppression') {
+                dernieresSoumissions = dernieresSoumissions.filter(s => s.id !== fichier.id);
+            } else if (existant) {
+                Object.assign(existant, fichier);
+            } else if (evenement.action === 'depot') {
+                dernieresSoumissions = [{ total_lignes: 0, ...fichier }].concat(dernieresSoumissions).slice(0, 5);
+            }
+            afficherDernieresSoumissions(dernieresSoumissions);
+        }
+
+        ecouterEvenementsSoumissions(appliquerEvenementSoumission, chargerDashboard);
+
         function afficherDernieresSoumissions(soumissions) {
             const tbody = document.querySelector('#table-dernieres-soumissions tbody');
             
@@ -61,15 +87,23 @@
             `).join('');
         }
 
-        async function chargerHistorique() {
+        // Historique paginé par curseur : "Afficher plus" charge la page suivante
+        let historiqueSoumissions = [];
+        let curseurHistorique = null;
+
+        async function chargerHistorique(suite = false) {
             const statut = document.getElementById('filtre-statut').value;
+            let url = `/aef/api/historique/?statut=${statut}`;
+            if (suite && curseurHistorique) url += `&curseur=${encodeURIComponent(curseurHistorique)}`;
             
             try {
-                const response = await fetch(`/aef/api/historique/?statut=${statut}`);
+                const response = await fetch(url);
                 const data = await response.json();
                 
                 if (data.success) {
-                    afficherHistorique(data.soumissions);
+                    historiqueSoumissions = suite ? historiqueSoumissions.concat(data.soumissions) : data.soumissions;
+                    curseurHistorique = data.pagination ? data.pagination.curseur_suivant : null;
+                    afficherHistorique(historiqueSoumissions);
                 }
             } catch (error) {
                 console.error('Erreur:', error);
@@ -84,6 +118,14 @@
                 return;
             }
             
+            const ligneSuite = curseurHistorique ? `
+                <tr>
+                    <td colspan="6" style="text-align: center;">
+                        <button class="btn btn-primary" onclick="chargerHistorique(true)">Afficher plus</button>
+                    </td>
+                </tr>
+            ` : '';
+            
             tbody.innerHTML = soumissions.map(s => `
                 <tr>
                     <td>${s.nom_fichier}</td>
@@ -97,7 +139,7 @@
                         </button>
                     </td>
                 </tr>
-            `).join('');
+            `).join('') + ligneSuite;
         }
 
         async function chargerUtilisateursUEF() {
@@ -185,15 +227,24 @@
             resultDiv.innerHTML = '<div class="alert alert-info">📤 Upload en cours...</div>';
             
             try {
-                const response = await fetch('/aef/upload-fichier/', {
-                    method: 'POST',
-                    body: formData,
-                    headers: {
-                        'X-CSRFToken': getCookie('csrftoken')
-                    }
-                });
-                
-                const data = await response.json();
+                let data;
+                const fichier = document.getElementById('fichier').files[0];
+                if (fichier && fichier.size > SEUIL_TELEVERSEMENT_FRAGMENTE) {
+                    // Gros fichier : envoi par fragments, repris en cas de coupure
+                    data = await televerserParFragments(fichier, (envoyes, total) => {
+                        resultDiv.innerHTML = '<div class="alert alert-info">📤 Upload en cours : ' + Math.round(100 * envoyes / total) + ' %</div>';
+                    });
+                } else {
+                    const response = await fetch('/aef/upload-fichier/', {
+                        method: 'POST',
+                        body: formData,
+                        headers: {
+                            'X-CSRFToken': getCookie('csrftoken')
+                        }
+                    });
+                    
+                    data = await response.json();
+                }
                 
                 if (data.success) {
                     resultDiv.innerHTML = '<div class="alert alert-success">' + data.message + '</div>';
@@ -877,10 +928,8 @@ async function supprimerSoumission(fichierId) {
         
         if (data.success) {
             alert(data.message);
-            // Recharger l'historique
+            // Recharger l'historique (le tableau de bord est mis à jour par les événements)
             chargerHistorique();
-            // Recharger le dashboard pour mettre à jour les stats
-            chargerDashboard();
         } else {
             alert('❌ ' + data.message);
         }
@@ -1042,6 +1091,13 @@ function handleFileSelectForPreview(files) {
     document.getElementById('dropZone').style.display = 'none';
     document.getElementById('submitBtn').style.display = 'flex';
     
+    // Archive .zip de fichiers CSV : pas de prévisualisation, le contrôle est fait côté serveur
+    if (file.name.toLowerCase().endsWith('.zip')) {
+        currentWorkbook = null;
+        document.getElementById('previewSection').classList.remove('active');
+        return;
+    }
+    
     // Lire et prévisualiser le fichier
     const reader = new FileReader();
     
@@ -1070,7 +1126,7 @@ function handleFileSelectForPreview(files) {
             
         } catch (error) {
             console.error('Erreur lors de la lecture du fichier:', error);
-            alert('Erreur lors de la lecture du fichier. Assurez-vous qu\'il s\'agit d\'un fichier Excel valide.');
+            alert('Erreur lors de la lecture du fichier. Assurez-vous qu\'il s\'agit d\'un fichier Excel ou CSV valide.');
         }
     };
     
@@ -1,9 +1,36 @@
 // Fonction pour soumettre le formulaire et rester sur le même onglet
         function submitFormAndStay() {
             localStorage.setItem('activeTab', 'submissions');
-            document.getElementById('filterForm').submit();
+            chargerSoumissions();
         }
 
+        // Filtrage et pagination de la liste sans recharger la page (api_soumissions_chef)
+        function chargerSoumissions(page = 1) {
+            const form = document.getElementById('filterForm');
+            const params = new URLSearchParams(new FormData(form));
+            if (page > 1) params.set('page', page);
+
+            fetch(`/chef/api/soumissions/?${params.toString()}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) return;
+                    document.getElementById('soumissions-lignes').innerHTML = data.html;
+                    document.getElementById('soumissions-total').textContent = `${data.pagination.total} fichier(s)`;
+                    mettreAJourStats(data.stats);
+                    // L'URL garde les filtres (rechargement, lien partagé)
+                    history.replaceState(null, '', `?${params.toString()}`);
+                })
+                .catch(() => form.submit());
+        }
+
+        document.addEventListener('click', function(e) {
+            const lien = e.target.closest('#soumissions-lignes a[data-page]');
+            if (lien) {
+                e.preventDefault();
+                chargerSoumissions(parseInt(lien.dataset.page, 10));
+            }
+        });
+
         // Fonction pour filtrer par statut
         function filterByStatut(statut) {
             document.getElementById('statut').value = statut;
@@ -171,8 +198,6 @@
                     if (row) {
                         row.remove();
                     }
-                    // Recharger les stats si nécessaire
-                    refreshStats();
                 } else {
                     showAlert(data.message, 'error');
                 }
@@ -261,18 +286,38 @@
                 .then(response => response.json())
                 .then(data => {
                     if (data.success) {
-                        document.querySelector('.stat-card-soumission.total .stat-number-soumission').textContent = data.stats.total;
-                        document.querySelector('.stat-card-soumission.en-attente .stat-number-soumission').textContent = data.stats.en_attente;
-                        document.querySelector('.stat-card-soumission.reussi .stat-number-soumission').textContent = data.stats.reussis;
-                        // NOUVEAU: Ajouter les stats de rejet
-                        const rejeteCard = document.querySelector('.stat-card-soumission.rejete .stat-number-soumission');
-                        if (rejeteCard && data.stats.rejetes !== undefined) {
-                            rejeteCard.textContent = data.stats.rejetes;
-                        }
+                        mettreAJourStats(data.stats);
                     }
                 });
         }
 
+        function mettreAJourStats(stats) {
+            document.querySelector('.stat-card-soumission.total .stat-number-soumission').textContent = stats.total;
+            document.querySelector('.stat-card-soumission.en-attente .stat-number-soumission').textContent = stats.en_attente;
+            document.querySelector('.stat-card-soumission.reussi .stat-number-soumission').textContent = stats.reussis;
+            // NOUVEAU: Ajouter les stats de rejet
+            const rejeteCard = document.querySelector('.stat-card-soumission.rejete .stat-number-soumission');
+            if (rejeteCard && stats.rejetes !== undefined) {
+                rejeteCard.textContent = stats.rejetes;
+            }
+            const erreurCard = document.querySelector('.stat-card-soumission.erreur .stat-number-soumission');
+            if (erreurCard && stats.erreurs !== undefined) {
+                erreurCard.textContent = stats.erreurs;
+            }
+            const badgeAttente = document.getElementById('badge-soumissions-attente');
+            if (badgeAttente) badgeAttente.textContent = stats.en_attente;
+        }
+
+        // Compteurs poussés par le serveur à chaque dépôt, validation, rejet ou
+        // suppression (evenements_soumissions.js) : plus de rechargement des stats
+        ecouterEvenementsSoumissions(evenement => {
+            mettreAJourStats(evenement.compteurs);
+            if (evenement.action === 'suppression') {
+                const row = document.getElementById(`file-${evenement.fichier.id}`);
+                if (row) row.remove();
+            }
+        }, refreshStats);
+
         function validerSoumission(fichierId) {
             showLoading(true);
             
@@ -294,7 +339,6 @@
                 if (data.success) {
                     showAlert('✓ ' + data.message, 'success');
                     updateSoumissionUI(fichierId, data);
-                    refreshStats();  // Rafraîchir les stats
                 } else {
                     showAlert('✗ ' + data.message, 'error');
                 }
@@ -394,9 +438,6 @@
                         `;
                     }
                     
-                    // Rafraîchir les statistiques
-                    refreshStats();
-                    
                     // Recharger après un court délai
                     setTimeout(() => {
                         window.location.reload();
@@ -2978,6 +3019,9 @@
                 console.log("DEBUG - Réponse API compter:", data);
                 
                 if (data.success) {
+                    // Borne de l'instantané : la suppression portera exactement sur ces entrées
+                    journalDataSuppr.pkMax = data.pk_max;
+                    
                     // Afficher le nombre dans le modal de confirmation
                     document.getElementById('nombreJournauxASupprimer').textContent = 
                         `${data.nombre} entrée(s) de journal`;
@@ -3006,6 +3050,34 @@
             }
         }
 
+        /**
+         * Suit la progression d'une suppression par lots jusqu'à sa fin
+         */
+        async function suivreSuppressionJournal(tacheId, total) {
+            const url = `/chef/api/journalisation/supprimer/${tacheId}/progression/`;
+            
+            if (typeof afficherNotification === 'function') {
+                afficherNotification('info', `Suppression de ${total} entrée(s) en cours...`);
+            }
+            
+            while (true) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                
+                const response = await fetch(url);
+                const etat = await response.json();
+                
+                if (!etat.success || etat.statut === 'ECHEC') {
+                    return { success: false, message: etat.message || 'Suppression interrompue' };
+                }
+                
+                console.log(`DEBUG - Suppression: ${etat.supprimes}/${total} (${etat.pourcentage} %)`);
+                
+                if (etat.statut === 'TERMINE') {
+                    return { success: true, nombre_lignes: etat.supprimes };
+                }
+            }
+        }
+
         // Fonction pour formater une date au format ISO
         function formatDateToISO(dateStr) {
             // Si la date contient déjà 'T', c'est un datetime-local (YYYY-MM-DDTHH:MM)
@@ -3018,7 +3090,7 @@
 
         // Exécuter la suppression définitive
         async function executerSuppressionJournal() {
-            const { mode, dateDebut, dateFin } = journalDataSuppr;
+            const { mode, dateDebut, dateFin, pkMax } = journalDataSuppr;
             
             console.log("DEBUG - Exécution suppression:", { mode, dateDebut, dateFin });
             
@@ -3038,16 +3110,26 @@
                     body: JSON.stringify({
                         mode: mode,
                         date_debut: dateDebut,
-                        date_fin: dateFin
+                        date_fin: dateFin,
+                        pk_max: pkMax
                     })
                 });
                 
-                const data = await response.json();
+                let data = await response.json();
                 console.log("DEBUG - Réponse suppression:", data);
                 
                 if (data.success) {
                     fermerModalConfirmationSuppressionJournal();
                     
+                    // Gros volume : la suppression se poursuit par lots côté serveur
+                    if (data.en_cours) {
+                        data = await suivreSuppressionJournal(data.tache_id, data.nombre_lignes);
+                        if (!data.success) {
+                            alert('Erreur lors de la suppression: ' + data.message);
+                            return;
+                        }
+                    }
+                    
                     // Afficher un message de succès
                     if (typeof afficherAlerte === 'function') {
                         afficherAlerte(`${data.nombre_lignes} entrée(s) supprimée(s) avec succès`, 'success');
@@ -3122,7 +3204,6 @@
                     showAlert(data.message, 'success');
                     const row = document.getElementById(`file-${fichierId}`);
                     if (row) row.remove();
-                    refreshStats();
                 } else {
                     showAlert(data.message, 'error');
                 }
@@ -169,14 +169,29 @@ function updateProfileHistory() {
         historyItem.innerHTML = historyHTML;
         profileHistoryList.appendChild(historyItem);
     });
+    
+    if (curseurHistorique) {
+        const boutonSuite = document.createElement('button');
+        boutonSuite.className = 'btn btn-primary';
+        boutonSuite.textContent = 'Afficher plus';
+        boutonSuite.onclick = () => actualiserHistorique(true);
+        profileHistoryList.appendChild(boutonSuite);
+    }
 }
 
-function actualiserHistorique() {
-    fetch('/api/historique/')
+// Historique paginé par curseur : "Afficher plus" charge la page suivante
+let curseurHistorique = null;
+
+function actualiserHistorique(suite = false) {
+    let url = '/api/historique/';
+    if (suite && curseurHistorique) url += `?curseur=${encodeURIComponent(curseurHistorique)}`;
+    
+    fetch(url)
         .then(response => response.json())
         .then(data => {
             if (data.success) {
-                userHistory = data.historique;
+                userHistory = suite ? userHistory.concat(data.historique) : data.historique;
+                curseurHistorique = data.pagination ? data.pagination.curseur_suivant : null;
                 updateProfileHistory();
             }
         });
@@ -211,6 +226,13 @@ function handleFileSelectForPreview(files) {
     document.getElementById('dropZone').style.display = 'none';
     document.getElementById('submitBtn').style.display = 'flex';
     
+    // Archive .zip de fichiers CSV : pas de prévisualisation, le contrôle est fait côté serveur
+    if (file.name.toLowerCase().endsWith('.zip')) {
+        currentWorkbook = null;
+        document.getElementById('previewSection').classList.remove('active');
+        return;
+    }
+    
     // Lire et prévisualiser le fichier
     const reader = new FileReader();
     
@@ -239,7 +261,7 @@ function handleFileSelectForPreview(files) {
             
         } catch (error) {
             console.error('Erreur lors de la lecture du fichier:', error);
-            alert('Erreur lors de la lecture du fichier. Assurez-vous qu\'il s\'agit d\'un fichier Excel valide.');
+            alert('Erreur lors de la lecture du fichier. Assurez-vous qu\'il s\'agit d\'un fichier Excel ou CSV valide.');
         }
     };
     
@@ -381,20 +403,34 @@ document.addEventListener('DOMContentLoaded', function() {
             `;
             
             try {
-                const response = await fetch('/upload-fichier/', {
-                    method: 'POST',
-                    body: formData,
-                    headers: {
-                        'X-CSRFToken': getCookie('csrftoken')
+                let data;
+                const fichier = fileInput.files[0];
+                if (fichier.size > SEUIL_TELEVERSEMENT_FRAGMENTE) {
+                    // Gros fichier : envoi par fragments, repris en cas de coupure
+                    data = await televerserParFragments(fichier, (envoyes, total) => {
+                        resultDiv.innerHTML = `
+                            <div class="alert alert-info">
+                                <div class="loading-spinner"></div>
+                                <p>📤 Upload en cours : ${Math.round(100 * envoyes / total)} %</p>
+                            </div>
+                        `;
+                    });
+                } else {
+                    const response = await fetch('/upload-fichier/', {
+                        method: 'POST',
+                        body: formData,
+                        headers: {
+                            'X-CSRFToken': getCookie('csrftoken')
+                        }
+                    });
+                    
+                    if (!response.ok) {
+                        throw new Error(`Erreur HTTP: ${response.status}`);
                     }
-                });
-                
-                if (!response.ok) {
-                    throw new Error(`Erreur HTTP: ${response.status}`);
+                    
+                    data = await response.json();
                 }
                 
-                const data = await response.json();
-                
                 if (data.success) {
                     resultDiv.innerHTML = `
                         <div class="alert alert-success">
@@ -0,0 +1,84 @@
+// ==================== TÉLÉVERSEMENT FRAGMENTÉ ====================
+// Envoi des gros fichiers par fragments (API /api/televersements/) :
+// après une coupure, un nouvel envoi du même fichier reprend aux fragments manquants.
+
+const SEUIL_TELEVERSEMENT_FRAGMENTE = 5 * 1024 * 1024;
+const TENTATIVES_FRAGMENT = 4;
+
+function cookieCsrf() {
+    const correspondance = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return correspondance ? decodeURIComponent(correspondance[1]) : '';
+}
+
+async function empreinteSha256(donnees) {
+    // Appelée par fragment : crypto.subtle ne hache pas par morceaux, et hacher le
+    // fichier entier le chargerait en mémoire (le serveur vérifie la taille assemblée)
+    // crypto.subtle n'est disponible qu'en HTTPS (ou localhost) : sans lui, seule la taille est vérifiée
+    if (!window.crypto || !window.crypto.subtle) return '';
+    const hash = await window.crypto.subtle.digest('SHA-256', await donnees.arrayBuffer());
+    return Array.from(new Uint8Array(hash)).map(octet => octet.toString(16).padStart(2, '0')).join('');
+}
+
+async function appelerApiTeleversement(url, options = {}) {
+    const response = await fetch(url, {
+        ...options,
+        headers: {'X-CSRFToken': cookieCsrf(), ...(options.headers || {})}
+    });
+    const data = await response.json().catch(() => ({success: false, message: `Erreur HTTP: ${response.status}`}));
+    return {ok: response.ok, status: response.status, data};
+}
+
+async function televerserParFragments(fichier, surProgression) {
+    const cle = `televersement:${fichier.name}:${fichier.size}:${fichier.lastModified}`;
+
+    // Reprise d'un téléversement interrompu
+    let etat = null;
+    const idPrecedent = localStorage.getItem(cle);
+    if (idPrecedent) {
+        const reponse = await appelerApiTeleversement(`/api/televersements/${idPrecedent}/`);
+        if (reponse.ok && reponse.data.statut === 'EN_COURS') {
+            etat = reponse.data;
+        }
+    }
+    if (!etat) {
+        const reponse = await appelerApiTeleversement('/api/televersements/', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({nom_fichier: fichier.name, taille: fichier.size})
+        });
+        if (!reponse.ok) return reponse.data;
+        etat = reponse.data;
+        localStorage.setItem(cle, etat.upload_id);
+    }
+
+    const recus = new Set(etat.fragments_recus);
+    for (let numero = 0; numero < etat.nb_fragments; numero++) {
+        if (!recus.has(numero)) {
+            const fragment = fichier.slice(numero * etat.taille_fragment, (numero + 1) * etat.taille_fragment);
+            const headers = {'X-Empreinte-Fragment': await empreinteSha256(fragment)};
+            let reponse = null;
+            for (let tentative = 1; tentative <= TENTATIVES_FRAGMENT; tentative++) {
+                try {
+                    reponse = await appelerApiTeleversement(
+                        `/api/televersements/${etat.upload_id}/fragments/${numero}/`,
+                        {method: 'PUT', headers, body: fragment}
+                    );
+                    if (reponse.ok || reponse.status < 500) break;
+                } catch (erreur) {
+                    reponse = {ok: false, data: {success: false, message: erreur.message}};
+                }
+                // Coupure ou erreur serveur : nouvel essai après 1 s, 2 s, 4 s
+                await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** (tentative - 1)));
+            }
+            if (!reponse.ok) return reponse.data;
+            recus.add(numero);
+        }
+        if (surProgression) surProgression(recus.size, etat.nb_fragments);
+    }
+
+    const reponse = await appelerApiTeleversement(`/api/televersements/${etat.upload_id}/finaliser/`, {
+        method: 'POST'
+    });
+    if (reponse.ok) localStorage.removeItem(cle);
+    return reponse.data;
+}
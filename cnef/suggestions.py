@@ -0,0 +1,218 @@
+"""
+Index de recherche par préfixe (autocomplétion) des utilisateurs et des établissements
+
+L'index est une liste triée de (jeton, type, id) gardée en mémoire dans chaque
+processus : une recherche par préfixe est une simple recherche dichotomique
+(bisect), sans requête SQL. Les jetons sont normalisés (minuscules, sans accents).
+
+Invalidation : les signaux post_save / post_delete de User et Etablissement
+incrémentent un numéro de génération stocké dans le cache partagé ; chaque
+processus reconstruit son index (2 requêtes) lorsqu'il constate que la
+génération a changé.
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .recherche_journal import normaliser_texte
+
+logger = logging.getLogger(__name__)
+
+CLE_GENERATION = 'suggestions:generation'
+
+UTILISATEUR = 'utilisateur'
+ETABLISSEMENT = 'etablissement'
+
+# Champs dont la modification impose de reconstruire l'index
+CHAMPS_INDEXES = {
+    UTILISATEUR: {'nom', 'prenom', 'email', 'role', 'etablissement', 'is_active'},
+    ETABLISSEMENT: {'Nom_etablissement', 'code_etablissement', 'type_etablissement', 'is_active'},
+}
+
+
+def decouper(texte):
+    """Mots normalisés d'un texte (un e-mail donne aussi chacune de ses parties)"""
+    return [mot for mot in re.split(r'[\W_]+', normaliser_texte(texte)) if mot]
+
+
+def generation_courante():
+    try:
+        return cache.get_or_set(CLE_GENERATION, 1, None)
+    except Exception:
+        # Cache indisponible : pas d'invalidation croisée entre processus
+        return 0
+
+
+# ==========================================
+# INDEX
+# ==========================================
+
+class IndexSuggestions:
+    """Index en mémoire, reconstruit à la demande quand la génération change"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._jetons = []
+        self._entrees = {}
+        self._generation = None
+        self._derniere_verification = 0.0
+
+    def _a_jour(self):
+        # La génération n'est relue qu'une fois par intervalle pour rester sous la milliseconde
+        maintenant = time.monotonic()
+        intervalle = getattr(settings, 'SUGGESTIONS_INTERVALLE_VERIFICATION', 2)
+        if self._generation is not None and maintenant - self._derniere_verification < intervalle:
+            return
+        self._derniere_verification = maintenant
+
+        generation = generation_courante()
+        if generation != self._generation:
+            self.reconstruire(generation)
+
+    def reconstruire(self, generation=None):
+        from .models import Etablissement, User
+
+        jetons = []
+        entrees = {}
+
+        for etab in Etablissement.objects.only(
+            'id', 'Nom_etablissement', 'code_etablissement', 'type_etablissement', 'is_active'
+        ):
+            cle = (ETABLISSEMENT, etab.id)
+            entrees[cle] = {
+                'id': etab.id,
+                'nom': etab.Nom_etablissement,
+                'code': etab.code_etablissement,
+                'type': etab.type_etablissement,
+                'is_active': etab.is_active,
+                '_tri': normaliser_texte(etab.Nom_etablissement),
+            }
+            for mot in set(decouper(etab.Nom_etablissement) + decouper(etab.code_etablissement)):
+                jetons.append((mot, ETABLISSEMENT, etab.id))
+
+        for user in User.objects.select_related('etablissement').only(
+            'id', 'nom', 'prenom', 'email', 'role', 'is_active',
+            'etablissement__id', 'etablissement__Nom_etablissement'
+        ):
+            cle = (UTILISATEUR, user.id)
+            entrees[cle] = {
+                'id': user.id,
+                'nom': user.nom,
+                'prenom': user.prenom,
+                'email': user.email,
+                'role': user.role,
+                'is_active': user.is_active,
+                'etablissement': {
+                    'id': user.etablissement.id,
+                    'nom': user.etablissement.Nom_etablissement,
+                } if user.etablissement else None,
+                '_tri': normaliser_texte(f"{user.nom} {user.prenom}"),
+            }
+            mots = decouper(user.nom) + decouper(user.prenom) + decouper(user.email)
+            mots.append(normaliser_texte(user.email))
+            for mot in set(mots):
+                jetons.append((mot, UTILISATEUR, user.id))
+
+        jetons.sort()
+        with self._verrou:
+            self._jetons = jetons
+            self._entrees = entrees
+            self._generation = generation if generation is not None else generation_courante()
+
+        logger.debug(f"Index de suggestions reconstruit : {len(entrees)} entrée(s), {len(jetons)} jeton(s)")
+
+    # ------------------------------------------
+    # Recherche
+    # ------------------------------------------
+
+    def _ids_prefixe(self, type_entree, prefixe):
+        """Identifiants dont au moins un jeton commence par le préfixe, et s'il est exact"""
+        jetons = self._jetons
+        position = bisect.bisect_left(jetons, (prefixe,))
+        resultats = {}
+        while position < len(jetons) and jetons[position][0].startswith(prefixe):
+            jeton, type_jeton, id_entree = jetons[position]
+            if type_jeton == type_entree:
+                resultats[id_entree] = resultats.get(id_entree, False) or jeton == prefixe
+            position += 1
+        return resultats
+
+    def suggerer(self, type_entree, texte, limite=10, filtre=None):
+        """
+        Retourne les `limite` meilleures entrées dont chaque mot de `texte`
+        préfixe un jeton. Les correspondances exactes passent en premier.
+        """
+        self._a_jour()
+        mots = decouper(texte)
+        if not mots:
+            return []
+
+        with self._verrou:
+            candidats = None
+            exacts = {}
+            for mot in mots:
+                trouves = self._ids_prefixe(type_entree, mot)
+                candidats = set(trouves) if candidats is None else candidats & set(trouves)
+                for id_entree, exact in trouves.items():
+                    exacts[id_entree] = exacts.get(id_entree, 0) + exact
+                if not candidats:
+                    return []
+
+            entrees = [self._entrees[(type_entree, id_entree)] for id_entree in candidats]
+
+        if filtre:
+            entrees = [e for e in entrees if filtre(e)]
+        entrees.sort(key=lambda e: (-exacts.get(e['id'], 0), e['_tri']))
+        return [{k: v for k, v in e.items() if not k.startswith('_')} for e in entrees[:limite]]
+
+    def lister(self, type_entree, filtre=None):
+        """Toutes les entrées d'un type, triées par libellé (sans requête SQL)"""
+        self._a_jour()
+        with self._verrou:
+            entrees = [e for (t, _), e in self._entrees.items() if t == type_entree]
+        if filtre:
+            entrees = [e for e in entrees if filtre(e)]
+        entrees.sort(key=lambda e: e['_tri'])
+        return [{k: v for k, v in e.items() if not k.startswith('_')} for e in entrees]
+
+    @property
+    def generation(self):
+        self._a_jour()
+        return self._generation
+
+
+index_suggestions = IndexSuggestions()
+
+
+# ==========================================
+# INVALIDATION (SIGNAUX)
+# ==========================================
+
+def invalider_suggestions():
+    """Force la reconstruction de l'index dans tous les processus"""
+    try:
+        cache.incr(CLE_GENERATION)
+    except ValueError:
+        cache.set(CLE_GENERATION, 2, None)
+    except Exception as e:
+        logger.warning(f"Suggestions : invalidation impossible ({e})")
+    # Ce processus se met à jour dès la prochaine recherche
+    index_suggestions._derniere_verification = 0.0
+
+
+def invalider_sur_modification(sender, instance, **kwargs):
+    """Récepteur post_save / post_delete de User et Etablissement"""
+    from .models import User
+
+    type_entree = UTILISATEUR if sender is User else ETABLISSEMENT
+    champs = kwargs.get('update_fields')
+    # Ex. mise à jour de last_login à chaque connexion : inutile de reconstruire
+    if champs and not set(champs) & CHAMPS_INDEXES[type_entree]:
+        return
+    invalider_suggestions()
@@ -0,0 +1,67 @@
+"""
+Tâches longues exécutées en arrière-plan (validation groupée, rétention du
+journal, détection des TEG atypiques)
+
+- la tâche tourne dans un thread démon du worker qui l'a lancée ; sa
+  connexion à la base est fermée à la fin
+- sa progression est publiée dans le cache sous un identifiant de suivi
+  (tache_id), lu par les points d'accès de progression des interfaces
+- statut : EN_COURS, puis TERMINE ou ECHEC (avec le message d'erreur)
+
+Chaque domaine déclare son suivi : suivi = SuiviTaches('validation:groupee:', 'validation-groupee')
+"""
+
+import logging
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Durée de conservation de la progression dans le cache (1 heure)
+DUREE_PROGRESSION = 3600
+
+
+class SuiviTaches:
+    """Progression et lancement des tâches d'un domaine"""
+
+    def __init__(self, prefixe, nom_thread, duree=DUREE_PROGRESSION):
+        self.prefixe = prefixe
+        self.nom_thread = nom_thread
+        self.duree = duree
+
+    def publier(self, tache_id, **donnees):
+        """Met à jour l'état publié de la tâche et le retourne"""
+        cle = self.prefixe + tache_id
+        etat = cache.get(cle) or {}
+        etat.update(donnees)
+        cache.set(cle, etat, self.duree)
+        return etat
+
+    def lire(self, tache_id):
+        """État publié de la tâche (None si inconnue ou expirée)"""
+        return cache.get(self.prefixe + tache_id)
+
+    def lancer(self, executer, **etat_initial):
+        """
+        Publie l'état initial (statut EN_COURS) puis exécute `executer(tache_id)`
+        dans un thread démon. Retourne l'identifiant de suivi.
+        """
+        tache_id = uuid.uuid4().hex
+        self.publier(tache_id, statut='EN_COURS', **etat_initial)
+
+        def cible():
+            try:
+                executer(tache_id)
+            except Exception as e:
+                # Échec non publié par la tâche elle-même
+                if (self.lire(tache_id) or {}).get('statut') != 'ECHEC':
+                    logger.error(f"Tâche {self.nom_thread} {tache_id} : échec: {e}")
+                    self.publier(tache_id, statut='ECHEC', message=str(e))
+            finally:
+                close_old_connections()
+
+        threading.Thread(target=cible, name=f'{self.nom_thread}-{tache_id[:8]}', daemon=True).start()
+        return tache_id
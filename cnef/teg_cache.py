@@ -0,0 +1,185 @@
+"""
+Module de mémoïsation des calculs de TEG
+
+Les fichiers des établissements contiennent souvent des milliers de prêts
+partageant exactement les mêmes paramètres (montant, durée, échéance, frais,
+fréquence). Ce module évite de relancer le calcul (notamment le solveur
+itératif npf.rate) pour un tuple déjà rencontré :
+- cache LRU borné en mémoire, propre à chaque processus
+- cache Redis optionnel, partagé entre les workers
+"""
+
+import functools
+import logging
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Marqueur interne pour distinguer "absent du cache" d'un résultat None
+_ABSENT = object()
+
+
+# ==========================================
+# CACHE LRU EN MÉMOIRE
+# ==========================================
+
+class CacheTEG:
+    """Cache LRU borné, thread-safe, avec compteurs de succès"""
+
+    def __init__(self, taille_max=10000):
+        self.taille_max = taille_max
+        self._donnees = OrderedDict()
+        self._verrou = threading.Lock()
+        self.reinitialiser_compteurs()
+
+    def reinitialiser_compteurs(self):
+        self.succes_memoire = 0
+        self.succes_redis = 0
+        self.echecs = 0
+
+    def obtenir(self, cle):
+        with self._verrou:
+            valeur = self._donnees.get(cle, _ABSENT)
+            if valeur is not _ABSENT:
+                self._donnees.move_to_end(cle)
+            return valeur
+
+    def enregistrer(self, cle, valeur):
+        with self._verrou:
+            self._donnees[cle] = valeur
+            self._donnees.move_to_end(cle)
+            while len(self._donnees) > self.taille_max:
+                self._donnees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self._donnees.clear()
+        self.reinitialiser_compteurs()
+
+    def statistiques(self):
+        total = self.succes_memoire + self.succes_redis + self.echecs
+        succes = self.succes_memoire + self.succes_redis
+        return {
+            'entrees': len(self._donnees),
+            'taille_max': self.taille_max,
+            'succes_memoire': self.succes_memoire,
+            'succes_redis': self.succes_redis,
+            'echecs': self.echecs,
+            'appels': total,
+            'taux_succes': round(succes / total * 100, 2) if total > 0 else 0,
+        }
+
+
+cache_teg = CacheTEG(taille_max=getattr(settings, 'TEG_CACHE_TAILLE_MAX', 10000))
+
+
+# ==========================================
+# NORMALISATION DES PARAMÈTRES
+# ==========================================
+
+def normaliser_parametre(valeur):
+    """
+    Normalise un paramètre pour la clé de cache :
+    int, float et Decimal de même valeur donnent la même clé
+    """
+    if valeur is None or isinstance(valeur, bool):
+        return valeur
+    if isinstance(valeur, (int, float, Decimal)):
+        return float(valeur)
+    return str(valeur)
+
+
+def construire_cle(nom_calcul, args, kwargs):
+    """Construit la clé de cache à partir du tuple normalisé des paramètres"""
+    parametres = tuple(normaliser_parametre(a) for a in args)
+    if kwargs:
+        parametres += tuple(
+            (nom, normaliser_parametre(kwargs[nom])) for nom in sorted(kwargs)
+        )
+    return f"teg:{nom_calcul}:{parametres!r}"
+
+
+# ==========================================
+# CACHE REDIS OPTIONNEL
+# ==========================================
+
+def _cache_redis():
+    """Retourne le cache Django partagé si activé dans les settings, sinon None"""
+    if not getattr(settings, 'TEG_CACHE_REDIS', False):
+        return None
+    from django.core.cache import caches
+    return caches[getattr(settings, 'TEG_CACHE_REDIS_ALIAS', 'default')]
+
+
+def _lire_redis(cle):
+    redis_cache = _cache_redis()
+    if redis_cache is None:
+        return _ABSENT
+    try:
+        return redis_cache.get(cle, _ABSENT)
+    except Exception as e:
+        # Redis indisponible : on continue avec le cache mémoire seul
+        logger.warning(f"Cache TEG Redis indisponible (lecture): {e}")
+        return _ABSENT
+
+
+def _ecrire_redis(cle, valeur):
+    redis_cache = _cache_redis()
+    if redis_cache is None:
+        return
+    try:
+        redis_cache.set(cle, valeur, timeout=getattr(settings, 'TEG_CACHE_REDIS_TIMEOUT', 86400))
+    except Exception as e:
+        logger.warning(f"Cache TEG Redis indisponible (écriture): {e}")
+
+
+# ==========================================
+# DÉCORATEUR DE MÉMOÏSATION
+# ==========================================
+
+def memoiser_teg(nom_calcul):
+    """
+    Décorateur de mémoïsation pour une fonction de calcul de TEG.
+    La fonction d'origine reste accessible via `fonction.__wrapped__`.
+    """
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def wrapper(*args, **kwargs):
+            if not getattr(settings, 'TEG_CACHE_ACTIF', True):
+                return fonction(*args, **kwargs)
+
+            cle = construire_cle(nom_calcul, args, kwargs)
+
+            valeur = cache_teg.obtenir(cle)
+            if valeur is not _ABSENT:
+                cache_teg.succes_memoire += 1
+                return valeur
+
+            valeur = _lire_redis(cle)
+            if valeur is not _ABSENT:
+                cache_teg.succes_redis += 1
+                cache_teg.enregistrer(cle, valeur)
+                return valeur
+
+            cache_teg.echecs += 1
+            valeur = fonction(*args, **kwargs)
+            cache_teg.enregistrer(cle, valeur)
+            _ecrire_redis(cle, valeur)
+            return valeur
+
+        return wrapper
+    return decorateur
+
+
+def statistiques_cache_teg():
+    """Retourne les compteurs de succès du cache TEG pour ce processus"""
+    return cache_teg.statistiques()
+
+
+def vider_cache_teg():
+    """Vide le cache TEG en mémoire et remet les compteurs à zéro"""
+    cache_teg.vider()
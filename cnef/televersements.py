@@ -0,0 +1,288 @@
+"""
+Téléversement fragmenté des soumissions (reprise après coupure)
+
+Un envoi multipart unique oblige à tout renvoyer quand la connexion tombe.
+Le client procède donc en trois temps :
+1. initier : POST nom, taille (et empreinte SHA-256 facultative) -> identifiant et taille de fragment
+2. envoyer chaque fragment N (0-indexé) : PUT du contenu brut, écrit
+   directement sur disque (jamais en mémoire), avec son empreinte dans
+   X-Empreinte-Fragment ; un fragment déjà reçu peut être renvoyé sans risque
+3. finaliser : assemblage des fragments, vérification de la taille et de
+   l'empreinte, puis création du FichierImport
+
+Après une coupure, l'état du téléversement (GET) donne la liste des
+fragments reçus : seuls les manquants sont renvoyés.
+
+Les fragments sont rangés dans TELEVERSEMENT_DOSSIER/<identifiant>/ ; les
+téléversements inachevés depuis TELEVERSEMENT_DUREE_VIE heures sont
+supprimés par purger_televersements_abandonnes() (commande
+nettoyer_televersements, et au plus une fois par heure lors d'un nouveau
+téléversement).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.utils import timezone
+
+from .classeur_csv import EXTENSIONS_SOUMISSION
+
+logger = logging.getLogger(__name__)
+
+TAILLE_BLOC = 64 * 1024
+NOM_ASSEMBLAGE = 'assemblage'
+CLE_CACHE_NETTOYAGE = 'televersements:dernier_nettoyage'
+
+
+class TeleversementInvalide(ValueError):
+    """Requête de téléversement refusée (message destiné à l'utilisateur)"""
+
+
+def dossier_racine():
+    return settings.TELEVERSEMENT_DOSSIER or os.path.join(settings.MEDIA_ROOT, 'televersements')
+
+
+def dossier_televersement(televersement):
+    return os.path.join(dossier_racine(), str(televersement.id))
+
+
+def chemin_fragment(televersement, numero):
+    return os.path.join(dossier_televersement(televersement), f'{numero:06d}.part')
+
+
+def verifier_empreinte(empreinte):
+    empreinte = (empreinte or '').strip().lower()
+    if empreinte and not re.fullmatch(r'[0-9a-f]{64}', empreinte):
+        raise TeleversementInvalide("Empreinte SHA-256 invalide (64 caractères hexadécimaux attendus)")
+    return empreinte
+
+
+# ==========================================
+# INITIALISATION
+# ==========================================
+
+def initier_televersement(utilisateur, nom_fichier, taille_totale, empreinte=''):
+    """Crée le téléversement et son dossier de fragments"""
+    from .models import TeleversementFragmente
+
+    nom_fichier = os.path.basename(str(nom_fichier or '').replace('\\', '/'))
+    if not nom_fichier.lower().endswith(EXTENSIONS_SOUMISSION):
+        raise TeleversementInvalide(
+            'Seuls les fichiers Excel (.xlsx, .xls) ou CSV (.csv, .zip de fichiers .csv) sont autorisés'
+        )
+    try:
+        taille_totale = int(taille_totale)
+    except (TypeError, ValueError):
+        raise TeleversementInvalide("Taille du fichier manquante ou invalide")
+    if taille_totale <= 0:
+        raise TeleversementInvalide("Le fichier est vide")
+    if taille_totale > settings.TELEVERSEMENT_TAILLE_MAX:
+        raise TeleversementInvalide(
+            f"Fichier trop volumineux (maximum {settings.TELEVERSEMENT_TAILLE_MAX // (1024 * 1024)} Mo)"
+        )
+
+    nettoyer_si_necessaire()
+
+    televersement = TeleversementFragmente.objects.create(
+        utilisateur=utilisateur,
+        etablissement=utilisateur.etablissement,
+        nom_fichier=nom_fichier[:255],
+        taille_totale=taille_totale,
+        taille_fragment=settings.TELEVERSEMENT_TAILLE_FRAGMENT,
+        empreinte_sha256=verifier_empreinte(empreinte),
+    )
+    os.makedirs(dossier_televersement(televersement), exist_ok=True)
+    return televersement
+
+
+# ==========================================
+# FRAGMENTS
+# ==========================================
+
+def fragments_recus(televersement):
+    """Numéros des fragments complets présents sur disque"""
+    try:
+        noms = os.listdir(dossier_televersement(televersement))
+    except FileNotFoundError:
+        return []
+    recus = []
+    for nom in noms:
+        if not nom.endswith('.part') or not nom[:-5].isdigit():
+            continue
+        numero = int(nom[:-5])
+        if numero < televersement.nb_fragments:
+            recus.append(numero)
+    return sorted(recus)
+
+
+def ecrire_fragment(televersement, numero, flux, taille_annoncee=None, empreinte=''):
+    """
+    Écrit le fragment `numero` depuis `flux` (corps de la requête), par blocs.
+    Le fichier temporaire n'est renommé qu'une fois complet et vérifié :
+    un fragment interrompu n'est jamais pris pour un fragment reçu.
+    """
+    if televersement.statut != 'EN_COURS':
+        raise TeleversementInvalide("Ce téléversement est déjà finalisé")
+    if not 0 <= numero < televersement.nb_fragments:
+        raise TeleversementInvalide(
+            f"Fragment {numero} hors limites (0 à {televersement.nb_fragments - 1})"
+        )
+    attendue = televersement.taille_attendue(numero)
+    if taille_annoncee is not None and taille_annoncee != attendue:
+        raise TeleversementInvalide(f"Le fragment {numero} doit faire {attendue} octets (reçu {taille_annoncee})")
+
+    dossier = dossier_televersement(televersement)
+    os.makedirs(dossier, exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier, suffix='.tmp')
+    hachage = hashlib.sha256()
+    taille = 0
+    try:
+        with os.fdopen(descripteur, 'wb') as sortie:
+            while True:
+                bloc = flux.read(TAILLE_BLOC)
+                if not bloc:
+                    break
+                taille += len(bloc)
+                if taille > attendue:
+                    raise TeleversementInvalide(f"Le fragment {numero} dépasse {attendue} octets")
+                hachage.update(bloc)
+                sortie.write(bloc)
+        if taille != attendue:
+            raise TeleversementInvalide(f"Fragment {numero} incomplet : {taille} octets sur {attendue}")
+        empreinte = verifier_empreinte(empreinte)
+        if empreinte and empreinte != hachage.hexdigest():
+            raise TeleversementInvalide(f"Empreinte du fragment {numero} incorrecte")
+        os.replace(temporaire, chemin_fragment(televersement, numero))
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
+
+    # date_mise_a_jour (auto_now) repousse la suppression du téléversement
+    televersement.save(update_fields=['date_mise_a_jour'])
+    return taille
+
+
+# ==========================================
+# FINALISATION
+# ==========================================
+
+class FichierAssemble(File):
+    """
+    Fichier assemblé sur disque : temporary_file_path() permet au stockage
+    de le déplacer vers MEDIA_ROOT au lieu de le recopier
+    """
+
+    def __init__(self, chemin, nom):
+        super().__init__(open(chemin, 'rb'), name=nom)
+        self.chemin = chemin
+
+    def temporary_file_path(self):
+        return self.chemin
+
+
+def assembler(televersement, empreinte=''):
+    """
+    Concatène les fragments dans un seul fichier en vérifiant taille et
+    empreinte. Retourne un FichierAssemble prêt à être enregistré.
+    """
+    manquants = sorted(set(range(televersement.nb_fragments)) - set(fragments_recus(televersement)))
+    if manquants:
+        apercu = ', '.join(str(n) for n in manquants[:20])
+        raise TeleversementInvalide(
+            f"{len(manquants)} fragment(s) manquant(s) : {apercu}{'...' if len(manquants) > 20 else ''}"
+        )
+
+    attendue = verifier_empreinte(empreinte) or televersement.empreinte_sha256
+    chemin = os.path.join(dossier_televersement(televersement), NOM_ASSEMBLAGE)
+    hachage = hashlib.sha256()
+    taille = 0
+    with open(chemin, 'wb') as sortie:
+        for numero in range(televersement.nb_fragments):
+            with open(chemin_fragment(televersement, numero), 'rb') as fragment:
+                while True:
+                    bloc = fragment.read(TAILLE_BLOC)
+                    if not bloc:
+                        break
+                    hachage.update(bloc)
+                    sortie.write(bloc)
+                    taille += len(bloc)
+
+    if taille != televersement.taille_totale:
+        os.remove(chemin)
+        raise TeleversementInvalide(f"Taille assemblée {taille} différente de la taille annoncée {televersement.taille_totale}")
+    if attendue and hachage.hexdigest() != attendue:
+        os.remove(chemin)
+        raise TeleversementInvalide("L'empreinte SHA-256 du fichier assemblé ne correspond pas : renvoyez le fichier")
+    return FichierAssemble(chemin, televersement.nom_fichier)
+
+
+def supprimer_fragments(televersement):
+    shutil.rmtree(dossier_televersement(televersement), ignore_errors=True)
+
+
+# ==========================================
+# NETTOYAGE
+# ==========================================
+
+def purger_televersements_abandonnes(duree_vie_heures=None, simulation=False):
+    """
+    Supprime les téléversements inachevés sans nouveau fragment depuis
+    `duree_vie_heures`, et les dossiers de fragments sans téléversement
+    en cours. Retourne (téléversements supprimés, dossiers supprimés).
+    """
+    from .models import TeleversementFragmente
+
+    duree_vie = duree_vie_heures if duree_vie_heures is not None else settings.TELEVERSEMENT_DUREE_VIE
+    limite = timezone.now() - timedelta(hours=duree_vie)
+
+    abandonnes = TeleversementFragmente.objects.filter(statut='EN_COURS', date_mise_a_jour__lt=limite)
+    ids_abandonnes = [str(i) for i in abandonnes.values_list('id', flat=True)]
+    racine = dossier_racine()
+    dossiers = 0
+    for identifiant in ids_abandonnes:
+        chemin = os.path.join(racine, identifiant)
+        if os.path.isdir(chemin):
+            dossiers += 1
+            if not simulation:
+                shutil.rmtree(chemin, ignore_errors=True)
+    if not simulation:
+        abandonnes.filter(id__in=ids_abandonnes).delete()
+
+    # Dossiers orphelins : téléversement supprimé ou finalisé
+    ignores = set(ids_abandonnes) | {
+        str(i) for i in TeleversementFragmente.objects.filter(statut='EN_COURS').values_list('id', flat=True)
+    }
+    if os.path.isdir(racine):
+        for nom in os.listdir(racine):
+            chemin = os.path.join(racine, nom)
+            if nom in ignores or not os.path.isdir(chemin):
+                continue
+            # Dossier créé entre la lecture des téléversements en cours et le listage
+            if timezone.now().timestamp() - os.path.getmtime(chemin) < 60:
+                continue
+            if not simulation:
+                shutil.rmtree(chemin, ignore_errors=True)
+            dossiers += 1
+
+    if ids_abandonnes or dossiers:
+        logger.info(f"Téléversements : {len(ids_abandonnes)} abandonné(s) supprimé(s), {dossiers} dossier(s) retiré(s)")
+    return len(ids_abandonnes), dossiers
+
+
+def nettoyer_si_necessaire():
+    """Purge opportuniste, au plus une fois par heure (verrou dans le cache)"""
+    if not cache.add(CLE_CACHE_NETTOYAGE, timezone.now().isoformat(), 3600):
+        return
+    try:
+        purger_televersements_abandonnes()
+    except Exception as e:
+        logger.error(f"Téléversements : échec du nettoyage: {e}")
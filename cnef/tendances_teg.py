@@ -0,0 +1,239 @@
+"""
+Tendances trimestrielles du communiqué : TEG moyen, seuil d'usure, volumes
+
+Pour une catégorie de bénéficiaires et un type d'établissement, chaque
+produit du communiqué (views_communique.STRUCTURE_CREDITS) est calculé pour
+tous les trimestres demandés en UNE requête groupée par (année, trimestre)
+et par modèle, au lieu de relancer calculer_donnees_communique trimestre
+par trimestre. Mêmes filtres et mêmes règles que le communiqué :
+seuil_usure = 4/3 × TEG moyen, crédits de trésorerie = crédits 1-CT + spot
+pondérés par le nombre de prêts.
+
+Les variations d'un trimestre au précédent sont calculées avec NumPy sur
+les séries ; elles valent None si l'un des deux trimestres est sans données.
+
+Mise en cache : le résultat est conservé tant que la génération des données
+de prêts ne change pas. Elle est incrémentée quand une soumission est
+importée ou supprimée (signaux de FichierImport), par les suppressions de
+l'admin et par le chargement des données synthétiques.
+"""
+
+import hashlib
+import logging
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.db.models.functions import ExtractQuarter, ExtractYear
+
+from .evenements import CHAMPS_LIGNES
+from .routage_bdd import lecture_reporting
+from .views_communique import CATEGORIES_BENEFICIAIRES, STRUCTURE_CREDITS, filtre_communique
+
+logger = logging.getLogger(__name__)
+
+CLE_GENERATION = 'prets:generation'
+
+
+# ==========================================
+# GÉNÉRATION DES DONNÉES DE PRÊTS
+# ==========================================
+
+def generation_donnees():
+    try:
+        return cache.get_or_set(CLE_GENERATION, 1, None)
+    except Exception:
+        # Cache indisponible : les résultats expirent après TENDANCES_CACHE_DUREE
+        return 0
+
+
+def invalider_donnees_prets():
+    """Les résultats calculés sur les tables de prêts sont à recalculer"""
+    try:
+        cache.incr(CLE_GENERATION)
+    except ValueError:
+        cache.set(CLE_GENERATION, 2, None)
+    except Exception as e:
+        logger.warning(f"Tendances TEG : invalidation impossible ({e})")
+
+
+def prets_modifies(sender, instance, created=False, **kwargs):
+    """Récepteur post_save / post_delete de FichierImport"""
+    champs = kwargs.get('update_fields')
+    # Changement de statut seul (validation, rejet) : les prêts sont inchangés
+    if not created and champs and not set(champs) & set(CHAMPS_LIGNES):
+        return
+    invalider_donnees_prets()
+
+
+# ==========================================
+# TRIMESTRES
+# ==========================================
+
+def lire_trimestre(valeur):
+    """'2024-T3' -> (2024, 3) ; ValueError si le format est invalide"""
+    annee, _, trimestre = (valeur or '').strip().upper().partition('-T')
+    if not (annee.isdigit() and trimestre in ('1', '2', '3', '4')):
+        raise ValueError(f"Trimestre invalide : '{valeur}' (format attendu : AAAA-T1 à AAAA-T4)")
+    return int(annee), int(trimestre)
+
+
+def trimestre_courant():
+    aujourd_hui = date.today()
+    return aujourd_hui.year, (aujourd_hui.month - 1) // 3 + 1
+
+
+def trimestres_entre(debut, fin):
+    """Liste des (année, trimestre) de debut à fin inclus"""
+    premier = debut[0] * 4 + debut[1] - 1
+    dernier = fin[0] * 4 + fin[1] - 1
+    return [(i // 4, i % 4 + 1) for i in range(premier, dernier + 1)]
+
+
+def libelle_trimestre(annee, trimestre):
+    return f"{annee}-T{trimestre}"
+
+
+# ==========================================
+# CALCUL
+# ==========================================
+
+def agreger_par_trimestre(config, category_codes, type_etablissement, trimestres):
+    """
+    Une requête groupée par (année, trimestre) pour un modèle d'un produit.
+    Retourne {(année, trimestre): {teg_moyen, montant_total, taux_nominal_moyen, nombre}}
+    """
+    date_field = config['date_field']
+    teg_field = config['teg_field']
+    debut = date(trimestres[0][0], 3 * trimestres[0][1] - 2, 1)
+    annee_fin, trimestre_fin = trimestres[-1]
+    fin = date(annee_fin + 1, 1, 1) if trimestre_fin == 4 else date(annee_fin, 3 * trimestre_fin + 1, 1)
+
+    # Intervalle de dates sur la colonne : index et partitions par année utilisés
+    queryset = config['model'].objects.filter(
+        Q(**{f'{date_field}__gte': debut, f'{date_field}__lt': fin})
+        & filtre_communique(config['categorie_field'], category_codes, type_etablissement)
+        & config['filters']
+    ).exclude(
+        **{f'{teg_field}__isnull': True}
+    ).exclude(
+        **{f'{teg_field}': 0}
+    )
+
+    agregats = {
+        'teg_moyen': Avg(teg_field),
+        'montant_total': Sum(config['montant_field']),
+        'nombre': Count('id'),
+    }
+    if config['taux_nominal_field']:
+        agregats['taux_nominal_moyen'] = Avg(config['taux_nominal_field'])
+
+    lignes = queryset.annotate(
+        annee=ExtractYear(date_field), trimestre=ExtractQuarter(date_field)
+    ).values('annee', 'trimestre').annotate(**agregats).order_by()
+
+    return {(ligne['annee'], ligne['trimestre']): ligne for ligne in lignes}
+
+
+def variations(valeurs, presents):
+    """Écart avec le trimestre précédent (NaN si l'un des deux est sans données)"""
+    import numpy as np
+
+    ecarts = np.full(valeurs.shape, np.nan)
+    consecutifs = presents[1:] & presents[:-1]
+    ecarts[1:][consecutifs] = np.diff(valeurs)[consecutifs]
+    return ecarts
+
+
+def en_liste(tableau, decimales=2):
+    import numpy as np
+
+    return [None if np.isnan(v) else round(float(v), decimales) for v in tableau]
+
+
+def serie_produit(config, category_codes, type_etablissement, trimestres):
+    """Série trimestrielle d'un produit (un ou plusieurs modèles, comme le communiqué)"""
+    # NumPy n'est importé qu'au calcul : ce module est chargé au démarrage (signaux, admin)
+    import numpy as np
+
+    index = {t: i for i, t in enumerate(trimestres)}
+    teg_pondere = np.zeros(len(trimestres))
+    taux_pondere = np.zeros(len(trimestres))
+    montants = np.zeros(len(trimestres))
+    nombres = np.zeros(len(trimestres), dtype=np.int64)
+
+    for config_modele in config.get('models', [config]):
+        for trimestre, ligne in agreger_par_trimestre(config_modele, category_codes, type_etablissement, trimestres).items():
+            i = index.get(trimestre)
+            if i is None:
+                continue
+            nombre = ligne['nombre']
+            teg_pondere[i] += float(ligne['teg_moyen'] or 0) * nombre
+            taux_pondere[i] += float(ligne.get('taux_nominal_moyen') or 0) * nombre
+            montants[i] += float(ligne['montant_total'] or 0)
+            nombres[i] += nombre
+
+    presents = nombres > 0
+    diviseur = np.where(presents, nombres, 1)
+    teg_moyen = np.where(presents, teg_pondere / diviseur, 0.0)
+    taux_nominal_moyen = np.where(presents, taux_pondere / diviseur, 0.0)
+    seuil_usure = 4 * teg_moyen / 3
+    montants = np.where(presents, montants, 0.0)
+
+    precedents = np.concatenate(([0.0], montants[:-1]))
+    variation_montant_pct = np.full(len(trimestres), np.nan)
+    evolution = np.concatenate(([False], presents[1:] & presents[:-1] & (precedents[1:] > 0)))
+    variation_montant_pct[evolution] = (montants[evolution] - precedents[evolution]) / precedents[evolution] * 100
+
+    colonnes = {
+        'teg_moyen': en_liste(teg_moyen),
+        'seuil_usure': en_liste(seuil_usure),
+        'montant_total': en_liste(montants),
+        'taux_nominal_moyen': en_liste(taux_nominal_moyen),
+        'variation_teg': en_liste(variations(teg_moyen, presents)),
+        'variation_seuil_usure': en_liste(variations(seuil_usure, presents)),
+        'variation_montant': en_liste(variations(montants, presents)),
+        'variation_montant_pct': en_liste(variation_montant_pct),
+    }
+    return [
+        {
+            'periode': libelle_trimestre(annee, trimestre),
+            'nombre_prets': int(nombres[i]),
+            **{nom: valeurs[i] for nom, valeurs in colonnes.items()},
+        }
+        for i, (annee, trimestre) in enumerate(trimestres)
+    ]
+
+
+@lecture_reporting
+def calculer_tendances(categorie, type_etablissement, debut, fin, produit=None):
+    """Séries trimestrielles de chaque produit de la catégorie (ou du seul `produit`)"""
+    trimestres = trimestres_entre(debut, fin)
+    category_codes = CATEGORIES_BENEFICIAIRES[categorie]
+    produits = STRUCTURE_CREDITS[categorie]
+    if produit:
+        produits = {produit: produits[produit]}
+
+    return {
+        'categorie': categorie,
+        'type_etablissement': type_etablissement,
+        'trimestres': [libelle_trimestre(*t) for t in trimestres],
+        'produits': {
+            nom: serie_produit(config, category_codes, type_etablissement, trimestres)
+            for nom, config in produits.items()
+        },
+    }
+
+
+def tendances_teg(categorie, type_etablissement, debut, fin, produit=None):
+    """calculer_tendances mis en cache pour la génération courante des données de prêts"""
+    generation = generation_donnees()
+    parametres = repr((categorie, type_etablissement, debut, fin, produit))
+    cle = f"tendances:{generation}:{hashlib.md5(parametres.encode()).hexdigest()}"
+
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = calculer_tendances(categorie, type_etablissement, debut, fin, produit)
+        cache.set(cle, resultat, settings.TENDANCES_CACHE_DUREE)
+    return {**resultat, 'generation': generation}
@@ -1,3 +1,886 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone as tz
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .anomalies_teg import (
+    DetectionEnCours, detecter_anomalies, lancer_detection_arriere_plan, liberer_detection,
+    statistiques_groupees, verrouiller_detection,
+)
+from .chargement_synthetique import (
+    charger_donnees_synthetiques, etablissements_synthetiques, supprimer_donnees_synthetiques,
+)
+from .email_utils import envoyer_email_rejet, envoyer_email_validation
+from .classeur_csv import charger_classeur
+from .middleware import InstrumentationMiddleware, LectureCollanteMiddleware, tampon_instrumentation
+from .models import (
+    ActionUtilisateur, AnomalieTEG, Credit_Amortissables, Etablissement, FichierImport, JetonJournal,
+    TeleversementFragmente, User,
+)
+from . import recherche_journal, retention_journal
+from .prevalidation import COLONNES_ATTENDUES, LIGNES_ENTETE, message_refus, prevalider_soumission
+from .routage_bdd import ALIAS_REPORTING, lecture_reporting, marquer_ecriture
+from .taches_arriere_plan import SuiviTaches
+from .utils import (
+    extraire_affacturages, extraire_cautions, extraire_credits_amortissables, extraire_decouverts,
+    extraire_effets_commerces, extraire_spot,
+)
+
+
+# ==========================================
+# ADMIN DES TABLES DE PRÊTS (admin.PretsAdmin)
+# ==========================================
+
+class PretsAdminTests(TestCase):
+    """La liste de l'admin exécute un nombre fixe de requêtes, quel que soit le volume"""
+
+    # Utilisateur de la session, COUNT(*) de la page filtrée, lignes de la page
+    NB_REQUETES_LISTE = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.etablissements = [
+            Etablissement.objects.create(
+                Nom_etablissement=f"Banque {i}", code_etablissement=f"B{i:03d}", type_etablissement='BANQUE'
+            )
+            for i in range(3)
+        ]
+        cls.admin = User.objects.create_superuser('admin@cnef.cg', 'Admin', 'CNEF', 'motdepasse')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:cnef_credit_amortissables_changelist')
+
+    def creer_credits(self, nombre, annee=2024):
+        Credit_Amortissables.objects.bulk_create([
+            Credit_Amortissables(
+                etablissement=self.etablissements[i % len(self.etablissements)],
+                ETABLISSEMENT_I01="Banque", CODE_ETAB_I02=f"B{i % 3:03d}",
+                DATE_MEP_I03=date(annee, 1 + i % 12, 1), NATURE_PRET_I05="Consommation",
+                BENEFICIAIRE_I06=f"Client {i}", CATEGORIE_BENEF_I07="Particulier",
+                LIEU_RESIDENCE_I08="Brazzaville", SECT_ACT_I09="Commerce", PROFESSION_I12="Commerçant",
+                MONTANT_PRET_I13=1_000_000, DUREE_I14=12, FREQ_REMB_I16="Mensuel", TAUX_NOMINAL_I17=0.1,
+                MODEREMBOURSEMENT_I22="Constant", MONTANT_ECHEANCE_I23=90_000, MODE_DEBLOCAGE_I24="Virement",
+                SITUATION_CREANCE_I25="Saine", TEG_I26=0.12,
+            )
+            for i in range(nombre)
+        ])
+
+    def requetes_liste(self, params=None):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(requetes)
+
+    def test_nombre_de_requetes_fixe(self):
+        self.creer_credits(10)
+        filtres = {'etablissement': self.etablissements[0].pk, 'annee': '2023'}
+        # Premier affichage : remplit le cache des filtres et l'index des suggestions
+        self.requetes_liste(filtres)
+
+        self.assertEqual(self.requetes_liste(), self.NB_REQUETES_LISTE)
+        self.creer_credits(150, annee=2023)
+        self.assertEqual(self.requetes_liste(), self.NB_REQUETES_LISTE)
+        # Les filtres n'ajoutent pas de requête
+        self.assertEqual(self.requetes_liste(filtres), self.NB_REQUETES_LISTE)
+        self.assertEqual(self.requetes_liste({'q': 'Client', 'p': 2}), self.NB_REQUETES_LISTE)
+
+    def test_recherche_et_filtres(self):
+        self.creer_credits(30)
+        response = self.client.get(self.url, {'q': '"Client 1"', 'etablissement': self.etablissements[1].pk})
+        self.assertEqual(response.status_code, 200)
+        resultats = response.context['cl'].result_list
+        self.assertTrue(resultats)
+        for credit in resultats:
+            self.assertEqual(credit.etablissement_id, self.etablissements[1].pk)
+            self.assertTrue(credit.BENEFICIAIRE_I06.startswith('Client 1'))
+
+    def test_suggestions_etablissements(self):
+        url = reverse('admin:cnef_credit_amortissables_suggestions_etablissements')
+        data = self.client.get(url, {'q': 'B001'}).json()
+        self.assertEqual([e['id'] for e in data['resultats']], [self.etablissements[1].pk])
+
+    @override_settings(ADMIN_SUPPRESSION_TAILLE_LOT=7)
+    def test_suppression_par_lots(self):
+        self.creer_credits(20)
+        self.creer_credits(5, annee=2023)
+        pks = list(Credit_Amortissables.objects.filter(DATE_MEP_I03__year=2024).values_list('pk', flat=True))
+        response = self.client.post(self.url, {
+            'action': 'supprimer_credits',
+            '_selected_action': pks,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Credit_Amortissables.objects.count(), 5)
+
+
+# ==========================================
+# ADMIN DES SOUMISSIONS (admin.FichierImportAdmin)
+# ==========================================
+
+class FichierImportAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin@cnef.cg', 'Admin', 'CNEF', 'motdepasse')
+        etablissement = Etablissement.objects.create(
+            Nom_etablissement="Banque", code_etablissement="B001", type_etablissement='BANQUE'
+        )
+        cls.fichiers = [
+            FichierImport.objects.create(
+                etablissement_cnef=etablissement, uploader_par=cls.admin, nom_fichier=f"t{i}.xlsx", statut=statut
+            )
+            for i, statut in enumerate(['EN_COURS', 'EN_COURS', 'REUSSI'])
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:cnef_fichierimport_changelist')
+
+    def test_liste(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "t2.xlsx")
+
+    @mock.patch('cnef.validation_groupee.lancer_validation_arriere_plan', return_value='tache')
+    def test_action_validation_groupee(self, lancer):
+        response = self.client.post(self.url, {
+            'action': 'valider_en_lot',
+            '_selected_action': [f.pk for f in self.fichiers],
+        }, follow=True)
+        self.assertEqual(response.status_code, 200)
+        # Seules les soumissions EN_COURS sont importées
+        lancer.assert_called_once()
+        fichier_ids, utilisateur = lancer.call_args.args
+        self.assertEqual(sorted(fichier_ids), [self.fichiers[0].pk, self.fichiers[1].pk])
+        self.assertEqual(utilisateur, self.admin)
+        message = str(list(response.context['messages'])[0])
+        self.assertIn("2 fichier(s)", message)
+        self.assertIn("1 ignoré(s)", message)
+        self.assertIn(reverse('api_progression_validation_en_lot', args=['tache']), message)
+
+
+# ==========================================
+# DONNÉES SYNTHÉTIQUES (chargement_synthetique.py)
+# ==========================================
+
+class DonneesSynthetiquesTests(TestCase):
+
+    def test_suppression_limitee_aux_etablissements_generes(self):
+        reel = Etablissement.objects.create(
+            Nom_etablissement="Synergie Banque", code_etablissement="SYN0007", type_etablissement='BANQUE'
+        )
+        fichier = FichierImport.objects.create(etablissement_cnef=reel, nom_fichier="t1.xlsx")
+        charger_donnees_synthetiques(2, 1, 3, produits=['credit'])
+        self.assertEqual(Credit_Amortissables.objects.exclude(etablissement=reel).count(), 6)
+
+        resultat = supprimer_donnees_synthetiques()
+        self.assertEqual(resultat['Etablissement'], 2)
+        self.assertEqual(list(Etablissement.objects.all()), [reel])
+        self.assertTrue(FichierImport.objects.filter(pk=fichier.pk).exists())
+        self.assertFalse(Credit_Amortissables.objects.exists())
+
+    def test_codes_voisins_jamais_retenus(self):
+        voisins = [
+            # (nom, code) : codes réels proches du motif généré
+            ("SYNTHETIQUE 0001", "SYN123"),
+            ("SYNTHETIQUE 0002", "SYN12345"),
+            ("SYNTHETIQUE 0003", "XSYN0003"),
+            ("SYNTHETIQUE 0004", "SYNA004"),
+            ("SYNTHETIQUE 0005", "syn0005"),
+            ("SYNTHETIQUE 0006", "SYN0006 "),
+            ("SYNTHETIQUE 0007", "SYM0007"),
+            ("SYNTHETIQUE 0008", "B008"),
+            # Code généré mais nom réel ou voisin
+            ("Synergie Banque", "SYN0010"),
+            ("synthetique 0011", "SYN0011"),
+            ("SYNTHETIQUE 12", "SYN0012"),
+            ("SYNTHETIQUE 00131", "SYN0013"),
+        ]
+        for nom, code in voisins:
+            Etablissement.objects.create(Nom_etablissement=nom, code_etablissement=code, type_etablissement='BANQUE')
+        genere = Etablissement.objects.create(
+            Nom_etablissement="SYNTHETIQUE 0009", code_etablissement="SYN0009", type_etablissement='BANQUE'
+        )
+
+        self.assertEqual(list(etablissements_synthetiques()), [genere])
+        self.assertEqual(supprimer_donnees_synthetiques()['Etablissement'], 1)
+        self.assertEqual(Etablissement.objects.count(), len(voisins))
+
+
+# ==========================================
+# EMAILS DE VALIDATION ET DE REJET (email_utils.py)
+# ==========================================
+
+class EmailsSoumissionTests(TestCase):
+
+    def test_echec_de_mise_en_file_sans_annulation(self):
+        etablissement = Etablissement.objects.create(
+            Nom_etablissement="Banque", code_etablissement="B001", type_etablissement='BANQUE'
+        )
+        User.objects.create_user('aef@banque.cg', 'Aef', 'Banque', 'motdepasse', role='AEF', etablissement=etablissement)
+        fichier = FichierImport.objects.create(etablissement_cnef=etablissement, nom_fichier="t1.xlsx")
+
+        with mock.patch('cnef.email_utils.mettre_en_file', side_effect=RuntimeError("file indisponible")):
+            with transaction.atomic():
+                FichierImport.objects.filter(pk=fichier.pk).update(statut='REUSSI')
+                with self.assertLogs('cnef.email_utils', 'ERROR'):
+                    self.assertEqual(envoyer_email_validation(fichier), {'aef': False, 'uef': False})
+                    self.assertEqual(envoyer_email_rejet(fichier, "Motif"), {'aef': False, 'uef': False})
+
+        # La transaction de la validation n'est pas annulée
+        fichier.refresh_from_db()
+        self.assertEqual(fichier.statut, 'REUSSI')
+
+
+# ==========================================
+# ROUTAGE VERS LA BASE DE REPORTING (routage_bdd.py)
+# ==========================================
+
+@lecture_reporting
+def lire_etablissements():
+    """Lecture décorée : retourne les codes et la base utilisée"""
+    etablissements = Etablissement.objects.order_by('code_etablissement')
+    return [e.code_etablissement for e in etablissements], etablissements.db
+
+
+def base_lue(request):
+    """Vue de test : base sur laquelle lit une fonction décorée"""
+    return lire_etablissements()[1]
+
+
+@skipUnless(
+    ALIAS_REPORTING in settings.DATABASES,
+    "base de reporting non configurée (DB_ENGINE et DB_REPORTING_ENGINE=django.db.backends.sqlite3)"
+)
+class RoutageReportingTests(TransactionTestCase):
+    # Le réplica de test est un miroir de 'default' : les données doivent être
+    # validées pour y être lues (TransactionTestCase). '__all__' = {'default',
+    # 'reporting'}, sans que le lanceur cherche l'alias s'il n'est pas configuré.
+    databases = '__all__'
+
+    def setUp(self):
+        Etablissement.objects.create(
+            Nom_etablissement="Banque", code_etablissement="B001", type_etablissement='BANQUE'
+        )
+        requete = RequestFactory().get('/')
+        SessionMiddleware(lambda request: None).process_request(requete)
+        self.session = requete.session
+
+    def requete(self, vue):
+        """Exécute `vue` derrière LectureCollanteMiddleware, dans la session du test"""
+        request = RequestFactory().get('/')
+        request.session = self.session
+        return LectureCollanteMiddleware(vue)(request)
+
+    def test_lectures_decorees_sur_reporting(self):
+        with CaptureQueriesContext(connections[ALIAS_REPORTING]) as reporting, \
+                CaptureQueriesContext(connection) as principale:
+            codes, base = lire_etablissements()
+        self.assertEqual(base, ALIAS_REPORTING)
+        self.assertEqual(codes, ['B001'])
+        self.assertEqual(len(reporting), 1)
+        self.assertEqual(len(principale), 0)
+        # Hors d'une fonction décorée, rien ne change
+        self.assertEqual(Etablissement.objects.all().db, 'default')
+
+    def test_ecritures_sur_default(self):
+        @lecture_reporting
+        def creer():
+            return Etablissement.objects.create(
+                Nom_etablissement="Banque 2", code_etablissement="B002", type_etablissement='BANQUE'
+            )
+
+        with CaptureQueriesContext(connections[ALIAS_REPORTING]) as reporting:
+            etablissement = creer()
+        self.assertEqual(etablissement._state.db, 'default')
+        self.assertEqual(len(reporting), 0)
+
+    @override_settings(DB_REPORTING_DELAI_COLLANT=60)
+    def test_lecture_collante_apres_ecriture(self):
+        self.assertEqual(self.requete(base_lue), ALIAS_REPORTING)
+
+        def valider(request):
+            marquer_ecriture(request)
+            return base_lue(request)
+
+        # La requête de la validation puis les suivantes lisent sur default
+        self.assertEqual(self.requete(valider), 'default')
+        self.assertEqual(self.requete(base_lue), 'default')
+
+        # Délai écoulé : retour au réplica
+        debut = time.time()
+        with mock.patch('cnef.routage_bdd.time.time', return_value=debut + 61):
+            self.assertEqual(self.requete(base_lue), ALIAS_REPORTING)
+
+        # Le contexte du test n'est pas affecté
+        self.assertEqual(base_lue(None), ALIAS_REPORTING)
+
+
+# ==========================================
+# RÉTENTION DU JOURNAL (retention_journal.py)
+# ==========================================
+
+class RetentionJournalTests(TestCase):
+
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(lambda: [f.unlink() for f in Path(self.dossier).iterdir()])
+        # 23 actions sur deux mois, puis 4 actions récentes conservées
+        ActionUtilisateur.objects.bulk_create([
+            ActionUtilisateur(
+                type_action='CONNEXION', description=f"Action {i}",
+                date_action=datetime(2023, 1 + i % 2, 1 + i, tzinfo=tz.utc),
+            )
+            for i in range(23)
+        ] + [
+            ActionUtilisateur(type_action='CONNEXION', description=f"Récente {i}") for i in range(4)
+        ])
+        self.queryset = ActionUtilisateur.objects.filter(date_action__lt=datetime(2024, 1, 1, tzinfo=tz.utc))
+        self.anciennes = set(self.queryset.values_list('pk', flat=True))
+
+    def ids_archives(self):
+        ids = []
+        for chemin in sorted(Path(self.dossier).glob('journal_*.jsonl.gz')):
+            with gzip.open(chemin, 'rt', encoding='utf-8') as f:
+                ids.extend(json.loads(ligne)['id'] for ligne in f)
+        return ids
+
+    def supprimer(self, **options):
+        instantane = retention_journal.instantane_suppression(self.queryset)
+        return retention_journal.supprimer_par_lots(
+            self.queryset, instantane['pk_max'], taille_lot=5, pause=0, archiver=True,
+            dossier=self.dossier, **options
+        )
+
+    def test_lignes_archivees_egales_aux_lignes_supprimees(self):
+        resultat = self.supprimer()
+        self.assertEqual(resultat, {'supprimes': 23, 'archives': 23})
+        self.assertEqual(sorted(self.ids_archives()), sorted(self.anciennes))
+        self.assertEqual(sorted(p.name for p in Path(self.dossier).glob('*.gz')),
+                         ['journal_2023_01.jsonl.gz', 'journal_2023_02.jsonl.gz'])
+        self.assertEqual(ActionUtilisateur.objects.count(), 4)
+        self.assertIsNone(retention_journal.lire_reprise(self.dossier))
+
+    def test_reprise_apres_interruption(self):
+        ecrire_reprise = retention_journal.ecrire_reprise
+        appels = []
+
+        def arret_avant_suppression(dossier, reprise):
+            # Arrêt du processus entre l'archivage du 3e lot et sa suppression
+            ecrire_reprise(dossier, reprise)
+            if reprise['en_attente']:
+                appels.append(reprise)
+                if len(appels) == 3:
+                    raise SystemExit
+
+        with mock.patch('cnef.retention_journal.ecrire_reprise', side_effect=arret_avant_suppression):
+            with self.assertRaises(SystemExit):
+                self.supprimer()
+
+        reprise = retention_journal.lire_reprise(self.dossier)
+        self.assertEqual(len(reprise['en_attente']), 5)
+        self.assertEqual(reprise['dernier_pk'], max(reprise['en_attente']))
+        self.assertEqual(ActionUtilisateur.objects.filter(pk__in=reprise['en_attente']).count(), 5)
+
+        resultat = self.supprimer()
+        self.assertEqual(resultat['supprimes'], 13)
+        self.assertEqual(resultat['archives'], 8)
+        # Chaque action archivée une seule fois, toutes supprimées
+        self.assertEqual(sorted(self.ids_archives()), sorted(self.anciennes))
+        self.assertFalse(self.queryset.exists())
+        self.assertIsNone(retention_journal.lire_reprise(self.dossier))
+
+
+# ==========================================
+# RECHERCHE DANS LE JOURNAL (recherche_journal.py)
+# ==========================================
+
+@override_settings(JOURNAL_RECHERCHE_FULLTEXT=False)
+class RechercheJournalTests(TestCase):
+
+    def rechercher(self, texte):
+        actions = recherche_journal.rechercher_journal(ActionUtilisateur.objects.all(), texte)
+        return set(actions.values_list('description', flat=True))
+
+    def test_extraction_des_jetons(self):
+        self.assertEqual(
+            recherche_journal.extraire_jetons("Validation du fichier BEAC-2024_03.xlsx par M. Ngoma"),
+            ['validation', 'fichier', 'beac', '2024_03', 'xlsx', 'par', 'ngoma'],
+        )
+        self.assertEqual(recherche_journal.extraire_jetons("a b cd"), [])
+        self.assertEqual(len(recherche_journal.extraire_jetons('x' * 100)[0]), recherche_journal.LONGUEUR_MAX_JETON)
+
+    def test_texte_accentue(self):
+        self.assertEqual(recherche_journal.extraire_jetons("Échéance modifiée, clôturée"),
+                         ['echeance', 'modifiee', 'cloturee'])
+        ActionUtilisateur.objects.create(type_action='SUPPRESSION', description="Échéance supprimée")
+
+        self.assertEqual(self.rechercher("echeance"), {"Échéance supprimée"})
+        self.assertEqual(self.rechercher("ÉCHÉANCE SUPPRIMÉE"), {"Échéance supprimée"})
+
+    def test_tous_les_mots_doivent_correspondre(self):
+        for description in ["Validation du fichier crédits", "Rejet du fichier crédits", "Validation de l'établissement"]:
+            ActionUtilisateur.objects.create(type_action='CONNEXION', description=description)
+
+        self.assertEqual(self.rechercher("validation fichier"), {"Validation du fichier crédits"})
+        # Recherche par préfixe
+        self.assertEqual(self.rechercher("valid fich"), {"Validation du fichier crédits"})
+        self.assertEqual(self.rechercher("fichier"), {"Validation du fichier crédits", "Rejet du fichier crédits"})
+        self.assertEqual(self.rechercher("validation inexistant"), set())
+
+    def test_index_mis_a_jour_a_l_ajout_d_actions(self):
+        self.assertEqual(self.rechercher("exportation"), set())
+
+        # Enregistrement unitaire : récepteur post_save
+        action = ActionUtilisateur.objects.create(type_action='CONNEXION', description="Exportation du rapport")
+        self.assertEqual(
+            set(JetonJournal.objects.filter(action=action).values_list('jeton', flat=True)),
+            {'exportation', 'rapport'},
+        )
+        self.assertEqual(self.rechercher("exportation"), {"Exportation du rapport"})
+
+        # Écriture par lots du tampon (bulk_create, sans post_save)
+        lot = ActionUtilisateur.objects.bulk_create([
+            ActionUtilisateur(type_action='CONNEXION', description="Exportation groupée des crédits"),
+        ])
+        recherche_journal.indexer_actions(lot)
+        self.assertEqual(self.rechercher("exportation"), {"Exportation du rapport", "Exportation groupée des crédits"})
+        self.assertEqual(self.rechercher("exportation groupee"), {"Exportation groupée des crédits"})
+
+
+# ==========================================
+# INSTRUMENTATION DES REQUÊTES (middleware.py)
+# ==========================================
+
+@override_settings(INSTRUMENTATION_TAUX=0, INSTRUMENTATION_SEUIL_LENT_MS=50)
+class InstrumentationMiddlewareTests(TestCase):
+
+    def appeler(self, attente):
+        def vue(request):
+            list(Etablissement.objects.all())
+            time.sleep(attente)
+            return HttpResponse()
+
+        tampon_instrumentation.clear()
+        return InstrumentationMiddleware(vue)(RequestFactory().get('/chef/'))
+
+    def test_requete_lente_non_echantillonnee_journalisee_avec_son_sql(self):
+        with self.assertLogs('cnef.instrumentation', 'WARNING') as journaux:
+            self.appeler(0.06)
+
+        detail = json.loads(journaux.records[0].getMessage())
+        self.assertEqual(detail['evenement'], 'requete_lente')
+        self.assertEqual(detail['nb_sql'], 1)
+        self.assertIn(Etablissement._meta.db_table, detail['sql'][0]['sql'])
+        # Hors échantillon : pas de mesure dans le tampon
+        self.assertEqual(len(tampon_instrumentation), 0)
+
+    def test_requete_rapide_non_echantillonnee_ignoree(self):
+        with self.assertNoLogs('cnef.instrumentation'):
+            self.appeler(0)
+        self.assertEqual(len(tampon_instrumentation), 0)
+
+
+# ==========================================
+# PRÉ-VALIDATION DES SOUMISSIONS (prevalidation.py)
+# ==========================================
+
+FEUILLES_PRODUITS = {
+    'credits': ("Crédits amortissables", extraire_credits_amortissables),
+    'decouverts': ("Découverts", extraire_decouverts),
+    'affacturages': ("Affacturage", extraire_affacturages),
+    'cautions': ("Cautions", extraire_cautions),
+    'effets': ("Effets de commerce", extraire_effets_commerces),
+    'spot': ("Spot", extraire_spot),
+}
+
+
+def classeur_xlsx(feuilles):
+    """Contenu d'un .xlsx : {nom de feuille: [lignes]}"""
+    import openpyxl
+
+    classeur = openpyxl.Workbook()
+    classeur.remove(classeur.active)
+    for nom, lignes in feuilles.items():
+        feuille = classeur.create_sheet(nom)
+        for numero, ligne in enumerate(lignes, start=1):
+            for colonne, valeur in enumerate(ligne, start=1):
+                feuille.cell(row=numero, column=colonne, value=valeur)
+    flux = io.BytesIO()
+    classeur.save(flux)
+    return flux.getvalue()
+
+
+def lignes_produit(largeur, nb_lignes=3, vides_avant=0):
+    lignes = [[None]] * vides_avant
+    lignes.append([f'Colonne {i}' for i in range(1, largeur + 1)])
+    lignes += [[n * 100 + i for i in range(1, largeur + 1)] for n in range(nb_lignes)]
+    return lignes
+
+
+class PrevalidationSoumissionTests(TestCase):
+
+    def prevalider(self, nom, contenu):
+        return prevalider_soumission(SimpleUploadedFile(nom, contenu))
+
+    def extraire(self, nom, contenu, type_feuille):
+        """Erreurs de l'extracteur complet sur la même feuille"""
+        libelle, extracteur = FEUILLES_PRODUITS[type_feuille]
+        classeur = charger_classeur(SimpleUploadedFile(nom, contenu))
+        try:
+            feuille = classeur.worksheets[0]
+            return extracteur(feuille, None, None)[1]
+        finally:
+            classeur.close()
+
+    def test_classeur_valide(self):
+        contenu = classeur_xlsx({
+            "Crédits amortissables": lignes_produit(26, vides_avant=2),
+            "Découverts": lignes_produit(17),
+            "Notes": [["Remarque"]],
+        })
+        resultat = self.prevalider('soumission.xlsx', contenu)
+
+        self.assertTrue(resultat['valide'], resultat['erreurs'])
+        self.assertEqual(
+            [(f['nom'], f['type'], f['lignes'], f['colonnes_entete']) for f in resultat['feuilles']],
+            [("Crédits amortissables", 'credits', 6, 26), ("Découverts", 'decouverts', 4, 17), ("Notes", None, 1, 1)],
+        )
+        self.assertIn("Feuille « Notes » non reconnue : elle sera ignorée", resultat['avertissements'])
+        self.assertIn("Feuille(s) absente(s) : Affacturage, Cautions, Effets de commerce, Spot", resultat['avertissements'])
+
+    def test_entete_trop_etroite_comme_les_extracteurs(self):
+        for type_feuille, (libelle, _) in FEUILLES_PRODUITS.items():
+            attendues = COLONNES_ATTENDUES[type_feuille]
+            contenu = classeur_xlsx({libelle: lignes_produit(attendues - 1)})
+            with self.subTest(type_feuille):
+                resultat = self.prevalider('soumission.xlsx', contenu)
+                self.assertFalse(resultat['valide'])
+                self.assertEqual(resultat['erreurs'], [
+                    f"Feuille « {libelle} » ({libelle}) : {attendues - 1} colonne(s) dans l'en-tête (ligne 1), "
+                    f"{attendues} attendues"
+                ])
+                # L'extracteur complet rejette chaque ligne pour la même raison
+                erreurs = self.extraire('soumission.xlsx', contenu, type_feuille)
+                self.assertEqual(erreurs[0], f"Ligne 2: Nombre de colonnes insuffisant ({attendues - 1}/{attendues})")
+
+    def test_entete_absente_des_premieres_lignes(self):
+        lignes = lignes_produit(26, vides_avant=LIGNES_ENTETE)
+        contenu = classeur_xlsx({"Crédits amortissables": lignes})
+        resultat = self.prevalider('soumission.xlsx', contenu)
+
+        self.assertEqual(resultat['erreurs'], [
+            f"Feuille « Crédits amortissables » : aucune ligne d'en-tête dans les {LIGNES_ENTETE} premières lignes"
+        ])
+        self.assertEqual(self.extraire('soumission.xlsx', contenu, 'credits'), ["Aucune ligne d'en-tête trouvée"])
+
+    def test_fichier_corrompu_ou_non_zip(self):
+        valide = classeur_xlsx({"Crédits amortissables": lignes_produit(26)})
+        for cas, contenu in {'non zip': b'ceci n\'est pas un classeur', 'tronque': valide[:len(valide) // 2]}.items():
+            with self.subTest(cas):
+                resultat = self.prevalider('soumission.xlsx', contenu)
+                self.assertEqual(message_refus(resultat), (
+                    "Fichier refusé : Le fichier n'est pas un classeur Excel (.xlsx) "
+                    "ou une archive de fichiers CSV lisible"
+                ))
+                # L'import complet ne pourrait pas non plus l'ouvrir
+                with self.assertRaises(Exception):
+                    charger_classeur(SimpleUploadedFile('soumission.xlsx', contenu))
+
+    def test_soumission_csv(self):
+        resultat = self.prevalider('credits.csv', contenu_csv_credits())
+        self.assertTrue(resultat['valide'], resultat['erreurs'])
+        self.assertEqual(resultat['feuilles'][0]['colonnes_entete'], 26)
+
+        etroit = '\n'.join(';'.join(str(i) for i in range(20)) for _ in range(3)).encode('utf-8')
+        resultat = self.prevalider('credits.csv', etroit)
+        self.assertEqual(resultat['erreurs'], [
+            "Feuille « credits » (Crédits amortissables) : 20 colonne(s) dans l'en-tête (ligne 1), 26 attendues"
+        ])
+        self.assertEqual(self.extraire('credits.csv', etroit, 'credits')[0], "Ligne 2: Nombre de colonnes insuffisant (20/26)")
+
+
+# ==========================================
+# TÉLÉVERSEMENT FRAGMENTÉ (views_televersements.py)
+# ==========================================
+
+def contenu_csv_credits(nb_lignes=5):
+    """Soumission CSV de crédits amortissables : en-tête de 26 colonnes"""
+    lignes = [';'.join(f'Colonne {i}' for i in range(1, 27))]
+    lignes += [';'.join(str(n * 100 + i) for i in range(1, 27)) for n in range(nb_lignes)]
+    return ('\n'.join(lignes) + '\n').encode('utf-8')
+
+
+class TeleversementFragmenteTests(TestCase):
+
+    def setUp(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        parametres = override_settings(MEDIA_ROOT=dossier, TELEVERSEMENT_DOSSIER='', TELEVERSEMENT_TAILLE_FRAGMENT=200)
+        parametres.enable()
+        self.addCleanup(parametres.disable)
+        self.media = Path(dossier)
+
+        etablissement = Etablissement.objects.create(
+            Nom_etablissement="Banque", code_etablissement="B001", type_etablissement='BANQUE'
+        )
+        self.client.force_login(User.objects.create_user(
+            'aef@banque.cg', 'Aef', 'Banque', 'motdepasse', role='AEF', etablissement=etablissement
+        ))
+        self.contenu = contenu_csv_credits()
+
+    def initier(self, nom='credits.csv'):
+        reponse = self.client.post(
+            reverse('televersement_initier'),
+            {'nom_fichier': nom, 'taille': len(self.contenu)},
+            content_type='application/json',
+        )
+        return reponse, reponse.json()
+
+    def envoyer(self, etat, numero, contenu=None, empreinte=None):
+        if contenu is None:
+            taille = etat['taille_fragment']
+            contenu = self.contenu[numero * taille:(numero + 1) * taille]
+        return self.client.put(
+            reverse('televersement_fragment', args=[etat['upload_id'], numero]),
+            contenu, content_type='application/octet-stream',
+            HTTP_X_EMPREINTE_FRAGMENT=empreinte or hashlib.sha256(contenu).hexdigest(),
+        )
+
+    def finaliser(self, etat):
+        return self.client.post(reverse('televersement_finaliser', args=[etat['upload_id']]))
+
+    def fichiers_stockes(self):
+        return [p for p in (self.media / 'imports').rglob('*') if p.is_file()]
+
+    def test_initier(self):
+        reponse, etat = self.initier()
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual(etat['nb_fragments'], -(-len(self.contenu) // 200))
+        self.assertEqual(etat['fragments_recus'], [])
+        self.assertEqual(etat['statut'], 'EN_COURS')
+
+        reponse, etat = self.initier('credits.pdf')
+        self.assertEqual(reponse.status_code, 400)
+        self.assertFalse(etat['success'])
+
+    def test_fragments_dans_le_desordre_et_reprise(self):
+        _, etat = self.initier()
+        self.assertGreaterEqual(etat['nb_fragments'], 3)
+        dernier = etat['nb_fragments'] - 1
+
+        for numero in (dernier, 0):
+            self.assertEqual(self.envoyer(etat, numero).status_code, 200)
+        # Un fragment déjà reçu peut être renvoyé
+        self.assertEqual(self.envoyer(etat, 0).status_code, 200)
+
+        # Reprise : seuls les fragments manquants restent à envoyer
+        reprise = self.client.get(reverse('televersement_etat', args=[etat['upload_id']])).json()
+        self.assertEqual(reprise['fragments_recus'], [0, dernier])
+        reponse = self.finaliser(etat)
+        self.assertEqual(reponse.status_code, 400)
+        self.assertIn('manquant', reponse.json()['message'])
+
+        for numero in range(1, dernier):
+            self.envoyer(etat, numero)
+        with self.captureOnCommitCallbacks(execute=True):
+            reponse = self.finaliser(etat)
+        self.assertEqual(reponse.status_code, 200, reponse.json())
+
+        fichier_import = FichierImport.objects.get()
+        self.assertEqual(reponse.json()['fichier_id'], fichier_import.pk)
+        with fichier_import.fichier.open('rb') as f:
+            self.assertEqual(f.read(), self.contenu)
+        # Fragments supprimés après la validation de la transaction
+        self.assertFalse((self.media / 'televersements' / etat['upload_id']).exists())
+
+    def test_finalisation_idempotente(self):
+        _, etat = self.initier()
+        for numero in range(etat['nb_fragments']):
+            self.envoyer(etat, numero)
+        premiere = self.finaliser(etat).json()
+        seconde = self.finaliser(etat).json()
+
+        self.assertTrue(seconde['success'])
+        self.assertIn('déjà soumis', seconde['message'])
+        self.assertEqual(seconde['fichier_id'], premiere['fichier_id'])
+        self.assertEqual(FichierImport.objects.count(), 1)
+        self.assertEqual(len(self.fichiers_stockes()), 1)
+
+    def test_fragments_refuses(self):
+        _, etat = self.initier()
+        nb = etat['nb_fragments']
+
+        refus = {
+            'hors limites': self.envoyer(etat, nb),
+            'trop court': self.envoyer(etat, 0, self.contenu[:50]),
+            'trop long': self.envoyer(etat, nb - 1, self.contenu[-(len(self.contenu) % 200) - 1:]),
+            'empreinte': self.envoyer(etat, 0, empreinte='0' * 64),
+            'empreinte invalide': self.envoyer(etat, 0, empreinte='abc'),
+        }
+        for cas, reponse in refus.items():
+            with self.subTest(cas):
+                self.assertEqual(reponse.status_code, 400)
+                self.assertFalse(reponse.json()['success'])
+        # Aucun fragment refusé n'est pris pour un fragment reçu
+        televersement = TeleversementFragmente.objects.get()
+        self.assertEqual(self.client.get(reverse('televersement_etat', args=[televersement.id])).json()['fragments_recus'], [])
+
+    def test_finalisation_annulee_sans_fichier_orphelin(self):
+        _, etat = self.initier()
+        for numero in range(etat['nb_fragments']):
+            self.envoyer(etat, numero)
+
+        echecs = [
+            # Après la création du FichierImport
+            mock.patch.object(TeleversementFragmente, 'save', side_effect=RuntimeError("base indisponible")),
+            # Pendant la création (notification des administrateurs)
+            mock.patch('cnef.views_aef.envoyer_email_notification_acnef', side_effect=RuntimeError("smtp")),
+        ]
+        for echec in echecs:
+            with self.subTest(echec.attribute), echec, self.assertLogs('cnef.views_televersements', 'ERROR'):
+                self.assertEqual(self.finaliser(etat).status_code, 500)
+            self.assertFalse(FichierImport.objects.exists())
+            self.assertEqual(self.fichiers_stockes(), [])
+
+        # Les fragments sont conservés : la finalisation peut être relancée
+        self.assertEqual(self.finaliser(etat).status_code, 200)
+        self.assertEqual(len(self.fichiers_stockes()), 1)
+
+
+# ==========================================
+# TÂCHES EN ARRIÈRE-PLAN (taches_arriere_plan.py)
+# ==========================================
+
+class TachesArrierePlanTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.suivi = SuiviTaches('essai:', 'essai')
+
+    def attendre_fin(self, tache_id):
+        for _ in range(200):
+            etat = self.suivi.lire(tache_id)
+            if etat['statut'] != 'EN_COURS':
+                return etat
+            time.sleep(0.01)
+        self.fail("tâche non terminée")
+
+    def test_progression_publiee(self):
+        evenement = threading.Event()
+
+        def executer(tache_id):
+            evenement.wait(1)
+            self.suivi.publier(tache_id, statut='TERMINE', traites=2)
+
+        tache_id = self.suivi.lancer(executer, total=2, traites=0)
+        self.assertEqual(self.suivi.lire(tache_id), {'statut': 'EN_COURS', 'total': 2, 'traites': 0})
+        evenement.set()
+        self.assertEqual(self.attendre_fin(tache_id), {'statut': 'TERMINE', 'total': 2, 'traites': 2})
+
+    def test_echec_publie(self):
+        def executer(tache_id):
+            raise RuntimeError("base indisponible")
+
+        with self.assertLogs('cnef.taches_arriere_plan', 'ERROR'):
+            etat = self.attendre_fin(self.suivi.lancer(executer))
+        self.assertEqual(etat, {'statut': 'ECHEC', 'message': 'base indisponible'})
+        self.assertIsNone(self.suivi.lire('inconnue'))
+
+
+# ==========================================
+# TEG ATYPIQUES (anomalies_teg.py)
+# ==========================================
+
+class AnomaliesTEGTests(TransactionTestCase):
+    # Lectures sur le réplica si DB_REPORTING_* est configuré (voir RoutageReportingTests)
+    databases = '__all__'
+
+    def test_statistiques_groupees(self):
+        rng = np.random.default_rng(0)
+        groupes = rng.integers(0, 5, 1000)
+        valeurs = rng.normal(15, 3, 1000)
+        stats = statistiques_groupees(groupes, valeurs, 6)
+        for g in range(5):
+            x = valeurs[groupes == g]
+            self.assertAlmostEqual(stats['mediane'][g], np.median(x))
+            self.assertAlmostEqual(stats['q1'][g], np.quantile(x, 0.25))
+            self.assertAlmostEqual(stats['q3'][g], np.quantile(x, 0.75))
+            self.assertAlmostEqual(stats['mad'][g], np.median(np.abs(x - np.median(x))))
+        # Groupe sans prêt
+        self.assertEqual(stats['effectif'][5], 0)
+        self.assertTrue(np.isnan(stats['mediane'][5]))
+
+    @override_settings(ANOMALIES_TAILLE_LOT=15)
+    def test_detection_par_soumission(self):
+        etablissement = Etablissement.objects.create(
+            Nom_etablissement="Banque", code_etablissement="B001", type_etablissement='BANQUE'
+        )
+        fichier = FichierImport.objects.create(etablissement_cnef=etablissement, nom_fichier="t1.xlsx")
+        teg = [0.12 + 0.001 * (i % 7) for i in range(40)] + [0.45]
+        Credit_Amortissables.objects.bulk_create([
+            Credit_Amortissables(
+                etablissement=etablissement, fichier_import=fichier,
+                ETABLISSEMENT_I01="Banque", CODE_ETAB_I02="B001", DATE_MEP_I03=date(2024, 5, 1),
+                NATURE_PRET_I05="Consommation", BENEFICIAIRE_I06=f"Client {i}",
+                # Même catégorie saisie de deux façons
+                CATEGORIE_BENEF_I07="06" if i % 2 else "6", LIEU_RESIDENCE_I08="Brazzaville",
+                SECT_ACT_I09="Commerce", PROFESSION_I12="Commerçant", MONTANT_PRET_I13=1_000_000,
+                DUREE_I14=12, FREQ_REMB_I16="Mensuel", TAUX_NOMINAL_I17=0.1, MODEREMBOURSEMENT_I22="Constant",
+                MONTANT_ECHEANCE_I23=90_000, MODE_DEBLOCAGE_I24="Virement", SITUATION_CREANCE_I25="Saine",
+                MATURITE="1-CT", TEG_I26=valeur,
+            )
+            for i, valeur in enumerate(teg)
+        ])
+
+        bilan = detecter_anomalies(produits=['credit'])
+        self.assertEqual(bilan['prets_analyses'], 41)
+        anomalies = list(AnomalieTEG.objects.filter(fichier_import=fichier))
+        self.assertEqual(len(anomalies), 1)
+        self.assertAlmostEqual(anomalies[0].teg_declare, 45.0)
+        self.assertEqual(anomalies[0].taille_groupe, 41)
+        self.assertEqual(anomalies[0].categorie_beneficiaire, '6')
+
+        # Une nouvelle détection remplace les résultats
+        detecter_anomalies(produits=['credit'])
+        self.assertEqual(AnomalieTEG.objects.filter(etablissement=etablissement).count(), 1)
+
+    def test_une_seule_detection_a_la_fois(self):
+        cache.clear()
+        verrouiller_detection()
+        with self.assertRaises(DetectionEnCours):
+            detecter_anomalies(produits=['credit'])
+        with self.assertRaises(DetectionEnCours):
+            lancer_detection_arriere_plan(produits=['credit'])
+
+        admin = User.objects.create_superuser('admin@cnef.cg', 'Admin', 'CNEF', 'motdepasse')
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('lancer_detection_anomalies'), '{"produits": ["credit"]}', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 409)
+
+        # Verrou libéré : la détection passe, et libère le verrou en fin de détection
+        liberer_detection()
+        detecter_anomalies(produits=['credit'])
+        verrouiller_detection()
+        liberer_detection()
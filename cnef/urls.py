@@ -36,13 +36,29 @@ urlpatterns = [
     path('upload-fichier/', views.upload_fichier_utilisateur, name='upload_fichier'),
     path('api/historique/', views.api_historique_etablissement, name='get_historique'),
 
+    # Téléversement fragmenté (gros fichiers, reprise après coupure)
+    path('api/televersements/', views.televersement_initier, name='televersement_initier'),
+    path('api/televersements/<uuid:televersement_id>/', views.televersement_etat, name='televersement_etat'),
+    path('api/televersements/<uuid:televersement_id>/fragments/<int:numero>/', views.televersement_fragment, name='televersement_fragment'),
+    path('api/televersements/<uuid:televersement_id>/finaliser/', views.televersement_finaliser, name='televersement_finaliser'),
+
+    # Événements des soumissions (tableaux de bord) : flux SSE sous ASGI, attente longue sous WSGI
+    path('api/evenements/flux/', views.flux_evenements, name='flux_evenements'),
+    path('api/evenements/attente/', views.attendre_evenements, name='attendre_evenements'),
+
     # ------------------------------------------------------------
     # INTERFACE CHEF
     # ------------------------------------------------------------
     path('chef/', views.interface_chef, name='interface_chef'),
+    path('chef/api/soumissions/', views.api_soumissions_chef, name='api_soumissions_chef'),
     path('chef/detail/<int:fichier_id>/', views.detail_soumission, name='detail_soumission'),
     path('chef/valider/<int:fichier_id>/', views.valider_soumission, name='valider_soumission'),
     path('chef/rejeter/<int:fichier_id>/', views.rejeter_soumission, name='rejeter_soumission'),
+    path('chef/api/valider-en-lot/', login_required(user_passes_test(is_chef)(views.valider_en_lot_api)), name='valider_en_lot'),
+    path('chef/api/valider-en-lot/<str:tache_id>/', login_required(user_passes_test(is_chef)(views.api_progression_validation_en_lot)), name='api_progression_validation_en_lot'),
+    path('chef/api/anomalies-teg/', views.api_anomalies_teg, name='api_anomalies_teg'),
+    path('chef/api/anomalies-teg/detecter/', views.lancer_detection_anomalies, name='lancer_detection_anomalies'),
+    path('chef/api/anomalies-teg/detecter/<str:tache_id>/', views.api_progression_detection_anomalies, name='api_progression_detection_anomalies'),
     path('chef/stats/', views.get_stats_ajax, name='get_stats'),
     path('chef/bases-donnees/<str:model_type>/', views.visualiser_base_donnees, name='visualiser_base_donnees'),
     path('chef/api/fichiers/', login_required((views.FichiersListAPIView.as_view())), name='get_fichiers'),
@@ -54,6 +70,7 @@ urlpatterns = [
     path('chef/api/supprimer-etablissement/<int:etablissement_id>/', login_required(user_passes_test(is_chef)(views.supprimer_etablissement_api)), name='supprimer_etablissement_api'),
     path('chef/telecharger-fichier/<int:fichier_id>/', login_required(user_passes_test(is_chef)(views.telecharger_fichier_original)), name='telecharger_fichier'),
     path('chef/communique-presse/', login_required((views.generer_communique_presse)), name='communique_presse'),
+    path('chef/api/communique/tendances/', views.api_tendances_teg, name='api_tendances_teg'),
 
     path('chef/historique-emails/', login_required(user_passes_test(is_chef)(views.historique_emails)), name='historique_emails'),
     path('chef/api/renvoyer-email/<int:email_id>/', login_required(user_passes_test(is_chef)(views.renvoyer_email_api)), name='renvoyer_email'),
@@ -68,6 +85,9 @@ urlpatterns = [
     path('chef/api/etablissements/<int:etablissement_id>/supprimer/', login_required(user_passes_test(is_acnef)(views.supprimer_etablissement)), name='supprimer_etablissement'),
     path('chef/api/etablissements/<int:etablissement_id>/toggle-status/', login_required(user_passes_test(is_acnef)(views.toggle_etablissement_status)), name='toggle_etablissement_status'),
     path('chef/api/etablissements/select/', views.charger_etablissements_select, name='charger_etablissements_select'),
+    path('chef/api/etablissements/suggest/', views.suggerer_etablissements, name='suggerer_etablissements'),
+    path('chef/api/utilisateurs/suggest/', views.suggerer_utilisateurs, name='suggerer_utilisateurs'),
+    path('chef/api/instrumentation/', views.api_instrumentation, name='api_instrumentation'),
     
     # ------------------------------------------------------------
     # PAGES SUPPLÉMENTAIRES
@@ -92,6 +112,7 @@ urlpatterns = [
     path('chef/api/utilisateurs/<int:user_id>/bannir/', login_required(user_passes_test(is_chef)(views.bannir_utilisateur)), name='bannir_utilisateur'),
     path('chef/api/journalisation/compter/', views.api_compter_journalisation, name='api_compter_journalisation'),
     path('chef/api/journalisation/supprimer/', views.api_supprimer_journalisation, name='api_supprimer_journalisation'),
+    path('chef/api/journalisation/supprimer/<str:tache_id>/progression/', views.api_progression_suppression_journalisation, name='api_progression_suppression_journalisation'),
     
     # ==========================================
     # URLS CORRESPONDANTES
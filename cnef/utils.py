@@ -1,13 +1,14 @@
-import openpyxl
 from datetime import datetime
 from decimal import Decimal, InvalidOperation
 import logging
+import math
 from django.db import transaction, IntegrityError, DatabaseError
 from .models import (
     FichierImport, Credit_Amortissables, Decouverts, 
     Affacturage, Cautions, Effets_commerces, Spot
 )
-import numpy_financial as npf
+from .teg_cache import memoiser_teg
+from .classeur_csv import charger_classeur
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
@@ -21,10 +22,17 @@ def convertir_date(valeur):
         return valeur.date()
     
     if isinstance(valeur, str):
+        valeur = valeur.strip()
+        # Cas courant des fichiers CSV : date ISO (AAAA-MM-JJ, avec ou sans heure)
+        if valeur[:4].isdigit():
+            try:
+                return datetime.fromisoformat(valeur).date()
+            except ValueError:
+                pass
         formats = ['%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y', '%Y/%m/%d']
         for fmt in formats:
             try:
-                return datetime.strptime(valeur.strip(), fmt).date()
+                return datetime.strptime(valeur, fmt).date()
             except ValueError:
                 continue
     
@@ -61,6 +69,14 @@ def convertir_decimal_safe(valeur, defaut=0):
         if valeur in ('', '-', '—', 'N/A', 'n/a', 'NA'):
             return float(defaut)
         
+        # Cas courant des fichiers CSV : nombre déjà au format décimal
+        try:
+            nombre = float(valeur)
+            if math.isfinite(nombre):
+                return nombre
+        except ValueError:
+            pass
+        
         # Nettoyer la chaîne - approche plus robuste
         import re
         # Garder seulement les chiffres, points, virgules et signes négatifs
@@ -224,12 +240,7 @@ def extraire_credits_amortissables(worksheet, etablissement_cnef, fichier_import
                                  (frais_dossier or 0) - 
                                  (montant_assurance or 0) - 
                                  (frais_annexe or 0))
-                    teg_mensuel = npf.rate(
-                        nper=duree,
-                        pmt=-montant_echeance,
-                        pv=montant_net,
-                        fv=0
-                    ) * 100
+                    teg_mensuel = calculer_taux_periodique(duree, montant_echeance, montant_net) * 100
                 else:
                     teg_mensuel = 0.0
             except Exception:
@@ -853,7 +864,7 @@ def previsualiser_fichier_excel(fichier_import):
     
     try:
         logger.debug(f"Début de la prévisualisation du fichier {fichier_import.nom_fichier}")
-        workbook = openpyxl.load_workbook(fichier_import.fichier.path, data_only=True)
+        workbook = charger_classeur(fichier_import.fichier.path)
         etablissement = fichier_import.etablissement_cnef
         
         sheet_mapping = {
@@ -976,7 +987,7 @@ def traiter_fichier_excel(fichier_import):
     try:
         # Ouvrir le fichier Excel
         logger.debug(f"Début du traitement du fichier {fichier_import.nom_fichier}")
-        workbook = openpyxl.load_workbook(fichier_import.fichier.path, data_only=True)
+        workbook = charger_classeur(fichier_import.fichier.path)
         etablissement = fichier_import.etablissement_cnef
         
         # Mapping étendu des noms de feuilles avec ordre de priorité
@@ -1155,7 +1166,104 @@ def traiter_fichier_excel(fichier_import):
 
 
 from django.core.cache import cache
-import numpy as np
+import io
+
+
+# Champs conservés par produit dans le cache de pré-calcul (affichage des TEG)
+CHAMPS_PRECALCUL_TEG = {
+    'credits': ['MONTANT_PRET_I13', 'DUREE_I14', 'TAUX_NOMINAL_I17', 'TEG_I26', 'TEG_mensuel', 'TEG_annualise'],
+    'decouverts': ['MONTANT_DECOUVERT_I08', 'TAUX_NOMINAL_I10', 'TEG_I17', 'TEG_decouvert'],
+    'affacturages': ['MONTANT_CREANCE_I10', 'DUREE_AFFACTURAGE_I05', 'TEG_I14', 'TEG_affacturage'],
+    'cautions': ['MONTANT_CAUTION_I10', 'DUREE_CAUTION_I05', 'TAUX_CAUTION_I11', 'TEG_I14', 'TEG_caution'],
+    'effets': ['MONTANT_EFFET_I11', 'DUREE_EFFET_I05', 'TAUX_NOMINAL_I10', 'TEG_I15', 'TEG_effet'],
+    'spots': ['MONTANT_PRET_I13', 'DUREE_I14', 'TAUX_NOMINAL_I17', 'TEG_I26', 'TEG_spot'],
+}
+
+
+def extraire_instances_precalcul(workbook, etablissement, fichier_import):
+    """
+    Extrait les instances (non enregistrées) de chaque produit d'un classeur,
+    avec leurs TEG calculés
+    """
+    sheet_mapping = {
+        'credits': ['credits amortissables', 'credit amortissable', 'crédits amortissables'],
+        'decouverts': ['découverts bancaires', 'decouvert bancaire', 'découverts'],
+        'affacturages': ['affacturage commercial', 'affacturages', 'affacturage'],
+        'cautions': ['cautions bancaires', 'caution bancaire', 'cautions'],
+        'effets': ['effets de commerce', 'effet de commerce', 'effets commerciaux'],
+        'spot': ['spot', 'spots', 'cours spot']
+    }
+    
+    resultats_precalcul = {}
+    
+    for sheet_name in workbook.sheetnames:
+        worksheet = workbook[sheet_name]
+        sheet_type = identifier_type_feuille(sheet_name, sheet_mapping)
+        
+        if not sheet_type:
+            continue
+        
+        # Extraire les données avec calcul des TEG
+        if sheet_type == 'credits':
+            credits, _ = extraire_credits_amortissables(worksheet, etablissement, fichier_import)
+            resultats_precalcul['credits'] = credits
+        elif sheet_type == 'decouverts':
+            decouverts, _ = extraire_decouverts(worksheet, etablissement, fichier_import)
+            resultats_precalcul['decouverts'] = decouverts
+        elif sheet_type == 'affacturages':
+            affacturages, _ = extraire_affacturages(worksheet, etablissement, fichier_import)
+            resultats_precalcul['affacturages'] = affacturages
+        elif sheet_type == 'cautions':
+            cautions, _ = extraire_cautions(worksheet, etablissement, fichier_import)
+            resultats_precalcul['cautions'] = cautions
+        elif sheet_type == 'effets':
+            effets, _ = extraire_effets_commerces(worksheet, etablissement, fichier_import)
+            resultats_precalcul['effets'] = effets
+        elif sheet_type == 'spot':
+            spots, _ = extraire_spot(worksheet, etablissement, fichier_import)
+            resultats_precalcul['spots'] = spots
+    
+    return resultats_precalcul
+
+
+def compacter_precalcul_teg(resultats_precalcul):
+    """
+    Convertit les listes d'instances en colonnes NumPy (float64) et les
+    sérialise au format .npz : seuls les champs utiles à l'affichage des TEG
+    sont conservés, sans l'état Django ni les objets liés
+    """
+    import numpy as np
+    colonnes = {}
+    for produit, instances in resultats_precalcul.items():
+        for champ in CHAMPS_PRECALCUL_TEG.get(produit, []):
+            colonnes[f"{produit}__{champ}"] = np.fromiter(
+                ((getattr(obj, champ, None) or 0) for obj in instances),
+                dtype=np.float64,
+                count=len(instances)
+            )
+    
+    tampon = io.BytesIO()
+    np.savez(tampon, **colonnes)
+    return tampon.getvalue()
+
+
+def decompacter_precalcul_teg(donnees):
+    """Reconstruit le dictionnaire {produit: {champ: ndarray}} depuis le format .npz"""
+    import numpy as np
+    resultat = {}
+    with np.load(io.BytesIO(donnees)) as archive:
+        for nom in archive.files:
+            produit, champ = nom.split('__', 1)
+            resultat.setdefault(produit, {})[champ] = archive[nom]
+    return resultat
+
+
+def lire_precalcul_teg(fichier_import):
+    """Retourne le pré-calcul TEG en cache pour un fichier, ou None s'il a expiré"""
+    donnees = cache.get(f"precalcul_teg_{fichier_import.id}")
+    if not donnees:
+        return None
+    return decompacter_precalcul_teg(donnees)
 
 
 def precalculer_teg_fichier(fichier_import):
@@ -1164,50 +1272,14 @@ def precalculer_teg_fichier(fichier_import):
     """
     try:
         logger.debug(f"Début du pré-calcul TEG pour {fichier_import.nom_fichier}")
-        workbook = openpyxl.load_workbook(fichier_import.fichier.path, data_only=True)
+        workbook = charger_classeur(fichier_import.fichier.path)
         etablissement = fichier_import.etablissement_cnef
         
-        sheet_mapping = {
-            'credits': ['credits amortissables', 'credit amortissable', 'crédits amortissables'],
-            'decouverts': ['découverts bancaires', 'decouvert bancaire', 'découverts'],
-            'affacturages': ['affacturage commercial', 'affacturages', 'affacturage'],
-            'cautions': ['cautions bancaires', 'caution bancaire', 'cautions'],
-            'effets': ['effets de commerce', 'effet de commerce', 'effets commerciaux'],
-            'spot': ['spot', 'spots', 'cours spot']
-        }
-        
-        resultats_precalcul = {}
-        
-        for sheet_name in workbook.sheetnames:
-            worksheet = workbook[sheet_name]
-            sheet_type = identifier_type_feuille(sheet_name, sheet_mapping)
-            
-            if not sheet_type:
-                continue
-            
-            # Extraire les données avec calcul des TEG
-            if sheet_type == 'credits':
-                credits, _ = extraire_credits_amortissables(worksheet, etablissement, fichier_import)
-                resultats_precalcul['credits'] = credits
-            elif sheet_type == 'decouverts':
-                decouverts, _ = extraire_decouverts(worksheet, etablissement, fichier_import)
-                resultats_precalcul['decouverts'] = decouverts
-            elif sheet_type == 'affacturages':
-                affacturages, _ = extraire_affacturages(worksheet, etablissement, fichier_import)
-                resultats_precalcul['affacturages'] = affacturages
-            elif sheet_type == 'cautions':
-                cautions, _ = extraire_cautions(worksheet, etablissement, fichier_import)
-                resultats_precalcul['cautions'] = cautions
-            elif sheet_type == 'effets':
-                effets, _ = extraire_effets_commerces(worksheet, etablissement, fichier_import)
-                resultats_precalcul['effets'] = effets
-            elif sheet_type == 'spot':
-                spots, _ = extraire_spot(worksheet, etablissement, fichier_import)
-                resultats_precalcul['spots'] = spots
+        resultats_precalcul = extraire_instances_precalcul(workbook, etablissement, fichier_import)
         
-        # Stocker les résultats en cache pour utilisation ultérieure
+        # Stocker une version compacte (colonnes NumPy) en cache pour utilisation ultérieure
         cache_key = f"precalcul_teg_{fichier_import.id}"
-        cache.set(cache_key, resultats_precalcul, timeout=3600)  # 1 heure
+        cache.set(cache_key, compacter_precalcul_teg(resultats_precalcul), timeout=3600)  # 1 heure
         
         logger.info(f"Pré-calcul TEG terminé pour {fichier_import.nom_fichier}")
         return resultats_precalcul
@@ -1323,7 +1395,6 @@ def extraire_et_calculer_teg(fichier_path, etablissement_cnef) -> Dict:
     Extrait les données ET calcule les TEG EN UNE SEULE PASSE
     Retourne un dictionnaire avec toutes les données nécessaires
     """
-    import openpyxl
     
     resultats = {
         'credits': [],
@@ -1336,7 +1407,7 @@ def extraire_et_calculer_teg(fichier_path, etablissement_cnef) -> Dict:
     }
     
     try:
-        workbook = openpyxl.load_workbook(fichier_path, data_only=True)
+        workbook = charger_classeur(fichier_path)
         
         sheet_mapping = {
             'credits': ['credits amortissables', 'credit amortissable', 'crédits amortissables'],
@@ -1694,6 +1765,19 @@ def extraire_spots_avec_teg(worksheet) -> List[Dict]:
 # FONCTIONS DE CALCUL TEG
 # ========================================
 
+@memoiser_teg('taux_periodique')
+def calculer_taux_periodique(duree, montant_echeance, montant_net) -> float:
+    """Résout le taux périodique d'un crédit amortissable (npf.rate)"""
+    import numpy_financial as npf
+    return float(npf.rate(
+        nper=duree,
+        pmt=-montant_echeance,
+        pv=montant_net,
+        fv=0
+    ))
+
+
+@memoiser_teg('credit')
 def calculer_teg_credit(montant_pret, duree, montant_echeance,
                         frais_dossier, montant_assurance, frais_annexe,
                         freq_remb) -> Tuple[float, float]:
@@ -1740,6 +1824,7 @@ def calculer_teg_credit(montant_pret, duree, montant_echeance,
         return 0.0, 0.0
 
 
+@memoiser_teg('decouvert')
 def calculer_teg_decouvert(montant_decouvert, taux_nominal,
                           frais_dossiers, couts_assurance, frais_annexes) -> float:
     """Calcule le TEG pour un découvert"""
@@ -1758,6 +1843,7 @@ def calculer_teg_decouvert(montant_decouvert, taux_nominal,
         return 0.0
 
 
+@memoiser_teg('affacturage')
 def calculer_teg_affacturage(montant_creance, duree,
                             montant_com_affacturage, montant_comm_financement,
                             montant_frais_annexes) -> float:
@@ -1778,6 +1864,7 @@ def calculer_teg_affacturage(montant_creance, duree,
         return 0.0
 
 
+@memoiser_teg('caution')
 def calculer_teg_caution(montant_caution, duree, taux_caution,
                         frais_comm, frais_annexes) -> float:
     """Calcule le TEG pour une caution"""
@@ -1799,6 +1886,7 @@ def calculer_teg_caution(montant_caution, duree, taux_caution,
         return 0.0
 
 
+@memoiser_teg('effet')
 def calculer_teg_effet(montant_effet, duree, taux_nominal,
                       montant_commission, autres_frais) -> float:
     """Calcule le TEG pour un effet de commerce"""
@@ -1820,6 +1908,7 @@ def calculer_teg_effet(montant_effet, duree, taux_nominal,
         return 0.0
 
 
+@memoiser_teg('spot')
 def calculer_teg_spot(montant_pret, duree, montant_echeance,
                      frais_dossier, montant_assurance, frais_annexe) -> float:
     """Calcule le TEG pour un spot"""
@@ -1924,3 +2013,84 @@ def generer_statistiques_teg(donnees_extraites: Dict) -> Dict:
     }
     
     return stats
+
+
+# ========================================
+# MÉTADONNÉES DES FICHIERS IMPORTÉS
+# ========================================
+
+import hashlib
+
+# Correspondance noms de feuilles → type de produit (même table que traiter_fichier_excel)
+CORRESPONDANCE_FEUILLES = {
+    'credits': [
+        'credits amortissables', 'credit amortissable', 'crédits amortissables',
+        'crédit amortissable', 'credits_amortissables', 'credit_amortissable',
+        'ca', 'credits', 'credit',
+    ],
+    'decouverts': [
+        'découverts bancaires', 'decouvert bancaire', 'découverts',
+        'decouverts', 'découvert', 'decouvert', 'dec',
+    ],
+    'affacturages': [
+        'affacturage commercial', 'affacturages', 'affacturage', 'aff',
+    ],
+    'cautions': [
+        'cautions bancaires', 'caution bancaire', 'cautions', 'caution', 'cau',
+    ],
+    'effets': [
+        'effets de commerce', 'effet de commerce', 'effets_commerce',
+        'effet_commerce', 'effets commerciaux', 'effet commercial',
+        'effets', 'effet', 'ec',
+    ],
+    'spot': [
+        'spot', 'spots', 'spot_fx', 'spots_fx', 'spot-fx', 'spots-fx', 'spot fx', 'spots fx',
+        'cours spot', 'cours_spot', 'cours-spot', 'taux spot', 'taux_spot', 'taux-spot',
+        'valeur spot', 'valeur_spot', 'valeur-spot', 'prix spot', 'prix_spot', 'prix-spot', 'sp',
+    ],
+}
+
+
+def calculer_metadonnees_fichier(fichier) -> Dict:
+    """
+    Calcule taille, empreinte SHA-256 et inventaire des feuilles d'un fichier
+    (UploadedFile ou FieldFile), en une lecture par blocs.
+    L'inventaire vient des balises <dimension> (openpyxl en lecture seule) :
+    les cellules ne sont pas chargées. Pour une soumission CSV, les lignes
+    sont comptées en un parcours en flux.
+    """
+    empreinte = hashlib.sha256()
+    taille = 0
+    fichier.open('rb')
+    fichier.seek(0)
+    for bloc in fichier.chunks():
+        empreinte.update(bloc)
+        taille += len(bloc)
+
+    feuilles = None
+    try:
+        fichier.seek(0)
+        workbook = charger_classeur(fichier, read_only=True)
+        try:
+            feuilles = [
+                {
+                    'nom': worksheet.title,
+                    'type': identifier_type_feuille(worksheet.title, CORRESPONDANCE_FEUILLES),
+                    'lignes': worksheet.max_row,
+                    'colonnes': worksheet.max_column,
+                }
+                for worksheet in workbook.worksheets
+            ]
+        finally:
+            workbook.close()
+    except Exception as e:
+        # Fichier illisible : l'upload reste accepté, la validation le signalera
+        logger.warning(f"Inventaire des feuilles impossible pour {fichier.name}: {e}")
+    finally:
+        fichier.seek(0)
+
+    return {
+        'taille_octets': taille,
+        'empreinte_sha256': empreinte.hexdigest(),
+        'feuilles': feuilles,
+    }
@@ -0,0 +1,259 @@
+"""
+Validation groupée des soumissions en attente (statut EN_COURS)
+
+Valider des dizaines de fichiers un par un depuis l'interface chef prend des
+heures en fin de trimestre. La validation groupée importe N soumissions en
+parallèle :
+- un pool borné de VALIDATION_GROUPEE_WORKERS threads ; chaque thread
+  ouvre sa propre connexion à la base (les connexions Django sont propres
+  à chaque thread) et la ferme après chaque fichier
+- chaque fichier est importé dans sa propre transaction : un fichier en
+  erreur est annulé en entier (aucune ligne partielle) sans toucher aux
+  autres, et son rapport d'erreurs est enregistré sur le FichierImport
+- une seule notification par établissement, listant tous ses fichiers
+  validés, au lieu d'un email par fichier
+
+Point d'entrée commun à l'action d'administration, à l'API chef et à la
+commande valider_soumissions_en_lot. La progression est publiée dans le
+cache pour être suivie depuis l'interface.
+"""
+
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.utils import timezone
+
+from .evenements import publier_fichiers
+from .models import ActionUtilisateur, FichierImport, User
+from .taches_arriere_plan import SuiviTaches
+from .utils import traiter_fichier_excel
+
+logger = logging.getLogger(__name__)
+
+suivi = SuiviTaches('validation:groupee:', 'validation-groupee')
+publier_progression = suivi.publier
+lire_progression = suivi.lire
+
+# Nombre maximal d'erreurs conservées dans le rapport d'un fichier
+ERREURS_RAPPORT = 20
+
+
+class EchecImport(Exception):
+    """Import sans ligne valide : annule la transaction du fichier"""
+
+    def __init__(self, resultat):
+        super().__init__(resultat['message'])
+        self.resultat = resultat
+
+
+def nombre_workers(demande=None, nb_fichiers=None):
+    """
+    Taille du pool. SQLite n'accepte qu'un écrivain à la fois :
+    les imports y sont sérialisés.
+    """
+    workers = demande or settings.VALIDATION_GROUPEE_WORKERS
+    if connection.vendor == 'sqlite':
+        workers = 1
+    if nb_fichiers:
+        workers = min(workers, nb_fichiers)
+    return max(1, workers)
+
+
+# ==========================================
+# VALIDATION D'UN FICHIER (DANS UN WORKER)
+# ==========================================
+
+def valider_fichier(fichier_id, utilisateur_id):
+    """
+    Importe une soumission dans sa propre transaction et retourne son rapport :
+    {fichier_id, nom_fichier, etablissement_id, statut (VALIDE, ERREUR, IGNORE),
+     message, total_lignes, details, erreurs, duree_ms}
+    """
+    debut = time.perf_counter()
+    rapport = {
+        'fichier_id': fichier_id, 'nom_fichier': '', 'etablissement_id': None,
+        'statut': 'IGNORE', 'message': '', 'total_lignes': 0, 'details': {}, 'erreurs': [],
+    }
+    close_old_connections()
+    try:
+        utilisateur = User.objects.filter(pk=utilisateur_id).first() if utilisateur_id else None
+        try:
+            with transaction.atomic():
+                # Verrou : un valideur ne peut pas traiter le même fichier en même temps
+                fichier = (
+                    FichierImport.objects.select_for_update()
+                    .select_related('etablissement_cnef')
+                    .filter(pk=fichier_id).first()
+                )
+                if fichier is None:
+                    rapport['message'] = 'Fichier introuvable'
+                    return rapport
+                rapport['nom_fichier'] = fichier.nom_fichier
+                rapport['etablissement_id'] = fichier.etablissement_cnef_id
+                if fichier.statut != 'EN_COURS':
+                    rapport['message'] = 'Ce fichier a déjà été traité'
+                    return rapport
+
+                resultat = traiter_fichier_excel(fichier)
+                if not resultat['success']:
+                    raise EchecImport(resultat)
+
+                fichier.valide_par = utilisateur
+                fichier.date_validation = timezone.now()
+                fichier.save(update_fields=['valide_par', 'date_validation'])
+
+                rapport['details'] = {
+                    'credits': resultat['credits'],
+                    'decouverts': resultat['decouverts'],
+                    'affacturages': resultat['affacturages'],
+                    'cautions': resultat['cautions'],
+                    'effets': resultat['effets'],
+                    'spots': resultat['spot'],
+                }
+                ActionUtilisateur.enregistrer_action(
+                    utilisateur=utilisateur,
+                    type_action='VALIDATION_FICHIER',
+                    description=f"Validation groupée du fichier {fichier.nom_fichier}",
+                    etablissement=fichier.etablissement_cnef,
+                    donnees_supplementaires={
+                        'fichier_id': fichier.id,
+                        'nom_fichier': fichier.nom_fichier,
+                        'total_lignes': resultat['total_lignes'],
+                        'details': rapport['details'],
+                        'validation_groupee': True,
+                    }
+                )
+            rapport.update(
+                statut='VALIDE', message=resultat['message'],
+                total_lignes=resultat['total_lignes'], erreurs=resultat['erreurs'][:ERREURS_RAPPORT],
+            )
+        except Exception as e:
+            # Transaction du fichier annulée : on n'enregistre que le statut et le rapport d'erreurs
+            erreurs = e.resultat['erreurs'] if isinstance(e, EchecImport) else []
+            message = str(e) if isinstance(e, EchecImport) else f"Erreur lors du traitement: {e}"
+            texte = "\n".join([message] + erreurs[:ERREURS_RAPPORT])
+            if len(erreurs) > ERREURS_RAPPORT:
+                texte += f"\n... et {len(erreurs) - ERREURS_RAPPORT} autres erreurs"
+            if FichierImport.objects.filter(pk=fichier_id, statut='EN_COURS').update(statut='ERREUR', erreurs=texte):
+                publier_fichiers([fichier_id])
+            rapport.update(statut='ERREUR', message=message, erreurs=erreurs[:ERREURS_RAPPORT])
+            if not isinstance(e, EchecImport):
+                logger.exception(f"Validation groupée : échec du fichier {fichier_id}")
+    finally:
+        rapport['duree_ms'] = round((time.perf_counter() - debut) * 1000, 1)
+        # Connexion propre au thread du worker
+        connections.close_all()
+    return rapport
+
+
+# ==========================================
+# VALIDATION D'UN LOT
+# ==========================================
+
+def notifier_etablissements(rapports):
+    """Une notification par établissement pour ses fichiers validés. Retourne le nombre d'emails mis en file."""
+    from .email_utils import envoyer_email_validation_groupee
+
+    par_etablissement = {}
+    for rapport in rapports:
+        if rapport['statut'] == 'VALIDE':
+            par_etablissement.setdefault(rapport['etablissement_id'], []).append(rapport['fichier_id'])
+
+    emails = 0
+    for ids in par_etablissement.values():
+        fichiers = list(
+            FichierImport.objects.filter(id__in=ids)
+            .select_related('etablissement_cnef', 'uploader_par').order_by('date_import')
+        )
+        try:
+            emails += envoyer_email_validation_groupee(fichiers)
+        except Exception as e:
+            logger.error(f"Validation groupée : échec de la notification de {fichiers[0].etablissement_cnef}: {e}")
+    return emails
+
+
+def valider_en_lot(fichier_ids, utilisateur=None, workers=None, progression=None, notifier=True):
+    """
+    Valide les soumissions `fichier_ids` avec un pool borné de threads.
+    `progression(rapport, traites, total)` est appelée après chaque fichier.
+    Retourne {total, valides, erreurs, ignores, emails, workers, duree_ms, rapports}.
+    """
+    debut = time.perf_counter()
+    fichier_ids = list(dict.fromkeys(int(i) for i in fichier_ids))
+    total = len(fichier_ids)
+    workers = nombre_workers(workers, total)
+    utilisateur_id = utilisateur.pk if utilisateur else None
+
+    rapports = []
+    if fichier_ids:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='validation-groupee') as pool:
+            futures = [pool.submit(valider_fichier, fichier_id, utilisateur_id) for fichier_id in fichier_ids]
+            for future in as_completed(futures):
+                rapport = future.result()
+                rapports.append(rapport)
+                if progression:
+                    progression(rapport, len(rapports), total)
+
+    ordre = {fichier_id: i for i, fichier_id in enumerate(fichier_ids)}
+    rapports.sort(key=lambda r: ordre[r['fichier_id']])
+
+    emails = 0
+    if notifier:
+        close_old_connections()
+        emails = notifier_etablissements(rapports)
+
+    bilan = {
+        'total': total,
+        'valides': sum(1 for r in rapports if r['statut'] == 'VALIDE'),
+        'erreurs': sum(1 for r in rapports if r['statut'] == 'ERREUR'),
+        'ignores': sum(1 for r in rapports if r['statut'] == 'IGNORE'),
+        'emails': emails,
+        'workers': workers,
+        'duree_ms': round((time.perf_counter() - debut) * 1000, 1),
+        'rapports': rapports,
+    }
+    logger.info(
+        f"Validation groupée : {bilan['valides']} validé(s), {bilan['erreurs']} en erreur, "
+        f"{bilan['ignores']} ignoré(s) sur {total} ({workers} worker(s), {bilan['duree_ms']} ms)"
+    )
+    return bilan
+
+
+# ==========================================
+# SUIVI DE PROGRESSION
+# ==========================================
+
+def executer_validation(fichier_ids, utilisateur=None, tache_id=None, **options):
+    """Exécute la validation du lot en publiant sa progression sous `tache_id`"""
+    tache_id = tache_id or uuid.uuid4().hex
+    total = len(set(fichier_ids))
+
+    def progression(rapport, traites, total):
+        etat = lire_progression(tache_id) or {}
+        publier_progression(
+            tache_id, traites=traites,
+            pourcentage=round(traites * 100 / total, 1) if total else 100,
+            rapports=etat.get('rapports', []) + [rapport],
+        )
+
+    publier_progression(tache_id, statut='EN_COURS', total=total, traites=0, pourcentage=0, rapports=[])
+    try:
+        bilan = valider_en_lot(fichier_ids, utilisateur, progression=progression, **options)
+        publier_progression(tache_id, statut='TERMINE', pourcentage=100, **bilan)
+        return bilan
+    except Exception as e:
+        logger.error(f"Validation groupée : échec du lot {tache_id}: {e}")
+        publier_progression(tache_id, statut='ECHEC', message=str(e))
+        raise
+
+
+def lancer_validation_arriere_plan(fichier_ids, utilisateur=None, **options):
+    """Lance la validation du lot dans un thread et retourne l'identifiant de suivi"""
+    return suivi.lancer(
+        lambda tache_id: executer_validation(fichier_ids, utilisateur, tache_id=tache_id, **options),
+        total=len(set(fichier_ids)), traites=0, pourcentage=0, rapports=[],
+    )
@@ -1,31 +1,533 @@
-# ==========================================
-# VUES SPÉCIFIQUES POUR L'INTERFACE AEF
-# ==========================================
 """
-Ce fichier contient les vues spécifiques pour l'interface AEF
-qui ne sont pas encore dans le fichier views.py principal
+Vues des interfaces établissement (AEF / UEF) : tableau de bord, soumissions, utilisateurs UEF
 """
 
 import logging
-from django.shortcuts import get_object_or_404
+import json
+
+from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
-from django.db import transaction
 from django.utils import timezone
+from django.db import transaction
+from django.views.decorators.http import require_http_methods
 
-# Import des modèles
-from .models import User, FichierImport, ActionUtilisateur
+from .models import FichierImport, TokenInscription, ActionUtilisateur, User
+from .utils import calculer_metadonnees_fichier
+from .classeur_csv import EXTENSIONS_SOUMISSION
+from .prevalidation import prevalider_soumission, message_refus
+from .email_utils import envoyer_email_notification_acnef
+
+from .views_commun import filtrer_historique, paginer_par_curseur, is_aef, is_uef, get_statut_class
+from .views_invitations import generer_invitation_uef, revoquer_invitation
 
 logger = logging.getLogger(__name__)
 
-# ==========================================
-# TESTS DE PERMISSIONS
-# ==========================================
 
-def is_aef(user):
-    """Vérifie si l'utilisateur est AEF"""
-    return user.is_authenticated and hasattr(user, 'role') and user.role == 'AEF'
+def enregistrer_soumission(request, fichier):
+    """
+    Crée le FichierImport d'une soumission (upload direct ou téléversement
+    fragmenté), notifie les administrateurs CNEF et journalise l'upload.
+    Retourne (fichier_import, nombre d'administrateurs notifiés).
+    """
+    # Taille, empreinte et inventaire des feuilles, calculés une fois pour toutes
+    metadonnees = calculer_metadonnees_fichier(fichier)
+    
+    # Créer l'enregistrement
+    fichier_import = FichierImport.objects.create(
+        etablissement_cnef=request.user.etablissement,
+        uploader_par=request.user,
+        fichier=fichier,
+        nom_fichier=fichier.name,
+        statut='EN_COURS',
+        **metadonnees
+    )
+    
+    try:
+        # ✅ CORRECTION : Notification avec le bon objet
+        nb_notifications = envoyer_email_notification_acnef(fichier_import)
+
+        # Log du résultat
+        if nb_notifications > 0:
+            logger.info(f"✅ {nb_notifications} administrateur(s) CNEF notifié(s) pour {fichier.name}")
+        else:
+            logger.warning(f"⚠️ Aucun administrateur CNEF notifié pour {fichier.name}")
+
+        # Journaliser
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='UPLOAD_FICHIER',
+            description=f"Upload du fichier {fichier.name}",
+            etablissement=request.user.etablissement,
+            request=request
+        )
+    except Exception:
+        # Dans une transaction (téléversement fragmenté), la création sera annulée :
+        # le fichier déjà écrit dans le stockage ne doit pas rester orphelin
+        if transaction.get_connection().in_atomic_block:
+            fichier_import.fichier.delete(save=False)
+        raise
+    return fichier_import, nb_notifications
+
+
+@login_required
+def upload_fichier_utilisateur(request):
+    """Vue pour l'upload des fichiers par les utilisateurs"""
+
+    if not request.FILES.get('fichier'):
+        return JsonResponse({
+            'success': False,
+            'message': 'Aucun fichier fourni'
+        }, status=400)
+    
+    fichier = request.FILES['fichier']
+    
+    # Validation de l'extension : classeur Excel, ou CSV (.csv / .zip de fichiers .csv)
+    if not fichier.name.lower().endswith(EXTENSIONS_SOUMISSION):
+        return JsonResponse({
+            'success': False,
+            'message': 'Seuls les fichiers Excel (.xlsx, .xls) ou CSV (.csv, .zip de fichiers .csv) sont autorisés'
+        }, status=400)
+    
+    # Contrôle structurel immédiat (feuilles, en-têtes), sans charger le classeur
+    prevalidation = prevalider_soumission(fichier)
+    if not prevalidation['valide']:
+        return JsonResponse({
+            'success': False,
+            'message': message_refus(prevalidation),
+            'erreurs': prevalidation['erreurs']
+        }, status=400)
+    
+    try:
+        fichier_import, nb_notifications = enregistrer_soumission(request, fichier)
+        
+        # Message adapté selon le nombre de notifications
+        if nb_notifications > 0:
+            message = f'Fichier "{fichier.name}" soumis avec succès ! {nb_notifications} administrateur(s) notifié(s).'
+        else:
+            message = f'Fichier "{fichier.name}" soumis avec succès !'
+        
+        return JsonResponse({
+            'success': True,
+            'message': message,
+            'fichier_id': fichier_import.id,
+            'avertissements': prevalidation['avertissements']
+        })
+    
+    except Exception as e:
+        logger.error(f"Erreur upload UEF: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de l\'upload : {str(e)}'
+        }, status=500)
+
+
+@login_required
+def api_historique_etablissement(request):    
+    """
+    API commune pour UEF et AEF : retourne l'historique de l'établissement
+    GET ?limite=50&curseur=<curseur_suivant>&statut=&date_debut=&date_fin=
+    """
+    if not request.user.etablissement:
+        return JsonResponse({'success': False, 'message': 'Aucun établissement associé'})
+
+    fichiers = FichierImport.objects.filter(
+        etablissement_cnef=request.user.etablissement,
+        uploader_par=request.user  # 🔥 DIFFÉRENCE CLÉ : Uniquement ses propres fichier s
+    ).select_related('uploader_par')
+    fichiers = filtrer_historique(fichiers, request)
+    page, curseur_suivant = paginer_par_curseur(fichiers, request)
+
+    data = []
+    for f in page:
+        # Extraire la raison du rejet
+        raison_rejet = None
+        if f.statut == 'REJETE':
+            raison_rejet = f.commentaire_validation or f.erreurs
+        
+        data.append({
+            'id': f.id,
+            'name': f.nom_fichier,  
+            # Taille enregistrée à l'upload (plus de stat() disque par fichier)
+            'size': f.taille_octets or 0,  
+            'date': f.date_import.isoformat(),  
+            'status': f.get_statut_display(),  
+            'statut_code': f.statut,
+            'lignes_importees': f.total_lignes_importees,  
+            'uploader': f.uploader_par.get_full_name() if f.uploader_par else 'Inconnu',
+            'raison_rejet': raison_rejet,  
+        })
+
+    return JsonResponse({
+        'success': True,
+        'historique': data,
+        'pagination': {
+            'curseur_suivant': curseur_suivant,
+            'has_next': curseur_suivant is not None,
+        }
+    })
+
+
+@login_required
+@user_passes_test(is_aef)
+def interface_aef(request):
+    """
+    Page principale pour l'administrateur établissement (AEF)
+    """
+    return render(request, 'EF/interface_aef.html', {
+        'title': f'Interface AEF - {request.user.etablissement.Nom_etablissement}'
+    })
+
+
+@login_required
+@user_passes_test(is_uef)
+def interface_uef(request):
+    """
+    Page principale pour l'administrateur établissement (UEF)
+    """
+    return render(request, 'accounts/tableau_de_bord.html', {
+        'title': f'Interface UEF - {request.user.etablissement.Nom_etablissement}'
+    })
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["GET"])
+def aef_api_dashboard(request):
+    """
+    API pour récupérer les statistiques du dashboard AEF
+    """
+    try:
+        etablissement = request.user.etablissement
+        
+        # Statistiques des soumissions
+        soumissions = FichierImport.objects.filter(etablissement_cnef=etablissement)
+        
+        stats = {
+            'total': soumissions.count(),
+            'en_attente': soumissions.filter(statut='EN_COURS').count(),
+            'validees': soumissions.filter(statut='REUSSI').count(),
+            'rejetees': soumissions.filter(statut='REJETE').count(),
+            'utilisateurs_actifs': User.objects.filter(
+                etablissement=etablissement,
+                role='UEF',
+                is_active=True
+            ).count()
+        }
+        
+        # Dernières soumissions (5 plus récentes)
+        dernieres_soumissions = []
+        for fichier in soumissions.order_by('-date_import')[:5]:
+            dernieres_soumissions.append({
+                'id': fichier.id,
+                'nom_fichier': fichier.nom_fichier,
+                'date_import': fichier.date_import.isoformat(),
+                'statut': fichier.statut,
+                'statut_display': fichier.get_statut_display(),
+                'statut_class': get_statut_class(fichier.statut),
+                'total_lignes': fichier.total_lignes_importees,
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'stats': stats,
+            'dernieres_soumissions': dernieres_soumissions
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans aef_api_dashboard: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["GET"])
+def aef_api_historique(request):
+    """
+    API pour récupérer l'historique des soumissions
+    GET ?limite=50&curseur=<curseur_suivant>&statut=&date_debut=&date_fin=
+    """
+    try:
+        etablissement = request.user.etablissement
+        
+        # Filtrer les soumissions
+        soumissions = FichierImport.objects.filter(
+            etablissement_cnef=etablissement
+        )
+        soumissions = filtrer_historique(soumissions, request)
+        page, curseur_suivant = paginer_par_curseur(soumissions, request)
+        
+        # Formater les données
+        data = []
+        for fichier in page:
+            data.append({
+                'id': fichier.id,
+                'nom_fichier': fichier.nom_fichier,
+                'date_import': fichier.date_import.isoformat(),
+                'statut': fichier.statut,
+                'statut_display': fichier.get_statut_display(),
+                'statut_class': get_statut_class(fichier.statut),
+                'total_lignes': fichier.total_lignes_importees,
+                'taille': fichier.taille_octets,
+                'commentaire': fichier.erreurs if fichier.statut == 'REJETE' else None,
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'soumissions': data,
+            'pagination': {
+                'curseur_suivant': curseur_suivant,
+                'has_next': curseur_suivant is not None,
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans aef_api_historique: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+@require_http_methods(["POST"])
+@login_required
+@user_passes_test(is_aef)
+def aef_upload_fichier(request):
+    """
+    Upload d'un fichier Excel par l'AEF
+    """
+    if not request.FILES.get('fichier'):
+        return JsonResponse({
+            'success': False,
+            'message': 'Aucun fichier fourni'
+        }, status=400)
+    
+    fichier = request.FILES['fichier']
+    
+    # Validation de l'extension : classeur Excel, ou CSV (.csv / .zip de fichiers .csv)
+    if not fichier.name.lower().endswith(EXTENSIONS_SOUMISSION):
+        return JsonResponse({
+            'success': False,
+            'message': 'Seuls les fichiers Excel (.xlsx, .xls) ou CSV (.csv, .zip de fichiers .csv) sont autorisés'
+        }, status=400)
+    
+    # Contrôle structurel immédiat (feuilles, en-têtes), sans charger le classeur
+    prevalidation = prevalider_soumission(fichier)
+    if not prevalidation['valide']:
+        return JsonResponse({
+            'success': False,
+            'message': message_refus(prevalidation),
+            'erreurs': prevalidation['erreurs']
+        }, status=400)
+    
+    try:
+        fichier_import, nb_notifications = enregistrer_soumission(request, fichier)
+        
+        # Message adapté
+        if nb_notifications > 0:
+            message = f'Fichier "{fichier.name}" soumis avec succès ! {nb_notifications} administrateur(s) CNEF notifié(s).'
+        else:
+            message = f'Fichier "{fichier.name}" soumis avec succès !'
+        
+        return JsonResponse({
+            'success': True,
+            'message': message,
+            'fichier_id': fichier_import.id,
+            'avertissements': prevalidation['avertissements']
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur upload AEF: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de l\'upload : {str(e)}'
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["GET"])
+def aef_api_utilisateurs_uef(request):
+    """
+    API pour récupérer les utilisateurs UEF de l'établissement
+    """
+    try:
+        etablissement = request.user.etablissement
+        
+        utilisateurs = User.objects.filter(
+            etablissement=etablissement,
+            role='UEF'
+        ).order_by('nom', 'prenom')
+        
+        data = []
+        for user in utilisateurs:
+            data.append({
+                'id': user.id,
+                'nom': user.nom,
+                'prenom': user.prenom,
+                'email': user.email,
+                'telephone': user.telephone,
+                'is_active': user.is_active,
+                'date_joined': user.date_joined.isoformat(),
+                'derniere_connexion': user.derniere_connexion.isoformat() if user.derniere_connexion else None,
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'utilisateurs': data
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans aef_api_utilisateurs_uef: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["GET"])
+def aef_api_invitations_attente(request):
+    """
+    API pour récupérer les invitations en attente de l'établissement
+    """
+    try:
+        etablissement = request.user.etablissement
+        
+        invitations = TokenInscription.objects.filter(
+            etablissement=etablissement,
+            role='UEF',
+            utilise=False,
+            date_expiration__gt=timezone.now()
+        ).order_by('-date_creation')
+        
+        data = []
+        for inv in invitations:
+            data.append({
+                'id': inv.id,
+                'email': inv.email_destinataire,
+                'date_creation': inv.date_creation.isoformat(),
+                'expiration': inv.date_expiration.isoformat(),
+                'temps_restant_minutes': inv.temps_restant_minutes(),
+                'lien': inv.generer_lien_inscription(),
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'invitations': data
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans aef_api_invitations_attente: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["POST"])
+def aef_api_generer_invitation_uef(request):
+    """
+    Génère une invitation pour un utilisateur UEF
+    RÉUTILISE LA VUE EXISTANTE generer_invitation_uef
+    """
+    return generer_invitation_uef(request)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["DELETE"])
+def aef_api_revoquer_invitation(request, invitation_id):
+    """
+    Révoque une invitation
+    RÉUTILISE LA VUE EXISTANTE revoquer_invitation
+    """
+    return revoquer_invitation(request, invitation_id)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["PUT"])
+def aef_api_modifier_profil(request):
+    """
+    Modifie le profil de l'AEF
+    """
+    try:
+        data = json.loads(request.body)
+        
+        user = request.user
+        user.prenom = data.get('prenom', user.prenom)
+        user.nom = data.get('nom', user.nom)
+        user.telephone = data.get('telephone', user.telephone)
+        user.save()
+        
+        
+        
+        # Journaliser
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=user,
+            type_action='MODIFICATION_UTILISATEUR',
+            description=f"Modification du profil AEF",
+            etablissement=user.etablissement,
+            request=request
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Profil modifié avec succès'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans aef_api_modifier_profil: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["GET"])
+def aef_detail_soumission(request, fichier_id):
+    """
+    Page de détails d'une soumission (similaire à detail_soumission du CNEF mais en lecture seule)
+    """
+    fichier = get_object_or_404(
+        FichierImport, 
+        id=fichier_id,
+        etablissement_cnef=request.user.etablissement
+    )
+    
+    # Réutiliser la même logique que detail_soumission
+    from .utils import previsualiser_fichier_excel
+    
+    preview_result = previsualiser_fichier_excel(fichier)
+    
+    donnees_importees = {
+        'credits': fichier.nb_credits_importes if fichier.statut == 'REUSSI' else preview_result.get('credits', 0),
+        'decouverts': fichier.nb_decouverts_importes if fichier.statut == 'REUSSI' else preview_result.get('decouverts', 0),
+        'affacturages': fichier.nb_affacturages_importes if fichier.statut == 'REUSSI' else preview_result.get('affacturages', 0),
+        'cautions': fichier.nb_cautions_importes if fichier.statut == 'REUSSI' else preview_result.get('cautions', 0),
+        'effets': fichier.nb_effets_importes if fichier.statut == 'REUSSI' else preview_result.get('effets', 0),
+        'spots': getattr(fichier, 'nb_spots_importes', 0) if fichier.statut == 'REUSSI' else preview_result.get('spot', 0),
+    }
+    
+    context = {
+        'fichier': fichier,
+        'donnees_importees': donnees_importees,
+        'preview_result': preview_result,
+        'total_lignes': preview_result.get('total_lignes', 0),
+        'is_aef': True,  # Pour adapter le template
+        'title': f'Détail - {fichier.nom_fichier}'
+    }
+    
+    return render(request, 'EF/detail_soumission_ef.html', context)
 
 
 # ==========================================
@@ -227,4 +729,4 @@ def aef_supprimer_soumission(request, fichier_id):
         return JsonResponse({
             'success': False,
             'message': 'Une erreur est survenue lors de la suppression de la soumission.'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
@@ -0,0 +1,112 @@
+"""
+TEG atypiques (anomalies_teg.py) : consultation par soumission et par
+établissement, lancement d'une détection en arrière-plan
+"""
+
+import json
+import logging
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from .models import AnomalieTEG
+from .views_commun import is_chef
+
+logger = logging.getLogger(__name__)
+
+ANOMALIES_PAR_PAGE = 50
+ANOMALIES_PAR_PAGE_MAX = 200
+
+CHAMPS_ANOMALIE = [
+    'id', 'produit', 'pret_id', 'date_mise_place', 'nature_pret', 'maturite',
+    'categorie_beneficiaire', 'taille_groupe', 'teg_declare', 'teg_median', 'mad',
+    'premier_quartile', 'troisieme_quartile', 'score_robuste', 'methode',
+    'date_detection', 'etablissement_id', 'fichier_import_id',
+    'etablissement__Nom_etablissement', 'fichier_import__nom_fichier',
+]
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["GET"])
+def api_anomalies_teg(request):
+    """
+    TEG atypiques, écarts les plus forts d'abord
+    GET ?fichier=<id>&etablissement=<id>&produit=<produit>&page=<n>&par_page=<n>
+    """
+    anomalies = AnomalieTEG.objects.all()
+    try:
+        if request.GET.get('fichier'):
+            anomalies = anomalies.filter(fichier_import_id=int(request.GET['fichier']))
+        if request.GET.get('etablissement'):
+            anomalies = anomalies.filter(etablissement_id=int(request.GET['etablissement']))
+        par_page = min(max(int(request.GET.get('par_page', ANOMALIES_PAR_PAGE)), 1), ANOMALIES_PAR_PAGE_MAX)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Paramètres invalides'}, status=400)
+    if request.GET.get('produit'):
+        anomalies = anomalies.filter(produit=request.GET['produit'])
+
+    page = Paginator(anomalies.values(*CHAMPS_ANOMALIE), par_page).get_page(request.GET.get('page'))
+    return JsonResponse({
+        'success': True,
+        'anomalies': list(page),
+        'pagination': {
+            'page': page.number,
+            'nb_pages': page.paginator.num_pages,
+            'total': page.paginator.count,
+        },
+    })
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["POST"])
+def lancer_detection_anomalies(request):
+    """
+    Lance la détection en arrière-plan : JSON {"annee": 2024, "trimestre": "T2", "produits": [...]}
+    (tous les prêts et tous les produits par défaut). Progression : api_progression_detection_anomalies.
+    """
+    # anomalies_teg charge NumPy : importé à l'appel, pas au chargement des URLs
+    from .anomalies_teg import PRODUITS, DetectionEnCours, lancer_detection_arriere_plan, periode
+
+    try:
+        data = json.loads(request.body or '{}')
+        debut, fin = periode(data.get('annee'), data.get('trimestre'))
+        produits = data.get('produits') or None
+        if produits and not set(produits) <= set(PRODUITS):
+            raise ValueError
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return JsonResponse({
+            'success': False,
+            'message': f"Paramètres invalides (annee, trimestre T1 à T4, produits parmi {', '.join(PRODUITS)})"
+        }, status=400)
+
+    try:
+        tache_id = lancer_detection_arriere_plan(debut, fin, produits)
+    except DetectionEnCours as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=409)
+    logger.info(f"Détection des TEG atypiques lancée par {request.user} ({tache_id})")
+    return JsonResponse({
+        'success': True,
+        'en_cours': True,
+        'tache_id': tache_id,
+        'message': 'Détection des TEG atypiques lancée'
+    })
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["GET"])
+def api_progression_detection_anomalies(request, tache_id):
+    """Retourne la progression et le bilan par produit d'une détection"""
+    from .anomalies_teg import lire_progression
+
+    etat = lire_progression(tache_id)
+    if etat is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Détection introuvable ou expirée'
+        }, status=404)
+    return JsonResponse({'success': True, **etat})
@@ -0,0 +1,192 @@
+"""
+Visualisation et export Excel de la base de données des prêts
+"""
+
+import logging
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse, HttpResponse
+
+from .models import Credit_Amortissables, Decouverts, Affacturage, Cautions, Effets_commerces, Spot
+
+from .views_commun import is_cnef_user
+from .routage_bdd import lecture_reporting
+
+logger = logging.getLogger(__name__)
+
+
+@user_passes_test(is_cnef_user)
+@login_required
+@lecture_reporting
+def visualiser_base_donnees(request, model_type):
+    """Vue pour visualiser les bases de données par modèle"""
+    MODEL_MAPPING = {
+        'Credit_Amortissables': Credit_Amortissables,
+        'Decouverts': Decouverts,
+        'Affacturage': Affacturage,
+        'Cautions': Cautions,
+        'Effets_commerces': Effets_commerces,
+        'Spots' : Spot,
+    }
+    
+    if model_type not in MODEL_MAPPING:
+        logger.warning(f"Modèle non trouvé: {model_type} par {request.user}")
+        return JsonResponse({'success': False, 'message': 'Modèle non trouvé'}, status=400)
+    
+    model_class = MODEL_MAPPING[model_type]
+    
+    # Récupérer TOUTES les données sans filtrage initial
+    queryset = model_class.objects.all()
+    
+    # Filtres
+    sigle_filter = request.GET.get('sigle')
+    mois_filter = request.GET.get('mois')
+    annee_filter = request.GET.get('annee')
+    page = int(request.GET.get('page', 1))
+    page_size = int(request.GET.get('page_size', 25))
+
+    # Déterminer le champ de date à utiliser
+    date_field = 'DATE_MISE_PLACE_I03' if hasattr(model_class, 'DATE_MISE_PLACE_I03') else 'DATE_MEP_I03'
+    
+
+    # IMPORTANT: Si format=xlsx, on exporte SANS pagination
+    if request.GET.get('format') == 'xlsx':
+        # Appliquer les filtres si présents
+        if sigle_filter:
+            sigle_fields = ['SIGLE_I01', 'ETABLISSEMENT_I01']
+            for field in sigle_fields:
+                if hasattr(model_class, field):
+                    queryset = queryset.filter(**{f'{field}__icontains': sigle_filter})
+                    break
+        
+        if mois_filter:
+            if hasattr(model_class, date_field):
+                queryset = queryset.filter(**{f'{date_field}__month': mois_filter})
+        
+        # NOUVEAU: Filtre par année pour export
+        if annee_filter:
+            if hasattr(model_class, date_field):
+                queryset = queryset.filter(**{f'{date_field}__year': annee_filter})
+        
+        return exporter_excel(queryset, model_type)
+    
+    # Appliquer les filtres pour l'affichage JSON
+    if sigle_filter:
+        sigle_fields = ['SIGLE_I01', 'ETABLISSEMENT_I01']
+        filtered = False
+        for field in sigle_fields:
+            if hasattr(model_class, field):
+                queryset = queryset.filter(**{f'{field}__icontains': sigle_filter})
+                filtered = True
+                break
+        if not filtered:
+            logger.warning(f"Aucun champ de filtrage par sigle disponible pour {model_type}")
+            return JsonResponse({'success': False, 'message': 'Aucun champ de filtrage par sigle disponible'}, status=400)
+    
+    if mois_filter:
+        if hasattr(model_class, date_field):
+            queryset = queryset.filter(**{f'{date_field}__month': mois_filter})
+        else:
+            logger.warning(f"Aucun champ de filtrage par date disponible pour {model_type}")
+            return JsonResponse({'success': False, 'message': 'Aucun champ de filtrage par date disponible'}, status=400)
+    
+    # NOUVEAU: Filtre par année
+    if annee_filter:
+        if hasattr(model_class, date_field):
+            queryset = queryset.filter(**{f'{date_field}__year': annee_filter})
+        else:
+            logger.warning(f"Aucun champ de filtrage par année disponible pour {model_type}")
+            return JsonResponse({'success': False, 'message': 'Aucun champ de filtrage par année disponible'}, status=400)
+    
+
+    # Récupérer TOUS les sigles distincts pour le filtre
+    sigle_field = 'SIGLE_I01' if hasattr(model_class, 'SIGLE_I01') else 'ETABLISSEMENT_I01'
+    sigles_distincts = []
+    if hasattr(model_class, sigle_field):
+        sigles_distincts = list(
+            model_class.objects.values_list(sigle_field, flat=True)
+            .distinct()
+            .order_by(sigle_field)
+        )
+    
+    # NOUVEAU: Récupérer toutes les années distinctes
+    annees_distinctes = []
+    if hasattr(model_class, date_field):
+        annees_distinctes = list(
+            model_class.objects.dates(date_field, 'year', order='DESC')
+            .values_list(date_field, flat=True)
+        )
+        # Extraire uniquement l'année
+        annees_distinctes = sorted(list(set([date.year for date in annees_distinctes])), reverse=True)
+  
+    # Pagination pour l'affichage (seulement pour JSON)
+    total = queryset.count()
+    start = (page - 1) * page_size
+    end = start + page_size
+    queryset_pagine = queryset[start:end]
+    
+    # Restreindre les champs sensibles
+    safe_fields = [
+        'SIGLE_I01', 'ETABLISSEMENT_I01', 'CODE_ETAB_I02', 'DATE_MEP_I03', 'CHA_ORI_I04', 'NATURE_PRET_I05', 
+        'BENEFICAIRE_I06', 'CATEGORIE_BENEF_I07', 'LIEU_RESIDENCE_I08','SECT_ACT_I09', 'MONTANT_CHAF_I10', 
+        'EFFECTIF_I11', 'PROFESSION_I12', 'MONTANT_PRET_I13', 'DUREE_I14', 'DUREE_DIFFERRE_I15', 'FREQ_REMB_I16', 
+        'TAUX_NOMINAL_I17', 'FRAIS_DOSSIER_I18', 'MODALITEPAIEMENT_ASS_I19', 'MONTANTASSURANCE_I20', 
+        'FRAIS_ANNEXE_I21', 'MODEREMBOURSEMENT_I22', 'MONTANT_ECHEANCE_I23', 'MODE_DEBLOCAGE_I24', 
+        'SITUATION_CREANCE_I25', 'TEG_I26', 'CODE_BANQUE_I02', 'DATE_MISE_PLACE_I03', 'BENEFICAIRE_I04', 
+        'CATEGORIE_BENEF_I05', 'LIEU_RESIDENCE_I06', 'SECT_ACT_I07', 'MONTANT_DECOUVERT_I08', 
+        'CUMUL_TIRAGES_DEC_I09', 'TAUX_NOMINAL_I10', 'FRAIS_DOSSIERS_ET_COMM_I11', 'COUTS_ASSURANCE_I12', 
+        'FRAIS_ANNEXES_I13', 'AGIOS_I14', 'NOMBRE_DEBITEURS_I15', 'SITUATION_CREANCE_I16', 'TEG_I17', 
+        'DATE_ECHEANCE_I04', 'DUREE_AFFACTURAGE_I05', 'MONTANT_AFFACTURAGE_I10', 'TAUX_AFFACTURAGE_I11', 
+        'MONTANT_FRAIS_COMM_I12', 'MONTANT_FRAIS_ANNEXES_I13', 'TEG_I14', 'DUREE_CAUTION_I05', 
+        'MONTANT_CAUTION_I10', 'TAUX_CAUTION_I11', 'DUREE_EFFET_I05', 'MONTANT_EFFET_I10', 'TAUX_EFFET_I11',
+        'AUTRES_FRA_I14', 'TEG_I15'
+    ]
+    available_fields = [f.name for f in model_class._meta.fields if f.name in safe_fields]
+    donnees = list(queryset_pagine.values(*available_fields))
+    
+    logger.info(f"Visualisation des données de {model_type} par {request.user}, page {page}")
+    return JsonResponse({
+        'success': True,
+        'donnees': donnees,
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'model_type': model_type,
+        'sigles_distincts': sigles_distincts,  # NOUVEAU: Liste de tous les sigles
+        'annees_distinctes': annees_distinctes
+    })
+
+
+@lecture_reporting
+def exporter_excel(queryset, model_type):
+    """Exporter les données en format Excel"""
+    # pandas n'est chargé qu'à l'export (import coûteux au démarrage)
+    import pandas as pd
+    from datetime import datetime
+    from django.utils import timezone as django_timezone
+    
+    # Récupérer les données
+    data = list(queryset.values())
+    
+    # Convertir les datetimes avec timezone en datetimes sans timezone
+    for row in data:
+        for key, value in row.items():
+            # Si c'est un datetime avec timezone, le convertir
+            if isinstance(value, datetime) and django_timezone.is_aware(value):
+                row[key] = django_timezone.make_naive(value)
+    
+    # Créer le DataFrame
+    df = pd.DataFrame(data)
+    
+    # Créer la réponse HTTP
+    response = HttpResponse(
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{model_type}_{django_timezone.now().date()}.xlsx"'
+    
+    # Écrire dans Excel
+    with pd.ExcelWriter(response, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name=model_type, index=False)
+    
+    logger.info(f"Export Excel de {model_type} effectué")
+    return response
@@ -0,0 +1,831 @@
+"""
+Interface chef (ACNEF/UCNEF) : tableau de bord, soumissions, validation et rejet
+"""
+
+import json
+import logging
+import os
+
+from django.urls import reverse_lazy, reverse
+from django.views.generic import TemplateView, ListView, DeleteView
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import render, get_object_or_404
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse, HttpResponse
+from django.utils import timezone
+from django.conf import settings
+from django.db.models import Max, Count, Q
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.db import transaction
+from django.views.decorators.http import require_http_methods
+
+from .models import FichierImport, Etablissement, ActionUtilisateur
+from .utils import traiter_fichier_excel
+from .email_utils import envoyer_email_validation, envoyer_email_rejet
+from .validation_groupee import lancer_validation_arriere_plan, lire_progression
+from .routage_bdd import marquer_ecriture
+
+from .views_commun import is_cnef_user, is_chef, is_acnef, compter_soumissions
+
+logger = logging.getLogger(__name__)
+
+# Type MIME du fichier original selon son extension
+TYPES_MIME_SOUMISSION = {
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.xls': 'application/vnd.ms-excel',
+    '.csv': 'text/csv',
+    '.zip': 'application/zip',
+}
+
+
+class TableauDeBordView(LoginRequiredMixin, TemplateView):
+    template_name = 'accounts/tableau_de_bord.html'
+    login_url = reverse_lazy('connexion')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        user = self.request.user
+        
+        # Vérifie que l'utilisateur a un établissement (UEF/AEF)
+        if hasattr(user, 'etablissement') and user.etablissement:
+            context['imports_recents'] = FichierImport.objects.filter(
+                etablissement_cnef=user.etablissement  # LE BON NOM DU CHAMP
+            ).order_by('-date_import')[:5]
+        else:
+            context['imports_recents'] = FichierImport.objects.none()
+        
+        return context
+
+
+class FichiersListAPIView(ListView):
+    model = FichierImport
+    queryset = FichierImport.objects.all().select_related('etablissement_cnef')
+
+    def render_to_response(self, context, **response_kwargs):
+        statut_filter = self.request.GET.get('statut', 'tous')
+        etablissement_filter = self.request.GET.get('etablissement', 'tous')
+
+        queryset = self.get_queryset()
+        if statut_filter != 'tous':
+            queryset = queryset.filter(statut=statut_filter)
+        if etablissement_filter != 'tous':
+            queryset = queryset.filter(etablissement_cnef__type_etablissement=etablissement_filter)
+
+        data = [
+            {
+                'id': f.id,
+                'name': f.nom_fichier,
+                'user': f.etablissement_cnef.Nom_etablissement if f.etablissement_cnef else 'Inconnu',
+                'date': f.date_import.isoformat(),
+                'size': f"{f.fichier.size / 1024:.1f} KB" if f.fichier else "0 KB",
+                'statut': f.get_statut_display(),
+                'statut_code': f.statut,
+            }
+            for f in queryset
+        ]
+        return JsonResponse({'success': True, 'fichiers': data})
+
+
+class EtablissementsListAPIView(ListView):
+    model = Etablissement
+    queryset = Etablissement.objects.all()
+
+    def render_to_response(self, context, **response_kwargs):
+        """Accepte uniquement GET pour lister les établissements"""
+        
+        if self.request.method != 'GET':
+            return JsonResponse({
+                'success': False,
+                'message': 'Méthode non autorisée. Utilisez POST sur /api/etablissements/'
+            }, status=405)
+        
+        # Debug: afficher tous les établissements d'abord
+        all_etabs = self.get_queryset()
+        logger.info(f"📊 Total établissements: {all_etabs.count()}")
+        
+        # Filtrer les non-chefs
+        queryset = all_etabs.annotate(
+            dernier_upload=Max('fichiers_imports__date_import')
+        )
+        
+        data = [
+            {
+                'id': etab.id,
+                'nom': etab.Nom_etablissement,
+                'code': getattr(etab, 'code_etablissement', ''),
+                'type': getattr(etab, 'type_etablissement', ''),
+                'categorie': getattr(etab, 'categorie_emf', None) or '-',
+                'signup': etab.date_creation.isoformat(),
+                'lastUpload': etab.dernier_upload.isoformat() if etab.dernier_upload else '',
+                'status': 'Actif' if etab.is_active else 'Inactif',
+                'actif': etab.is_active
+            }
+            for etab in queryset
+        ]
+        
+        return JsonResponse({
+            'success': True,
+            'etablissements': data,
+            'utilisateurs': data  # Compatibilité ancienne API
+        })
+
+
+class FichierDeleteAPIView(LoginRequiredMixin, DeleteView):
+    model = FichierImport
+    pk_url_kwarg = 'fichier_id'
+
+    def delete(self, request, *args, **kwargs):
+        fichier = self.get_object()
+        nom_fichier = fichier.nom_fichier
+        fichier.delete()
+        logger.info(f"Fichier {nom_fichier} supprimé par {request.user}")
+        
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='SUPPRESSION_FICHIER',
+            description=f"Suppression du fichier {nom_fichier}",
+            etablissement=fichier.etablissement_cnef,
+            request=request,
+            donnees_supplementaires={
+                'fichier_id': fichier.id,
+                'nom_fichier': nom_fichier,
+                'etablissement': fichier.etablissement_cnef.Nom_etablissement if fichier.etablissement_cnef else None
+            }
+        )
+        return JsonResponse({
+            'success': True,
+            'message': f'Fichier "{nom_fichier}" supprimé avec succès'
+        })
+
+    def handle_no_permission(self):
+        return JsonResponse({
+            'success': False,
+            'message': 'Non autorisé'
+        }, status=403)
+
+
+class EtablissementDeleteAPIView(LoginRequiredMixin, DeleteView):
+    model = Etablissement
+    pk_url_kwarg = 'etablissement_id'
+
+    def delete(self, request, *args, **kwargs):
+        etablissement = self.get_object()
+        Nom_etablissement = etablissement.Nom_etablissement
+        etablissement.delete()
+        logger.info(f"Établissement {Nom_etablissement} supprimé par {request.user}")
+        
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='SUPPRESSION_ETABLISSEMENT',
+            description=f"Suppression de l'établissement {Nom_etablissement}",
+            etablissement=etablissement,
+            request=request,
+            donnees_supplementaires={
+                'etablissement_id': etablissement.id,
+                'code_etablissement': etablissement.code_etablissement,
+                'type_etablissement': etablissement.get_type_etablissement_display()
+            }
+        )
+        return JsonResponse({
+            'success': True,
+            'message': f'Établissement "{Nom_etablissement}" supprimé avec succès'
+        })
+
+    def handle_no_permission(self):
+        return JsonResponse({
+            'success': False,
+            'message': 'Non autorisé'
+        }, status=403)
+
+
+# ==========================================
+# LISTE DES SOUMISSIONS
+# ==========================================
+
+# Colonnes lues pour la liste (les lignes n'affichent ni le fichier, ni les erreurs, ni les détails)
+CHAMPS_LISTE_SOUMISSIONS = [
+    'id', 'nom_fichier', 'date_import', 'statut', 'date_validation',
+    'nb_credits_importes', 'nb_decouverts_importes', 'nb_affacturages_importes',
+    'nb_cautions_importes', 'nb_effets_importes', 'nb_spots_importes',
+    'etablissement_cnef__Nom_etablissement', 'etablissement_cnef__type_etablissement',
+    'uploader_par__prenom', 'uploader_par__nom',
+    'valide_par__prenom', 'valide_par__nom',
+]
+
+SOUMISSIONS_PAR_PAGE = 25
+SOUMISSIONS_PAR_PAGE_MAX = 100
+
+
+def filtrer_soumissions(request):
+    """
+    Soumissions filtrées (statut, type d'établissement, établissement,
+    recherche sur le nom du fichier ou de l'établissement), établissement,
+    déposant et valideur joints. Retourne (queryset, filtres).
+    """
+    filtres = {
+        'statut': request.GET.get('statut', 'tous'),
+        'etablissement': request.GET.get('etablissement', 'tous'),
+        'etablissement_id': request.GET.get('etablissement_id', ''),
+        'q': request.GET.get('q', '').strip(),
+    }
+
+    fichiers = FichierImport.objects.select_related(
+        'etablissement_cnef', 'uploader_par', 'valide_par'
+    ).only(*CHAMPS_LISTE_SOUMISSIONS).order_by('-date_import', '-id')
+
+    if filtres['statut'] != 'tous':
+        fichiers = fichiers.filter(statut=filtres['statut'])
+
+    if filtres['etablissement'] != 'tous':
+        fichiers = fichiers.filter(etablissement_cnef__type_etablissement=filtres['etablissement'])
+
+    if filtres['etablissement_id'].isdigit():
+        fichiers = fichiers.filter(etablissement_cnef_id=int(filtres['etablissement_id']))
+
+    if filtres['q']:
+        fichiers = fichiers.filter(
+            Q(nom_fichier__icontains=filtres['q']) |
+            Q(etablissement_cnef__Nom_etablissement__icontains=filtres['q'])
+        )
+
+    return fichiers, filtres
+
+
+def paginer_soumissions(request, fichiers):
+    """Page demandée (?page=, ?par_page=) : une requête COUNT et une requête pour les lignes"""
+    try:
+        par_page = min(max(int(request.GET.get('par_page', SOUMISSIONS_PAR_PAGE)), 1), SOUMISSIONS_PAR_PAGE_MAX)
+    except ValueError:
+        par_page = SOUMISSIONS_PAR_PAGE
+    return Paginator(fichiers, par_page).get_page(request.GET.get('page'))
+
+
+def parametres_pagination(request):
+    """Paramètres des filtres, repris par les liens de pagination"""
+    parametres = request.GET.copy()
+    parametres.pop('page', None)
+    return parametres.urlencode()
+
+
+@user_passes_test(is_cnef_user)
+@login_required
+def interface_chef(request):
+    """Interface principale du chef pour visualiser les soumissions"""
+    fichiers, filtres = filtrer_soumissions(request)
+    page_obj = paginer_soumissions(request, fichiers)
+
+    context = {
+        'fichiers': page_obj,
+        'page_obj': page_obj,
+        'parametres_pagination': parametres_pagination(request),
+        'stats': compter_soumissions(),
+        'statut_filter': filtres['statut'],
+        'etablissement_filter': filtres['etablissement'],
+        'recherche': filtres['q'],
+        'title': 'Interface Chef - Gestion des soumissions'
+    }
+    return render(request, 'admin/interface_chef.html', context)
+
+
+@login_required
+@user_passes_test(is_cnef_user)
+@require_http_methods(["GET"])
+def api_soumissions_chef(request):
+    """
+    Variante JSON de la liste des soumissions d'interface_chef (mêmes filtres
+    et pagination) : le filtrage ne recharge que le tableau. `html` contient
+    les lignes rendues par le même gabarit que la page.
+    """
+    fichiers, filtres = filtrer_soumissions(request)
+    page_obj = paginer_soumissions(request, fichiers)
+
+    soumissions = []
+    for fichier in page_obj:
+        soumissions.append({
+            'id': fichier.id,
+            'nom_fichier': fichier.nom_fichier,
+            'etablissement': fichier.etablissement_cnef.Nom_etablissement if fichier.etablissement_cnef else None,
+            'uploader_par': fichier.uploader_par.get_full_name() if fichier.uploader_par else None,
+            'valide_par': fichier.valide_par.get_full_name() if fichier.valide_par else None,
+            'date_import': fichier.date_import.isoformat(),
+            'date_validation': fichier.date_validation.isoformat() if fichier.date_validation else None,
+            'statut': fichier.statut,
+            'statut_display': fichier.get_statut_display(),
+            'total_lignes': fichier.total_lignes_importees,
+        })
+
+    return JsonResponse({
+        'success': True,
+        'soumissions': soumissions,
+        'html': render_to_string('admin/soumissions_lignes.html', {
+            'fichiers': page_obj,
+            'parametres_pagination': parametres_pagination(request),
+        }, request=request),
+        'pagination': {
+            'page': page_obj.number,
+            'per_page': page_obj.paginator.per_page,
+            'total_pages': page_obj.paginator.num_pages,
+            'total': page_obj.paginator.count,
+            'has_next': page_obj.has_next(),
+            'has_previous': page_obj.has_previous(),
+        },
+        'filtres': filtres,
+        'stats': compter_soumissions(),
+    })
+
+
+@user_passes_test(is_cnef_user)
+@login_required
+def detail_soumission(request, fichier_id):
+    """Détail d'une soumission spécifique avec prévisualisation"""
+    fichier = get_object_or_404(FichierImport, id=fichier_id)
+    
+    # Import de la fonction de prévisualisation
+    from .utils import previsualiser_fichier_excel
+    
+    # Obtenir la prévisualisation du fichier
+    preview_result = previsualiser_fichier_excel(fichier)
+    
+    donnees_importees = {
+        'credits': fichier.nb_credits_importes if fichier.statut == 'REUSSI' else preview_result.get('credits', 0),
+        'decouverts': fichier.nb_decouverts_importes if fichier.statut == 'REUSSI' else preview_result.get('decouverts', 0),
+        'affacturages': fichier.nb_affacturages_importes if fichier.statut == 'REUSSI' else preview_result.get('affacturages', 0),
+        'cautions': fichier.nb_cautions_importes if fichier.statut == 'REUSSI' else preview_result.get('cautions', 0),
+        'effets': fichier.nb_effets_importes if fichier.statut == 'REUSSI' else preview_result.get('effets', 0),
+        'spot': getattr(fichier, 'nb_spots_importes', 0) if fichier.statut == 'REUSSI' else preview_result.get('spot', 0),
+    }
+    
+    # Analyser les erreurs pour créer un rapport d'incohérences
+    incoherences = {
+        'total': len(preview_result.get('erreurs', [])),
+        'par_type': {},
+        'details': preview_result.get('erreurs', [])
+    }
+    
+    # Catégoriser les erreurs
+    for erreur in preview_result.get('erreurs', []):
+        if 'Date' in erreur or 'date' in erreur:
+            incoherences['par_type']['dates'] = incoherences['par_type'].get('dates', 0) + 1
+        elif 'colonnes' in erreur or 'colonne' in erreur:
+            incoherences['par_type']['structure'] = incoherences['par_type'].get('structure', 0) + 1
+        elif 'Type de feuille' in erreur:
+            incoherences['par_type']['feuilles'] = incoherences['par_type'].get('feuilles', 0) + 1
+        else:
+            incoherences['par_type']['autres'] = incoherences['par_type'].get('autres', 0) + 1
+    
+    # Ajouter l'URL pour la visualisation des TEG
+    teg_verification_url = reverse('visualisation_teg', kwargs={'fichier_id': fichier_id})
+
+    context = {
+        'fichier': fichier,
+        'donnees_importees': donnees_importees,
+        'preview_result': preview_result,
+        'incoherences': incoherences,
+        'total_lignes': preview_result.get('total_lignes', 0),
+        'teg_verification_url': teg_verification_url,  
+        'title': f'Détail - {fichier.nom_fichier}'
+    }
+    
+    return render(request, 'admin/detail_soumission.html', context)
+
+
+@login_required
+def get_stats_ajax(request):
+    """Récupérer les statistiques en AJAX"""
+    stats = compter_soumissions()
+    
+    top_etablissements = Etablissement.objects.annotate(
+        nb_fichiers=Count('fichiers_imports')
+    ).order_by('-nb_fichiers')[:5]
+    
+    etablissements_data = [
+        {'nom': etab.type_etablissement, 'count': etab.nb_fichiers}
+        for etab in top_etablissements
+    ]
+    
+    return JsonResponse({
+        'success': True,
+        'stats': stats,
+        'top_etablissements': etablissements_data
+    })
+
+
+@user_passes_test(is_cnef_user)
+@login_required
+def valider_soumission(request, fichier_id):
+    """Valider une soumission"""
+    if request.method != 'POST':
+        logger.warning(f"Tentative d'accès non-POST à valider_soumission par {request.user}")
+        return HttpResponse(status=405)
+    
+    fichier = get_object_or_404(FichierImport, id=fichier_id)
+    
+    if fichier.statut != 'EN_COURS':
+        logger.warning(f"Tentative de validation d'un fichier déjà traité {fichier.nom_fichier} par {request.user}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Ce fichier a déjà été traité'
+        }, status=400)
+    
+    try:
+        with transaction.atomic():
+            logger.debug(f"Début du traitement de {fichier.nom_fichier}")
+            resultat = traiter_fichier_excel(fichier)
+            logger.debug(f"Résultat du traitement: {resultat}")
+            
+            if resultat['success']:
+                #Pour le message de validation
+                envoyer_email_validation(fichier)
+                # Les prochaines lectures de la session doivent voir l'import
+                marquer_ecriture(request)
+                
+                ActionUtilisateur.enregistrer_action(
+                    utilisateur=request.user,
+                    type_action='VALIDATION_FICHIER',
+                    description=f"Validation réussie du fichier {fichier.nom_fichier}",
+                    etablissement=fichier.etablissement_cnef,
+                    request=request,
+                    donnees_supplementaires={
+                        'fichier_id': fichier.id,
+                        'nom_fichier': fichier.nom_fichier,
+                        'total_lignes': resultat['total_lignes'],
+                        'details': {
+                            'credits': resultat['credits'],
+                            'decouverts': resultat['decouverts'],
+                            'affacturages': resultat['affacturages'],
+                            'cautions': resultat['cautions'],
+                            'effets': resultat['effets'],
+                            'spots': resultat.get('spots', 0)
+                        }
+                    }
+                )
+                
+
+                statut_display = fichier.get_statut_display()
+                logger.info(f"Fichier {fichier.nom_fichier} validé par {request.user}: {resultat['total_lignes']} lignes importées")
+                
+               
+                
+                return JsonResponse({
+                    'success': True,
+                    'message': f"Fichier validé avec succès! {resultat['total_lignes']} lignes importées.",
+                    'statut': statut_display,
+                    'total_lignes': resultat['total_lignes'],
+                    'details': {
+                        'credits': resultat['credits'],
+                        'decouverts': resultat['decouverts'],
+                        'affacturages': resultat['affacturages'],
+                        'cautions': resultat['cautions'],
+                        'effets': resultat['effets'],
+                    }
+                })
+                
+                
+                
+            else:
+                logger.error(f"Erreur lors de la validation de {fichier.nom_fichier}: {resultat['message']}")
+                return JsonResponse({
+                    'success': False,
+                    'message': f"Erreur lors de l'import: {resultat['message']}"
+                }, status=400)
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement de {fichier.nom_fichier} par {request.user}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f"Erreur lors du DDDDtraitement: {str(e)}"
+        }, status=500)
+
+
+@require_http_methods(["POST"])
+def valider_en_lot_api(request):
+    """
+    Validation groupée : importe en parallèle les soumissions EN_COURS
+    sélectionnées (JSON {"fichier_ids": [...]}), en arrière-plan.
+    La progression et les rapports par fichier sont suivis par
+    api_progression_validation_en_lot.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+        fichier_ids = [int(i) for i in data.get('fichier_ids', [])]
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return JsonResponse({
+            'success': False,
+            'message': 'Corps de la requête JSON invalide (fichier_ids attendu)'
+        }, status=400)
+
+    en_attente = list(
+        FichierImport.objects.filter(id__in=fichier_ids, statut='EN_COURS').values_list('id', flat=True)
+    )
+    ignores = sorted(set(fichier_ids) - set(en_attente))
+    if not en_attente:
+        return JsonResponse({
+            'success': False,
+            'message': 'Aucun fichier en attente de validation dans la sélection',
+            'ignores': ignores
+        }, status=400)
+
+    tache_id = lancer_validation_arriere_plan(en_attente, request.user)
+    marquer_ecriture(request)
+    logger.info(f"Validation groupée de {len(en_attente)} fichier(s) lancée par {request.user} ({tache_id})")
+
+    return JsonResponse({
+        'success': True,
+        'en_cours': True,
+        'tache_id': tache_id,
+        'nombre_fichiers': len(en_attente),
+        'ignores': ignores,
+        'message': f'Validation de {len(en_attente)} fichier(s) lancée'
+    })
+
+
+@require_http_methods(["GET"])
+def api_progression_validation_en_lot(request, tache_id):
+    """Retourne la progression et les rapports d'une validation groupée"""
+    etat = lire_progression(tache_id)
+    if etat is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Validation groupée introuvable ou expirée'
+        }, status=404)
+
+    return JsonResponse({
+        'success': True,
+        **etat
+    })
+
+
+@login_required
+def rejeter_soumission(request, fichier_id):
+    """
+    Rejeter une soumission de fichier
+    
+    Cette fonction :
+    1. Vérifie que le fichier existe et est EN_COURS
+    2. Récupère le motif du rejet
+    3. Change le statut à REJETE
+    4. Enregistre qui a rejeté et quand
+    5. Envoie des emails à l'AEF et l'UEF
+    6. Journalise l'action
+    """
+    
+    # ══════════════════════════════════════════════════════════════════════
+    # 1. VÉRIFICATIONS DE SÉCURITÉ
+    # ══════════════════════════════════════════════════════════════════════
+    
+    if request.method != 'POST':
+        logger.warning(f"Tentative d'accès non-POST à rejeter_soumission par {request.user}")
+        return HttpResponse(status=405)
+    
+    # Récupérer le fichier
+    fichier = get_object_or_404(FichierImport, id=fichier_id)
+    
+    # Vérifier que le fichier n'a pas déjà été traité
+    if fichier.statut != 'EN_COURS':
+        logger.warning(
+            f"Tentative de rejet d'un fichier déjà traité : "
+            f"{fichier.nom_fichier} (statut={fichier.statut}) par {request.user}"
+        )
+        return JsonResponse({
+            'success': False,
+            'message': f'Ce fichier a déjà été traité (statut: {fichier.get_statut_display()})'
+        }, status=400)
+    
+    # ══════════════════════════════════════════════════════════════════════
+    # 2. RÉCUPÉRATION DU MOTIF DU REJET
+    # ══════════════════════════════════════════════════════════════════════
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        logger.error(f"Corps JSON invalide dans rejeter_soumission par {request.user}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Corps de la requête JSON invalide'
+        }, status=400)
+    
+    motif_rejet = data.get('raison', '').strip()
+    
+    # Vérifier qu'un motif a été fourni
+    if not motif_rejet:
+        logger.warning(f"Tentative de rejet sans motif par {request.user} pour {fichier.nom_fichier}")
+        return JsonResponse({
+            'success': False,
+            'message': 'Veuillez fournir un motif de rejet'
+        }, status=400)
+    
+    # ══════════════════════════════════════════════════════════════════════
+    # 3. REJET DU FICHIER (TRANSACTION ATOMIQUE)
+    # ══════════════════════════════════════════════════════════════════════
+    
+    try:
+        with transaction.atomic():
+            # Mise à jour du fichier
+            fichier.statut = 'REJETE'
+            fichier.valide_par = request.user  # ✅ QUI a rejeté
+            fichier.date_validation = timezone.now()  # ✅ QUAND rejeté
+            fichier.commentaire_validation = f"[REJET] {motif_rejet}"  # ✅ Utilisation du bon champ
+            
+            # Optionnel : garder aussi dans erreurs pour compatibilité
+            fichier.erreurs = f"Fichier rejeté par {request.user.get_full_name()}"
+            
+            fichier.save()
+            
+            logger.info(
+                f"✅ Fichier {fichier.nom_fichier} (ID:{fichier.id}) rejeté par "
+                f"{request.user.get_full_name()} ({request.user.get_role_display()})"
+            )
+            
+            # ══════════════════════════════════════════════════════════════
+            # 4. JOURNALISATION DE L'ACTION
+            # ══════════════════════════════════════════════════════════════
+            
+            ActionUtilisateur.enregistrer_action(
+                utilisateur=request.user,
+                type_action='REJET_FICHIER',
+                description=f"Rejet du fichier {fichier.nom_fichier}",
+                etablissement=fichier.etablissement_cnef,
+                request=request,
+                donnees_supplementaires={
+                    'fichier_id': fichier.id,
+                    'nom_fichier': fichier.nom_fichier,
+                    'motif_rejet': motif_rejet,
+                    'etablissement': fichier.etablissement_cnef.Nom_etablissement if fichier.etablissement_cnef else None,
+                    'uploader': fichier.uploader_par.get_full_name() if fichier.uploader_par else None,
+                }
+            )
+            
+            # ══════════════════════════════════════════════════════════════
+            # 5. ENVOI DES EMAILS DE NOTIFICATION
+            # ══════════════════════════════════════════════════════════════
+            
+            try:
+                resultat_emails = envoyer_email_rejet(fichier, motif_rejet)
+                
+                if resultat_emails['aef']:
+                    logger.info(f"📧 Email de rejet envoyé à l'AEF")
+                else:
+                    logger.warning(f"⚠️ Email de rejet NON envoyé à l'AEF")
+                
+                if resultat_emails['uef']:
+                    logger.info(f"📧 Email de rejet envoyé à l'UEF")
+                else:
+                    logger.warning(f"⚠️ Email de rejet NON envoyé à l'UEF")
+                    
+            except Exception as e:
+                # L'email a échoué mais le rejet est quand même enregistré
+                logger.error(f"❌ Erreur lors de l'envoi des emails de rejet : {str(e)}")
+                # On ne fait pas échouer la transaction pour autant
+        
+        # ══════════════════════════════════════════════════════════════════
+        # 6. RETOUR SUCCÈS
+        # ══════════════════════════════════════════════════════════════════
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Fichier rejeté avec succès. Les responsables ont été notifiés par email.',
+            'statut': fichier.get_statut_display(),
+            'motif_rejet': motif_rejet,
+            'rejet_par': request.user.get_full_name(),
+            'date_rejet': fichier.date_validation.strftime('%d/%m/%Y à %H:%M')
+        })
+        
+    except Exception as e:
+        logger.error(
+            f"❌ ERREUR CRITIQUE lors du rejet de {fichier.nom_fichier} (ID:{fichier.id}) "
+            f"par {request.user}: {str(e)}",
+            exc_info=True
+        )
+        return JsonResponse({
+            'success': False,
+            'message': f"Erreur lors du rejet : {str(e)}"
+        }, status=500)
+
+
+@user_passes_test(is_cnef_user)
+@login_required
+def telecharger_fichier_original(request, fichier_id):
+    """Télécharger le fichier original (Excel ou CSV) soumis par l'utilisateur"""
+    fichier = get_object_or_404(FichierImport, id=fichier_id)
+    
+    try:
+        if fichier.fichier and fichier.fichier.name:
+            content_type = TYPES_MIME_SOUMISSION.get(
+                os.path.splitext(fichier.fichier.name)[1].lower(),
+                'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+            response = HttpResponse(fichier.fichier.read(), content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{fichier.nom_fichier}"'
+            logger.info(f"Téléchargement du fichier original {fichier.nom_fichier} par {request.user}")
+            return response
+        else:
+            logger.error(f"Fichier non trouvé pour l'import {fichier_id}")
+            return JsonResponse({
+                'success': False,
+                'message': 'Fichier non disponible'
+            }, status=404)
+            
+    except Exception as e:
+        logger.error(f"Erreur lors du téléchargement du fichier {fichier_id} par {request.user}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors du téléchargement: {str(e)}'
+        }, status=500)
+
+
+@user_passes_test(is_cnef_user)
+@login_required
+def supprimer_fichier_api(request, fichier_id):
+    """Supprimer un fichier via API"""
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Méthode non autorisée'
+        }, status=405)
+    
+    fichier = get_object_or_404(FichierImport, id=fichier_id)
+    nom_fichier = fichier.nom_fichier
+    
+    try:
+        # Supprimer le fichier physique si nécessaire
+        if fichier.fichier:
+            fichier.fichier.delete(save=False)
+        
+        # Supprimer l'objet de la base de données
+        fichier.delete()
+        
+        logger.info(f"Fichier {nom_fichier} supprimé par {request.user}")
+        return JsonResponse({
+            'success': True,
+            'message': f'Fichier "{nom_fichier}" supprimé avec succès'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression du fichier {fichier_id} par {request.user}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de la suppression: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_chef)
+def supprimer_etablissement_api(request, etablissement_id):
+    """Supprimer un établissement via API"""
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Méthode non autorisée'
+        }, status=405)
+    
+    etablissement = get_object_or_404(Etablissement, id=etablissement_id)
+    Nom_etablissement = etablissement.Nom_etablissement
+    
+    try:
+        # Vérifier s'il y a des fichiers associés
+        fichiers_associes = FichierImport.objects.filter(etablissement=etablissement).exists()
+        
+        if fichiers_associes:
+            return JsonResponse({
+                'success': False,
+                'message': f'Impossible de supprimer l\'établissement "{Nom_etablissement}" car il a des fichiers associés'
+            }, status=400)
+        
+        # Supprimer l'établissement
+        etablissement.delete()
+        
+        logger.info(f"Établissement {Nom_etablissement} supprimé par {request.user}")
+        return JsonResponse({
+            'success': True,
+            'message': f'Établissement "{Nom_etablissement}" supprimé avec succès'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression de l'établissement {etablissement_id} par {request.user}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de la suppression: {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# API INSTRUMENTATION
+# ==========================================
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["GET"])
+def api_instrumentation(request):
+    """
+    Mesures récentes de ce processus (InstrumentationMiddleware) :
+    synthèse par vue (durées, SQL, N+1) et dernières requêtes
+    """
+    from .middleware import synthese_instrumentation
+    
+    return JsonResponse({
+        'success': True,
+        'taux_echantillonnage': settings.INSTRUMENTATION_TAUX,
+        'seuil_lent_ms': settings.INSTRUMENTATION_SEUIL_LENT_MS,
+        **synthese_instrumentation()
+    })
@@ -0,0 +1,163 @@
+"""
+Tests de rôles et utilitaires partagés par les modules de vues
+"""
+
+import base64
+from datetime import timedelta
+
+from django.utils import timezone
+from django.db.models import Count, Q
+
+
+# ==========================================
+# FONCTION HELPER POUR VÉRIFIER LES RÔLES
+# ==========================================
+
+def verifier_role_et_rediriger(user):
+    """
+    Fonction utilitaire pour vérifier le rôle et obtenir l'URL de redirection
+    Peut être utilisée dans d'autres vues si nécessaire
+    """
+    redirections = {
+        'ACNEF': 'interface_chef',
+        'UCNEF': 'interface_chef',
+        'AEF': 'interface_aef',  
+        'UEF': 'tableau_de_bord',
+    }
+    
+    return redirections.get(user.role, 'tableau_de_bord')
+
+
+# ==========================================
+# TESTS DE PERMISSIONS UNIFIÉS
+# ==========================================
+
+def is_aef(user):
+    """Vérifie si l'utilisateur est AEF"""
+    return user.is_authenticated and hasattr(user, 'role') and user.role == 'AEF'
+
+
+def is_uef(user):
+    """Vérifie si l'utilisateur est AEF"""
+    return user.is_authenticated and hasattr(user, 'role') and user.role == 'UEF'
+
+
+def is_acnef(user):
+    """Vérifie si l'utilisateur est un administrateur CNEF"""
+    if not user.is_authenticated:
+        return False
+    if hasattr(user, 'role'):
+        return user.role == 'ACNEF'
+    return user.is_staff or user.is_superuser
+
+
+def is_ucnef(user):
+    """Vérifie si l'utilisateur est UCNEF"""
+    return user.is_authenticated and user.role == 'UCNEF'
+
+
+def is_chef(user):
+    """Vérifie si l'utilisateur est un chef/admin"""
+    return user.is_authenticated and (user.is_staff or user.is_superuser or (hasattr(user, 'role') and user.role == 'ACNEF'))
+
+
+def is_cnef_user(user):
+    """Vérifie si l'utilisateur est du CNEF (ACNEF ou UCNEF)"""
+    if not user.is_authenticated:
+        return False
+    if hasattr(user, 'role'):
+        return user.role in ['ACNEF', 'UCNEF']
+    return user.is_staff or user.is_superuser
+
+
+def is_etablissement_user(user):
+    """Vérifie si l'utilisateur fait partie d'un établissement"""
+    return user.is_authenticated and hasattr(user, 'role') and user.role in ['AEF', 'UEF']
+
+
+# ==========================================
+# PAGINATION PAR CURSEUR DES HISTORIQUES
+# ==========================================
+
+def filtrer_historique(fichiers, request):
+    """Filtres optionnels des historiques : statut, date_debut, date_fin (AAAA-MM-JJ)"""
+    statut = request.GET.get('statut', '')
+    if statut:
+        fichiers = fichiers.filter(statut=statut)
+    
+    # Bornes en datetime (et non __date) pour que l'index sur date_import serve
+    for parametre, lookup, decalage in (('date_debut', 'date_import__gte', 0), ('date_fin', 'date_import__lt', 1)):
+        valeur = request.GET.get(parametre, '')
+        if valeur:
+            try:
+                borne = timezone.make_aware(timezone.datetime.strptime(valeur, '%Y-%m-%d')) + timedelta(days=decalage)
+                fichiers = fichiers.filter(**{lookup: borne})
+            except ValueError:
+                pass
+    return fichiers
+
+
+def paginer_par_curseur(fichiers, request, taille_defaut=50):
+    """
+    Pagination par curseur sur (date_import, id) décroissants : chaque page est
+    une requête indexée, quelle que soit sa profondeur.
+    Retourne (page, curseur_suivant) ; curseur_suivant vaut None sur la dernière page.
+    """
+    try:
+        limite = max(1, min(int(request.GET.get('limite', taille_defaut)), 200))
+    except ValueError:
+        limite = taille_defaut
+    
+    fichiers = fichiers.order_by('-date_import', '-id')
+    
+    curseur = request.GET.get('curseur', '')
+    if curseur:
+        try:
+            date_curseur, id_curseur = base64.urlsafe_b64decode(curseur.encode()).decode().split('|')
+            date_curseur = timezone.datetime.fromisoformat(date_curseur)
+            fichiers = fichiers.filter(
+                Q(date_import__lt=date_curseur) |
+                Q(date_import=date_curseur, id__lt=int(id_curseur))
+            )
+        except (ValueError, UnicodeDecodeError):
+            pass
+    
+    page = list(fichiers[:limite + 1])
+    curseur_suivant = None
+    if len(page) > limite:
+        page = page[:limite]
+        dernier = page[-1]
+        curseur_suivant = base64.urlsafe_b64encode(
+            f"{dernier.date_import.isoformat()}|{dernier.id}".encode()
+        ).decode()
+    return page, curseur_suivant
+
+
+# ==========================================
+# FONCTION UTILITAIRE
+# ==========================================
+
+def compter_soumissions(queryset=None):
+    """Soumissions par statut en une seule requête (toutes par défaut)"""
+    from .models import FichierImport
+
+    if queryset is None:
+        queryset = FichierImport.objects.all()
+    return queryset.aggregate(
+        total=Count('id'),
+        en_attente=Count('id', filter=Q(statut='EN_COURS')),
+        reussis=Count('id', filter=Q(statut='REUSSI')),
+        rejetes=Count('id', filter=Q(statut='REJETE')),
+        erreurs=Count('id', filter=Q(statut='ERREUR')),
+    )
+
+
+def get_statut_class(statut):
+    """Retourne la classe CSS selon le statut"""
+    mapping = {
+        'EN_COURS': 'warning',
+        'REUSSI': 'success',
+        'REJETE': 'danger',
+        'ERREUR': 'danger',
+    }
+    return mapping.get(statut, 'secondary')
@@ -0,0 +1,811 @@
+"""
+Communiqué de presse : TEG moyens et seuils d'usure par catégorie
+"""
+
+from django.shortcuts import render
+from django.http import JsonResponse
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.http import require_http_methods
+from django.utils import timezone
+from django.db.models import Sum, Avg, Q
+
+from .models import Credit_Amortissables, Decouverts, Affacturage, Cautions, Effets_commerces, Spot
+
+from .views_commun import is_cnef_user
+from .routage_bdd import lecture_reporting
+
+
+# ==========================================
+# CONFIGURATION DU COMMUNIQUÉ
+# ==========================================
+
+# Mapper le type d'établissement
+TYPE_MAPPING = {
+    'Banques': 'BANQUE',
+    'EMF Première catégorie': 'EMF',
+    'EMF Deuxième catégorie': 'EMF',
+    'EMF Troisième catégorie': 'EMF'
+}
+
+# Catégorie EMF selon le type d'établissement du communiqué
+CATEGORIES_EMF = {
+    'EMF Première catégorie': 'PREMIERE_CATEGORIE',
+    'EMF Deuxième catégorie': 'DEUXIEME_CATEGORIE',
+    'EMF Troisième catégorie': 'TROISIEME_CATEGORIE',
+}
+
+# CORRECTION MAJEURE : Codes de catégories normalisés
+CATEGORIES_BENEFICIAIRES = {
+    'Particuliers': ['6', '06'],
+    'Petites et Moyennes Entreprises': ['3-2', '3_2', '3 2', '32'],
+    'Grandes Entreprises': ['3-1', '3_1', '3 1', '31'],
+    'Administrations publiques et collectivités locales': ['1', '01'],
+    'Autres personnes morales': ['2', '3', '4', '5', '7', '02', '03', '04', '05', '07']
+}
+
+# Structure des crédits avec configuration détaillée
+STRUCTURE_CREDITS = {
+    'Particuliers': {
+        'Crédits à la consommation, autre que découvert': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(NATURE_PRET_I05__in=['2', '02', 'Consommation'])
+        },
+        'Découverts': {
+            'model': Decouverts,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I05',
+            'teg_field': 'TEG_decouvert',
+            'montant_field': 'MONTANT_DECOUVERT_I08',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Crédits à moyens terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='2-MT')
+        },
+        'Crédits à long terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='3-LT')
+        },
+        'Crédits immobilier': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(NATURE_PRET_I05__in=['3', '03', 'Immobilier'])
+        },
+        'Cautions': {
+            'model': Cautions,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_caution',
+            'montant_field': 'MONTANT_CAUTION_I10',
+            'taux_nominal_field': 'TAUX_CAUTION_I11',
+            'filters': Q()
+        },
+        'Effets commerciaux': {
+            'model': Effets_commerces,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_effet',
+            'montant_field': 'MONTANT_EFFET_I11',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Affacturage': {
+            'model': Affacturage,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_affacturage',
+            'montant_field': 'MONTANT_CREANCE_I10',
+            'taux_nominal_field': None,
+            'filters': Q()
+        }
+    },
+    'Petites et Moyennes Entreprises': {
+        'Crédits de trésorerie, autre que découvert': {
+            'models': [
+                {
+                    'model': Credit_Amortissables,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_annualise',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q(MATURITE='1-CT')
+                },
+                {
+                    'model': Spot,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_spot',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q()
+                }
+            ]
+        },
+        'Découverts': {
+            'model': Decouverts,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I05',
+            'teg_field': 'TEG_decouvert',
+            'montant_field': 'MONTANT_DECOUVERT_I08',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Crédits à moyens terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='2-MT')
+        },
+        'Crédits à long terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='3-LT')
+        },
+        'Cautions': {
+            'model': Cautions,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_caution',
+            'montant_field': 'MONTANT_CAUTION_I10',
+            'taux_nominal_field': 'TAUX_CAUTION_I11',
+            'filters': Q()
+        },
+        'Effets commerciaux': {
+            'model': Effets_commerces,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_effet',
+            'montant_field': 'MONTANT_EFFET_I11',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Affacturage': {
+            'model': Affacturage,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_affacturage',
+            'montant_field': 'MONTANT_CREANCE_I10',
+            'taux_nominal_field': None,
+            'filters': Q()
+        }
+    },
+    'Grandes Entreprises': {
+        'Crédits de trésorerie, autre que découvert': {
+            'models': [
+                {
+                    'model': Credit_Amortissables,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_annualise',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q(MATURITE='1-CT')
+                },
+                {
+                    'model': Spot,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_spot',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q()
+                }
+            ]
+        },
+        'Découverts': {
+            'model': Decouverts,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I05',
+            'teg_field': 'TEG_decouvert',
+            'montant_field': 'MONTANT_DECOUVERT_I08',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Crédits à moyens terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='2-MT')
+        },
+        'Crédits à long terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='3-LT')
+        },
+        'Cautions': {
+            'model': Cautions,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_caution',
+            'montant_field': 'MONTANT_CAUTION_I10',
+            'taux_nominal_field': 'TAUX_CAUTION_I11',
+            'filters': Q()
+        },
+        'Effets commerciaux': {
+            'model': Effets_commerces,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_effet',
+            'montant_field': 'MONTANT_EFFET_I11',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Affacturage': {
+            'model': Affacturage,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_affacturage',
+            'montant_field': 'MONTANT_CREANCE_I10',
+            'taux_nominal_field': None,
+            'filters': Q()
+        }
+    },
+    'Administrations publiques et collectivités locales': {
+        'Crédits de trésorerie, autre que découvert': {
+            'models': [
+                {
+                    'model': Credit_Amortissables,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_annualise',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q(MATURITE='1-CT')
+                },
+                {
+                    'model': Spot,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_spot',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q()
+                }
+            ]
+        },
+        'Découverts': {
+            'model': Decouverts,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I05',
+            'teg_field': 'TEG_decouvert',
+            'montant_field': 'MONTANT_DECOUVERT_I08',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Crédits à moyens terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='2-MT')
+        },
+        'Crédits à long terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='3-LT')
+        },
+        'Cautions': {
+            'model': Cautions,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_caution',
+            'montant_field': 'MONTANT_CAUTION_I10',
+            'taux_nominal_field': 'TAUX_CAUTION_I11',
+            'filters': Q()
+        },
+        'Effets commerciaux': {
+            'model': Effets_commerces,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_effet',
+            'montant_field': 'MONTANT_EFFET_I11',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Affacturage': {
+            'model': Affacturage,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_affacturage',
+            'montant_field': 'MONTANT_CREANCE_I10',
+            'taux_nominal_field': None,
+            'filters': Q()
+        }
+    },
+    'Autres personnes morales': {
+        'Crédits de trésorerie, autre que découvert': {
+            'models': [
+                {
+                    'model': Credit_Amortissables,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_annualise',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q(MATURITE='1-CT')
+                },
+                {
+                    'model': Spot,
+                    'date_field': 'DATE_MEP_I03',
+                    'categorie_field': 'CATEGORIE_BENEF_I07',
+                    'teg_field': 'TEG_spot',
+                    'montant_field': 'MONTANT_PRET_I13',
+                    'taux_nominal_field': 'TAUX_NOMINAL_I17',
+                    'filters': Q()
+                }
+            ]
+        },
+        'Découverts': {
+            'model': Decouverts,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I05',
+            'teg_field': 'TEG_decouvert',
+            'montant_field': 'MONTANT_DECOUVERT_I08',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Crédits à moyens terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='2-MT')
+        },
+        'Crédits à long terme': {
+            'model': Credit_Amortissables,
+            'date_field': 'DATE_MEP_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_annualise',
+            'montant_field': 'MONTANT_PRET_I13',
+            'taux_nominal_field': 'TAUX_NOMINAL_I17',
+            'filters': Q(MATURITE='3-LT')
+        },
+        'Cautions': {
+            'model': Cautions,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_caution',
+            'montant_field': 'MONTANT_CAUTION_I10',
+            'taux_nominal_field': 'TAUX_CAUTION_I11',
+            'filters': Q()
+        },
+        'Effets commerciaux': {
+            'model': Effets_commerces,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_effet',
+            'montant_field': 'MONTANT_EFFET_I11',
+            'taux_nominal_field': 'TAUX_NOMINAL_I10',
+            'filters': Q()
+        },
+        'Affacturage': {
+            'model': Affacturage,
+            'date_field': 'DATE_MISE_PLACE_I03',
+            'categorie_field': 'CATEGORIE_BENEF_I07',
+            'teg_field': 'TEG_affacturage',
+            'montant_field': 'MONTANT_CREANCE_I10',
+            'taux_nominal_field': None,
+            'filters': Q()
+        }
+    }
+}
+
+
+@login_required
+@user_passes_test(is_cnef_user)
+def generer_communique_presse(request):
+    """
+    Vue CORRIGÉE pour générer le communiqué de presse avec statistiques
+    """
+    # Récupérer les paramètres de filtrage
+    trimestre = request.GET.get('trimestre', 'T2')
+    annee = request.GET.get('annee', str(timezone.now().year))
+    type_etablissement = request.GET.get('type_etablissement', 'EMF Deuxième catégorie')
+
+    # Calculer les données
+    context = calculer_donnees_communique(trimestre, annee, type_etablissement)
+    
+    return render(request, 'admin/communique_presse.html', context)
+
+
+@login_required
+@user_passes_test(is_cnef_user)
+def details_supplementaires(request):
+    """
+    Vue pour afficher la page des détails supplémentaires avec les mêmes calculs
+    """
+    # Récupérer les paramètres de filtrage
+    trimestre = request.GET.get('trimestre', 'T2')
+    annee = request.GET.get('annee', str(timezone.now().year))
+    type_etablissement = request.GET.get('type_etablissement', 'EMF Deuxième catégorie')
+
+    # Calculer les données (même logique que generer_communique_presse)
+    context = calculer_donnees_communique(trimestre, annee, type_etablissement)
+    
+    return render(request, 'admin/details_supplementaires.html', context)
+
+
+@login_required
+@user_passes_test(is_cnef_user)
+@require_http_methods(["GET"])
+def api_tendances_teg(request):
+    """
+    Évolution trimestrielle du TEG moyen, du seuil d'usure et des volumes
+    d'une catégorie (tendances_teg.py)
+
+    GET ?categorie=Particuliers&type_etablissement=Banques&debut=2024-T1&fin=2025-T2[&produit=Découverts]
+    Par défaut : les quatre derniers trimestres
+    """
+    from .tendances_teg import lire_trimestre, tendances_teg, trimestre_courant, trimestres_entre
+
+    categorie = request.GET.get('categorie', 'Particuliers')
+    type_etablissement = request.GET.get('type_etablissement', 'EMF Deuxième catégorie')
+    produit = request.GET.get('produit') or None
+
+    if categorie not in CATEGORIES_BENEFICIAIRES:
+        return JsonResponse({'success': False, 'message': f"Catégorie inconnue : {categorie}"}, status=400)
+    if type_etablissement not in TYPE_MAPPING:
+        return JsonResponse({'success': False, 'message': f"Type d'établissement inconnu : {type_etablissement}"}, status=400)
+    if produit and produit not in STRUCTURE_CREDITS[categorie]:
+        return JsonResponse({'success': False, 'message': f"Produit inconnu pour cette catégorie : {produit}"}, status=400)
+
+    try:
+        fin = lire_trimestre(request.GET['fin']) if request.GET.get('fin') else trimestre_courant()
+        if request.GET.get('debut'):
+            debut = lire_trimestre(request.GET['debut'])
+        else:
+            # Quatre trimestres se terminant par `fin`
+            debut = trimestres_entre((fin[0] - 1, fin[1]), fin)[1]
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    nb_trimestres = len(trimestres_entre(debut, fin))
+    if nb_trimestres == 0:
+        return JsonResponse({'success': False, 'message': "Le trimestre de début doit précéder celui de fin"}, status=400)
+    if nb_trimestres > settings.TENDANCES_TRIMESTRES_MAX:
+        return JsonResponse({
+            'success': False,
+            'message': f"Au plus {settings.TENDANCES_TRIMESTRES_MAX} trimestres par requête"
+        }, status=400)
+
+    return JsonResponse({'success': True, **tendances_teg(categorie, type_etablissement, debut, fin, produit)})
+
+
+def filtre_communique(categorie_field, category_codes, type_etablissement):
+    """
+    Filtre commun du communiqué (hors période) : type et catégorie EMF de
+    l'établissement, catégorie du bénéficiaire (recherche exacte ET partielle)
+    """
+    filtre = Q(etablissement__type_etablissement=TYPE_MAPPING.get(type_etablissement, 'EMF'))
+    categorie_emf = CATEGORIES_EMF.get(type_etablissement)
+    if categorie_emf:
+        filtre &= Q(etablissement__categorie_emf=categorie_emf)
+
+    category_filter = Q()
+    for code in category_codes:
+        category_filter |= Q(**{f'{categorie_field}': code})
+        category_filter |= Q(**{f'{categorie_field}__icontains': code})
+    return filtre & category_filter
+
+
+@lecture_reporting
+def calculer_donnees_communique(trimestre, annee, type_etablissement):
+    """
+    Fonction partagée pour calculer les données du communiqué et des détails
+    """
+    import logging
+    from django.db.models import Q, Avg, Sum, Count
+    from datetime import datetime
+    
+    logger = logging.getLogger(__name__)
+    
+    # Options de filtrage
+    trimestres = ['T1', 'T2', 'T3', 'T4']
+    types_etablissement = ['Banques', 'EMF Première catégorie', 'EMF Deuxième catégorie']
+
+    # Extraire les années disponibles
+    annees = set()
+    for model in [Credit_Amortissables, Spot, Decouverts, Affacturage, Cautions, Effets_commerces]:
+        date_field = 'DATE_MEP_I03' if hasattr(model, 'DATE_MEP_I03') else 'DATE_MISE_PLACE_I03'
+        years = model.objects.dates(date_field, 'year')
+        annees.update([y.year for y in years])
+    
+    annees = sorted(list(annees), reverse=True)
+
+    categories_beneficiaires = CATEGORIES_BENEFICIAIRES
+
+    # Calculer le trimestre
+    trimestre_ranges = {
+        'T1': (1, 3),
+        'T2': (4, 6),
+        'T3': (7, 9),
+        'T4': (10, 12)
+    }
+    start_month, end_month = trimestre_ranges.get(trimestre, (4, 6))
+    start_date = datetime(int(annee), start_month, 1)
+    end_date = datetime(int(annee), end_month + 1, 1) if end_month < 12 else datetime(int(annee) + 1, 1, 1)
+
+    # FONCTION AMÉLIORÉE pour calculer les statistiques
+    def calculer_stats_amelioree(model, date_field, categorie_field, teg_field, 
+                                  montant_field, taux_nominal_field, 
+                                  category_codes, additional_filters=Q()):
+        """
+        Fonction améliorée avec meilleure gestion des jointures et des filtres
+        """
+        try:
+            # 1. FILTRE DE BASE : Période
+            base_filter = Q(
+                **{
+                    f'{date_field}__gte': start_date,
+                    f'{date_field}__lt': end_date,
+                }
+            )
+
+            # 2-3. TYPE / CATÉGORIE EMF ET CATÉGORIE BÉNÉFICIAIRE
+            category_filter = filtre_communique(categorie_field, category_codes, type_etablissement)
+
+            # 4. COMBINAISON DE TOUS LES FILTRES
+            queryset = model.objects.filter(
+                base_filter & category_filter & additional_filters
+            ).exclude(
+                **{f'{teg_field}__isnull': True}
+            ).exclude(
+                **{f'{teg_field}': 0}
+            )
+            
+            # 5. DEBUG : Compter les résultats
+            count = queryset.count()
+
+            if count == 0:
+                return None
+            
+            # 6. AGRÉGATIONS
+            stats = queryset.aggregate(
+                teg_moyen=Avg(teg_field),
+                montant_total=Sum(montant_field),
+                count=Count('id')
+            )
+            
+            result = {
+                'teg_moyen': float(stats['teg_moyen'] or 0),
+                'montant_total': float(stats['montant_total'] or 0),
+                'count': stats['count']
+            }
+            
+            # 7. TAUX NOMINAL (si disponible)
+            if taux_nominal_field:
+                taux_stats = queryset.aggregate(avg=Avg(taux_nominal_field))
+                result['taux_nominal_moyen'] = float(taux_stats['avg'] or 0)
+            else:
+                result['taux_nominal_moyen'] = 0
+            
+            logger.info(f"    TEG moyen: {result['teg_moyen']:.2f}%, Montant: {result['montant_total']:,.0f}")
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Erreur dans calculer_stats_amelioree pour {model.__name__}: {e}")
+            return None
+
+    # Structure des crédits (configuration partagée avec tendances_teg.py)
+    structure_credits = dict(STRUCTURE_CREDITS)
+
+
+    # AGRÉGATION DES DONNÉES
+    data = {}
+    total_records_found = 0
+    
+    logger.info(f"\n{'='*80}")
+    logger.info(f"🔍 GÉNÉRATION DONNÉES : {trimestre} {annee} - {type_etablissement}")
+    logger.info(f"{'='*80}\n")
+    
+    for category_name, category_codes in categories_beneficiaires.items():
+        data[category_name] = {}
+        
+        if category_name not in structure_credits:
+            # Répliquer la structure pour toutes les catégories
+            structure_credits[category_name] = structure_credits['Petites et Moyennes Entreprises']
+        
+        credit_types = structure_credits[category_name]
+        
+        for credit_type, config in credit_types.items():
+            logger.info(f"\n📋 {category_name} - {credit_type}")
+            
+            # CAS SPÉCIAL : Multi-modèles (crédits de trésorerie)
+            if 'models' in config:
+                combined_stats = {
+                    'teg_total': 0,
+                    'montant_total': 0,
+                    'taux_nominal_total': 0,
+                    'count': 0
+                }
+                
+                for model_config in config['models']:
+                    stats = calculer_stats_amelioree(
+                        model_config['model'],
+                        model_config['date_field'],
+                        model_config['categorie_field'],
+                        model_config['teg_field'],
+                        model_config['montant_field'],
+                        model_config['taux_nominal_field'],
+                        category_codes,
+                        model_config['filters']
+                    )
+                    
+                    if stats:
+                        combined_stats['teg_total'] += stats['teg_moyen'] * stats['count']
+                        combined_stats['montant_total'] += stats['montant_total']
+                        combined_stats['taux_nominal_total'] += stats['taux_nominal_moyen'] * stats['count']
+                        combined_stats['count'] += stats['count']
+                
+                if combined_stats['count'] > 0:
+                    teg_moyen = combined_stats['teg_total'] / combined_stats['count']
+                    taux_nominal_moyen = combined_stats['taux_nominal_total'] / combined_stats['count']
+                    
+                    data[category_name][credit_type] = {
+                        'teg_moyen': round(teg_moyen, 2),
+                        'seuil_usure': round((4 * teg_moyen) / 3, 2),
+                        'montant_total': combined_stats['montant_total'],
+                        'taux_nominal_moyen': round(taux_nominal_moyen, 2)
+                    }
+                    total_records_found += combined_stats['count']
+                else:
+                    data[category_name][credit_type] = {
+                        'teg_moyen': 0,
+                        'seuil_usure': 0,
+                        'montant_total': 0,
+                        'taux_nominal_moyen': 0
+                    }
+            
+            # CAS NORMAL : Un seul modèle
+            else:
+                stats = calculer_stats_amelioree(
+                    config['model'],
+                    config['date_field'],
+                    config['categorie_field'],
+                    config['teg_field'],
+                    config['montant_field'],
+                    config['taux_nominal_field'],
+                    category_codes,
+                    config['filters']
+                )
+                
+                if stats and stats['teg_moyen'] > 0:
+                    data[category_name][credit_type] = {
+                        'teg_moyen': round(stats['teg_moyen'], 2),
+                        'seuil_usure': round((4 * stats['teg_moyen']) / 3, 2),
+                        'montant_total': stats['montant_total'],
+                        'taux_nominal_moyen': round(stats['taux_nominal_moyen'], 2)
+                    }
+                    total_records_found += stats['count']
+                else:
+                    data[category_name][credit_type] = {
+                        'teg_moyen': 0,
+                        'seuil_usure': 0,
+                        'montant_total': 0,
+                        'taux_nominal_moyen': 0
+                    }
+
+    # Date et heure actuelles
+    current_date = timezone.now().strftime('%d/%m/%Y')
+    current_time = timezone.now().strftime('%H:%M')
+    default_ministre = 'Christian YOKA'
+
+    context = {
+        'data': data,
+        'trimestre': trimestre,
+        'annee': annee,
+        'type_etablissement': type_etablissement,
+        'current_date': current_date,
+        'current_time': current_time,
+        'trimestres': trimestres,
+        'annees': annees,
+        'types_etablissement': types_etablissement,
+        'default_ministre': default_ministre,
+        'total_records': total_records_found
+    }
+
+    return context
+
+
+@login_required
+@user_passes_test(is_cnef_user)
+def calculer_statistiques_model(config, category_codes, start_date, end_date, type_mapping, type_etablissement, categorie_emf):
+    """
+    Fonction utilitaire pour calculer les statistiques d'un modèle donné
+    """
+    model = config['model']
+    date_field = config['date_field']
+    categorie_field = config['categorie_field']
+    teg_field = config['teg_field']
+    montant_field = config['montant_field']
+    taux_nominal_field = config['taux_nominal_field']
+    filters = config['filters']
+
+    # Filtrer par type d'établissement et période
+    date_filter = {
+        f'{date_field}__gte': start_date,
+        f'{date_field}__lt': end_date
+    }
+    
+    queryset = model.objects.select_related('etablissement').filter(
+        **date_filter,
+        etablissement__type_etablissement=type_mapping.get(type_etablissement, 'EMF')
+    )
+    
+    if categorie_emf:
+        queryset = queryset.filter(etablissement__categorie_emf=categorie_emf)
+    
+    # Filtrer par catégorie de bénéficiaire
+    category_filter = Q()
+    for code in category_codes:
+        category_filter |= Q(**{f'{categorie_field}__icontains': code})
+    
+    queryset = queryset.filter(category_filter & filters)
+
+    # Agrégations avec gestion des valeurs None
+    stats = queryset.aggregate(
+        teg_moyen=Avg(teg_field),
+        montant_total=Sum(montant_field),
+    )
+    
+    # Gestion des valeurs None
+    teg_moyen = stats['teg_moyen'] or 0
+    montant_total = stats['montant_total'] or 0
+    
+    # Ajouter le taux nominal moyen si le champ existe
+    if taux_nominal_field:
+        taux_nominal_stats = queryset.aggregate(avg=Avg(taux_nominal_field))
+        taux_nominal_moyen = taux_nominal_stats['avg'] or 0
+    else:
+        taux_nominal_moyen = 0
+
+    return {
+        'teg_moyen': teg_moyen,
+        'montant_total': montant_total,
+        'taux_nominal_moyen': taux_nominal_moyen
+    }
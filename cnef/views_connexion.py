@@ -0,0 +1,394 @@
+"""
+Connexion, déconnexion et réinitialisation du mot de passe
+"""
+
+import datetime
+import logging
+
+from django.urls import reverse_lazy
+from django.contrib.auth.views import LoginView, LogoutView
+from django.shortcuts import render, redirect
+from django.contrib import messages
+from django.utils import timezone
+
+from .models import ActionUtilisateur, User
+from .forms import ConnexionUniverselleForm
+from .email_utils import generate_reset_code, send_reset_code_email, is_code_expired
+
+logger = logging.getLogger(__name__)
+
+
+class ConnexionUniverselleView(LoginView):
+    """
+    Vue de connexion universelle pour tous les rôles
+    Redirige automatiquement selon le rôle de l'utilisateur
+    """
+    template_name = 'accounts/connexion.html'
+    form_class = ConnexionUniverselleForm
+    redirect_authenticated_user = True
+    
+    def get_form_kwargs(self):
+        """S'assurer que le formulaire reçoit bien le request"""
+        kwargs = super().get_form_kwargs()
+        kwargs['request'] = self.request
+        return kwargs
+    
+    def form_valid(self, form):
+        """
+        ✅ CORRECTION : Enregistrer l'action ICI (appelé UNE SEULE FOIS)
+        Cette méthode est exécutée quand le formulaire de connexion est valide
+        """
+        # D'abord appeler le parent pour connecter l'utilisateur
+        response = super().form_valid(form)
+        
+        # Maintenant self.request.user est authentifié
+        user = self.request.user
+        
+        # Mettre à jour la dernière connexion
+        user.derniere_connexion = timezone.now()
+        user.save(update_fields=['derniere_connexion'])
+        
+        # ✅ Enregistrer la connexion dans le journal UNE SEULE FOIS
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=user,
+            type_action='CONNEXION',
+            description=f"Connexion réussie - Rôle: {user.get_role_display()}",
+            etablissement=user.etablissement if user.etablissement else None,
+            request=self.request
+        )
+        
+        return response
+    
+    def get_success_url(self):
+        """
+        ✅ SIMPLIFIÉ : Juste retourner l'URL de redirection selon le rôle
+        Plus de journalisation ici pour éviter les doublons
+        """
+        user = self.request.user
+        
+        # Redirection selon le rôle
+        if user.role == 'ACNEF':
+            messages.success(self.request, f"Bienvenue {user.get_full_name()} - Administrateur CNEF")
+            return reverse_lazy('interface_chef')  # admin/interface_chef.html
+        
+        elif user.role == 'UCNEF':
+            messages.success(self.request, f"Bienvenue {user.get_full_name()} - Utilisateur CNEF")
+            return reverse_lazy('interface_chef')  # admin/interface_chef.html
+        
+        elif user.role == 'AEF':
+            messages.success(self.request, f"Bienvenue {user.get_full_name()} - Administrateur {user.etablissement.Nom_etablissement}")
+            return reverse_lazy('interface_aef')  
+        
+        elif user.role == 'UEF':
+            messages.success(self.request, f"Bienvenue {user.get_full_name()} - {user.etablissement.Nom_etablissement}")
+            return reverse_lazy('tableau_de_bord')  # accounts/tableau_de_bord.html
+        
+        # Par défaut (ne devrait jamais arriver)
+        return reverse_lazy('tableau_de_bord')
+    
+    def form_invalid(self, form):
+        """Gérer les erreurs de connexion"""
+        messages.error(self.request, "Email ou mot de passe incorrect.")
+        return super().form_invalid(form)
+    
+    def get_context_data(self, **kwargs):
+        """Ajouter des données au contexte du template"""
+        context = super().get_context_data(**kwargs)
+        context['page_title'] = 'Connexion - Plateforme CNEF'
+        return context
+
+
+class DeconnexionView(LogoutView):
+    """
+    Vue de déconnexion universelle
+    """
+    next_page = reverse_lazy('connexion')
+    
+    def dispatch(self, request, *args, **kwargs):
+        """Enregistrer la déconnexion avant de déconnecter l'utilisateur"""
+        if request.user.is_authenticated:
+            ActionUtilisateur.enregistrer_action(
+                utilisateur=request.user,
+                type_action='DECONNEXION',
+                description=f"Déconnexion - Rôle: {request.user.get_role_display()}",
+                etablissement=request.user.etablissement if request.user.etablissement else None,
+                request=request
+            )
+            messages.info(request, "Vous avez été déconnecté avec succès.")
+        
+        return super().dispatch(request, *args, **kwargs)
+
+
+def saisie_mail_view(request):
+    """
+    Étape 1 : Saisie de l'adresse email pour réinitialisation
+    """
+    if request.method == 'POST':
+        email = request.POST.get('email', '').strip().lower()
+        
+        if not email:
+            messages.error(request, "Veuillez saisir une adresse email.")
+            return render(request, 'réintialisation/saisie_mail.html')
+        
+        # Vérifier si l'email existe dans la base de données
+        try:
+            user = User.objects.get(email=email)
+            
+            # Générer le code de réinitialisation
+            reset_code = generate_reset_code()
+            
+            # Sauvegarder dans la session
+            request.session['reset_code'] = reset_code
+            request.session['reset_email'] = email
+            request.session['reset_code_sent_at'] = timezone.now().isoformat()
+            request.session['reset_attempts'] = 0  # Compteur de tentatives
+            
+            # Envoyer le code par email
+            if send_reset_code_email(email, reset_code):
+                messages.success(request, f"Un code de confirmation a été envoyé à {email}")
+                logger.info(f"Code de réinitialisation envoyé à {email}")
+                return redirect('code_validation')
+            else:
+                messages.error(request, "Erreur lors de l'envoi du code. Veuillez réessayer.")
+                logger.error(f"Échec envoi code reset à {email}")
+            
+        except User.DoesNotExist:
+            # Pour la sécurité, on ne dit pas si l'email existe ou non
+            # Mais on peut afficher un message générique
+            messages.error(request, "Aucun compte trouvé avec cette adresse email.")
+            logger.warning(f"Tentative reset pour email inexistant: {email}")
+    
+    return render(request, 'réintialisation/saisie_mail.html')
+
+
+def code_validation_view(request):
+    """
+    Étape 2 : Validation du code de 6 caractères
+    Avec validation automatique dès que 6 caractères corrects sont saisis
+    """
+    # Vérifier que l'utilisateur vient de la page saisie_mail
+    if 'reset_code' not in request.session:
+        messages.error(request, "Veuillez d'abord saisir votre adresse email.")
+        return redirect('saisie_mail')
+    
+    # Vérifier si le code a expiré
+    try:
+        sent_at = datetime.datetime.fromisoformat(request.session['reset_code_sent_at'])
+        sent_at = timezone.make_aware(sent_at) if timezone.is_naive(sent_at) else sent_at
+        
+        if is_code_expired(sent_at):
+            messages.error(request, "⏰ Le code a expiré (15 minutes). Veuillez recommencer.")
+            # Nettoyer la session
+            _clear_reset_session(request)
+            return redirect('saisie_mail')
+            
+    except (ValueError, KeyError) as e:
+        logger.error(f"Erreur validation date session: {e}")
+        messages.error(request, "Session invalide. Veuillez recommencer.")
+        _clear_reset_session(request)
+        return redirect('saisie_mail')
+    
+    if request.method == 'POST':
+        # Gérer le renvoi de code
+        if 'resend' in request.POST:
+            # Régénérer un nouveau code
+            reset_code = generate_reset_code()
+            request.session['reset_code'] = reset_code
+            request.session['reset_code_sent_at'] = timezone.now().isoformat()
+            request.session['reset_attempts'] = 0  # Réinitialiser le compteur
+            
+            if send_reset_code_email(request.session['reset_email'], reset_code):
+                messages.success(request, "✅ Un nouveau code a été envoyé à votre adresse email.")
+                logger.info(f"Code renvoyé à {request.session['reset_email']}")
+            else:
+                messages.error(request, "❌ Erreur lors de l'envoi du code. Veuillez réessayer.")
+            
+            return redirect('code_validation')
+        
+        # Validation du code
+        entered_code = request.POST.get('code', '').strip().upper()
+        stored_code = request.session.get('reset_code', '').upper()
+        
+        # Récupérer le nombre de tentatives
+        attempts = request.session.get('reset_attempts', 0)
+        
+        # Vérifier la limite de tentatives (5 max)
+        if attempts >= 5:
+            messages.error(request, "❌ Trop de tentatives incorrectes. Veuillez recommencer.")
+            logger.warning(f"Trop de tentatives pour {request.session['reset_email']}")
+            _clear_reset_session(request)
+            return redirect('saisie_mail')
+        
+        if entered_code == stored_code:
+            # Code correct, réinitialiser les tentatives et rediriger
+            request.session['reset_attempts'] = 0
+            request.session['code_validated'] = True  # Marquer que le code est validé
+            logger.info(f"Code validé pour {request.session['reset_email']}")
+            return redirect('confirmation')
+        else:
+            # Code incorrect, incrémenter les tentatives
+            attempts += 1
+            request.session['reset_attempts'] = attempts
+            remaining = 5 - attempts
+            
+            if remaining > 0:
+                messages.error(request, f"❌ Code incorrect. Il vous reste {remaining} tentative(s).")
+            else:
+                messages.error(request, "❌ Code incorrect. Limite de tentatives atteinte.")
+                _clear_reset_session(request)
+                return redirect('saisie_mail')
+    
+    return render(request, 'réintialisation/code_validation.html')
+
+
+def code_validation_ajax(request):
+    """
+    Vue AJAX pour valider le code en temps réel (validation automatique)
+    Appelée par JavaScript quand 6 caractères sont saisis
+    """
+    from django.http import JsonResponse
+    
+    if request.method == 'POST':
+        import json
+        try:
+            data = json.loads(request.body)
+            entered_code = data.get('code', '').strip().upper()
+            
+            # Vérifier que la session est valide
+            if 'reset_code' not in request.session:
+                return JsonResponse({
+                    'valid': False,
+                    'error': 'Session expirée',
+                    'redirect': '/saisie-mail/'
+                })
+            
+            # Vérifier expiration
+            try:
+                sent_at = datetime.datetime.fromisoformat(request.session['reset_code_sent_at'])
+                sent_at = timezone.make_aware(sent_at) if timezone.is_naive(sent_at) else sent_at
+                
+                if is_code_expired(sent_at):
+                    _clear_reset_session(request)
+                    return JsonResponse({
+                        'valid': False,
+                        'error': 'Code expiré',
+                        'redirect': '/saisie-mail/'
+                    })
+            except (ValueError, KeyError):
+                return JsonResponse({
+                    'valid': False,
+                    'error': 'Session invalide',
+                    'redirect': '/saisie-mail/'
+                })
+            
+            stored_code = request.session.get('reset_code', '').upper()
+            attempts = request.session.get('reset_attempts', 0)
+            
+            # Vérifier limite tentatives
+            if attempts >= 5:
+                _clear_reset_session(request)
+                return JsonResponse({
+                    'valid': False,
+                    'error': 'Trop de tentatives',
+                    'redirect': '/saisie-mail/'
+                })
+            
+            # Vérifier le code
+            if entered_code == stored_code:
+                request.session['reset_attempts'] = 0
+                request.session['code_validated'] = True
+                return JsonResponse({
+                    'valid': True,
+                    'redirect': '/confirmation/'
+                })
+            else:
+                # Incrémenter tentatives
+                attempts += 1
+                request.session['reset_attempts'] = attempts
+                remaining = 5 - attempts
+                
+                return JsonResponse({
+                    'valid': False,
+                    'remaining': remaining,
+                    'error': f'Code incorrect. {remaining} tentative(s) restante(s)'
+                })
+                
+        except Exception as e:
+            logger.error(f"Erreur validation AJAX: {e}")
+            return JsonResponse({
+                'valid': False,
+                'error': 'Erreur serveur'
+            })
+    
+    return JsonResponse({'valid': False, 'error': 'Méthode non autorisée'})
+
+
+def confirmation_view(request):
+    """
+    Étape 3 : Création du nouveau mot de passe
+    """
+    # Vérifier que l'utilisateur a validé le code
+    if not request.session.get('code_validated'):
+        messages.error(request, "Veuillez d'abord valider votre code de confirmation.")
+        return redirect('saisie_mail')
+    
+    # Vérifier si le code a expiré
+    try:
+        sent_at = datetime.datetime.fromisoformat(request.session['reset_code_sent_at'])
+        sent_at = timezone.make_aware(sent_at) if timezone.is_naive(sent_at) else sent_at
+        
+        if is_code_expired(sent_at):
+            messages.error(request, "⏰ La session a expiré. Veuillez recommencer.")
+            _clear_reset_session(request)
+            return redirect('saisie_mail')
+            
+    except (ValueError, KeyError):
+        messages.error(request, "Session invalide. Veuillez recommencer.")
+        _clear_reset_session(request)
+        return redirect('saisie_mail')
+    
+    if request.method == 'POST':
+        password = request.POST.get('password', '')
+        password_confirm = request.POST.get('password_confirm', '')
+        
+        # Validations
+        if not password or not password_confirm:
+            messages.error(request, "⚠️ Veuillez remplir tous les champs.")
+        elif password != password_confirm:
+            messages.error(request, "❌ Les mots de passe ne correspondent pas.")
+        elif len(password) < 8:
+            messages.error(request, "❌ Le mot de passe doit contenir au moins 8 caractères.")
+        else:
+            # Mettre à jour le mot de passe
+            try:
+                user = User.objects.get(email=request.session['reset_email'])
+                user.set_password(password)  # Utiliser set_password pour le hachage
+                user.save()
+                
+                logger.info(f"Mot de passe réinitialisé pour {user.email}")
+                
+                # Nettoyer la session
+                _clear_reset_session(request)
+                
+                messages.success(request, "✅ Votre mot de passe a été réinitialisé avec succès. Vous pouvez maintenant vous connecter.")
+                return redirect('connexion')
+                
+            except User.DoesNotExist:
+                logger.error(f"Utilisateur non trouvé lors de la réinitialisation: {request.session.get('reset_email')}")
+                messages.error(request, "❌ Erreur lors de la réinitialisation du mot de passe. Utilisateur non trouvé.")
+                _clear_reset_session(request)
+                return redirect('saisie_mail')
+            except Exception as e:
+                logger.error(f"Erreur lors de la réinitialisation: {e}")
+                messages.error(request, "❌ Une erreur est survenue. Veuillez réessayer.")
+    
+    return render(request, 'réintialisation/confirmation.html')
+
+
+def _clear_reset_session(request):
+    """Fonction utilitaire pour nettoyer la session de réinitialisation"""
+    request.session.pop('reset_code', None)
+    request.session.pop('reset_email', None)
+    request.session.pop('reset_code_sent_at', None)
+    request.session.pop('reset_attempts', None)
+    request.session.pop('code_validated', None)
@@ -0,0 +1,161 @@
+"""
+Historique et renvoi des e-mails
+"""
+
+import logging
+
+from django.shortcuts import render
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from .models import ActionUtilisateur, HistoriqueEmail
+from .email_utils import renvoyer_email
+
+from .views_commun import is_chef
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# VUES POUR L'HISTORIQUE DES EMAILS
+# ==========================================
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["GET"])
+def historique_emails(request):
+    """
+    Affiche l'historique de tous les emails envoyés
+    Accessible uniquement aux ACNEF/Chef
+    """
+    
+    # Si c'est une requête AJAX (appelée depuis JavaScript)
+    if request.GET.get('ajax') == '1':
+        try:
+            # Récupérer les filtres depuis l'URL
+            type_filter = request.GET.get('type', '')
+            objet_filter = request.GET.get('objet', '')
+            
+            # Query de base : tous les emails, triés par date décroissante
+            emails = HistoriqueEmail.objects.all().select_related(
+                'utilisateur_envoyeur',
+                'etablissement',
+                'token_lie',
+                'fichier_lie'
+            ).order_by('-date_envoi')
+            
+            # Appliquer le filtre par type si présent
+            if type_filter:
+                emails = emails.filter(type_email=type_filter)
+            
+            # Appliquer le filtre par objet si présent
+            if objet_filter:
+                emails = emails.filter(objet__icontains=objet_filter)
+            
+            # Limiter aux 100 derniers emails pour la performance
+            emails = emails[:100]
+            
+            # Sérialiser les données en JSON
+            data = []
+            for email in emails:
+                data.append({
+                    'id': email.id,
+                    'date_envoi': email.date_envoi.strftime('%d/%m/%Y %H:%M'),
+                    'type_email': email.type_email,
+                    'type_display': email.get_type_email_display(),
+                    'destinataire_email': email.destinataire_email,
+                    'destinataire_nom': email.destinataire_nom or '',
+                    'objet': email.objet,
+                    'statut': email.statut,
+                    'etablissement': email.etablissement.Nom_etablissement if email.etablissement else '',
+                })
+            
+            # ========== NOUVEAU: Calculer les statistiques ==========
+            total_emails = HistoriqueEmail.objects.count()
+            emails_envoyes = HistoriqueEmail.objects.filter(statut='ENVOYE').count()
+            emails_echec = HistoriqueEmail.objects.filter(statut='ECHEC').count()
+            emails_en_attente = HistoriqueEmail.objects.filter(statut='EN_ATTENTE').count()
+            emails_aujourdhui = HistoriqueEmail.objects.filter(
+                date_envoi__date=timezone.now().date()
+            ).count()
+            # ========================================================
+            
+            # Retourner les données en JSON avec les stats
+            return JsonResponse({
+                'emails': data,
+                'stats': {
+                    'total': total_emails,
+                    'envoyes': emails_envoyes,
+                    'echec': emails_echec,
+                    'en_attente': emails_en_attente,
+                    'aujourdhui': emails_aujourdhui
+                }
+            })
+        
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement de l'historique des emails: {str(e)}")
+            return JsonResponse({
+                'emails': [],
+                'error': str(e)
+            }, status=500)
+    
+    # Si ce n'est pas une requête AJAX, afficher la page HTML
+    # (mais normalement on n'utilisera que l'AJAX depuis l'interface chef)
+    context = {
+        'types_email': HistoriqueEmail.TYPE_EMAIL_CHOICES,
+    }
+    return render(request, 'historique_emails.html', context)
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["POST"])
+def renvoyer_email_api(request, email_id):
+    """
+    Renvoie un email depuis l'historique
+    Accessible uniquement aux ACNEF/Chef
+    """
+    try:
+        # Récupérer l'email depuis l'historique
+        email_historique = HistoriqueEmail.objects.get(id=email_id)
+        
+        # Renvoyer l'email en utilisant la fonction d'email_utils
+        succes = renvoyer_email(email_historique)
+        
+        if succes:
+            # Journaliser l'action dans ActionUtilisateur
+            ActionUtilisateur.enregistrer_action(
+                utilisateur=request.user,
+                type_action='AUTRE',
+                description=f"Renvoi d'email à {email_historique.destinataire_email} (Type: {email_historique.get_type_email_display()})",
+                request=request
+            )
+            
+            logger.info(f"Renvoi d'email programmé pour {email_historique.destinataire_email} par {request.user.email}")
+            
+            return JsonResponse({
+                'success': True,
+                'message': f'Renvoi programmé pour {email_historique.destinataire_email}'
+            })
+        else:
+            logger.warning(f"Échec du renvoi d'email à {email_historique.destinataire_email}")
+            return JsonResponse({
+                'success': False,
+                'message': 'Échec du renvoi de l\'email. Vérifiez les logs.'
+            }, status=500)
+            
+    except HistoriqueEmail.DoesNotExist:
+        logger.error(f"Tentative de renvoi d'un email inexistant (ID: {email_id})")
+        return JsonResponse({
+            'success': False,
+            'message': 'Email introuvable dans l\'historique'
+        }, status=404)
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du renvoi d'email (ID: {email_id}): {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur: {str(e)}'
+        }, status=500)
@@ -0,0 +1,80 @@
+"""
+Pages d'erreur personnalisées (400, 403, 404, 500)
+"""
+
+import logging
+
+from django.shortcuts import render
+
+logger = logging.getLogger(__name__)
+
+
+def custom_404_view(request, exception=None):
+    """
+    Vue personnalisée pour les erreurs 404 - Chemins incorrects
+    """
+    context = {
+        'title': 'Chemin incorrect - CNEF',
+        'error_message': 'La page que vous recherchez n\'existe pas ou a été déplacée.',
+        'redirect_url': 'connexion',
+        'redirect_label': 'Se connecter'
+    }
+    return render(request, 'errors/404.html', context, status=404)
+
+
+def custom_500_view(request):
+    """
+    Vue personnalisée pour les erreurs 500 - Erreurs serveur
+    """
+    context = {
+        'title': 'Erreur serveur - CNEF', 
+        'error_message': 'Une erreur interne du serveur s\'est produite.',
+        'redirect_url': 'connexion',
+        'redirect_label': 'Se connecter'
+    }
+    return render(request, 'errors/500.html', context, status=500)
+
+
+def custom_permission_denied_view(request, exception=None):
+    """
+    Vue personnalisée pour les accès refusés (403)
+    """
+    context = {
+        'title': 'Accès refusé - CNEF',
+        'error_message': 'Vous n\'avez pas les permissions nécessaires pour accéder à cette page.',
+        'redirect_url': 'connexion',
+        'redirect_label': 'Se connecter'
+    }
+    return render(request, 'errors/403.html', context, status=403)
+
+
+def custom_bad_request_view(request, exception=None):
+    """
+    Vue personnalisée pour les mauvaises requêtes (400)
+    """
+    context = {
+        'title': 'Requête invalide - CNEF',
+        'error_message': 'La requête envoyée au serveur est invalide.',
+        'redirect_url': 'connexion', 
+        'redirect_label': 'Se connecter'
+    }
+    return render(request, 'errors/400.html', context, status=400)
+
+
+class ErrorHandlerMiddleware:
+    """
+    Middleware personnalisé pour une meilleure gestion des erreurs
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return response
+
+    def process_exception(self, request, exception):
+        """
+        Intercepte toutes les exceptions non gérées
+        """
+        logger.error(f"Exception non gérée: {str(exception)}")
+        return custom_500_view(request)
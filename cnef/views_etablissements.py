@@ -0,0 +1,454 @@
+"""
+Gestion des établissements (ACNEF)
+"""
+
+import json
+import logging
+
+from django.shortcuts import get_object_or_404
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.db import transaction
+from django.views.decorators.http import require_http_methods
+
+from .models import Etablissement, ActionUtilisateur, User
+
+from .views_commun import is_cnef_user, is_acnef
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# 1. CRÉER UN NOUVEL ÉTABLISSEMENT
+# ==========================================
+
+@login_required
+@user_passes_test(is_cnef_user)
+@require_http_methods(["POST"])
+def creer_etablissement(request):
+    """
+    Crée un nouvel établissement financier
+    """
+    try:
+        data = json.loads(request.body)
+        
+        # Validation des données
+        Nom_etablissement = data.get('Nom_etablissement', '').strip()
+        code_etablissement = data.get('code_etablissement', '').strip()
+        type_etablissement = data.get('type_etablissement', '')
+        categorie_emf = data.get('categorie_emf', None)
+        
+        # Vérifications
+        if not Nom_etablissement or not code_etablissement or not type_etablissement:
+            return JsonResponse({
+                'success': False,
+                'message': 'Tous les champs obligatoires doivent être remplis'
+            }, status=400)
+        
+        # Vérifier si le code existe déjà
+        if Etablissement.objects.filter(code_etablissement=code_etablissement).exists():
+            return JsonResponse({
+                'success': False,
+                'message': f'Le code "{code_etablissement}" existe déjà'
+            }, status=400)
+        
+        # Vérifier si le nom existe déjà
+        if Etablissement.objects.filter(Nom_etablissement=Nom_etablissement).exists():
+            return JsonResponse({
+                'success': False,
+                'message': f'L\'établissement "{Nom_etablissement}" existe déjà'
+            }, status=400)
+        
+        # Validation pour les EMF
+        if type_etablissement == 'EMF' and not categorie_emf:
+            return JsonResponse({
+                'success': False,
+                'message': 'La catégorie est obligatoire pour les EMF'
+            }, status=400)
+        
+        # Si c'est une banque, catégorie doit être None
+        if type_etablissement == 'BANQUE':
+            categorie_emf = None
+        
+        # Créer l'établissement
+        with transaction.atomic():
+            etablissement = Etablissement.objects.create(
+                Nom_etablissement=Nom_etablissement,
+                code_etablissement=code_etablissement,
+                type_etablissement=type_etablissement,
+                categorie_emf=categorie_emf,
+                is_active=True
+            )
+            
+            # Journaliser l'action
+            ActionUtilisateur.enregistrer_action(
+                utilisateur=request.user,
+                type_action='CREATION_ETABLISSEMENT',
+                description=f"Création de l'établissement {Nom_etablissement} ({code_etablissement})",
+                etablissement=etablissement,
+                request=request,
+                donnees_supplementaires={
+                    'type': type_etablissement,
+                    'categorie': categorie_emf
+                }
+            )
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Établissement "{Nom_etablissement}" créé avec succès',
+            'etablissement': {
+                'id': etablissement.id,
+                'nom': etablissement.Nom_etablissement,
+                'code': etablissement.code_etablissement,
+                'type': etablissement.get_type_etablissement_display(),
+                'categorie': etablissement.get_categorie_emf_display() if etablissement.categorie_emf else None,
+                'date_creation': etablissement.date_creation.strftime('%d/%m/%Y %H:%M'),
+                'is_active': etablissement.is_active
+            }
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Données JSON invalides'
+        }, status=400)
+    
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de la création : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 2. LISTER TOUS LES ÉTABLISSEMENTS
+# ==========================================
+
+@login_required
+@user_passes_test(is_acnef)
+def lister_etablissements(request):
+    """
+    Retourne la liste de tous les établissements avec statistiques et filtres
+    """
+    try:
+        # Récupérer tous les établissements (sans select_related car pas de relation cree_par)
+        etablissements = Etablissement.objects.all()
+        
+        # ========================================
+        # APPLIQUER LES FILTRES
+        # ========================================
+        type_filter = request.GET.get('type_etablissement', '')
+        categorie_filter = request.GET.get('categorie_emf', '')
+        statut_filter = request.GET.get('is_active', '')
+        
+        if type_filter:
+            etablissements = etablissements.filter(type_etablissement=type_filter)
+        
+        if categorie_filter:
+            etablissements = etablissements.filter(categorie_emf=categorie_filter)
+        
+        if statut_filter:
+            is_active = statut_filter.lower() == 'true'
+            etablissements = etablissements.filter(is_active=is_active)
+        
+        # ========================================
+        # CALCULER LES STATISTIQUES GLOBALES
+        # (sans filtres pour avoir le total complet)
+        # ========================================
+        total_etablissements = Etablissement.objects.count()
+        total_banques = Etablissement.objects.filter(type_etablissement='BANQUE').count()
+        total_emf = Etablissement.objects.filter(type_etablissement='EMF').count()
+        etablissements_actifs = Etablissement.objects.filter(is_active=True).count()
+        
+        stats = {
+            'total': total_etablissements,
+            'banques': total_banques,
+            'emf': total_emf,
+            'actifs': etablissements_actifs
+        }
+        
+        # ========================================
+        # FORMATER LES DONNÉES
+        # ========================================
+        liste_etablissements = []
+        for etab in etablissements.order_by('Nom_etablissement'):
+            # Compter les utilisateurs par rôle
+            nb_aef = User.objects.filter(etablissement=etab, role='AEF', is_active=True).count()
+            nb_uef = User.objects.filter(etablissement=etab, role='UEF', is_active=True).count()
+            nb_total = nb_aef + nb_uef
+            
+            liste_etablissements.append({
+                'id': etab.id,
+                'Nom_etablissement': etab.Nom_etablissement,  # Format attendu par JS
+                'nom': etab.Nom_etablissement,
+                'code_etablissement': etab.code_etablissement,  # Format attendu par JS
+                'code': etab.code_etablissement,
+                'type_etablissement': etab.type_etablissement,  # Format attendu par JS
+                'type': etab.get_type_etablissement_display(),
+                'categorie_emf': etab.categorie_emf,  # Format attendu par JS
+                'categorie': etab.get_categorie_emf_display() if etab.categorie_emf else '-',
+                'is_active': etab.is_active,
+                'date_creation': etab.date_creation.isoformat() if etab.date_creation else None,
+                'nombre_utilisateurs': nb_total,  # Format attendu par JS
+                'nb_aef': nb_aef,
+                'nb_uef': nb_uef,
+                'nb_total_utilisateurs': nb_total
+            })
+        
+        logger.info(f"Liste des établissements chargée par {request.user} - {len(liste_etablissements)} établissements")
+        
+        return JsonResponse({
+            'success': True,
+            'etablissements': liste_etablissements,
+            'stats': stats,
+            'total': len(liste_etablissements),
+            'message': f'{len(liste_etablissements)} établissement(s) trouvé(s)'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du listage des établissements par {request.user}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors du chargement : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 3. DÉTAILS D'UN ÉTABLISSEMENT (avec utilisateurs)
+# ==========================================
+
+@login_required
+@user_passes_test(is_cnef_user)
+@require_http_methods(["GET"])
+def details_etablissement(request, etablissement_id):
+    """
+    Retourne les détails complets d'un établissement avec tous ses utilisateurs
+    """
+    try:
+        etablissement = get_object_or_404(Etablissement, id=etablissement_id)
+        
+        # Récupérer tous les utilisateurs de cet établissement
+        utilisateurs_list = []
+        utilisateurs = etablissement.utilisateurs.all().order_by('role', 'nom', 'prenom')
+        
+        for user in utilisateurs:
+            utilisateurs_list.append({
+                'id': user.id,
+                'nom': user.nom,
+                'prenom': user.prenom,
+                'email': user.email,
+                'telephone': user.telephone or '-',
+                'role': user.get_role_display(),
+                'role_code': user.role,
+                'is_active': user.is_active,
+                'date_joined': user.date_joined.strftime('%d/%m/%Y %H:%M'),
+                'derniere_connexion': user.derniere_connexion.strftime('%d/%m/%Y %H:%M') if user.derniere_connexion else 'Jamais connecté'
+            })
+        
+        # Statistiques
+        nb_aef = etablissement.utilisateurs.filter(role='AEF').count()
+        nb_uef = etablissement.utilisateurs.filter(role='UEF').count()
+        nb_actifs = etablissement.utilisateurs.filter(is_active=True).count()
+        nb_inactifs = etablissement.utilisateurs.filter(is_active=False).count()
+        
+        return JsonResponse({
+            'success': True,
+            'etablissement': {
+                'id': etablissement.id,
+                'nom': etablissement.Nom_etablissement,
+                'code': etablissement.code_etablissement,
+                'type': etablissement.get_type_etablissement_display(),
+                'type_code': etablissement.type_etablissement,
+                'categorie': etablissement.get_categorie_emf_display() if etablissement.categorie_emf else '-',
+                'categorie_code': etablissement.categorie_emf,
+                'is_active': etablissement.is_active,
+                'date_creation': etablissement.date_creation.strftime('%d/%m/%Y %H:%M'),
+                'date_modification': etablissement.date_modification.strftime('%d/%m/%Y %H:%M'),
+            },
+            'statistiques': {
+                'nb_aef': nb_aef,
+                'nb_uef': nb_uef,
+                'nb_total': nb_aef + nb_uef,
+                'nb_actifs': nb_actifs,
+                'nb_inactifs': nb_inactifs
+            },
+            'utilisateurs': utilisateurs_list
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors du chargement : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 4. MODIFIER UN ÉTABLISSEMENT
+# ==========================================
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["PUT", "PATCH"])
+def modifier_etablissement(request, etablissement_id):
+    """
+    Modifie les informations d'un établissement
+    """
+    try:
+        etablissement = get_object_or_404(Etablissement, id=etablissement_id)
+        data = json.loads(request.body)
+        
+        ancien_nom = etablissement.Nom_etablissement
+        modifications = []
+        
+        # Mise à jour des champs
+        if 'Nom_etablissement' in data:
+            nouveau_nom = data['Nom_etablissement'].strip()
+            if nouveau_nom != etablissement.Nom_etablissement:
+                # Vérifier l'unicité
+                if Etablissement.objects.filter(Nom_etablissement=nouveau_nom).exclude(id=etablissement_id).exists():
+                    return JsonResponse({
+                        'success': False,
+                        'message': f'Le nom "{nouveau_nom}" existe déjà'
+                    }, status=400)
+                etablissement.Nom_etablissement = nouveau_nom
+                modifications.append(f'Nom modifié: {ancien_nom} → {nouveau_nom}')
+        
+        if 'type_etablissement' in data:
+            if data['type_etablissement'] != etablissement.type_etablissement:
+                etablissement.type_etablissement = data['type_etablissement']
+                modifications.append(f'Type modifié: {etablissement.get_type_etablissement_display()}')
+        
+        if 'categorie_emf' in data:
+            if etablissement.type_etablissement == 'EMF':
+                etablissement.categorie_emf = data['categorie_emf']
+                modifications.append(f'Catégorie modifiée: {etablissement.get_categorie_emf_display()}')
+            else:
+                etablissement.categorie_emf = None
+        
+        if 'is_active' in data:
+            if data['is_active'] != etablissement.is_active:
+                etablissement.is_active = data['is_active']
+                statut = 'activé' if etablissement.is_active else 'désactivé'
+                modifications.append(f'Établissement {statut}')
+        
+        # Sauvegarder
+        etablissement.save()
+        
+        # Journaliser
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='MODIFICATION_ETABLISSEMENT',
+            description=f"Modification de l'établissement {etablissement.Nom_etablissement}: {', '.join(modifications)}",
+            etablissement=etablissement,
+            request=request
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Établissement modifié avec succès',
+            'modifications': modifications
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de la modification : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 5. SUPPRIMER UN ÉTABLISSEMENT
+# ==========================================
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["DELETE"])
+def supprimer_etablissement(request, etablissement_id):
+    """
+    Supprime un établissement et tous ses utilisateurs associés
+    ATTENTION : Action irréversible !
+    """
+    try:
+        etablissement = get_object_or_404(Etablissement, id=etablissement_id)
+        
+        # Compter les utilisateurs qui seront supprimés
+        nb_utilisateurs = etablissement.utilisateurs.count()
+        Nom_etablissement = etablissement.Nom_etablissement
+        code_etablissement = etablissement.code_etablissement
+        
+        # Journaliser AVANT la suppression
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='SUPPRESSION_ETABLISSEMENT',
+            description=f"Suppression de l'établissement {Nom_etablissement} ({code_etablissement}) avec {nb_utilisateurs} utilisateur(s)",
+            etablissement=None,  # L'établissement va être supprimé
+            request=request,
+            donnees_supplementaires={
+                'etablissement_id': etablissement_id,
+                'nom': Nom_etablissement,
+                'code': code_etablissement,
+                'nb_utilisateurs_supprimes': nb_utilisateurs
+            }
+        )
+        
+        # Supprimer (CASCADE supprimera automatiquement les utilisateurs)
+        with transaction.atomic():
+            etablissement.delete()
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Établissement "{Nom_etablissement}" supprimé avec succès',
+            'details': {
+                'nom': Nom_etablissement,
+                'code': code_etablissement,
+                'nb_utilisateurs_supprimes': nb_utilisateurs
+            }
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de la suppression : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 6. ACTIVER/DÉSACTIVER UN ÉTABLISSEMENT
+# ==========================================
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["POST"])
+def toggle_etablissement_status(request, etablissement_id):
+    """
+    Active ou désactive un établissement
+    """
+    try:
+        etablissement = get_object_or_404(Etablissement, id=etablissement_id)
+        
+        # Inverser le statut
+        etablissement.is_active = not etablissement.is_active
+        etablissement.save()
+        
+        statut = 'activé' if etablissement.is_active else 'désactivé'
+        
+        # Journaliser
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='MODIFICATION_ETABLISSEMENT',
+            description=f"Établissement {etablissement.Nom_etablissement} {statut}",
+            etablissement=etablissement,
+            request=request
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Établissement {statut} avec succès',
+            'is_active': etablissement.is_active
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur : {str(e)}'
+        }, status=500)
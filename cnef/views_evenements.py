@@ -0,0 +1,103 @@
+"""
+Événements des soumissions pour les tableaux de bord (voir cnef/evenements.py)
+
+    GET /api/evenements/flux/                       text/event-stream (ASGI)
+    GET /api/evenements/attente/?depuis=<id>        attente longue JSON (WSGI)
+
+Le CNEF reçoit tous les événements avec les compteurs globaux, un AEF / UEF
+ceux de son établissement avec les compteurs de l'établissement.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_http_methods
+
+from .evenements import diffuseur, portee_utilisateur, pour_abonne
+
+
+def lire_id(valeur):
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_sse(evenement):
+    return f"id: {evenement['id']}\nevent: {evenement['type']}\ndata: {json.dumps(evenement, default=str)}\n\n"
+
+
+async def flux(dernier_id, portee):
+    """Corps du flux SSE : rattrapage, événements, battements ; fermé après EVENEMENTS_SSE_DUREE_MAX"""
+    fin = time.monotonic() + settings.EVENEMENTS_SSE_DUREE_MAX
+    yield f"retry: {settings.EVENEMENTS_RECONNEXION_MS}\n\n"
+
+    evenements = diffuseur().ecouter(dernier_id, settings.EVENEMENTS_BATTEMENT)
+    try:
+        async for evenement in evenements:
+            if evenement is None:
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ": battement\n\n"
+            else:
+                donnees = pour_abonne(evenement, portee)
+                if donnees is not None:
+                    yield format_sse(donnees)
+            # Le navigateur se reconnecte avec Last-Event-ID : rien n'est perdu,
+            # et la session est revérifiée
+            if time.monotonic() >= fin:
+                break
+    finally:
+        await evenements.aclose()
+
+
+@login_required
+@require_http_methods(["GET"])
+async def flux_evenements(request):
+    """
+    Flux Server-Sent Events. Sous WSGI, répond 204 : EventSource s'arrête
+    et le client passe à l'attente longue.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    portee = portee_utilisateur(await request.auser())
+    if portee is False:
+        return HttpResponse(status=403)
+
+    dernier_id = lire_id(request.headers.get('Last-Event-ID') or request.GET.get('depuis'))
+    response = StreamingHttpResponse(flux(dernier_id, portee), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx : pas de mise en tampon du flux
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@require_http_methods(["GET"])
+def attendre_evenements(request):
+    """
+    Attente longue : répond dès qu'un événement postérieur à `depuis` est
+    publié, ou après EVENEMENTS_ATTENTE_MAX secondes avec une liste vide.
+    Sans `depuis`, répond immédiatement avec le numéro du dernier événement.
+    """
+    portee = portee_utilisateur(request.user)
+    if portee is False:
+        return JsonResponse({'success': False, 'message': 'Accès non autorisé'}, status=403)
+
+    depuis = lire_id(request.GET.get('depuis'))
+    if depuis is None:
+        return JsonResponse({'success': True, 'dernier_id': diffuseur().dernier_id(), 'evenements': []})
+
+    evenements = diffuseur().attendre(depuis, settings.EVENEMENTS_ATTENTE_MAX)
+    return JsonResponse({
+        'success': True,
+        'dernier_id': evenements[-1]['id'] if evenements else depuis,
+        'evenements': [
+            donnees for donnees in (pour_abonne(e, portee) for e in evenements)
+            if donnees is not None
+        ],
+    })
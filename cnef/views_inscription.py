@@ -0,0 +1,231 @@
+"""
+Inscription des utilisateurs à partir d'un lien d'invitation (token)
+"""
+
+import logging
+
+from django.shortcuts import render, redirect
+from django.contrib import messages
+from django.utils import timezone
+from django.db import transaction
+from django.contrib.auth import login
+
+from .models import TokenInscription, ActionUtilisateur, User
+
+logger = logging.getLogger(__name__)
+
+
+def inscription_avec_token(request, token_str):
+    """
+    Vue pour gérer l'inscription d'un utilisateur via un token
+    Gère tous les rôles : ACNEF, UCNEF, AEF, UEF
+    """
+    
+    # Récupérer le token
+    try:
+        token = TokenInscription.objects.get(token=token_str)
+    except TokenInscription.DoesNotExist:
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': False,
+            'error': 'Ce lien d\'inscription est invalide.'
+        })
+    
+    # Vérifier si le token est expiré
+    if token.est_expire():
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': False,
+            'error': f'Ce lien a expiré le {token.date_expiration.strftime("%d/%m/%Y à %H:%M")}. Demandez un nouveau lien à votre administrateur.'
+        })
+    
+    # Vérifier si le token a déjà été utilisé
+    if token.utilise:
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': False,
+            'error': 'Ce lien a déjà été utilisé. Vous ne pouvez pas l\'utiliser à nouveau.'
+        })
+    
+    # Si méthode POST : traiter l'inscription
+    if request.method == 'POST':
+        return traiter_inscription(request, token)
+    
+    # Si méthode GET : afficher le formulaire
+    return render(request, 'inscription/inscription_token.html', {
+        'token_valide': True,
+        'token': token
+    })
+
+
+def traiter_inscription(request, token):
+    """
+    Traite le formulaire d'inscription et crée l'utilisateur
+    CORRIGÉ : Gestion de la session avant connexion
+    """
+    
+    # Récupérer les données du formulaire
+    nom = request.POST.get('nom', '').strip()
+    prenom = request.POST.get('prenom', '').strip()
+    telephone = request.POST.get('telephone', '').strip()
+    password = request.POST.get('password', '')
+    password_confirm = request.POST.get('password_confirm', '')
+    
+    # Validation de base
+    errors = []
+    
+    if not nom or not prenom:
+        errors.append('Le nom et le prénom sont obligatoires')
+    
+    if not password or not password_confirm:
+        errors.append('Le mot de passe est obligatoire')
+    
+    if password != password_confirm:
+        errors.append('Les mots de passe ne correspondent pas')
+    
+    if len(password) < 8:
+        errors.append('Le mot de passe doit contenir au moins 8 caractères')
+    
+    # Vérifier que l'email n'existe pas déjà
+    if User.objects.filter(email=token.email_destinataire).exists():
+        errors.append('Un compte avec cet email existe déjà')
+    
+    # S'il y a des erreurs, réafficher le formulaire
+    if errors:
+        for error in errors:
+            messages.error(request, error)
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': True,
+            'token': token,
+            'form': request.POST
+        })
+    
+    # Créer l'utilisateur
+    try:
+        with transaction.atomic():
+            # CORRECTION CRITIQUE : Vider la session AVANT de créer l'utilisateur
+            # Cela évite les conflits de session lors de l'auto-login
+            request.session.flush()
+            
+            # Créer le compte utilisateur
+            user = User.objects.create_user(
+                email=token.email_destinataire,
+                nom=nom,
+                prenom=prenom,
+                password=password,
+                role=token.role,
+                etablissement=token.etablissement,
+                telephone=telephone if telephone else None
+            )
+            
+            # Marquer le token comme utilisé
+            token.utilise = True
+            token.date_utilisation = timezone.now()
+            token.save()
+            
+            # CORRECTION : Créer une NOUVELLE session propre avant le login
+            request.session.create()
+            
+            # Connecter automatiquement l'utilisateur
+            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+            
+            # Journaliser l'action (APRÈS le login pour avoir une session valide)
+            ActionUtilisateur.enregistrer_action(
+                utilisateur=user,
+                type_action='INSCRIPTION',
+                description=f"Inscription réussie via token - Rôle: {token.get_role_display()}",
+                etablissement=token.etablissement,
+                request=request,
+                donnees_supplementaires={
+                    'token_id': token.id,
+                    'cree_par': token.cree_par.email if token.cree_par else 'Système'
+                }
+            )
+            
+            # Message de succès
+            messages.success(request, f'Bienvenue {prenom} ! Votre compte a été créé avec succès.')
+            
+            # Redirection selon le rôle
+            if user.role in ['ACNEF', 'UCNEF']:
+                return redirect('interface_chef')
+            elif user.role == 'AEF':
+                return redirect('interface_aef')
+            else:  # UEF
+                return redirect('tableau_de_bord')
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la création du compte: {str(e)}")
+        messages.error(request, f'Erreur lors de la création du compte : {str(e)}')
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': True,
+            'token': token,
+            'form': request.POST
+        })
+
+
+# ==========================================
+# VERSION COMPATIBLE AVEC ?token=xxx
+# Pour les liens du type: /inscription/acnef/?token=abc123
+# ==========================================
+
+
+def inscription_acnef_get(request):
+    """
+    Inscription ACNEF avec token en GET parameter
+    URL: /inscription/acnef/?token=xxx
+    """
+    token_str = request.GET.get('token')
+    
+    if not token_str:
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': False,
+            'error': 'Token manquant dans l\'URL'
+        })
+    
+    return inscription_avec_token(request, token_str)
+
+
+def inscription_ucnef_get(request):
+    """
+    Inscription UCNEF avec token en GET parameter
+    URL: /inscription/ucnef/?token=xxx
+    """
+    token_str = request.GET.get('token')
+    
+    if not token_str:
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': False,
+            'error': 'Token manquant dans l\'URL'
+        })
+    
+    return inscription_avec_token(request, token_str)
+
+
+def inscription_aef_get(request, code_etablissement):
+    """
+    Inscription AEF avec token en GET parameter
+    URL: /inscription/aef/BCC001/?token=xxx
+    """
+    token_str = request.GET.get('token')
+    
+    if not token_str:
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': False,
+            'error': 'Token manquant dans l\'URL'
+        })
+    
+    return inscription_avec_token(request, token_str)
+
+
+def inscription_uef_get(request, code_etablissement, nom_user=None):
+    """
+    Inscription UEF avec token en GET parameter
+    URL: /inscription/uef/BCC001/?token=xxx
+    ou   /inscription/uef/BCC001/jean.dupont/?token=xxx
+    """
+    token_str = request.GET.get('token')
+    
+    if not token_str:
+        return render(request, 'inscription/inscription_token.html', {
+            'token_valide': False,
+            'error': 'Token manquant dans l\'URL'
+        })
+    
+    return inscription_avec_token(request, token_str)
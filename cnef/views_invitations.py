@@ -0,0 +1,493 @@
+"""
+Génération, liste et révocation des invitations (liens d'inscription)
+"""
+
+import json
+import logging
+from datetime import timedelta
+
+from django.shortcuts import get_object_or_404
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.utils import timezone
+from django.db import transaction
+from django.views.decorators.http import require_http_methods
+
+from .models import Etablissement, TokenInscription, ActionUtilisateur, User
+from .email_utils import envoyer_email_invitation
+
+from .views_commun import is_chef, is_acnef, is_aef
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# GÉNÉRATION DE LIENS D'INSCRIPTION
+# ==========================================
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["POST"])
+def generer_lien_inscription(request):
+    """Génère un lien d'inscription pour un établissement"""
+    
+    try:
+        data = json.loads(request.body)
+        
+        # Validation
+        etablissement_id = data.get('etablissement_id')
+        role = data.get('role')
+        nom_user = data.get('nom_user', '')
+        duree_heures = int(data.get('duree_heures', 48))
+        
+        if not etablissement_id or not role:
+            return JsonResponse({
+                'success': False,
+                'message': 'Établissement et rôle requis'
+            }, status=400)
+        
+        if role not in ['AEF', 'UEF']:
+            return JsonResponse({
+                'success': False,
+                'message': 'Le rôle doit être AEF ou UEF'
+            }, status=400)
+        
+        if role == 'UEF' and not nom_user:
+            return JsonResponse({
+                'success': False,
+                'message': 'Le nom de l\'utilisateur est requis pour le rôle UEF'
+            }, status=400)
+        
+        # Récupérer l'établissement
+        try:
+            etablissement = Etablissement.objects.get(id=etablissement_id)
+        except Etablissement.DoesNotExist:
+            return JsonResponse({
+                'success': False,
+                'message': 'Établissement introuvable'
+            }, status=404)
+        
+        # Créer le token
+        with transaction.atomic():
+            token_obj = TokenInscription.objects.create(
+                etablissement=etablissement,
+                nom_user=nom_user if role == 'UEF' else None,
+                role=role,
+                cree_par=request.user,
+                date_expiration=timezone.now() + timedelta(hours=duree_heures)
+            )
+            
+            # Enregistrer l'action
+            ActionUtilisateur.enregistrer_action(
+                utilisateur=request.user,
+                type_action='GENERATION_LIEN',
+                description=f"Génération d'un lien d'inscription {role} pour {etablissement.Nom_etablissement}",
+                etablissement=etablissement,
+                request=request,
+                donnees_supplementaires={
+                    'token_id': token_obj.id,
+                    'role': role,
+                    'duree_heures': duree_heures
+                }
+            )
+            
+            envoyer_email_invitation(token_obj, request.user)
+            
+            logger.info(f"Lien d'inscription généré pour {etablissement.Nom_etablissement} par {request.user.email}")
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Lien d\'inscription généré avec succès',
+            'token': {
+                'id': token_obj.id,
+                'lien': token_obj.generer_lien_inscription(),
+                'expiration': token_obj.date_expiration.isoformat(),
+                'temps_restant_minutes': token_obj.temps_restant_minutes()
+            }
+        }, status=201)
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Données JSON invalides'
+        }, status=400)
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération du lien: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f"Erreur: {str(e)}"
+        }, status=500)
+
+
+# ==========================================
+# 1. GÉNÉRER INVITATION (ACNEF)
+# ==========================================
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["POST"])
+def generer_invitation_acnef(request):
+    """
+    Génère un lien d'invitation pour ACNEF, UCNEF ou AEF
+    Utilisé par l'ACNEF uniquement
+    """
+    try:
+        data = json.loads(request.body)
+        
+        email_destinataire = data.get('email', '').strip()
+        role = data.get('role', '')
+        etablissement_id = data.get('etablissement_id', None)
+        
+        # Validation de base
+        if not email_destinataire or not role:
+            return JsonResponse({
+                'success': False,
+                'message': 'Email et rôle sont obligatoires'
+            }, status=400)
+        
+        # Vérifier que le rôle est autorisé
+        if role not in ['ACNEF', 'UCNEF', 'AEF']:
+            return JsonResponse({
+                'success': False,
+                'message': 'Rôle non autorisé. Choisissez ACNEF, UCNEF ou AEF'
+            }, status=400)
+        
+        # Si AEF, l'établissement est obligatoire
+        etablissement = None
+        if role == 'AEF':
+            if not etablissement_id:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'L\'établissement est obligatoire pour le rôle AEF'
+                }, status=400)
+            
+            try:
+                etablissement = Etablissement.objects.get(id=etablissement_id)
+            except Etablissement.DoesNotExist:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Établissement introuvable'
+                }, status=404)
+            
+            # ⭐ Vérification : Limiter à 2 AEF par établissement
+            nb_aef_existants = User.objects.filter(
+                etablissement=etablissement, 
+                role='AEF', 
+                is_active=True
+            ).count()
+            
+            # Compter aussi les invitations AEF en attente
+            nb_invitations_aef_attente = TokenInscription.objects.filter(
+                etablissement=etablissement,
+                role='AEF',
+                utilise=False,
+                date_expiration__gt=timezone.now()
+            ).count()
+            
+            total_aef = nb_aef_existants + nb_invitations_aef_attente
+            
+            if total_aef >= 2:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Limite atteinte : Cet établissement a déjà {nb_aef_existants} AEF actif(s) et {nb_invitations_aef_attente} invitation(s) en attente. Maximum autorisé : 2 AEF par établissement.'
+                }, status=400)
+        
+        # Vérifier si l'email existe déjà (User est déjà importé en haut du fichier)
+        if User.objects.filter(email=email_destinataire).exists():
+            return JsonResponse({
+                'success': False,
+                'message': f'Un utilisateur avec l\'email {email_destinataire} existe déjà'
+            }, status=400)
+        # Créer le token d'inscription
+        token = TokenInscription.objects.create(
+            role=role,
+            etablissement=etablissement,
+            email_destinataire=email_destinataire,
+            cree_par=request.user
+        )
+        
+        # Générer le lien
+        lien = token.generer_lien_inscription()
+        envoyer_email_invitation(token, request.user)
+        
+        # Journaliser
+        description = f"Génération d'invitation {role} pour {email_destinataire}"
+        if etablissement:
+            description += f" - Établissement: {etablissement.Nom_etablissement}"
+        
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='GENERATION_LIEN',
+            description=description,
+            etablissement=etablissement,
+            request=request,
+            donnees_supplementaires={
+                'email_destinataire': email_destinataire,
+                'role': role,
+                'token_id': token.id
+            }
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Lien d\'invitation généré avec succès',
+            'invitation': {
+                'id': token.id,
+                'email': email_destinataire,
+                'role': token.get_role_display(),
+                'role_code': role,
+                'etablissement': etablissement.Nom_etablissement if etablissement else None,
+                'lien': lien,
+                'expiration': token.date_expiration.strftime('%d/%m/%Y à %H:%M'),
+                'temps_restant_minutes': token.temps_restant_minutes()
+            }
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Données JSON invalides'
+        }, status=400)
+    
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 2. GÉNÉRER INVITATION UEF (AEF)
+# ==========================================
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["POST"])
+def generer_invitation_uef(request):
+    """
+    Génère un lien d'invitation pour UEF
+    Utilisé par l'AEF pour inviter des utilisateurs de SON établissement
+    """
+    try:
+        data = json.loads(request.body)
+        
+        email_destinataire = data.get('email', '').strip()
+        
+        # Validation
+        if not email_destinataire:
+            return JsonResponse({
+                'success': False,
+                'message': 'L\'email est obligatoire'
+            }, status=400)
+        
+        # Vérifier que l'AEF a bien un établissement
+        if not request.user.etablissement:
+            return JsonResponse({
+                'success': False,
+                'message': 'Votre compte n\'est pas associé à un établissement'
+            }, status=400)
+        
+        # Vérifier si l'email existe déjà
+        from .models import User
+        if User.objects.filter(email=email_destinataire).exists():
+            return JsonResponse({
+                'success': False,
+                'message': f'Un utilisateur avec l\'email {email_destinataire} existe déjà'
+            }, status=400)
+        
+        # Créer le token d'inscription (automatiquement rattaché à l'établissement de l'AEF)
+        token = TokenInscription.objects.create(
+            role='UEF',
+            etablissement=request.user.etablissement,
+            email_destinataire=email_destinataire,
+            cree_par=request.user
+        )
+        
+        # Générer le lien
+        lien = token.generer_lien_inscription()
+        # Envoi automatique de l'email d'invitation
+        envoyer_email_invitation(token, request.user)
+        
+        # Journaliser
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='GENERATION_LIEN',
+            description=f"Génération d'invitation UEF pour {email_destinataire} - Établissement: {request.user.etablissement.Nom_etablissement}",
+            etablissement=request.user.etablissement,
+            request=request,
+            donnees_supplementaires={
+                'email_destinataire': email_destinataire,
+                'role': 'UEF',
+                'token_id': token.id
+            }
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Lien d\'invitation généré avec succès',
+            'invitation': {
+                'id': token.id,
+                'email': email_destinataire,
+                'role': 'Utilisateur Établissement (UEF)',
+                'role_code': 'UEF',
+                'etablissement': request.user.etablissement.Nom_etablissement,
+                'lien': lien,
+                'expiration': token.date_expiration.strftime('%d/%m/%Y à %H:%M'),
+                'temps_restant_minutes': token.temps_restant_minutes()
+            }
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Données JSON invalides'
+        }, status=400)
+    
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 3. LISTER LES INVITATIONS EN ATTENTE
+# ==========================================
+
+@login_required
+@require_http_methods(["GET"])
+def lister_invitations_en_attente(request):
+    """
+    Liste toutes les invitations non utilisées et non expirées
+    - ACNEF voit toutes les invitations
+    - AEF voit uniquement les invitations pour son établissement
+    """
+    try:
+        from django.utils import timezone
+        
+        # Filtrer selon le rôle
+        if request.user.role == 'ACNEF':
+            # ACNEF voit toutes les invitations
+            invitations = TokenInscription.objects.filter(
+                utilise=False,
+                date_expiration__gt=timezone.now()
+            ).select_related('etablissement', 'cree_par').order_by('-date_creation')
+        
+        elif request.user.role == 'AEF':
+            # AEF voit uniquement les invitations pour son établissement
+            if not request.user.etablissement:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Votre compte n\'est pas associé à un établissement'
+                }, status=400)
+            
+            invitations = TokenInscription.objects.filter(
+                utilise=False,
+                date_expiration__gt=timezone.now(),
+                etablissement=request.user.etablissement
+            ).select_related('etablissement', 'cree_par').order_by('-date_creation')
+        
+        else:
+            # UCNEF et UEF ne peuvent pas voir les invitations
+            return JsonResponse({
+                'success': False,
+                'message': 'Vous n\'avez pas les permissions pour voir les invitations'
+            }, status=403)
+        
+        # Formater les données
+        liste_invitations = []
+        for inv in invitations:
+            liste_invitations.append({
+                'id': inv.id,
+                'email': inv.email_destinataire,
+                'role': inv.get_role_display(),
+                'role_code': inv.role,
+                'etablissement': inv.etablissement.Nom_etablissement if inv.etablissement else '-',
+                'cree_par': inv.cree_par.get_full_name() if inv.cree_par else 'Système',
+                'date_creation': inv.date_creation.strftime('%d/%m/%Y %H:%M'),
+                'expiration': inv.date_expiration.strftime('%d/%m/%Y %H:%M'),
+                'temps_restant_minutes': inv.temps_restant_minutes(),
+                'lien': inv.generer_lien_inscription()
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'invitations': liste_invitations,
+            'total': len(liste_invitations)
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur : {str(e)}'
+        }, status=500)
+
+
+# ==========================================
+# 4. RÉVOQUER UNE INVITATION
+# ==========================================
+
+@login_required
+@require_http_methods(["DELETE"])
+def revoquer_invitation(request, token_id):
+    """
+    Révoque (supprime) une invitation non utilisée
+    """
+    try:
+        token = get_object_or_404(TokenInscription, id=token_id)
+        
+        # Vérifier les permissions
+        if request.user.role == 'ACNEF':
+            # ACNEF peut révoquer toutes les invitations
+            pass
+        elif request.user.role == 'AEF':
+            # AEF peut uniquement révoquer les invitations de son établissement
+            if token.etablissement != request.user.etablissement:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Vous ne pouvez révoquer que les invitations de votre établissement'
+                }, status=403)
+        else:
+            return JsonResponse({
+                'success': False,
+                'message': 'Vous n\'avez pas les permissions pour révoquer des invitations'
+            }, status=403)
+        
+        # Vérifier que l'invitation n'est pas déjà utilisée
+        if token.utilise:
+            return JsonResponse({
+                'success': False,
+                'message': 'Cette invitation a déjà été utilisée et ne peut pas être révoquée'
+            }, status=400)
+        
+        # Sauvegarder les infos avant suppression
+        email = token.email_destinataire
+        role = token.get_role_display()
+        
+        # Journaliser
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='AUTRE',
+            description=f"Révocation de l'invitation {role} pour {email}",
+            etablissement=token.etablissement,
+            request=request,
+            donnees_supplementaires={
+                'token_id': token_id,
+                'email': email,
+                'role': token.role
+            }
+        )
+        
+        # Supprimer le token
+        token.delete()
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Invitation pour {email} révoquée avec succès'
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur : {str(e)}'
+        }, status=500)
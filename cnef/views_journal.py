@@ -0,0 +1,828 @@
+"""
+Journal des actions : consultation, export CSV, rétention
+"""
+
+import json
+import csv
+import logging
+from datetime import datetime
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse, HttpResponse
+from django.utils import timezone
+from django.conf import settings
+from django.views.decorators.http import require_http_methods
+from django.core.paginator import Paginator
+
+from .models import ActionUtilisateur
+from .retention_journal import (
+    instantane_suppression,
+    supprimer_par_lots,
+    lancer_suppression_arriere_plan,
+    lire_progression,
+)
+from .recherche_journal import rechercher_journal, trier_journal
+
+from .views_commun import is_chef, is_acnef, is_aef
+from .routage_bdd import lecture_reporting
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# JOURNALISATION / LOGS
+# ==========================================
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["GET"])
+def api_journalisation(request):
+    """Récupère les logs avec filtres et pagination"""
+    
+    try:
+        # Paramètres de pagination
+        page = int(request.GET.get('page', 1))
+        per_page = int(request.GET.get('per_page', 50))
+        
+        # Paramètres de filtrage
+        type_action = request.GET.get('type_action', '')
+        utilisateur_id = request.GET.get('utilisateur_id', '')
+        etablissement_id = request.GET.get('etablissement_id', '')
+        date_debut = request.GET.get('date_debut', '')
+        date_fin = request.GET.get('date_fin', '')
+        search_query = request.GET.get('search', '')
+        
+        # Construction de la requête
+        actions = ActionUtilisateur.objects.all().select_related('utilisateur', 'etablissement')
+        
+        # Application des filtres
+        if type_action:
+            actions = actions.filter(type_action=type_action)
+        
+        if utilisateur_id:
+            actions = actions.filter(utilisateur_id=utilisateur_id)
+        
+        if etablissement_id:
+            actions = actions.filter(etablissement_id=etablissement_id)
+        
+        if date_debut:
+            try:
+                date_debut_obj = datetime.fromisoformat(date_debut.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__gte=date_debut_obj)
+            except ValueError:
+                pass
+        
+        if date_fin:
+            try:
+                date_fin_obj = datetime.fromisoformat(date_fin.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__lte=date_fin_obj)
+            except ValueError:
+                pass
+        
+        if search_query:
+            # Recherche plein texte (FULLTEXT MySQL ou index de jetons)
+            actions = rechercher_journal(actions, search_query)
+        
+        # Tri (par pertinence si recherche, sauf tri=date)
+        actions = trier_journal(actions, search_query, request.GET.get('tri', ''))
+        
+        # Pagination
+        paginator = Paginator(actions, per_page)
+        page_obj = paginator.get_page(page)
+        
+        # Formatage des données
+        actions_data = []
+        for action in page_obj:
+            actions_data.append({
+                'id': action.id,
+                'type_action': action.type_action,
+                'type_action_display': action.get_type_action_display(),
+                'description': action.description,
+                'utilisateur': {
+                    'id': action.utilisateur.id,
+                    'nom': action.utilisateur.get_full_name(),
+                    'email': action.utilisateur.email
+                } if action.utilisateur else None,
+                'etablissement': {
+                    'id': action.etablissement.id,
+                    'nom': action.etablissement.Nom_etablissement
+                } if action.etablissement else None,
+                'adresse_ip': action.adresse_ip,
+                'date_action': action.date_action.isoformat(),
+            })
+        
+        # Statistiques
+        total = actions.count()
+        stats = {
+            'total': total,
+            'par_type': {}
+        }
+        
+        for type_action, _ in ActionUtilisateur.TYPE_ACTION_CHOICES:
+            stats['par_type'][type_action] = actions.filter(type_action=type_action).count()
+        
+        return JsonResponse({
+            'success': True,
+            'actions': actions_data,
+            'pagination': {
+                'page': page_obj.number,
+                'per_page': per_page,
+                'total_pages': paginator.num_pages,
+                'total': total,
+                'has_next': page_obj.has_next(),
+                'has_previous': page_obj.has_previous(),
+            },
+            'stats': stats
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération des logs: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f"Erreur: {str(e)}"
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["GET"])
+@lecture_reporting
+def exporter_journalisation_csv(request):
+    """Exporte les logs en format CSV"""
+    
+    try:
+        # Récupérer les mêmes filtres que l'API
+        type_action = request.GET.get('type_action', '')
+        utilisateur_id = request.GET.get('utilisateur_id', '')
+        etablissement_id = request.GET.get('etablissement_id', '')
+        date_debut = request.GET.get('date_debut', '')
+        date_fin = request.GET.get('date_fin', '')
+        search_query = request.GET.get('search', '')
+        
+        # Construction de la requête
+        actions = ActionUtilisateur.objects.all().select_related('utilisateur', 'etablissement')
+        
+        # Application des filtres (même logique que l'API)
+        if type_action:
+            actions = actions.filter(type_action=type_action)
+        if utilisateur_id:
+            actions = actions.filter(utilisateur_id=utilisateur_id)
+        if etablissement_id:
+            actions = actions.filter(etablissement_id=etablissement_id)
+        if date_debut:
+            try:
+                date_debut_obj = datetime.fromisoformat(date_debut.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__gte=date_debut_obj)
+            except ValueError:
+                pass
+        if date_fin:
+            try:
+                date_fin_obj = datetime.fromisoformat(date_fin.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__lte=date_fin_obj)
+            except ValueError:
+                pass
+        if search_query:
+            # Recherche plein texte (FULLTEXT MySQL ou index de jetons)
+            actions = rechercher_journal(actions, search_query)
+        
+        # Par pertinence si recherche, sauf tri=date
+        actions = trier_journal(actions, search_query, request.GET.get('tri', ''))
+        
+        # Créer la réponse CSV
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="journalisation_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+        
+        # Ajouter le BOM UTF-8 pour Excel
+        response.write('\ufeff')
+        
+        writer = csv.writer(response)
+        
+        # En-têtes
+        writer.writerow([
+            'ID',
+            'Date/Heure',
+            'Type d\'action',
+            'Utilisateur',
+            'Email',
+            'Établissement',
+            'Description',
+            'Adresse IP'
+        ])
+        
+        # Données
+        for action in actions:
+            writer.writerow([
+                action.id,
+                action.date_action.strftime('%d/%m/%Y %H:%M:%S'),
+                action.get_type_action_display(),
+                action.utilisateur.get_full_name() if action.utilisateur else 'N/A',
+                action.utilisateur.email if action.utilisateur else 'N/A',
+                action.etablissement.Nom_etablissement if action.etablissement else 'N/A',
+                action.description,
+                action.adresse_ip or 'N/A'
+            ])
+        
+        # Enregistrer l'export dans les logs
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='AUTRE',
+            description=f"Export CSV de {actions.count()} actions de journalisation",
+            request=request
+        )
+        
+        logger.info(f"Export CSV de {actions.count()} actions par {request.user.email}")
+        
+        return response
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'export CSV: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f"Erreur lors de l'export: {str(e)}"
+        }, status=500)
+
+
+# ==========================================
+# API SUPPRESSION DE JOURNAUX
+# ==========================================
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["POST"])
+def api_compter_journalisation(request):
+    """
+    Compte le nombre d'entrées de journal à supprimer selon les critères
+    """
+    try:
+        data = json.loads(request.body)
+        mode = data.get('mode')
+        date_debut = data.get('date_debut')
+        date_fin = data.get('date_fin')
+        
+        if not mode or not date_debut:
+            return JsonResponse({
+                'success': False,
+                'message': 'Paramètres manquants'
+            }, status=400)
+        
+        # Parser les dates
+        try:
+            date_debut_obj = timezone.datetime.strptime(date_debut, '%Y-%m-%dT%H:%M')
+            date_debut_obj = timezone.make_aware(date_debut_obj)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Format de date de début invalide'
+            }, status=400)
+        
+        # Construire la requête
+        if mode == 'avant':
+            # Supprimer toutes les entrées AVANT la date
+            queryset = ActionUtilisateur.objects.filter(date_action__lt=date_debut_obj)
+        
+        elif mode == 'intervalle':
+            if not date_fin:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Date de fin requise pour le mode intervalle'
+                }, status=400)
+            
+            try:
+                date_fin_obj = timezone.datetime.strptime(date_fin, '%Y-%m-%dT%H:%M')
+                date_fin_obj = timezone.make_aware(date_fin_obj)
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Format de date de fin invalide'
+                }, status=400)
+            
+            # Vérifier que date_debut < date_fin
+            if date_debut_obj >= date_fin_obj:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'La date de début doit être antérieure à la date de fin'
+                }, status=400)
+            
+            # Supprimer les entrées ENTRE les deux dates
+            queryset = ActionUtilisateur.objects.filter(
+                date_action__gte=date_debut_obj,
+                date_action__lte=date_fin_obj
+            )
+        else:
+            return JsonResponse({
+                'success': False,
+                'message': 'Mode invalide'
+            }, status=400)
+        
+        # Instantané partagé avec la suppression : le nombre affiché est
+        # exactement celui qui sera supprimé (lignes de pk <= pk_max)
+        instantane = instantane_suppression(queryset)
+        
+        return JsonResponse({
+            'success': True,
+            'nombre': instantane['nombre'],
+            'pk_max': instantane['pk_max']
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'JSON invalide'
+        }, status=400)
+    
+    except Exception as e:
+        logger.error(f"Erreur lors du comptage des journaux: {e}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur serveur: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["POST"])
+def api_supprimer_journalisation(request):
+    """
+    Supprime les entrées de journal selon les critères
+    """
+    try:
+        data = json.loads(request.body)
+        mode = data.get('mode')
+        date_debut = data.get('date_debut')
+        date_fin = data.get('date_fin')
+        
+        if not mode or not date_debut:
+            return JsonResponse({
+                'success': False,
+                'message': 'Paramètres manquants'
+            }, status=400)
+        
+        # Parser les dates
+        try:
+            date_debut_obj = timezone.datetime.strptime(date_debut, '%Y-%m-%dT%H:%M')
+            date_debut_obj = timezone.make_aware(date_debut_obj)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Format de date de début invalide'
+            }, status=400)
+        
+        # Construire la requête
+        if mode == 'avant':
+            queryset = ActionUtilisateur.objects.filter(date_action__lt=date_debut_obj)
+        
+        elif mode == 'intervalle':
+            if not date_fin:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Date de fin requise pour le mode intervalle'
+                }, status=400)
+            
+            try:
+                date_fin_obj = timezone.datetime.strptime(date_fin, '%Y-%m-%dT%H:%M')
+                date_fin_obj = timezone.make_aware(date_fin_obj)
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Format de date de fin invalide'
+                }, status=400)
+            
+            if date_debut_obj >= date_fin_obj:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'La date de début doit être antérieure à la date de fin'
+                }, status=400)
+            
+            queryset = ActionUtilisateur.objects.filter(
+                date_action__gte=date_debut_obj,
+                date_action__lte=date_fin_obj
+            )
+        else:
+            return JsonResponse({
+                'success': False,
+                'message': 'Mode invalide'
+            }, status=400)
+        
+        # Figer l'ensemble à supprimer. Si le comptage affiché a fourni pk_max,
+        # on s'y limite pour ne pas supprimer des lignes arrivées depuis.
+        pk_max = data.get('pk_max')
+        if pk_max not in (None, ''):
+            try:
+                pk_max = int(pk_max)
+            except (TypeError, ValueError):
+                return JsonResponse({
+                    'success': False,
+                    'message': 'pk_max invalide'
+                }, status=400)
+            queryset = queryset.filter(pk__lte=pk_max)
+        instantane = instantane_suppression(queryset)
+        nombre = instantane['nombre']
+        
+        if nombre == 0:
+            return JsonResponse({
+                'success': True,
+                'nombre_lignes': 0,
+                'en_cours': False,
+                'message': 'Aucune entrée à supprimer'
+            })
+        
+        # Enregistrer l'action avant de supprimer (hors de l'instantané)
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='SUPPRESSION',
+            description=f"Suppression de {nombre} entrées de journal ({mode})",
+            request=request,
+            donnees_supplementaires={
+                'mode': mode,
+                'date_debut': date_debut,
+                'date_fin': date_fin,
+                'nombre_supprime': nombre,
+                'pk_max': instantane['pk_max']
+            }
+        )
+        
+        # Petit volume : un seul lot, traité dans la requête
+        if nombre <= settings.JOURNAL_RETENTION_TAILLE_LOT:
+            resultat = supprimer_par_lots(queryset, instantane['pk_max'])
+            return JsonResponse({
+                'success': True,
+                'nombre_lignes': resultat['supprimes'],
+                'en_cours': False,
+                'message': f"{resultat['supprimes']} entrée(s) supprimée(s) avec succès"
+            })
+        
+        # Gros volume : suppression par lots en arrière-plan, suivie par
+        # api_progression_suppression_journalisation
+        tache_id = lancer_suppression_arriere_plan(queryset, instantane)
+        
+        return JsonResponse({
+            'success': True,
+            'nombre_lignes': nombre,
+            'en_cours': True,
+            'tache_id': tache_id,
+            'message': f'Suppression de {nombre} entrée(s) lancée'
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'message': 'JSON invalide'
+        }, status=400)
+    
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression des journaux: {e}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur serveur: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["GET"])
+def api_progression_suppression_journalisation(request, tache_id):
+    """
+    Retourne la progression d'une suppression de journaux lancée en arrière-plan
+    """
+    etat = lire_progression(tache_id)
+    if etat is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'Suppression introuvable ou expirée'
+        }, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        **etat
+    })
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["GET"])
+def aef_api_journalisation(request):
+    """
+    API pour récupérer les logs de journalisation de l'établissement AEF
+    """
+    try:
+        etablissement = request.user.etablissement
+        
+        # Paramètres de pagination
+        page = int(request.GET.get('page', 1))
+        per_page = int(request.GET.get('per_page', 50))
+        
+        # Paramètres de filtrage
+        type_action = request.GET.get('type_action', '')
+        date_debut = request.GET.get('date_debut', '')
+        date_fin = request.GET.get('date_fin', '')
+        search_query = request.GET.get('search', '')
+        
+        # Construction de la requête - FILTRER PAR ÉTABLISSEMENT
+        actions = ActionUtilisateur.objects.filter(
+            etablissement=etablissement
+        ).select_related('utilisateur', 'etablissement')
+        
+        # Application des filtres
+        if type_action:
+            actions = actions.filter(type_action=type_action)
+        
+        if date_debut:
+            try:
+                date_debut_obj = datetime.fromisoformat(date_debut.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__gte=date_debut_obj)
+            except ValueError:
+                pass
+        
+        if date_fin:
+            try:
+                date_fin_obj = datetime.fromisoformat(date_fin.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__lte=date_fin_obj)
+            except ValueError:
+                pass
+        
+        if search_query:
+            # Recherche plein texte (FULLTEXT MySQL ou index de jetons)
+            actions = rechercher_journal(actions, search_query)
+        
+        # Tri (par pertinence si recherche, sauf tri=date)
+        actions = trier_journal(actions, search_query, request.GET.get('tri', ''))
+        
+        # Pagination
+        paginator = Paginator(actions, per_page)
+        page_obj = paginator.get_page(page)
+        
+        # Formatage des données
+        actions_data = []
+        for action in page_obj:
+            actions_data.append({
+                'id': action.id,
+                'type_action': action.type_action,
+                'type_action_display': action.get_type_action_display(),
+                'description': action.description,
+                'utilisateur': {
+                    'id': action.utilisateur.id,
+                    'nom': action.utilisateur.get_full_name(),
+                    'email': action.utilisateur.email
+                } if action.utilisateur else None,
+                'adresse_ip': action.adresse_ip,
+                'date_action': action.date_action.isoformat(),
+            })
+        
+        # Statistiques
+        total = actions.count()
+        stats = {
+            'total': total,
+            'par_type': {}
+        }
+        
+        for type_action, _ in ActionUtilisateur.TYPE_ACTION_CHOICES:
+            stats['par_type'][type_action] = actions.filter(type_action=type_action).count()
+        
+        return JsonResponse({
+            'success': True,
+            'actions': actions_data,
+            'pagination': {
+                'page': page_obj.number,
+                'per_page': per_page,
+                'total_pages': paginator.num_pages,
+                'total': total,
+                'has_next': page_obj.has_next(),
+                'has_previous': page_obj.has_previous(),
+            },
+            'stats': stats
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur dans aef_api_journalisation: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f"Erreur: {str(e)}"
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_aef)
+@require_http_methods(["GET"])
+@lecture_reporting
+def aef_exporter_journalisation_csv(request):
+    """
+    Exporte les logs de journalisation de l'établissement en CSV
+    """
+    try:
+        etablissement = request.user.etablissement
+        
+        # Récupérer les mêmes filtres que l'API
+        type_action = request.GET.get('type_action', '')
+        date_debut = request.GET.get('date_debut', '')
+        date_fin = request.GET.get('date_fin', '')
+        search_query = request.GET.get('search', '')
+        
+        # Construction de la requête
+        actions = ActionUtilisateur.objects.filter(
+            etablissement=etablissement
+        ).select_related('utilisateur', 'etablissement')
+        
+        # Application des filtres
+        if type_action:
+            actions = actions.filter(type_action=type_action)
+        if date_debut:
+            try:
+                date_debut_obj = datetime.fromisoformat(date_debut.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__gte=date_debut_obj)
+            except ValueError:
+                pass
+        if date_fin:
+            try:
+                date_fin_obj = datetime.fromisoformat(date_fin.replace('Z', '+00:00'))
+                actions = actions.filter(date_action__lte=date_fin_obj)
+            except ValueError:
+                pass
+        if search_query:
+            # Recherche plein texte (FULLTEXT MySQL ou index de jetons)
+            actions = rechercher_journal(actions, search_query)
+        
+        # Par pertinence si recherche, sauf tri=date
+        actions = trier_journal(actions, search_query, request.GET.get('tri', ''))
+        
+        # Créer la réponse CSV
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="journalisation_{etablissement.code_etablissement}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+        
+        # Ajouter le BOM UTF-8 pour Excel
+        response.write('\ufeff')
+        
+        writer = csv.writer(response)
+        
+        # En-têtes
+        writer.writerow([
+            'ID',
+            'Date/Heure',
+            'Type d\'action',
+            'Utilisateur',
+            'Email',
+            'Description',
+            'Adresse IP'
+        ])
+        
+        # Données
+        for action in actions:
+            writer.writerow([
+                action.id,
+                action.date_action.strftime('%d/%m/%Y %H:%M:%S'),
+                action.get_type_action_display(),
+                action.utilisateur.get_full_name() if action.utilisateur else 'N/A',
+                action.utilisateur.email if action.utilisateur else 'N/A',
+                action.description,
+                action.adresse_ip or 'N/A'
+            ])
+        
+        # Journaliser l'export
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='AUTRE',
+            description=f"Export CSV de {actions.count()} actions de journalisation",
+            etablissement=etablissement,
+            request=request
+        )
+        
+        logger.info(f"Export CSV journalisation par AEF: {request.user.email} - {actions.count()} actions")
+        
+        return response
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'export CSV AEF: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f"Erreur lors de l'export: {str(e)}"
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["POST"])
+def supprimer_journaux(request):
+    try:
+        data = json.loads(request.body)
+        mode = data.get('mode')
+        date_debut = data.get('date_debut')
+        date_fin = data.get('date_fin')
+        
+        print(f"DEBUG - Mode: {mode}, Date début: {date_debut}, Date fin: {date_fin}")  # LOG
+        
+        # Validation
+        if not mode or not date_debut:
+            return JsonResponse({
+                'success': False,
+                'message': 'Paramètres manquants'
+            }, status=400)
+        
+        # Convertir les dates
+        date_debut_obj = None
+        date_fin_obj = None
+        
+        try:
+            # Essayer le format datetime-local (avec T)
+            date_debut_obj = timezone.datetime.strptime(date_debut, '%Y-%m-%dT%H:%M')
+            if mode == 'intervalle' and date_fin:
+                date_fin_obj = timezone.datetime.strptime(date_fin, '%Y-%m-%dT%H:%M')
+        except ValueError:
+            try:
+                # Essayer le format date simple
+                date_debut_obj = timezone.datetime.strptime(date_debut, '%Y-%m-%d')
+                if mode == 'intervalle' and date_fin:
+                    date_fin_obj = timezone.datetime.strptime(date_fin, '%Y-%m-%d')
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'message': f'Format de date invalide. Reçu: {date_debut}'
+                }, status=400)
+        
+        print(f"DEBUG - Date début parsée: {date_debut_obj}, Date fin parsée: {date_fin_obj}")  # LOG
+        
+        # Construire la requête de suppression
+        if mode == 'avant':
+            queryset = ActionUtilisateur.objects.filter(
+                date_action__lt=date_debut_obj
+            )
+        elif mode == 'intervalle':
+            if not date_fin:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'Date de fin manquante pour le mode intervalle'
+                }, status=400)
+            
+            queryset = ActionUtilisateur.objects.filter(
+                date_action__gte=date_debut_obj,
+                date_action__lte=date_fin_obj
+            )
+        else:
+            return JsonResponse({
+                'success': False,
+                'message': 'Mode invalide'
+            }, status=400)
+        
+        # Compter avant suppression
+        nombre = queryset.count()
+        print(f"DEBUG - Nombre d'entrées à supprimer: {nombre}")  # LOG
+        
+        # Si c'est une requête de calcul seulement
+        if request.GET.get('calcul_only') == 'true':
+            return JsonResponse({
+                'success': True,
+                'nombre': nombre,
+                'message': f'{nombre} entrée(s) seront supprimées'
+            })
+        
+        # Effectuer la suppression réelle
+        queryset.delete()
+        
+        # Enregistrer l'action
+        ActionUtilisateur.objects.create(
+            utilisateur=request.user,
+            action='SUPPRESSION_JOURNAL',
+            description=f"Suppression de {nombre} entrée(s) du journal (mode: {mode})",
+            adresse_ip=request.META.get('REMOTE_ADDR', ''),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')[:255]
+        )
+        
+        logger.info(f"{nombre} entrées du journal supprimées par {request.user} (mode: {mode})")
+        
+        return JsonResponse({
+            'success': True,
+            'nombre_lignes': nombre,
+            'message': f'{nombre} entrée(s) supprimée(s) avec succès'
+        })
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression du journal par {request.user}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur: {str(e)}'
+        }, status=500)
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["POST"])
+def compter_journaux_a_supprimer(request):
+    try:
+        import json
+        from datetime import datetime
+        from django.utils import timezone
+        
+        data = json.loads(request.body)
+        mode = data.get('mode')
+        date_debut_str = data.get('date_debut')
+        date_fin_str = data.get('date_fin')
+        
+        date_debut = timezone.make_aware(datetime.fromisoformat(date_debut_str))
+        
+        if mode == 'intervalle':
+            date_fin = timezone.make_aware(datetime.fromisoformat(date_fin_str))
+            queryset = ActionUtilisateur.objects.filter(date_action__gte=date_debut, date_action__lte=date_fin)
+        else:
+            queryset = ActionUtilisateur.objects.filter(date_action__lt=date_debut)
+        
+        return JsonResponse({'success': True, 'nombre': queryset.count()})
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=500)
@@ -0,0 +1,85 @@
+"""
+Autocomplétion des utilisateurs et des établissements (index en mémoire)
+"""
+
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods, condition
+
+from .suggestions import index_suggestions, UTILISATEUR, ETABLISSEMENT
+
+from .views_commun import is_acnef
+
+
+def etag_suggestions(request, *args, **kwargs):
+    """ETag des listes servies par l'index de suggestions (change à chaque modification)"""
+    return f'suggestions-{index_suggestions.generation}'
+
+
+@login_required
+@user_passes_test(is_acnef)
+@condition(etag_func=etag_suggestions)
+def charger_etablissements_select(request):
+    # Servi depuis l'index en mémoire ; le navigateur revalide par ETag (304)
+    etabs = index_suggestions.lister(ETABLISSEMENT, filtre=lambda e: e['is_active'])
+    data = [
+        {
+            'id': etab['id'],
+            'nom': etab['nom'],
+            'code': etab['code']
+        }
+        for etab in etabs
+    ]
+    response = JsonResponse({'etablissements': data})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# ==========================================
+# API SUGGESTIONS (AUTOCOMPLÉTION)
+# ==========================================
+
+def lire_limite_suggestions(request):
+    try:
+        limite = int(request.GET.get('limite', 10))
+    except ValueError:
+        limite = 10
+    return max(1, min(limite, 50))
+
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["GET"])
+def suggerer_utilisateurs(request):
+    """
+    Suggestions d'utilisateurs par préfixe (nom, prénom, email)
+    GET ?q=<texte>&limite=10&etablissement=<id>&actif=true
+    """
+    texte = request.GET.get('q', '')
+    etablissement_id = request.GET.get('etablissement', '')
+    actif = request.GET.get('actif', '')
+
+    def filtre(user):
+        if etablissement_id and str((user['etablissement'] or {}).get('id')) != etablissement_id:
+            return False
+        if actif and user['is_active'] != (actif.lower() == 'true'):
+            return False
+        return True
+
+    resultats = index_suggestions.suggerer(UTILISATEUR, texte, lire_limite_suggestions(request), filtre)
+    return JsonResponse({'success': True, 'resultats': resultats})
+
+
+@login_required
+@user_passes_test(is_acnef)
+@require_http_methods(["GET"])
+def suggerer_etablissements(request):
+    """
+    Suggestions d'établissements par préfixe (nom, code)
+    GET ?q=<texte>&limite=10&tous=1 (inclut les établissements inactifs)
+    """
+    texte = request.GET.get('q', '')
+    filtre = None if request.GET.get('tous') else (lambda e: e['is_active'])
+
+    resultats = index_suggestions.suggerer(ETABLISSEMENT, texte, lire_limite_suggestions(request), filtre)
+    return JsonResponse({'success': True, 'resultats': resultats})
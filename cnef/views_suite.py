@@ -3,7 +3,6 @@
 # ==========================================
 import logging
 import json
-import pandas as pd
 import csv
 from datetime import datetime, timedelta
 
@@ -106,15 +105,18 @@ def supprimer_journaux(request):
         else:
             queryset = ActionUtilisateur.objects.filter(date_action__lt=date_debut)
         
-        nombre = queryset.count()
+        from .retention_journal import instantane_suppression, supprimer_par_lots
+        
+        instantane = instantane_suppression(queryset)
+        nombre = instantane['nombre']
         if nombre == 0:
             return JsonResponse({'success': False, 'message': 'Aucune entrée'}, status=400)
         
         ActionUtilisateur.enregistrer_action(utilisateur=request.user, type_action='AUTRE',
             description=f"Suppression de {nombre} journaux", etablissement=None, request=request)
-        queryset.delete()
+        resultat = supprimer_par_lots(queryset, instantane['pk_max'])
         
-        return JsonResponse({'success': True, 'nombre_lignes': nombre})
+        return JsonResponse({'success': True, 'nombre_lignes': resultat['supprimes']})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
@@ -0,0 +1,909 @@
+"""
+Vérification et visualisation des TEG, rapport TEG Excel
+"""
+
+import json
+import logging
+
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib import messages
+
+from .models import (
+    FichierImport,
+    Credit_Amortissables,
+    Decouverts,
+    Affacturage,
+    Cautions,
+    Effets_commerces,
+    Spot,
+    ActionUtilisateur,
+)
+from .utils import extraire_et_calculer_teg, generer_statistiques_teg
+from .classeur_csv import charger_classeur
+
+from .views_commun import is_cnef_user, is_aef
+from .routage_bdd import lecture_reporting
+
+logger = logging.getLogger(__name__)
+
+
+@lecture_reporting
+def verifier_teg_unifie(fichier_import):
+    """
+    Fonction UNIFIÉE pour vérifier les TEG 
+    Fonctionne pour TOUS les statuts de fichier
+    """
+    resultat = {
+        'credits': {'conformes': 0, 'non_conformes': 0, 'records': []},
+        'decouverts': {'conformes': 0, 'non_conformes': 0, 'records': []},
+        'affacturages': {'conformes': 0, 'non_conformes': 0, 'records': []},
+        'cautions': {'conformes': 0, 'non_conformes': 0, 'records': []},
+        'effets': {'conformes': 0, 'non_conformes': 0, 'records': []},
+        'spots': {'conformes': 0, 'non_conformes': 0, 'records': []},
+        'erreurs': []
+    }
+    
+    TOLERANCE = 0.001
+    
+    # Configuration complète
+    model_config = {
+        'credits': {
+            'model': Credit_Amortissables,
+            'relation': 'credits_amortissables_files',
+            'teg_calcule': 'TEG_annualise',
+            'teg_original': 'TEG_I26'
+        },
+        'decouverts': {
+            'model': Decouverts,
+            'relation': 'decouverts',
+            'teg_calcule': 'TEG_decouvert',
+            'teg_original': 'TEG_I17'
+        },
+        'affacturages': {
+            'model': Affacturage,
+            'relation': 'affacturages',
+            'teg_calcule': 'TEG_affacturage',
+            'teg_original': 'TEG_I14'
+        },
+        'cautions': {
+            'model': Cautions,
+            'relation': 'cautions',
+            'teg_calcule': 'TEG_caution',
+            'teg_original': 'TEG_I14'
+        },
+        'effets': {
+            'model': Effets_commerces,
+            'relation': 'effets',
+            'teg_calcule': 'TEG_effet',
+            'teg_original': 'TEG_I15'
+        },
+        'spots': {
+            'model': Spot,
+            'relation': 'spot_files',
+            'teg_calcule': 'TEG_spot',
+            'teg_original': 'TEG_I26'
+        }
+    }
+    
+    for key, config in model_config.items():
+        try:
+            logger.info(f"\n{'='*60}")
+            logger.info(f"🔍 ANALYSE: {key.upper()}")
+            logger.info(f"{'='*60}")
+            
+            # STRATÉGIE 1: Essayer avec fichier_import directement
+            queryset = config['model'].objects.filter(fichier_import=fichier_import)
+            count = queryset.count()
+            logger.info(f"  Stratégie 1 (fichier_import): {count} enregistrements")
+            
+            # STRATÉGIE 2: Si vide, essayer avec la relation
+            if count == 0:
+                try:
+                    related_manager = getattr(fichier_import, config['relation'], None)
+                    if related_manager:
+                        queryset = related_manager.all()
+                        count = queryset.count()
+                        logger.info(f"  Stratégie 2 (relation '{config['relation']}'): {count} enregistrements")
+                except Exception as e:
+                    logger.warning(f"  Stratégie 2 échouée: {e}")
+            
+            # STRATÉGIE 3: Si toujours vide, essayer avec etablissement
+            if count == 0:
+                queryset = config['model'].objects.filter(etablissement=fichier_import.etablissement)
+                count = queryset.count()
+                logger.info(f"  Stratégie 3 (etablissement): {count} enregistrements")
+            
+            if count == 0:
+                logger.warning(f"  ⚠️ Aucune donnée trouvée pour {key}")
+                continue
+            
+            # Analyse des données
+            conformes = 0
+            non_conformes = 0
+            teg_zero = 0
+            teg_null = 0
+            
+            for obj in queryset:
+                try:
+                    teg_calcule = getattr(obj, config['teg_calcule'], None)
+                    teg_original = getattr(obj, config['teg_original'], None)
+                    
+                    # Compteurs de diagnostic
+                    if teg_calcule is None:
+                        teg_null += 1
+                        continue
+                    if teg_original is None:
+                        teg_null += 1
+                        continue
+                    
+                    # Conversion
+                    try:
+                        teg_calc_val = float(teg_calcule) / 100
+                        teg_orig_val = float(teg_original)
+                    except (ValueError, TypeError) as e:
+                        logger.debug(f"    Erreur conversion: {e}")
+                        continue
+                    
+                    # Ignorer les zéros
+                    if teg_calc_val == 0 and teg_orig_val == 0:
+                        teg_zero += 1
+                        continue
+                    
+                    # Comparaison
+                    difference = abs(teg_calc_val - teg_orig_val)
+                    
+                    if difference <= TOLERANCE:
+                        conformes += 1
+                    else:
+                        non_conformes += 1
+                
+                except Exception as e:
+                    logger.debug(f"    Erreur objet {getattr(obj, 'id', '?')}: {e}")
+                    continue
+            
+            # Mise à jour des résultats
+            resultat[key]['conformes'] = conformes
+            resultat[key]['non_conformes'] = non_conformes
+            
+            # Résumé
+            total_analyse = conformes + non_conformes
+
+            
+            if total_analyse == 0 and count > 0:
+                resultat['erreurs'].append(
+                    f" {key}: {count} enregistrements trouvés mais aucun TEG valide"
+                )
+        
+        except Exception as e:
+            error_msg = f"Erreur {key}: {str(e)}"
+            resultat['erreurs'].append(error_msg)
+            logger.error(f"   {error_msg}")
+            import traceback
+            logger.error(traceback.format_exc())
+    
+    # Statistiques globales finales
+    total_global = sum(
+        resultat[key]['conformes'] + resultat[key]['non_conformes']
+        for key in model_config.keys()
+    )
+
+    if total_global == 0:
+        msg = " ATTENTION: Aucune donnée TEG valide trouvée !"
+        resultat['erreurs'].append(msg)
+        logger.warning(msg)
+    
+    return resultat
+
+
+def preparer_contexte_visualisation(fichier, resultat_teg):
+    """Prépare le contexte optimisé pour les templates avec tooltips dynamiques"""
+    type_labels = {
+        'credits': 'Crédits Amortissables',
+        'decouverts': 'Découverts', 
+        'affacturages': 'Affacturages',
+        'cautions': 'Cautions',
+        'effets': 'Effets de Commerce',
+        'spots': 'Spots'
+    }
+    
+    charts = []
+    total_conformes = 0
+    total_non_conformes = 0
+    
+    # Préparer les graphiques de manière optimisée
+    for key in type_labels.keys():
+        conformes = resultat_teg[key]['conformes']
+        non_conformes = resultat_teg[key]['non_conformes']
+        total = conformes + non_conformes
+        
+        if total > 0:
+            total_conformes += conformes
+            total_non_conformes += non_conformes
+            
+            percent_conformes = round((conformes / total * 100), 2) if total > 0 else 0
+            percent_non_conformes = round((non_conformes / total * 100), 2) if total > 0 else 0
+            
+            # CORRECTION: Configuration Chart.js avec tooltips interactifs
+            chart_data = {
+                "type": "doughnut",
+                "data": {
+                    "labels": ['Conformes', 'Non conformes'],
+                    "datasets": [{
+                        "data": [conformes, non_conformes],
+                        "backgroundColor": ["#4CAF50", "#DA1D10"],
+                        "borderColor": ["#ffffff", "#ffffff"],
+                        "borderWidth": 2,
+                        "hoverBackgroundColor": ["#45a049", "#c41a0f"],  # Couleurs au survol
+                        "hoverBorderColor": ["#ffffff", "#ffffff"],
+                        "hoverBorderWidth": 3
+                    }]
+                },
+                "options": {
+                    "responsive": True,
+                    "maintainAspectRatio": False,
+                    "interaction": {
+                        "mode": "nearest",
+                        "intersect": True
+                    },
+                    "plugins": {
+                        "legend": {
+                            "position": "top",
+                            "labels": {
+                                "font": {
+                                    "size": 12,
+                                    "family": "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif"
+                                },
+                                "padding": 15,
+                                "usePointStyle": True
+                            }
+                        },
+                        "title": {
+                            "display": True,
+                            "text": f"{type_labels[key]} - {total} enregistrements",
+                            "font": {
+                                "size": 14,
+                                "weight": "bold",
+                                "family": "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif"
+                            },
+                            "padding": {
+                                "top": 10,
+                                "bottom": 10
+                            }
+                        },
+                        "tooltip": {
+                            "enabled": True,
+                            "backgroundColor": "rgba(0, 0, 0, 0.8)",
+                            "titleColor": "#ffffff",
+                            "bodyColor": "#ffffff",
+                            "borderColor": "#ffffff",
+                            "borderWidth": 1,
+                            "padding": 12,
+                            "displayColors": True,
+                            "titleFont": {
+                                "size": 14,
+                                "weight": "bold"
+                            },
+                            "bodyFont": {
+                                "size": 13
+                            },
+                            "callbacks": {
+                                "label": f"""function(context) {{
+                                    const label = context.label || '';
+                                    const value = context.parsed || 0;
+                                    const total = {total};
+                                    const percentage = ((value / total) * 100).toFixed(2);
+                                    return label + ': ' + value + ' (' + percentage + '%)';
+                                }}"""
+                            }
+                        }
+                    },
+                    "animation": {
+                        "animateRotate": True,
+                        "animateScale": True,
+                        "duration": 1000
+                    }
+                }
+            }
+            
+            charts.append({
+                "chartjs": json.dumps(chart_data),
+                "conformes": conformes,
+                "non_conformes": non_conformes,
+                "total": total,
+                "percent_conformes": percent_conformes,
+                "percent_non_conformes": percent_non_conformes,
+                "title": type_labels[key],
+                "key": key,
+                "records": resultat_teg[key].get('records', [])
+            })
+    
+    # Calculer les statistiques globales
+    total_global = total_conformes + total_non_conformes
+    percent_conformes_global = round((total_conformes / total_global * 100), 2) if total_global > 0 else 0
+    percent_non_conformes_global = round((total_non_conformes / total_global * 100), 2) if total_global > 0 else 0
+    
+    stats_globales = {
+        'total_conformes': total_conformes,
+        'total_non_conformes': total_non_conformes,
+        'total_global': total_global,
+        'percent_conformes': percent_conformes_global,
+        'percent_non_conformes': percent_non_conformes_global,
+        'taux_conformite': percent_conformes_global
+    }
+    
+    # Créer un graphique global récapitulatif avec tooltips
+    if total_global > 0:
+        chart_global = {
+            "type": "doughnut",
+            "data": {
+                "labels": ['Conformes', 'Non conformes'],
+                "datasets": [{
+                    "data": [total_conformes, total_non_conformes],
+                    "backgroundColor": ["#4CAF50", "#DA1D10"],
+                    "borderColor": ["#ffffff", "#ffffff"],
+                    "borderWidth": 3,
+                    "hoverBackgroundColor": ["#45a049", "#c41a0f"],
+                    "hoverBorderColor": ["#ffffff", "#ffffff"],
+                    "hoverBorderWidth": 4
+                }]
+            },
+            "options": {
+                "responsive": True,
+                "maintainAspectRatio": False,
+                "interaction": {
+                    "mode": "nearest",
+                    "intersect": True
+                },
+                "plugins": {
+                    "legend": {
+                        "position": "top",
+                        "labels": {
+                            "font": {
+                                "size": 14,
+                                "family": "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif"
+                            },
+                            "padding": 20,
+                            "usePointStyle": True
+                        }
+                    },
+                    "title": {
+                        "display": True,
+                        "text": f"Vue d'ensemble - {total_global} enregistrements",
+                        "font": {
+                            "size": 16,
+                            "weight": "bold",
+                            "family": "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif"
+                        },
+                        "padding": {
+                            "top": 15,
+                            "bottom": 15
+                        }
+                    },
+                    "tooltip": {
+                        "enabled": True,
+                        "backgroundColor": "rgba(0, 0, 0, 0.85)",
+                        "titleColor": "#ffffff",
+                        "bodyColor": "#ffffff",
+                        "borderColor": "#ffffff",
+                        "borderWidth": 2,
+                        "padding": 15,
+                        "displayColors": True,
+                        "titleFont": {
+                            "size": 15,
+                            "weight": "bold"
+                        },
+                        "bodyFont": {
+                            "size": 14
+                        },
+                        "callbacks": {
+                            "label": f"""function(context) {{
+                                const label = context.label || '';
+                                const value = context.parsed || 0;
+                                const total = {total_global};
+                                const percentage = ((value / total) * 100).toFixed(2);
+                                return label + ': ' + value + ' enregistrements (' + percentage + '%)';
+                            }}""",
+                            "afterLabel": """function(context) {
+                                return '━━━━━━━━━━━━━━━';
+                            }""",
+                            "footer": f"""function(tooltipItems) {{
+                                return 'Total: {total_global} enregistrements';
+                            }}"""
+                        }
+                    }
+                },
+                "animation": {
+                    "animateRotate": True,
+                    "animateScale": True,
+                    "duration": 1200
+                }
+            }
+        }
+        stats_globales['chart_global'] = json.dumps(chart_global)
+    
+    return {
+        'fichier': fichier,
+        'charts': charts,
+        'stats_globales': stats_globales,
+        'erreurs': resultat_teg.get('erreurs', []),
+        'has_data': len(charts) > 0,
+        'title': f'Rapport TEG - {fichier.nom_fichier}',
+    }
+
+
+@login_required
+@user_passes_test(is_cnef_user)
+def visualisation_teg(request, fichier_id):
+    """
+    Vue simplifiée pour l'analyse TEG
+    Extraction + Calcul + Comparaison en UNE SEULE FOIS
+    """
+    fichier = get_object_or_404(FichierImport, id=fichier_id)
+    
+    try:
+        # 1. EXTRACTION + CALCUL DES TEG
+        logger.info(f"🔍 Début analyse TEG pour {fichier.nom_fichier}")
+        
+        donnees_extraites = extraire_et_calculer_teg(
+            fichier.fichier.path,
+            fichier.etablissement_cnef
+        )
+        
+        # 2. GÉNÉRATION DES STATISTIQUES
+        stats = generer_statistiques_teg(donnees_extraites)
+        
+        # 3. PRÉPARATION DES GRAPHIQUES
+        context = preparer_graphiques_teg(fichier, donnees_extraites, stats)
+        
+        logger.info(f" Analyse terminée: {stats['global']['total']} enregistrements")
+        
+        return render(request, 'admin/verification_teg.html', context)
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur analyse TEG: {e}")
+        
+        context = {
+            'fichier': fichier,
+            'charts': [],
+            'stats_globales': {},
+            'erreurs': [f"Erreur lors de l'analyse: {str(e)}"],
+            'has_data': False,
+            'title': f'Rapport TEG - {fichier.nom_fichier}'
+        }
+        
+        return render(request, 'admin/verification_teg.html', context)
+
+
+def preparer_graphiques_teg(fichier, donnees_extraites, stats):
+    """
+    Prépare les graphiques pour l'affichage
+    """
+    type_labels = {
+        'credits': 'Crédits Amortissables',
+        'decouverts': 'Découverts',
+        'affacturages': 'Affacturages',
+        'cautions': 'Cautions',
+        'effets': 'Effets de Commerce',
+        'spots': 'Spots'
+    }
+    
+    charts = []
+    
+    # Créer un graphique pour chaque type de produit
+    for key, label in type_labels.items():
+        stat = stats.get(key, {})
+        conformes = stat.get('conformes', 0)
+        non_conformes = stat.get('non_conformes', 0)
+        total = stat.get('total', 0)
+        
+        if total == 0:
+            continue
+        
+        percent_conformes = round((conformes / total * 100), 2)
+        percent_non_conformes = round((non_conformes / total * 100), 2)
+        
+        chart_data = {
+            "type": "doughnut",
+            "data": {
+                "labels": ['Conformes', 'Non conformes'],
+                "datasets": [{
+                    "data": [conformes, non_conformes],
+                    "backgroundColor": ["#4CAF50", "#DA1D10"],
+                    "borderColor": ["#ffffff", "#ffffff"],
+                    "borderWidth": 2
+                }]
+            },
+            "options": {
+                "responsive": True,
+                "maintainAspectRatio": False,
+                "plugins": {
+                    "legend": {
+                        "position": "top",
+                        "labels": {
+                            "font": {"size": 12},
+                            "padding": 15
+                        }
+                    },
+                    "title": {
+                        "display": True,
+                        "text": f"{label} - {total} enregistrements",
+                        "font": {"size": 14, "weight": "bold"}
+                    },
+                    "tooltip": {
+                        "enabled": True,
+                        "backgroundColor": "rgba(0, 0, 0, 0.8)",
+                        "callbacks": {
+                            "label": f"function(context) {{ const label = context.label || ''; const value = context.parsed || 0; const percentage = ((value / {total}) * 100).toFixed(2); return label + ': ' + value + ' (' + percentage + '%)'; }}"
+                        }
+                    }
+                }
+            }
+        }
+        
+        charts.append({
+            "chartjs": json.dumps(chart_data),
+            "conformes": conformes,
+            "non_conformes": non_conformes,
+            "total": total,
+            "percent_conformes": percent_conformes,
+            "percent_non_conformes": percent_non_conformes,
+            "title": label,
+            "key": key
+        })
+    
+    # Statistiques globales
+    stats_global = stats.get('global', {})
+    total_global = stats_global.get('total', 0)
+    conformes_global = stats_global.get('conformes', 0)
+    non_conformes_global = stats_global.get('non_conformes', 0)
+    
+    stats_globales = {
+        'total_conformes': conformes_global,
+        'total_non_conformes': non_conformes_global,
+        'total_global': total_global,
+        'percent_conformes': round((conformes_global / total_global * 100), 2) if total_global > 0 else 0,
+        'percent_non_conformes': round((non_conformes_global / total_global * 100), 2) if total_global > 0 else 0,
+        'taux_conformite': stats_global.get('taux_conformite', 0)
+    }
+    
+    # Graphique global
+    if total_global > 0:
+        chart_global = {
+            "type": "doughnut",
+            "data": {
+                "labels": ['Conformes', 'Non conformes'],
+                "datasets": [{
+                    "data": [conformes_global, non_conformes_global],
+                    "backgroundColor": ["#4CAF50", "#DA1D10"],
+                    "borderColor": ["#ffffff", "#ffffff"],
+                    "borderWidth": 3
+                }]
+            },
+            "options": {
+                "responsive": True,
+                "maintainAspectRatio": False,
+                "plugins": {
+                    "legend": {
+                        "position": "top",
+                        "labels": {
+                            "font": {"size": 14},
+                            "padding": 20
+                        }
+                    },
+                    "title": {
+                        "display": True,
+                        "text": f"Vue d'ensemble - {total_global} enregistrements",
+                        "font": {"size": 16, "weight": "bold"}
+                    },
+                    "tooltip": {
+                        "enabled": True,
+                        "backgroundColor": "rgba(0, 0, 0, 0.85)",
+                        "callbacks": {
+                            "label": f"function(context) {{ const label = context.label || ''; const value = context.parsed || 0; const percentage = ((value / {total_global}) * 100).toFixed(2); return label + ': ' + value + ' (' + percentage + '%)'; }}"
+                        }
+                    }
+                }
+            }
+        }
+        stats_globales['chart_global'] = json.dumps(chart_global)
+    
+    return {
+        'fichier': fichier,
+        'charts': charts,
+        'stats_globales': stats_globales,
+        'erreurs': donnees_extraites.get('erreurs', []),
+        'has_data': len(charts) > 0,
+        'title': f'Rapport TEG - {fichier.nom_fichier}'
+    }
+
+
+@login_required
+@user_passes_test(is_aef)
+def visualisation_teg_aef(request, fichier_id):
+    """
+    Vue pour AEF : Vérification TEG d'un fichier spécifique de SON établissement
+    Réutilise exactement la même logique que visualisation_teg mais avec contrôle d'accès AEF
+    """
+    fichier = get_object_or_404(
+        FichierImport,
+        id=fichier_id,
+        etablissement_cnef=request.user.etablissement,
+    )
+
+    # Réutilisation directe de la fonction existante
+    from .utils import extraire_et_calculer_teg, generer_statistiques_teg
+
+    try:
+        # 1. EXTRACTION + CALCUL DES TEG
+        logger.info(f"🔍 Début analyse TEG pour {fichier.nom_fichier} (AEF)")
+        
+        donnees_extraites = extraire_et_calculer_teg(
+            fichier.fichier.path,
+            fichier.etablissement_cnef
+        )
+        
+        # 2. GÉNÉRATION DES STATISTIQUES
+        stats = generer_statistiques_teg(donnees_extraites)
+        
+        # 3. PRÉPARATION DES GRAPHIQUES
+        context = preparer_graphiques_teg(fichier, donnees_extraites, stats)
+        
+        # Ajouter le flag is_aef
+        context['is_aef'] = True
+        
+        logger.info(f" Analyse TEG AEF terminée: {stats['global']['total']} enregistrements")
+
+        # Journalisation
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='AUTRE',
+            description=f"Consultation rapport TEG : {fichier.nom_fichier}",
+            etablissement=request.user.etablissement,
+            request=request
+        )
+
+        return render(request, 'EF/verification_teg_ef.html', context)
+
+    except Exception as e:
+        logger.error(f"Erreur TEG AEF (fichier {fichier_id}): {str(e)}")
+        messages.error(request, "Erreur lors du calcul des TEG. Contactez l'administrateur.")
+        return redirect('aef_detail_soumission', fichier_id=fichier_id)
+
+
+@login_required
+@user_passes_test(is_aef)
+def telecharger_rapport_teg_aef(request, fichier_id):
+    """
+    Vue pour AEF : Télécharger un rapport Excel détaillé des TEG
+    avec toutes les colonnes originales + TEG Original, TEG Calculé, Conformité
+    """
+    import openpyxl
+    from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
+    from datetime import datetime
+    from django.http import HttpResponse
+    import io
+    
+    # Vérifier que le fichier appartient bien à l'établissement de l'AEF
+    fichier = get_object_or_404(
+        FichierImport,
+        id=fichier_id,
+        etablissement_cnef=request.user.etablissement,
+    )
+    
+    try:
+        logger.info(f"🔍 Génération rapport TEG Excel pour {fichier.nom_fichier} (AEF)")
+        
+        # 1. EXTRAIRE ET CALCULER LES TEG
+        donnees_extraites = extraire_et_calculer_teg(
+            fichier.fichier.path,
+            fichier.etablissement_cnef
+        )
+        
+        # 2. CHARGER LE FICHIER EXCEL ORIGINAL
+        workbook_original = charger_classeur(fichier.fichier.path)
+        
+        # 3. CRÉER UN NOUVEAU WORKBOOK POUR LE RAPPORT
+        workbook_rapport = openpyxl.Workbook()
+        workbook_rapport.remove(workbook_rapport.active)  # Supprimer la feuille par défaut
+        
+        # Styles pour le formatage
+        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+        header_font = Font(bold=True, color="FFFFFF", size=11)
+        conforme_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+        non_conforme_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+        border = Border(
+            left=Side(style='thin', color='000000'),
+            right=Side(style='thin', color='000000'),
+            top=Side(style='thin', color='000000'),
+            bottom=Side(style='thin', color='000000')
+        )
+        
+        # Mapping des types de produits
+        sheet_mapping = {
+            'credits': ['credits amortissables', 'credit amortissable', 'crédits amortissables'],
+            'decouverts': ['découverts bancaires', 'decouvert', 'découverts'],
+            'affacturages': ['affacturage', 'affacturages'],
+            'cautions': ['cautions', 'caution'],
+            'effets': ['effets de commerce', 'effet'],
+            'spots': ['spot', 'spots', 'cours spot']
+        }
+        
+        # Labels pour les feuilles
+        type_labels = {
+            'credits': 'Crédits Amortissables',
+            'decouverts': 'Découverts',
+            'affacturages': 'Affacturage',
+            'cautions': 'Cautions',
+            'effets': 'Effets de Commerce',
+            'spots': 'Spots'
+        }
+        
+        # 4. TRAITER CHAQUE TYPE DE PRODUIT
+        for type_produit, variations in sheet_mapping.items():
+            if type_produit not in donnees_extraites or not donnees_extraites[type_produit]:
+                continue  # Passer si aucune donnée
+            
+            # Trouver la feuille originale correspondante
+            sheet_original = None
+            for sheet_name in workbook_original.sheetnames:
+                if any(var in sheet_name.lower() for var in variations):
+                    sheet_original = workbook_original[sheet_name]
+                    break
+            
+            if not sheet_original:
+                continue
+            
+            # Créer une nouvelle feuille dans le rapport
+            ws = workbook_rapport.create_sheet(title=type_labels[type_produit])
+            
+            # 5. COPIER LES EN-TÊTES ORIGINAUX
+            header_row = None
+            for row_num, row in enumerate(sheet_original.iter_rows(min_row=1, max_row=10), start=1):
+                if any(cell.value for cell in row):
+                    header_row = row_num
+                    break
+            
+            if not header_row:
+                continue
+            
+            # Copier l'en-tête
+            headers = [cell.value for cell in sheet_original[header_row]]
+            for col_num, header in enumerate(headers, start=1):
+                cell = ws.cell(row=1, column=col_num, value=header)
+                cell.fill = header_fill
+                cell.font = header_font
+                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+                cell.border = border
+            
+            # Ajouter les 3 nouvelles colonnes d'en-tête
+            nouvelle_col_start = len(headers) + 1
+            ws.cell(row=1, column=nouvelle_col_start, value="TEG Original (%)").fill = header_fill
+            ws.cell(row=1, column=nouvelle_col_start, value="TEG Original (%)").font = header_font
+            ws.cell(row=1, column=nouvelle_col_start, value="TEG Original (%)").alignment = Alignment(horizontal='center', vertical='center')
+            ws.cell(row=1, column=nouvelle_col_start, value="TEG Original (%)").border = border
+            
+            ws.cell(row=1, column=nouvelle_col_start + 1, value="TEG Calculé (%)").fill = header_fill
+            ws.cell(row=1, column=nouvelle_col_start + 1, value="TEG Calculé (%)").font = header_font
+            ws.cell(row=1, column=nouvelle_col_start + 1, value="TEG Calculé (%)").alignment = Alignment(horizontal='center', vertical='center')
+            ws.cell(row=1, column=nouvelle_col_start + 1, value="TEG Calculé (%)").border = border
+            
+            ws.cell(row=1, column=nouvelle_col_start + 2, value="Conformité").fill = header_fill
+            ws.cell(row=1, column=nouvelle_col_start + 2, value="Conformité").font = header_font
+            ws.cell(row=1, column=nouvelle_col_start + 2, value="Conformité").alignment = Alignment(horizontal='center', vertical='center')
+            ws.cell(row=1, column=nouvelle_col_start + 2, value="Conformité").border = border
+            
+            # 6. CRÉER UN MAPPING DES DONNÉES CALCULÉES PAR LIGNE
+            donnees_map = {item['ligne']: item for item in donnees_extraites[type_produit]}
+            
+            # 7. COPIER LES DONNÉES + AJOUTER LES CALCULS
+            output_row = 2
+            for row_num in range(header_row + 1, sheet_original.max_row + 1):
+                row_data = [cell.value for cell in sheet_original[row_num]]
+                
+                # Vérifier si la ligne n'est pas vide
+                if not any(row_data):
+                    continue
+                
+                # Copier les données originales
+                for col_num, value in enumerate(row_data, start=1):
+                    cell = ws.cell(row=output_row, column=col_num, value=value)
+                    cell.border = border
+                    if isinstance(value, (int, float)):
+                        cell.alignment = Alignment(horizontal='right')
+                
+                # Ajouter les données calculées si disponibles
+                if row_num in donnees_map:
+                    item = donnees_map[row_num]
+                    
+                    # TEG Original (converti en %)
+                    teg_original = item.get('teg_original', 0)
+                    if teg_original < 1:  # Si c'est en décimal
+                        teg_original *= 100
+                    teg_original = round(teg_original, 2)
+                    
+                    # TEG Calculé (déjà en %)
+                    teg_calcule = round(item.get('teg_calcule', 0), 2)
+                    
+                    # Conformité
+                    conforme = item.get('conforme', False)
+                    conformite_text = "Conforme" if conforme else "Non conforme"
+                    
+                    # Écrire les valeurs
+                    cell_teg_original = ws.cell(row=output_row, column=nouvelle_col_start, value=teg_original)
+                    cell_teg_calcule = ws.cell(row=output_row, column=nouvelle_col_start + 1, value=teg_calcule)
+                    cell_conformite = ws.cell(row=output_row, column=nouvelle_col_start + 2, value=conformite_text)
+                    
+                    # Appliquer le formatage
+                    cell_teg_original.border = border
+                    cell_teg_original.alignment = Alignment(horizontal='right')
+                    cell_teg_original.number_format = '0.00'
+                    
+                    cell_teg_calcule.border = border
+                    cell_teg_calcule.alignment = Alignment(horizontal='right')
+                    cell_teg_calcule.number_format = '0.00'
+                    
+                    cell_conformite.border = border
+                    cell_conformite.alignment = Alignment(horizontal='center')
+                    
+                    # Couleur selon conformité
+                    if conforme:
+                        cell_conformite.fill = conforme_fill
+                        cell_conformite.font = Font(color="006100", bold=True)
+                    else:
+                        cell_conformite.fill = non_conforme_fill
+                        cell_conformite.font = Font(color="9C0006", bold=True)
+                
+                output_row += 1
+            
+            # 8. AJUSTER LA LARGEUR DES COLONNES
+            for col_num in range(1, ws.max_column + 1):
+                column_letter = get_column_letter(col_num)
+                max_length = 0
+                for cell in ws[column_letter]:
+                    try:
+                        if cell.value:
+                            max_length = max(max_length, len(str(cell.value)))
+                    except:
+                        pass
+                adjusted_width = min(max_length + 2, 50)
+                ws.column_dimensions[column_letter].width = adjusted_width
+            
+            # Figer la première ligne
+            ws.freeze_panes = 'A2'
+        
+        # 9. SAUVEGARDER ET RETOURNER LE FICHIER
+        # Nom du fichier
+        date_str = datetime.now().strftime("%d-%m-%Y")
+        nom_etablissement = fichier.etablissement_cnef.Nom_etablissement.replace(' ', '_')
+        nom_fichier = f"Rapport_TEG_{nom_etablissement}_{date_str}.xlsx"
+        
+        # Créer la réponse HTTP
+        output = io.BytesIO()
+        workbook_rapport.save(output)
+        output.seek(0)
+        
+        response = HttpResponse(
+            output.read(),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+        
+        # Journalisation
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user,
+            type_action='EXPORT',
+            description=f"Téléchargement rapport TEG Excel - Fichier: {nom_fichier}",
+            etablissement=request.user.etablissement,
+            request=request
+        )
+        
+        logger.info(f" Rapport TEG Excel généré avec succès: {nom_fichier}")
+        
+        return response
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur génération rapport TEG Excel (fichier {fichier_id}): {str(e)}")
+        messages.error(request, f"Erreur lors de la génération du rapport : {str(e)}")
+        return redirect('aef_detail_soumission', fichier_id=fichier_id)
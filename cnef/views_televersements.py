@@ -0,0 +1,172 @@
+"""
+API de téléversement fragmenté des soumissions (AEF / UEF) - voir cnef/televersements.py
+
+    POST   /api/televersements/                         {nom_fichier, taille, empreinte_sha256}
+    GET    /api/televersements/<id>/                    état et fragments reçus (reprise)
+    PUT    /api/televersements/<id>/fragments/<n>/      contenu brut du fragment n (0-indexé)
+    POST   /api/televersements/<id>/finaliser/          {empreinte_sha256} -> FichierImport
+    DELETE /api/televersements/<id>/                    abandon
+"""
+
+import json
+import logging
+
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_http_methods
+
+from .models import TeleversementFragmente
+from .prevalidation import prevalider_soumission, message_refus
+from .televersements import (
+    TeleversementInvalide, assembler, ecrire_fragment, fragments_recus,
+    initier_televersement, supprimer_fragments,
+)
+
+from .views_aef import enregistrer_soumission
+
+logger = logging.getLogger(__name__)
+
+
+def lire_donnees(request):
+    """Corps JSON, ou formulaire classique"""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            raise TeleversementInvalide("Corps JSON invalide")
+    return request.POST
+
+
+def etat_televersement(televersement):
+    recus = fragments_recus(televersement)
+    return {
+        'success': True,
+        'upload_id': str(televersement.id),
+        'nom_fichier': televersement.nom_fichier,
+        'taille': televersement.taille_totale,
+        'taille_fragment': televersement.taille_fragment,
+        'nb_fragments': televersement.nb_fragments,
+        'fragments_recus': recus,
+        'statut': televersement.statut,
+        'fichier_id': televersement.fichier_import_id,
+    }
+
+
+def obtenir_televersement(request, televersement_id):
+    # Un téléversement n'est visible que de son auteur
+    return get_object_or_404(TeleversementFragmente, id=televersement_id, utilisateur=request.user)
+
+
+@login_required
+@require_http_methods(["POST"])
+def televersement_initier(request):
+    if not request.user.etablissement:
+        return JsonResponse({'success': False, 'message': 'Aucun établissement associé'}, status=400)
+    try:
+        donnees = lire_donnees(request)
+        televersement = initier_televersement(
+            request.user,
+            donnees.get('nom_fichier'),
+            donnees.get('taille'),
+            donnees.get('empreinte_sha256', ''),
+        )
+    except TeleversementInvalide as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse(etat_televersement(televersement), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "DELETE"])
+def televersement_etat(request, televersement_id):
+    televersement = obtenir_televersement(request, televersement_id)
+    if request.method == 'DELETE':
+        if televersement.statut == 'EN_COURS':
+            supprimer_fragments(televersement)
+            televersement.delete()
+        return JsonResponse({'success': True, 'message': 'Téléversement abandonné'})
+    return JsonResponse(etat_televersement(televersement))
+
+
+@login_required
+@require_http_methods(["PUT"])
+def televersement_fragment(request, televersement_id, numero):
+    televersement = obtenir_televersement(request, televersement_id)
+    try:
+        taille_annoncee = int(request.META['CONTENT_LENGTH'])
+    except (KeyError, ValueError):
+        taille_annoncee = None
+    try:
+        # Le corps est lu en flux (request.read) : jamais chargé en mémoire
+        ecrire_fragment(
+            televersement, numero, request, taille_annoncee,
+            empreinte=request.headers.get('X-Empreinte-Fragment', ''),
+        )
+    except TeleversementInvalide as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    return JsonResponse({'success': True, 'numero': numero, 'fragments_recus': len(fragments_recus(televersement))})
+
+
+@login_required
+@require_http_methods(["POST"])
+def televersement_finaliser(request, televersement_id):
+    obtenir_televersement(request, televersement_id)
+    fichier_import = None
+    try:
+        donnees = lire_donnees(request)
+        with transaction.atomic():
+            # Verrou : deux finalisations simultanées ne créent qu'une soumission
+            televersement = TeleversementFragmente.objects.select_for_update().get(id=televersement_id)
+            if televersement.statut == 'TERMINE':
+                return JsonResponse({
+                    'success': True,
+                    'message': f'Fichier "{televersement.nom_fichier}" déjà soumis',
+                    'fichier_id': televersement.fichier_import_id,
+                })
+
+            fichier = assembler(televersement, donnees.get('empreinte_sha256', ''))
+            try:
+                prevalidation = prevalider_soumission(fichier)
+                if not prevalidation['valide']:
+                    # Fichier complet mais mal structuré : inutile de le conserver
+                    supprimer_fragments(televersement)
+                    televersement.delete()
+                    return JsonResponse({
+                        'success': False,
+                        'message': message_refus(prevalidation),
+                        'erreurs': prevalidation['erreurs']
+                    }, status=400)
+                fichier_import, nb_notifications = enregistrer_soumission(request, fichier)
+            finally:
+                fichier.close()
+
+            televersement.statut = 'TERMINE'
+            televersement.fichier_import = fichier_import
+            televersement.save(update_fields=['statut', 'fichier_import', 'date_mise_a_jour'])
+            transaction.on_commit(lambda: supprimer_fragments(televersement))
+
+    except TeleversementInvalide as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        # Transaction annulée : le fichier assemblé, déjà déplacé dans MEDIA_ROOT, serait orphelin
+        if fichier_import is not None:
+            fichier_import.fichier.delete(save=False)
+        logger.error(f"Erreur finalisation téléversement {televersement_id}: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'message': f'Erreur lors de l\'upload : {str(e)}'
+        }, status=500)
+
+    if nb_notifications > 0:
+        message = f'Fichier "{fichier_import.nom_fichier}" soumis avec succès ! {nb_notifications} administrateur(s) CNEF notifié(s).'
+    else:
+        message = f'Fichier "{fichier_import.nom_fichier}" soumis avec succès !'
+    return JsonResponse({
+        'success': True,
+        'message': message,
+        'fichier_id': fichier_import.id,
+        'avertissements': prevalidation['avertissements'],
+    })
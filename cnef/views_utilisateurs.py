@@ -0,0 +1,437 @@
+"""
+API de gestion des utilisateurs (ACNEF)
+"""
+
+import json
+import logging
+
+from django.shortcuts import get_object_or_404
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.db.models import Q
+from django.db import transaction
+from django.views.decorators.http import require_http_methods
+from django.core.paginator import Paginator
+
+from .models import Etablissement, TokenInscription, ActionUtilisateur, User
+
+from .views_commun import is_chef
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================
+# API GESTION DES UTILISATEURS
+# ==========================================
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["GET", "POST"])
+def api_utilisateurs(request):
+    """
+    GET: Liste tous les utilisateurs avec filtres et pagination
+    POST: Créer un nouvel utilisateur
+    """
+    
+    if request.method == "GET":
+        try:
+            # Paramètres de pagination
+            page = int(request.GET.get('page', 1))
+            per_page = int(request.GET.get('per_page', 20))
+            
+            # Paramètres de filtrage
+            role_filter = request.GET.get('role', '')
+            etablissement_filter = request.GET.get('etablissement', '')
+            search_query = request.GET.get('search', '')
+            actif_filter = request.GET.get('actif', '')
+            
+            # Construction de la requête
+            utilisateurs = User.objects.all().select_related('etablissement', 'cree_par')
+            
+            # Application des filtres
+            if role_filter:
+                utilisateurs = utilisateurs.filter(role=role_filter)
+            
+            if etablissement_filter:
+                utilisateurs = utilisateurs.filter(etablissement_id=etablissement_filter)
+            
+            if search_query:
+                utilisateurs = utilisateurs.filter(
+                    Q(nom__icontains=search_query) |
+                    Q(prenom__icontains=search_query) |
+                    Q(email__icontains=search_query)
+                )
+            
+            if actif_filter:
+                utilisateurs = utilisateurs.filter(is_active=(actif_filter.lower() == 'true'))
+            
+            # Tri
+            sort_by = request.GET.get('sort', '-date_joined')
+            utilisateurs = utilisateurs.order_by(sort_by)
+            
+            # Pagination
+            paginator = Paginator(utilisateurs, per_page)
+            page_obj = paginator.get_page(page)
+            
+            # Formatage des données
+            utilisateurs_data = []
+            for user in page_obj:
+                utilisateurs_data.append({
+                    'id': user.id,
+                    'nom': user.nom,
+                    'prenom': user.prenom,
+                    'email': user.email,
+                    'telephone': user.telephone or '',
+                    'role': user.role,
+                    'role_display': user.get_role_display(),
+                    'etablissement': {
+                        'id': user.etablissement.id,
+                        'nom': user.etablissement.Nom_etablissement,
+                        'code': user.etablissement.code_etablissement
+                    } if user.etablissement else None,
+                    'is_active': user.is_active,
+                    'date_joined': user.date_joined.isoformat(),
+                    'derniere_connexion': user.derniere_connexion.isoformat() if user.derniere_connexion else None,
+                    'cree_par': {
+                        'id': user.cree_par.id,
+                        'nom': user.cree_par.get_full_name()
+                    } if user.cree_par else None,
+                })
+            
+            # Statistiques
+            total = utilisateurs.count()
+            stats = {
+                'total': total,
+                'actifs': utilisateurs.filter(is_active=True).count(),
+                'inactifs': utilisateurs.filter(is_active=False).count(),
+                'par_role': {}
+            }
+            
+            for role, _ in User.ROLE_CHOICES:
+                stats['par_role'][role] = utilisateurs.filter(role=role).count()
+            
+            return JsonResponse({
+                'success': True,
+                'utilisateurs': utilisateurs_data,
+                'pagination': {
+                    'page': page_obj.number,
+                    'per_page': per_page,
+                    'total_pages': paginator.num_pages,
+                    'total': total,
+                    'has_next': page_obj.has_next(),
+                    'has_previous': page_obj.has_previous(),
+                },
+                'stats': stats
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des utilisateurs: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': f"Erreur: {str(e)}"
+            }, status=500)
+    
+    elif request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            
+            # Validation des champs obligatoires
+            required_fields = ['nom', 'prenom', 'email', 'role']
+            for field in required_fields:
+                if not data.get(field):
+                    return JsonResponse({
+                        'success': False,
+                        'message': f"Le champ '{field}' est obligatoire"
+                    }, status=400)
+            
+            # Vérifier si l'email existe déjà
+            if User.objects.filter(email=data['email']).exists():
+                return JsonResponse({
+                    'success': False,
+                    'message': f"Un utilisateur avec l'email '{data['email']}' existe déjà"
+                }, status=400)
+            
+            # Validation du rôle et de l'établissement
+            role = data['role']
+            if role in ['AEF', 'UEF']:
+                if not data.get('etablissement_id'):
+                    return JsonResponse({
+                        'success': False,
+                        'message': "Un établissement est requis pour les rôles AEF et UEF"
+                    }, status=400)
+                
+                try:
+                    etablissement = Etablissement.objects.get(id=data['etablissement_id'])
+                except Etablissement.DoesNotExist:
+                    return JsonResponse({
+                        'success': False,
+                        'message': "Établissement introuvable"
+                    }, status=404)
+            else:
+                etablissement = None
+            
+            # Créer l'utilisateur avec transaction
+            with transaction.atomic():
+                # Générer un mot de passe temporaire
+                temp_password = User.objects.make_random_password(length=12)
+                
+                # Créer l'utilisateur
+                user = User.objects.create_user(
+                    email=data['email'],
+                    nom=data['nom'],
+                    prenom=data['prenom'],
+                    password=temp_password,
+                    telephone=data.get('telephone', ''),
+                    role=role,
+                    etablissement=etablissement,
+                    cree_par=request.user
+                )
+                
+                # Générer un token d'inscription si c'est AEF ou UEF
+                token_obj = None
+                if role in ['AEF', 'UEF']:
+                    token_obj = TokenInscription.objects.create(
+                        etablissement=etablissement,
+                        nom_user=f"{user.prenom} {user.nom}" if role == 'UEF' else None,
+                        role=role,
+                        cree_par=request.user
+                    )
+                    user.token_inscription = token_obj.token
+                    user.save()
+                
+                # Enregistrer l'action dans les logs
+                ActionUtilisateur.enregistrer_action(
+                    utilisateur=request.user,
+                    type_action='CREATION_UTILISATEUR',
+                    description=f"Création de l'utilisateur {user.get_full_name()} ({user.get_role_display()})",
+                    etablissement=etablissement,
+                    request=request,
+                    donnees_supplementaires={
+                        'utilisateur_cree_id': user.id,
+                        'email': user.email,
+                        'role': user.role
+                    }
+                )
+                
+                logger.info(f"Utilisateur créé: {user.email} par {request.user.email}")
+            
+            # Préparer la réponse
+            response_data = {
+                'success': True,
+                'message': f"Utilisateur '{user.get_full_name()}' créé avec succès",
+                'utilisateur': {
+                    'id': user.id,
+                    'nom': user.nom,
+                    'prenom': user.prenom,
+                    'email': user.email,
+                    'role': user.role,
+                    'role_display': user.get_role_display(),
+                    'etablissement': {
+                        'id': etablissement.id,
+                        'nom': etablissement.Nom_etablissement
+                    } if etablissement else None,
+                },
+                'mot_de_passe_temporaire': temp_password if role in ['ACNEF', 'UCNEF'] else None,
+            }
+            
+            # Ajouter le lien d'inscription si applicable
+            if token_obj:
+                response_data['lien_inscription'] = token_obj.generer_lien_inscription()
+                response_data['token_expiration'] = token_obj.temps_restant_minutes()
+            
+            return JsonResponse(response_data, status=201)
+            
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Données JSON invalides'
+            }, status=400)
+        except Exception as e:
+            logger.error(f"Erreur lors de la création de l'utilisateur: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': f"Erreur: {str(e)}"
+            }, status=500)
+
+
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["GET", "PUT", "DELETE"])
+def api_utilisateur_detail(request, utilisateur_id):
+    """
+    GET: Récupérer les détails d'un utilisateur
+    PUT: Modifier un utilisateur
+    DELETE: Supprimer un utilisateur
+    """
+    
+    try:
+        utilisateur = User.objects.select_related('etablissement', 'cree_par').get(id=utilisateur_id)
+    except User.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'message': 'Utilisateur introuvable'
+        }, status=404)
+    
+    if request.method == "GET":
+        try:
+            # Récupérer les statistiques de l'utilisateur
+            nb_actions = ActionUtilisateur.objects.filter(utilisateur=utilisateur).count()
+            
+            utilisateur_data = {
+                'id': utilisateur.id,
+                'nom': utilisateur.nom,
+                'prenom': utilisateur.prenom,
+                'email': utilisateur.email,
+                'telephone': utilisateur.telephone or '',
+                'role': utilisateur.role,
+                'role_display': utilisateur.get_role_display(),
+                'etablissement': {
+                    'id': utilisateur.etablissement.id,
+                    'nom': utilisateur.etablissement.Nom_etablissement,
+                    'code': utilisateur.etablissement.code_etablissement
+                } if utilisateur.etablissement else None,
+                'is_active': utilisateur.is_active,
+                'date_joined': utilisateur.date_joined.isoformat(),
+                'derniere_connexion': utilisateur.derniere_connexion.isoformat() if utilisateur.derniere_connexion else None,
+                'cree_par': {
+                    'id': utilisateur.cree_par.id,
+                    'nom': utilisateur.cree_par.get_full_name()
+                } if utilisateur.cree_par else None,
+                'nb_actions': nb_actions,
+                'token_inscription': utilisateur.token_inscription,
+                'lien_inscription_utilise': utilisateur.lien_inscription_utilise,
+            }
+            
+            return JsonResponse({
+                'success': True,
+                'utilisateur': utilisateur_data
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la récupération des détails: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': f"Erreur: {str(e)}"
+            }, status=500)
+    
+    elif request.method == "PUT":
+        try:
+            data = json.loads(request.body)
+            
+            # Mise à jour des champs autorisés
+            with transaction.atomic():
+                if 'nom' in data:
+                    utilisateur.nom = data['nom']
+                if 'prenom' in data:
+                    utilisateur.prenom = data['prenom']
+                if 'telephone' in data:
+                    utilisateur.telephone = data['telephone']
+                if 'is_active' in data:
+                    utilisateur.is_active = data['is_active']
+                
+                utilisateur.save()
+                
+                # Enregistrer l'action
+                ActionUtilisateur.enregistrer_action(
+                    utilisateur=request.user,
+                    type_action='MODIFICATION_UTILISATEUR',
+                    description=f"Modification de l'utilisateur {utilisateur.get_full_name()}",
+                    etablissement=utilisateur.etablissement,
+                    request=request,
+                    donnees_supplementaires={
+                        'utilisateur_modifie_id': utilisateur.id,
+                        'champs_modifies': list(data.keys())
+                    }
+                )
+                
+                logger.info(f"Utilisateur modifié: {utilisateur.email} par {request.user.email}")
+            
+            return JsonResponse({
+                'success': True,
+                'message': f"Utilisateur '{utilisateur.get_full_name()}' modifié avec succès"
+            })
+            
+        except json.JSONDecodeError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Données JSON invalides'
+            }, status=400)
+        except Exception as e:
+            logger.error(f"Erreur lors de la modification: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': f"Erreur: {str(e)}"
+            }, status=500)
+    
+    elif request.method == "DELETE":
+        try:
+            # Vérifier que l'utilisateur ne se supprime pas lui-même
+            if utilisateur.id == request.user.id:
+                return JsonResponse({
+                    'success': False,
+                    'message': "Vous ne pouvez pas supprimer votre propre compte"
+                }, status=400)
+            
+            with transaction.atomic():
+                nom_complet = utilisateur.get_full_name()
+                email = utilisateur.email
+                
+                # Enregistrer l'action avant la suppression
+                ActionUtilisateur.enregistrer_action(
+                    utilisateur=request.user,
+                    type_action='CREATION_UTILISATEUR',  # Utiliser un type existant
+                    description=f"Suppression de l'utilisateur {nom_complet} ({email})",
+                    etablissement=utilisateur.etablissement,
+                    request=request,
+                    donnees_supplementaires={
+                        'utilisateur_supprime_id': utilisateur.id,
+                        'email': email,
+                        'role': utilisateur.role
+                    }
+                )
+                
+                utilisateur.delete()
+                
+                logger.warning(f"Utilisateur supprimé: {email} par {request.user.email}")
+            
+            return JsonResponse({
+                'success': True,
+                'message': f"Utilisateur '{nom_complet}' supprimé avec succès"
+            })
+            
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression: {str(e)}")
+            return JsonResponse({
+                'success': False,
+                'message': f"Erreur: {str(e)}"
+            }, status=500)
+
+
+# ==========================================
+# 1. BANNIR UN UTILISATEUR
+# ==========================================
+@login_required
+@user_passes_test(is_chef)
+@require_http_methods(["POST"])
+def bannir_utilisateur(request, user_id):
+    try:
+        utilisateur = get_object_or_404(User, id=user_id)
+        if utilisateur.id == request.user.id:
+            return JsonResponse({'success': False, 'message': 'Vous ne pouvez pas vous bannir vous-même'}, status=400)
+        if utilisateur.is_superuser:
+            return JsonResponse({'success': False, 'message': 'Impossible de bannir un super administrateur'}, status=403)
+        if not utilisateur.is_active:
+            return JsonResponse({'success': False, 'message': 'Cet utilisateur est déjà banni'}, status=400)
+        
+        nom_complet = utilisateur.get_full_name()
+        utilisateur.is_active = False
+        utilisateur.save()
+        
+        ActionUtilisateur.enregistrer_action(
+            utilisateur=request.user, type_action='MODIFICATION_UTILISATEUR',
+            description=f"Bannissement de l'utilisateur {nom_complet}",
+            etablissement=utilisateur.etablissement, request=request
+        )
+        return JsonResponse({'success': True, 'message': f'Utilisateur {nom_complet} banni'})
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Erreur : {str(e)}'}, status=500)
@@ -3,6 +3,16 @@ ASGI config for collecte_platform project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Servie par un serveur ASGI (uvicorn, daphne), l'application diffuse en
+continu les événements des soumissions aux tableaux de bord
+(/api/evenements/flux/, voir cnef/evenements.py) : chaque flux SSE ouvert
+n'occupe qu'une coroutine. Sous WSGI, ce point d'accès répond 204 et les
+tableaux de bord passent à l'attente longue (/api/evenements/attente/).
+
+    uvicorn collecte_platform.asgi:application --workers 4
+
+Avec plusieurs workers, EVENEMENTS_MODE doit valoir 'redis'.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -7,6 +7,7 @@ l'application Django en développement et en production de manière sécurisée.
 """
 
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -25,6 +26,9 @@ load_dotenv()
 # Exemple : /home/user/projet/collecte_platform/
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# EN_TEST : Vrai sous `python manage.py test` (modes synchrones, voir JOURNAL_MODE)
+EN_TEST = sys.argv[1:2] == ['test']
+
 # ==============================================================================
 # PARAMÈTRES DE SÉCURITÉ
 # ==============================================================================
@@ -133,10 +137,26 @@ CSRF_COOKIE_SAMESITE = 'Strict'
 # 1209600 = 2 semaines (14 jours)
 SESSION_COOKIE_AGE = int(os.getenv('SESSION_COOKIE_AGE', '1209600'))
 
+# SESSION_ENGINE : Stockage des sessions
+# cached_db = lecture depuis le cache Redis, écriture dans Redis ET en base
+# (les sessions survivent à un redémarrage de Redis)
+# cache = Redis uniquement (aucune écriture en base)
+# db = base de données uniquement (comportement Django par défaut)
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
+# SESSION_CACHE_ALIAS : Cache utilisé par les moteurs cached_db et cache (voir CACHES)
+SESSION_CACHE_ALIAS = 'default'
+
 # SESSION_SAVE_EVERY_REQUEST : Sauvegarde la session à chaque requête
-# True = renouvelle la durée de vie à chaque action
-# False = la session expire après SESSION_COOKIE_AGE même si l'utilisateur est actif
-SESSION_SAVE_EVERY_REQUEST = True
+# True = renouvelle la durée de vie à chaque action (une écriture par requête)
+# False = la durée de vie est renouvelée par SessionRafraichissementMiddleware
+# au plus une fois toutes les SESSION_REFRESH_INTERVAL secondes
+SESSION_SAVE_EVERY_REQUEST = False
+
+# SESSION_REFRESH_INTERVAL : Intervalle minimal (en secondes) entre deux
+# prolongations de la session d'un utilisateur actif
+# 300 = 5 minutes
+SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', '300'))
 
 # SESSION_EXPIRE_AT_BROWSER_CLOSE : La session expire à la fermeture du navigateur
 # False = la session persiste selon SESSION_COOKIE_AGE
@@ -219,6 +239,10 @@ INSTALLED_APPS = [
 # Les middlewares sont des couches qui traitent les requêtes/réponses
 # L'ORDRE EST IMPORTANT !
 MIDDLEWARE = [
+    # Instrumentation : durée et SQL par vue (voir INSTRUMENTATION_* plus bas)
+    # En premier pour mesurer aussi le coût des autres middlewares (sessions, auth)
+    'cnef.middleware.InstrumentationMiddleware',
+    
     # SecurityMiddleware : Applique diverses protections de sécurité
     'django.middleware.security.SecurityMiddleware',
     
@@ -249,6 +273,14 @@ MIDDLEWARE = [
     
     # Notre middleware personnalisé pour gérer les interruptions de session
     'cnef.middleware.SessionInterruptionMiddleware',
+    
+    # Prolonge la session au plus une fois par SESSION_REFRESH_INTERVAL
+    # DOIT être après AuthenticationMiddleware
+    'cnef.middleware.SessionRafraichissementMiddleware',
+
+    # Lectures sur la base principale juste après une validation, même si la
+    # base de reporting est configurée (DB_REPORTING_*) - après SessionMiddleware
+    'cnef.middleware.LectureCollanteMiddleware',
 ]
 
 # ==============================================================================
@@ -332,6 +364,11 @@ WSGI_APPLICATION = 'collecte_platform.wsgi.application'
 # ==============================================================================
 # CONFIGURATION DE LA BASE DE DONNÉES
 # ==============================================================================
+# DB_ENGINE : Moteur de la base principale (MySQL par défaut)
+# 'django.db.backends.sqlite3' avec DB_NAME (chemin du fichier) : base SQLite
+# locale pour le développement et les tests, sans serveur MySQL
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.mysql')
+
 DATABASES = {
     'default': {
         # Engine : Type de base de données (MySQL dans notre cas)
@@ -380,6 +417,58 @@ DATABASES = {
     }
 }
 
+if DB_ENGINE == 'django.db.backends.sqlite3':
+    # Les options MySQL (charset, init_command) ne s'appliquent pas
+    DATABASES['default'] = {
+        'ENGINE': DB_ENGINE,
+        'NAME': os.getenv('DB_NAME', str(BASE_DIR / 'db.sqlite3')),
+    }
+
+# Base de reporting (réplica MySQL en lecture seule), facultative
+# Les calculs du communiqué, la visualisation et l'export de la base des
+# prêts, les exports du journal et la vérification des TEG y lisent leurs
+# données (cnef/routage_bdd.py) ; les écritures restent sur 'default'.
+# DB_REPORTING_HOST : Hôte du réplica (vide = pas de base de reporting)
+# DB_REPORTING_PORT, DB_REPORTING_NAME, DB_REPORTING_USER, DB_REPORTING_PASSWORD :
+# par défaut, ceux de la base principale
+# DB_REPORTING_ENGINE : Moteur du réplica (par défaut celui de la base principale)
+# 'django.db.backends.sqlite3' : seconde connexion SQLite, sans hôte, pour
+# essayer le routage localement et l'exercer dans les tests (cnef/tests.py).
+# Exige une base principale SQLite (DB_ENGINE) ; DB_REPORTING_NAME est par
+# défaut le fichier de la base principale (le réplica n'est jamais migré)
+DB_REPORTING_ENGINE = os.getenv('DB_REPORTING_ENGINE', DATABASES['default']['ENGINE'])
+if os.getenv('DB_REPORTING_ENGINE') == 'django.db.backends.sqlite3':
+    if DATABASES['default']['ENGINE'] != DB_REPORTING_ENGINE:
+        # Empêche un réplica SQLite vide face à une base principale MySQL
+        raise ValueError("DB_REPORTING_ENGINE=sqlite3 requires DB_ENGINE=django.db.backends.sqlite3")
+    DATABASES['reporting'] = {
+        'ENGINE': DB_REPORTING_ENGINE,
+        'NAME': os.getenv('DB_REPORTING_NAME', DATABASES['default']['NAME']),
+        # Tests : le réplica est la base de test principale
+        'TEST': {'MIRROR': 'default'},
+    }
+elif os.getenv('DB_REPORTING_HOST'):
+    DATABASES['reporting'] = {
+        **DATABASES['default'],
+        'ENGINE': DB_REPORTING_ENGINE,
+        'HOST': os.getenv('DB_REPORTING_HOST'),
+        'PORT': os.getenv('DB_REPORTING_PORT', DATABASES['default']['PORT']),
+        'NAME': os.getenv('DB_REPORTING_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPORTING_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPORTING_PASSWORD', DATABASES['default']['PASSWORD']),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests : le réplica est la base de test principale
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Routage des lectures vers 'reporting' (sans effet si l'alias n'existe pas)
+DATABASE_ROUTERS = ['cnef.routage_bdd.RouteurReporting']
+
+# DB_REPORTING_DELAI_COLLANT : Durée (en secondes) pendant laquelle les
+# lectures d'une session restent sur la base principale après une validation,
+# le temps que le réplica rattrape son retard
+DB_REPORTING_DELAI_COLLANT = int(os.getenv('DB_REPORTING_DELAI_COLLANT', '120'))
+
 # ==============================================================================
 # CONFIGURATION DU CACHE (Redis)
 # ==============================================================================
@@ -429,6 +518,109 @@ CACHES = {
     }
 }
 
+# ==============================================================================
+# CACHE DES CALCULS TEG (cnef/teg_cache.py)
+# ==============================================================================
+# Les prêts d'un même produit partagent souvent les mêmes paramètres :
+# le résultat du calcul de TEG est mémorisé pour chaque tuple de paramètres
+
+# TEG_CACHE_ACTIF : Active la mémoïsation des calculs de TEG
+TEG_CACHE_ACTIF = os.getenv('TEG_CACHE_ACTIF', 'True').lower() == 'true'
+
+# TEG_CACHE_TAILLE_MAX : Nombre maximum d'entrées du cache LRU en mémoire (par processus)
+TEG_CACHE_TAILLE_MAX = int(os.getenv('TEG_CACHE_TAILLE_MAX', '10000'))
+
+# TEG_CACHE_REDIS : Partage aussi les résultats entre les workers via Redis
+# False par défaut : un aller-retour Redis coûte plus cher qu'un calcul simple,
+# l'intérêt se limite aux workers qui traitent les mêmes produits standards
+TEG_CACHE_REDIS = os.getenv('TEG_CACHE_REDIS', 'False').lower() == 'true'
+
+# TEG_CACHE_REDIS_ALIAS : Alias du cache Django utilisé (voir CACHES)
+TEG_CACHE_REDIS_ALIAS = 'default'
+
+# TEG_CACHE_REDIS_TIMEOUT : Durée de conservation dans Redis (24 heures)
+TEG_CACHE_REDIS_TIMEOUT = 86400
+
+# ==============================================================================
+# JOURNAL DES ACTIONS (cnef/journal.py)
+# ==============================================================================
+# Les actions des utilisateurs (ActionUtilisateur) sont écrites par lots
+# au lieu d'un INSERT par action sur le chemin de la requête
+
+# JOURNAL_MODE : Mode d'écriture du journal
+# 'synchrone' = écriture immédiate (toujours utilisé pour les tests)
+# 'tampon' = file en mémoire propre à chaque worker (par défaut)
+# 'redis' = file partagée dans une liste Redis
+JOURNAL_MODE = 'synchrone' if EN_TEST else os.getenv('JOURNAL_MODE', 'tampon')
+
+# JOURNAL_TAILLE_LOT : Nombre d'actions écrites par bulk_create
+JOURNAL_TAILLE_LOT = int(os.getenv('JOURNAL_TAILLE_LOT', '100'))
+
+# JOURNAL_DELAI_MAX : Délai maximal (en secondes) avant l'écriture d'une action en attente
+JOURNAL_DELAI_MAX = int(os.getenv('JOURNAL_DELAI_MAX', '2'))
+
+# JOURNAL_VIDAGE_FIN_REQUETE : Écrit aussi les actions en attente à la fin de chaque requête
+# (après l'envoi de la réponse, via le signal request_finished)
+JOURNAL_VIDAGE_FIN_REQUETE = os.getenv('JOURNAL_VIDAGE_FIN_REQUETE', 'False').lower() == 'true'
+
+# JOURNAL_RECHERCHE_FULLTEXT : Recherche du journal par index FULLTEXT (MySQL)
+# Sur les autres bases, ou si désactivé, la table d'index JetonJournal est utilisée
+# (cnef/recherche_journal.py, reconstruction : python manage.py indexer_journal)
+JOURNAL_RECHERCHE_FULLTEXT = os.getenv('JOURNAL_RECHERCHE_FULLTEXT', 'True').lower() == 'true'
+
+# Rétention du journal (cnef/retention_journal.py, commande retention_journal)
+# Les suppressions se font par lots bornés par la clé primaire pour ne pas
+# verrouiller la table, avec archivage optionnel en JSONL gzip (un fichier par mois)
+
+# JOURNAL_RETENTION_JOURS : Ancienneté (en jours) au-delà de laquelle
+# la commande planifiée supprime les actions
+JOURNAL_RETENTION_JOURS = int(os.getenv('JOURNAL_RETENTION_JOURS', '365'))
+
+# JOURNAL_RETENTION_TAILLE_LOT : Nombre de lignes supprimées par lot
+JOURNAL_RETENTION_TAILLE_LOT = int(os.getenv('JOURNAL_RETENTION_TAILLE_LOT', '5000'))
+
+# JOURNAL_RETENTION_PAUSE : Pause (en secondes) entre deux lots
+JOURNAL_RETENTION_PAUSE = float(os.getenv('JOURNAL_RETENTION_PAUSE', '0.2'))
+
+# JOURNAL_RETENTION_ARCHIVER : Archiver les lignes avant de les supprimer
+JOURNAL_RETENTION_ARCHIVER = os.getenv('JOURNAL_RETENTION_ARCHIVER', 'True').lower() == 'true'
+
+# JOURNAL_RETENTION_DOSSIER : Dossier des archives journal_AAAA_MM.jsonl.gz
+JOURNAL_RETENTION_DOSSIER = os.getenv('JOURNAL_RETENTION_DOSSIER', os.path.join(BASE_DIR, 'archives', 'journal'))
+
+# ==============================================================================
+# SUGGESTIONS (AUTOCOMPLÉTION) - cnef/suggestions.py
+# ==============================================================================
+# Index en mémoire des utilisateurs et établissements pour la recherche par préfixe
+# (/chef/api/utilisateurs/suggest/?q=, /chef/api/etablissements/suggest/?q=)
+
+# SUGGESTIONS_INTERVALLE_VERIFICATION : Intervalle (en secondes) entre deux lectures
+# de la génération de l'index dans le cache, pour détecter les modifications
+# faites par un autre worker
+SUGGESTIONS_INTERVALLE_VERIFICATION = int(os.getenv('SUGGESTIONS_INTERVALLE_VERIFICATION', '2'))
+
+# ==============================================================================
+# INSTRUMENTATION DES REQUÊTES - cnef.middleware.InstrumentationMiddleware
+# ==============================================================================
+# Durée, nombre et temps des requêtes SQL par vue, détection des requêtes
+# répétées (N+1). Mesures écrites dans logs/instrumentation.log et consultables
+# par l'ACNEF sur /chef/api/instrumentation/
+
+# INSTRUMENTATION_TAUX : Proportion de requêtes instrumentées (0 = désactivé, 1 = toutes)
+# Hors échantillon, la requête n'est journalisée que si elle est lente
+INSTRUMENTATION_TAUX = float(os.getenv('INSTRUMENTATION_TAUX', '0'))
+
+# INSTRUMENTATION_SEUIL_LENT_MS : Durée (ms) au-delà de laquelle une requête est
+# journalisée en WARNING avec le SQL exécuté, échantillonnée ou non (0 = jamais)
+INSTRUMENTATION_SEUIL_LENT_MS = int(os.getenv('INSTRUMENTATION_SEUIL_LENT_MS', '2000'))
+
+# INSTRUMENTATION_SEUIL_DOUBLONS : Nombre d'exécutions d'une même requête SQL
+# (aux paramètres près) à partir duquel elle est signalée comme N+1
+INSTRUMENTATION_SEUIL_DOUBLONS = int(os.getenv('INSTRUMENTATION_SEUIL_DOUBLONS', '3'))
+
+# INSTRUMENTATION_TAILLE_TAMPON : Nombre de mesures conservées en mémoire par processus
+INSTRUMENTATION_TAILLE_TAMPON = int(os.getenv('INSTRUMENTATION_TAILLE_TAMPON', '500'))
+
 # ==============================================================================
 # CONFIGURATION DE CELERY
 # ==============================================================================
@@ -505,7 +697,8 @@ SITE_URL = os.getenv('SITE_URL', 'https://www.cnef.cg')
 # EMAIL_BACKEND : Moteur d'envoi d'emails
 # smtp.EmailBackend = envoie via un serveur SMTP (Gmail, SendGrid, etc.)
 # console.EmailBackend = affiche les emails dans la console (développement)
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# locmem.EmailBackend = conserve les emails en mémoire (tests)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 
 # Serveur SMTP (Gmail dans notre cas)
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -532,6 +725,35 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', f'Comité National Economiq
 # Adresse email de l'administrateur
 EMAIL_ADMIN = os.getenv('EMAIL_ADMIN', EMAIL_HOST_USER)
 
+# File d'envoi des emails (cnef/envoi_emails.py)
+# Les emails sont enregistrés dans HistoriqueEmail (statut EN_ATTENTE) dans la
+# transaction de l'action métier, puis envoyés par lots sur une seule connexion SMTP
+
+# EMAIL_FILE_MODE : Mode d'envoi
+# 'synchrone' = envoi après le commit, dans la requête (à utiliser pour les tests)
+# 'thread' = envoi par un thread d'arrière-plan de chaque worker
+# 'commande' = envoi uniquement par la commande envoyer_emails (cron ou --continu)
+EMAIL_FILE_MODE = os.getenv('EMAIL_FILE_MODE', 'thread')
+
+# EMAIL_FILE_TAILLE_LOT : Nombre d'emails envoyés par connexion SMTP
+EMAIL_FILE_TAILLE_LOT = int(os.getenv('EMAIL_FILE_TAILLE_LOT', '50'))
+
+# EMAIL_FILE_TENTATIVES_MAX : Nombre de tentatives avant le statut ECHEC
+EMAIL_FILE_TENTATIVES_MAX = int(os.getenv('EMAIL_FILE_TENTATIVES_MAX', '6'))
+
+# EMAIL_FILE_DELAI_BASE / EMAIL_FILE_DELAI_MAX : Délai (en secondes) avant une
+# nouvelle tentative : base × 2^(n-1), plafonné (60 s, 2 min, 4 min... 1 h)
+EMAIL_FILE_DELAI_BASE = int(os.getenv('EMAIL_FILE_DELAI_BASE', '60'))
+EMAIL_FILE_DELAI_MAX = int(os.getenv('EMAIL_FILE_DELAI_MAX', '3600'))
+
+# EMAIL_FILE_BAIL : Durée (en secondes) de réservation d'un lot en cours d'envoi
+# (un lot interrompu par l'arrêt du processus est repris après ce délai)
+EMAIL_FILE_BAIL = int(os.getenv('EMAIL_FILE_BAIL', '300'))
+
+# EMAIL_FILE_INTERVALLE : Intervalle (en secondes) entre deux passages du thread
+# d'envoi, pour les nouvelles tentatives
+EMAIL_FILE_INTERVALLE = int(os.getenv('EMAIL_FILE_INTERVALLE', '30'))
+
 # ==============================================================================
 # ADMINISTRATEURS
 # ==============================================================================
@@ -628,6 +850,16 @@ LOGGING = {
             'formatter': 'verbose',
         },
         
+        # Handler fichier pour l'instrumentation (durée et SQL par vue)
+        'file_instrumentation': {
+            'level': 'INFO',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(LOGS_DIR, 'instrumentation.log'),
+            'maxBytes': 1024 * 1024 * 10,  # 10 MB
+            'backupCount': 5,
+            'formatter': 'simple',
+        },
+        
         # Handler email : envoie les erreurs aux admins par email
         'mail_admins': {
             'level': 'ERROR',
@@ -662,6 +894,13 @@ LOGGING = {
             'propagate': False,
         },
         
+        # Logger de l'instrumentation des requêtes (une ligne JSON par mesure)
+        'cnef.instrumentation': {
+            'handlers': ['file_instrumentation'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        
         # Logger pour les modèles
         'app.models': {
             'handlers': ['file_error'],
@@ -741,6 +980,125 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880
 # Empêche les attaques par saturation de mémoire
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880
 
+# Téléversement fragmenté (cnef/televersements.py)
+# Les gros fichiers sont envoyés en fragments (PUT) écrits directement sur
+# disque, puis assemblés et vérifiés (SHA-256) : une coupure réseau ne fait
+# renvoyer que les fragments manquants
+
+# TELEVERSEMENT_TAILLE_FRAGMENT : Taille d'un fragment (4 MB, sous DATA_UPLOAD_MAX_MEMORY_SIZE)
+TELEVERSEMENT_TAILLE_FRAGMENT = int(os.getenv('TELEVERSEMENT_TAILLE_FRAGMENT', str(4 * 1024 * 1024)))
+
+# TELEVERSEMENT_TAILLE_MAX : Taille maximale d'un fichier téléversé en fragments (200 MB)
+TELEVERSEMENT_TAILLE_MAX = int(os.getenv('TELEVERSEMENT_TAILLE_MAX', str(200 * 1024 * 1024)))
+
+# TELEVERSEMENT_DUREE_VIE : Durée (en heures) sans nouveau fragment après laquelle
+# un téléversement inachevé est supprimé (commande nettoyer_televersements)
+TELEVERSEMENT_DUREE_VIE = int(os.getenv('TELEVERSEMENT_DUREE_VIE', '24'))
+
+# TELEVERSEMENT_DOSSIER : Dossier des fragments (vide = MEDIA_ROOT/televersements)
+TELEVERSEMENT_DOSSIER = os.getenv('TELEVERSEMENT_DOSSIER', '')
+
+# PREVALIDATION_SOUMISSIONS : Contrôle structurel des classeurs à l'upload
+# (feuilles de produits, ligne d'en-tête, nombre de colonnes - cnef/prevalidation.py)
+# Les fichiers mal structurés sont refusés immédiatement
+PREVALIDATION_SOUMISSIONS = os.getenv('PREVALIDATION_SOUMISSIONS', 'True').lower() == 'true'
+
+# VALIDATION_GROUPEE_WORKERS : Nombre de soumissions importées en parallèle
+# par une validation groupée (cnef/validation_groupee.py) ; chaque worker
+# utilise sa propre connexion à la base. Forcé à 1 sous SQLite.
+VALIDATION_GROUPEE_WORKERS = int(os.getenv('VALIDATION_GROUPEE_WORKERS', '4'))
+
+# ==============================================================================
+# ADMINISTRATION DES TABLES DE PRÊTS (cnef/admin.py, PretsAdmin)
+# ==============================================================================
+# Les listes de l'admin des prêts exécutent un nombre fixe de requêtes par page
+
+# ADMIN_COMPTAGE_ESTIME_SEUIL : Au-delà de ce nombre de lignes (estimation du
+# moteur), une liste sans filtre affiche le nombre estimé au lieu d'un COUNT(*)
+ADMIN_COMPTAGE_ESTIME_SEUIL = int(os.getenv('ADMIN_COMPTAGE_ESTIME_SEUIL', '100000'))
+
+# ADMIN_FILTRES_CACHE_DUREE : Durée (en secondes) de mise en cache des valeurs
+# proposées par les filtres (années, natures de prêt, situations de créance)
+ADMIN_FILTRES_CACHE_DUREE = int(os.getenv('ADMIN_FILTRES_CACHE_DUREE', '3600'))
+
+# ADMIN_SUPPRESSION_TAILLE_LOT : Nombre de lignes supprimées par transaction
+# par les actions de suppression
+ADMIN_SUPPRESSION_TAILLE_LOT = int(os.getenv('ADMIN_SUPPRESSION_TAILLE_LOT', '5000'))
+
+# ==============================================================================
+# ÉVÉNEMENTS DES SOUMISSIONS (cnef/evenements.py)
+# ==============================================================================
+# Les tableaux de bord chef et AEF reçoivent les changements de statut des
+# soumissions et les compteurs à jour par un flux SSE (application ASGI,
+# collecte_platform/asgi.py), ou par attente longue sous WSGI
+
+# EVENEMENTS_MODE : Transport des événements
+# 'redis' = pub/sub Redis, partagé entre tous les workers (production)
+# 'local' = diffuseur en mémoire, limité au processus (un seul worker, tests)
+# 'redis' devient 'local' si le cache par défaut n'est pas django-redis
+EVENEMENTS_MODE = os.getenv('EVENEMENTS_MODE', 'redis')
+
+# EVENEMENTS_REDIS_URL : Connexion Redis des flux SSE (client asynchrone)
+EVENEMENTS_REDIS_URL = os.getenv('EVENEMENTS_REDIS_URL', REDIS_URL)
+
+# EVENEMENTS_HISTORIQUE : Nombre d'événements conservés pour les clients qui se reconnectent
+EVENEMENTS_HISTORIQUE = int(os.getenv('EVENEMENTS_HISTORIQUE', '200'))
+
+# EVENEMENTS_BATTEMENT : Intervalle (en secondes) des battements envoyés sur un flux inactif
+EVENEMENTS_BATTEMENT = int(os.getenv('EVENEMENTS_BATTEMENT', '20'))
+
+# EVENEMENTS_SSE_DUREE_MAX : Durée (en secondes) d'une connexion SSE ; le
+# navigateur se reconnecte ensuite sans perte (Last-Event-ID)
+EVENEMENTS_SSE_DUREE_MAX = int(os.getenv('EVENEMENTS_SSE_DUREE_MAX', '300'))
+
+# EVENEMENTS_RECONNEXION_MS : Délai de reconnexion indiqué au navigateur (retry:)
+EVENEMENTS_RECONNEXION_MS = int(os.getenv('EVENEMENTS_RECONNEXION_MS', '3000'))
+
+# EVENEMENTS_ATTENTE_MAX : Durée maximale (en secondes) d'une attente longue (WSGI) ;
+# chaque client en attente occupe un thread du worker pendant ce temps
+EVENEMENTS_ATTENTE_MAX = int(os.getenv('EVENEMENTS_ATTENTE_MAX', '25'))
+
+# ==============================================================================
+# TENDANCES DU COMMUNIQUÉ (cnef/tendances_teg.py)
+# ==============================================================================
+# Évolution trimestrielle du TEG moyen, du seuil d'usure et des volumes
+
+# TENDANCES_CACHE_DUREE : Durée (en secondes) de conservation d'un résultat ;
+# il est de toute façon recalculé dès que les données de prêts changent
+TENDANCES_CACHE_DUREE = int(os.getenv('TENDANCES_CACHE_DUREE', '86400'))
+
+# TENDANCES_TRIMESTRES_MAX : Nombre maximal de trimestres par requête
+TENDANCES_TRIMESTRES_MAX = int(os.getenv('TENDANCES_TRIMESTRES_MAX', '20'))
+
+# ==============================================================================
+# TEG ATYPIQUES (cnef/anomalies_teg.py)
+# ==============================================================================
+# Prêts dont le TEG déclaré s'écarte fortement des prêts comparables
+# (même produit, maturité et catégorie de bénéficiaire)
+
+# ANOMALIES_TAILLE_LOT : Nombre de prêts chargés par requête
+ANOMALIES_TAILLE_LOT = int(os.getenv('ANOMALIES_TAILLE_LOT', '100000'))
+
+# ANOMALIES_SEUIL_MAD : Score robuste (x - médiane) / (1,4826 × MAD) au-delà
+# duquel le TEG est atypique (3,5 : seuil usuel d'Iglewicz et Hoaglin)
+ANOMALIES_SEUIL_MAD = float(os.getenv('ANOMALIES_SEUIL_MAD', '3.5'))
+
+# ANOMALIES_COEFFICIENT_IQR : TEG atypique hors de [Q1 - k × IQR, Q3 + k × IQR]
+ANOMALIES_COEFFICIENT_IQR = float(os.getenv('ANOMALIES_COEFFICIENT_IQR', '1.5'))
+
+# ANOMALIES_ECART_MIN : Écart minimal à la médiane (en points de TEG) pour
+# signaler un prêt, même dans un groupe aux TEG presque identiques
+ANOMALIES_ECART_MIN = float(os.getenv('ANOMALIES_ECART_MIN', '1.0'))
+
+# ANOMALIES_TAILLE_GROUPE_MIN : Nombre minimal de prêts comparables pour
+# évaluer un groupe
+ANOMALIES_TAILLE_GROUPE_MIN = int(os.getenv('ANOMALIES_TAILLE_GROUPE_MIN', '30'))
+
+# ANOMALIES_DUREE_VERROU : Durée maximale (en secondes) du verrou qui empêche
+# deux détections simultanées ; libéré à la fin de la détection, il expire
+# de lui-même si le worker s'arrête en cours de route
+ANOMALIES_DUREE_VERROU = int(os.getenv('ANOMALIES_DUREE_VERROU', '3600'))
+
 # ==============================================================================
 # PARAMÈTRES DE SÉCURITÉ ADDITIONNELS
 # ==============================================================================